@@ -0,0 +1,104 @@
+from __future__ import absolute_import
+
+import glob
+import imp
+import os
+import sys
+
+from Deadline.Events import DeadlineEventListener
+from Deadline.Scripting import RepositoryUtils
+
+imp.load_source( 'BlenderChunking', RepositoryUtils.GetRepositoryFilePath( "plugins/Blender/BlenderChunking.py", True ) )
+from BlenderChunking import TimingFilePattern, ReadTimingRecords, EstimateTiming, GetAdaptiveChunkSize
+
+########################################################################
+## This is the function that Deadline calls to get an instance of the
+## main DeadlineEventListener class.
+########################################################################
+def GetDeadlineEventListener():
+    return BlenderAdaptiveChunkingListener()
+
+########################################################################
+## This is the function that Deadline calls when the event plugin is
+## no longer in use so that it can get cleaned up.
+########################################################################
+def CleanupDeadlineEventListener( deadlineEventListener ):
+    deadlineEventListener.Cleanup()
+
+########################################################################
+## Chunks the frames of a Blender job submitted with adaptive frames per
+## task. The submitter sends the probe frames as a job of one frame per
+## task, and the remaining frames as a suspended job. When the probe job
+## finishes, the remaining frames are chunked to the target task duration
+## from the startup and frame times the probe tasks measured, and their
+## job is resumed. When the probe job fails or is deleted instead, the
+## remaining frames are resumed with the frames per task they were
+## submitted with.
+########################################################################
+class BlenderAdaptiveChunkingListener( DeadlineEventListener ):
+    def __init__( self ):
+        if sys.version_info.major == 3:
+            super().__init__()
+        self.OnJobFinishedCallback += self.OnJobFinished
+        self.OnJobFailedCallback += self.OnJobFailed
+        self.OnJobDeletedCallback += self.OnJobDeleted
+
+    def Cleanup( self ):
+        del self.OnJobFinishedCallback
+        del self.OnJobFailedCallback
+        del self.OnJobDeletedCallback
+
+    def GetSuspendedMainJob( self, job ):
+        ''' The suspended job of the remaining frames of a probe job, None when there is nothing to resume '''
+        mainJobId = job.GetJobPluginInfoKeyValue( "AdaptiveChunkJobId" )
+        if mainJobId == "":
+            return None
+
+        mainJob = RepositoryUtils.GetJob( mainJobId, True )
+        if mainJob is None:
+            self.LogWarning( "The job %s the probe job %s measured frame times for no longer exists" % ( mainJobId, job.JobId ) )
+            return None
+        if mainJob.JobStatus != "Suspended":
+            # Somebody resumed it already, chunking it again now would requeue its tasks
+            self.LogInfo( "The job %s is %s, leaving its %d frames per task" % ( mainJobId, mainJob.JobStatus, mainJob.JobFramesPerTask ) )
+            return None
+
+        return mainJob
+
+    def OnJobFailed( self, job ):
+        self.ResumeWithoutTiming( job, "failed" )
+
+    def OnJobDeleted( self, job ):
+        self.ResumeWithoutTiming( job, "was deleted" )
+
+    def ResumeWithoutTiming( self, job, reason ):
+        ''' Resume the remaining frames of a probe job that won't finish, so they don't stay suspended '''
+        mainJob = self.GetSuspendedMainJob( job )
+        if mainJob is None:
+            return
+
+        self.LogWarning( "The probe job %s %s before it finished, resuming %s with the %d frames per task it was submitted with" % ( job.JobId, reason, mainJob.JobId, mainJob.JobFramesPerTask ) )
+        RepositoryUtils.ResumeJob( mainJob )
+
+    def OnJobFinished( self, job ):
+        mainJob = self.GetSuspendedMainJob( job )
+        if mainJob is None:
+            return
+        mainJobId = mainJob.JobId
+
+        timingFiles = glob.glob( os.path.join( RepositoryUtils.GetJobAuxiliaryPath( job ), TimingFilePattern % "*" ) )
+        startupSeconds, frameSeconds = EstimateTiming( ReadTimingRecords( timingFiles ) )
+        if frameSeconds <= 0:
+            self.LogWarning( "The probe job %s recorded no frame times, resuming %s with %d frames per task" % ( job.JobId, mainJobId, mainJob.JobFramesPerTask ) )
+            RepositoryUtils.ResumeJob( mainJob )
+            return
+
+        targetSeconds = float( job.GetJobPluginInfoKeyValue( "AdaptiveChunkTargetSeconds" ) or "900" )
+        minTasks = int( self.GetConfigEntryWithDefault( "MinimumTasks", "20" ) )
+        frameCount = len( mainJob.JobFramesList )
+        chunkSize = GetAdaptiveChunkSize( startupSeconds, frameSeconds, frameCount, targetSeconds, minTasks )
+
+        self.LogInfo( "%d probe tasks of job %s: %.1fs startup, %.1fs per frame" % ( len( timingFiles ), job.JobId, startupSeconds, frameSeconds ) )
+        self.LogInfo( "Chunking the %d frames of job %s with %d frames per task, about %.0fs per task for a %.0fs target" % ( frameCount, mainJobId, chunkSize, startupSeconds + chunkSize * frameSeconds, targetSeconds ) )
+        RepositoryUtils.SetJobFrameRange( mainJob, mainJob.JobFrames, chunkSize )
+        RepositoryUtils.ResumeJob( mainJob )
@@ -0,0 +1,110 @@
+from __future__ import absolute_import
+
+import imp
+import os
+import random
+import sys
+import time
+
+from Deadline.Events import DeadlineEventListener
+from Deadline.Scripting import RepositoryUtils, ClientUtils, FileUtils
+
+imp.load_source( 'BlenderExecutables', RepositoryUtils.GetRepositoryFilePath( "plugins/Blender/BlenderExecutables.py", True ) )
+from BlenderExecutables import VersionManifest, InstallRootsConfigKey, VersionedConfigKeyPattern, FormatVersion, GetVersionLimitName, ParseVersion, SplitPatterns
+
+########################################################################
+## This is the function that Deadline calls to get an instance of the
+## main DeadlineEventListener class.
+########################################################################
+def GetDeadlineEventListener():
+    return BlenderVersionsListener()
+
+########################################################################
+## This is the function that Deadline calls when the event plugin is
+## no longer in use so that it can get cleaned up.
+########################################################################
+def CleanupDeadlineEventListener( deadlineEventListener ):
+    deadlineEventListener.Cleanup()
+
+########################################################################
+## Reports the Blender versions installed on a Worker when it starts, by
+## listing the Worker in the "blender-X-Y" limits of those versions. Jobs
+## submitted with "Only Workers With This Blender Version" require the
+## limit of their version, so other Workers never dequeue them.
+########################################################################
+class BlenderVersionsListener( DeadlineEventListener ):
+    def __init__( self ):
+        if sys.version_info.major == 3:
+            super().__init__()
+        self.OnSlaveStartedCallback += self.OnSlaveStarted
+
+    def Cleanup( self ):
+        del self.OnSlaveStartedCallback
+
+    def OnSlaveStarted( self, slaveName ):
+        versions = self.GetInstalledVersions()
+        self.LogInfo( "Blender versions installed on %s: %s" % ( slaveName, ", ".join( FormatVersion( version ) for version in sorted( versions ) ) ) )
+        self.UpdateVersionLimits( slaveName, set( GetVersionLimitName( FormatVersion( version ) ) for version in versions ) )
+
+    def GetInstalledVersions( self ):
+        ''' Major.minor releases found in the install roots or through the plugin's executable entries '''
+        pluginConfig = RepositoryUtils.GetPluginConfig( "Blender" )
+
+        manifestFile = os.path.join( ClientUtils.GetDeadlineTempPath(), "BlenderVersionManifest.json" )
+        manifest = VersionManifest.Load( manifestFile )
+        if manifest.Discover( SplitPatterns( pluginConfig.GetConfigEntryWithDefault( InstallRootsConfigKey, "" ) ) ):
+            try:
+                manifest.Save( manifestFile )
+            except ( IOError, OSError ) as e:
+                self.LogWarning( "Unable to save the Blender version manifest to \"%s\": %s" % ( manifestFile, e ) )
+
+        versions = set( version[:2] for version in manifest.GetVersions() )
+        for key in pluginConfig.GetConfigKeys():
+            match = VersionedConfigKeyPattern.match( key )
+            if match is not None and ParseVersion( match.group( 1 ) ) is not None:
+                if FileUtils.SearchFileList( pluginConfig.GetConfigEntry( key ) ) != "":
+                    versions.add( ParseVersion( match.group( 1 ) )[:2] )
+
+        return versions
+
+    def UpdateVersionLimits( self, slaveName, limitNames ):
+        existingNames = [ name for name in RepositoryUtils.GetLimitGroupNames() if name.startswith( "blender-" ) ]
+        for limitName in sorted( set( existingNames ) | limitNames ):
+            self.UpdateVersionLimit( slaveName, limitName, limitName in limitNames )
+
+    def UpdateVersionLimit( self, slaveName, limitName, listed ):
+        ''' List the Worker in a limit or take it off. A limit's Workers can only be written as a whole, so
+        Workers starting at the same time overwrite each other's changes: the list is read again after a
+        random delay, and written again until it still holds this Worker's change after another delay '''
+        limitCount = int( self.GetConfigEntryWithDefault( "LimitCount", "1000000" ) )
+        attempts = int( self.GetConfigEntryWithDefault( "UpdateAttempts", "10" ) )
+        written = 0
+        confirmed = False
+        while True:
+            listedSlaves = []
+            limitGroup = RepositoryUtils.GetLimitGroup( limitName, True )
+            if limitGroup is not None:
+                listedSlaves = [ name for name in limitGroup.LimitGroupListedSlaves ]
+
+            if ( slaveName in listedSlaves ) == listed:
+                if written == 0 or confirmed:
+                    return
+                # Another Worker that read the list before this one wrote it may still write it
+                confirmed = True
+            elif written == attempts:
+                break
+            else:
+                if written > 0:
+                    self.LogInfo( "The %s limit was changed by another Worker, updating it again" % limitName )
+                if listed:
+                    listedSlaves.append( slaveName )
+                else:
+                    listedSlaves.remove( slaveName )
+
+                self.LogInfo( "Updating the Workers allowed by the %s limit" % limitName )
+                RepositoryUtils.SetLimitGroup( limitName, limitCount, listedSlaves, True )
+                written += 1
+                confirmed = False
+            time.sleep( random.uniform( 0.5, 2.0 ) * written )
+
+        self.LogWarning( "Unable to update the %s limit after %d attempts" % ( limitName, attempts ) )
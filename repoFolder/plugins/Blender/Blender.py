@@ -6,9 +6,30 @@ from System.Diagnostics import *
 from System.IO import *
 
 from Deadline.Plugins import DeadlinePlugin, PluginType
-from Deadline.Scripting import RepositoryUtils, SystemUtils, FileUtils, StringUtils
+from Deadline.Scripting import RepositoryUtils, SystemUtils, FileUtils, StringUtils, ClientUtils
+from FranticX.Processes import ManagedProcess
 
+import glob
+import json
+import os
 import sys
+import time
+
+from BlenderAffinity import GetTopology, PartitionCpus, SetAffinity, FormatCpuList, ProcessIdExpression, ProcessIdPattern
+from BlenderBlendFile import PrefetchBlendDependencies
+from BlenderCache import FileCache
+from BlenderChunking import TimingFilePattern, WriteTimingRecord
+from BlenderEta import FormatDuration, TaskEstimator
+from BlenderExecutables import ExecutableIndex, VersionManifest, DefaultMatchPolicy, FallbackConfigKey, InstallRootsConfigKey, VersionedConfigKeyPattern, GetConfigFingerprint, FormatVersion, ParseVersion, SplitPatterns
+from BlenderFrames import GetFrameArgument, GetPreviewOrder
+from BlenderMemory import MemoryLedger, GetMemoryStatus, PeakFilePattern, RecordPeak, GetJobEstimate
+from BlenderMetrics import FrameMetrics
+from BlenderProfile import PhaseProfiler
+from BlenderOutputs import CanWritePreviews, CheckFrameOutputs, GetFramePath, ValidateFrameOutputs, WritePreviews
+from BlenderProgress import GetProgressParser
+from BlenderRegions import GetRegionDirectory, RegionFilePattern
+from BlenderSceneStore import SceneStore
+from BlenderViews import GetViewName, GetViewOutput, GetViews, ParseNames
 
 def GetDeadlinePlugin():
     return BlenderPlugin()
@@ -20,6 +41,9 @@ class BlenderPlugin(DeadlinePlugin):
     frameCount = 0
     finishedFrameCount = 0
     
+    SessionName = "BlenderSession"
+    TaskProcessName = "BlenderTask"
+    
     def __init__(self):
         if sys.version_info.major == 3:
             super().__init__()
@@ -28,30 +52,167 @@ class BlenderPlugin(DeadlinePlugin):
         self.RenderArgumentCallback += self.RenderArgument
         self.PreRenderTasksCallback += self.PreRenderTasks
         self.PostRenderTasksCallback += self.PostRenderTasks
+        self.StartJobCallback += self.StartJob
+        self.RenderTasksCallback += self.RenderTasks
+        self.EndJobCallback += self.EndJob
+        
+        self.stdoutSource = self
+        self.session = None
+        self.sessionKey = None
+        self.executableIndex = None
+        # (config fingerprint, version, policy) -> (index entry, reason) resolved for this job
+        self.resolvedExecutables = {}
+        self.resolvedVersion = ""
+        self.frameMetrics = FrameMetrics( "" )
+        self.estimator = TaskEstimator( 0 )
+        self.profiler = PhaseProfiler( False )
+        self.taskCpus = []
+        self.renderThreads = 0
+        self.memoryLedger = None
+        self.memoryReservation = ""
+        self.sceneCache = None
     
     def Cleanup(self):
         for stdoutHandler in self.StdoutHandlers:
             del stdoutHandler.HandleCallback
         
+        if self.session is not None:
+            self.session.Cleanup()
+            self.session = None
+        self.ReleaseSceneCache()
+        
         del self.InitializeProcessCallback
         del self.RenderExecutableCallback
         del self.RenderArgumentCallback
         del self.PreRenderTasksCallback
         del self.PostRenderTasksCallback
+        del self.StartJobCallback
+        del self.RenderTasksCallback
+        del self.EndJobCallback
     
     def InitializeProcess(self):
         self.SingleFramesOnly = False
         self.StdoutHandling = True
         
+        # In session mode a single Blender process renders every task of the job that this worker
+        # slot picks up, so the process is driven from StartJob/RenderTasks/EndJob instead. Skipping
+        # existing frames also needs RenderTasks, so that Blender isn't started when nothing is missing.
+        self.SessionMode = self.GetBooleanPluginInfoEntryWithDefault( "SessionMode", False )
+        self.SkipExistingFrames = self.GetBooleanPluginInfoEntryWithDefault( "SkipExistingFrames", False )
+        
+        # Region jobs render one region of a still per task, and their stitch job assembles the frame
+        # from the regions. Both render a single image per task, so they always run Blender per task.
+        self.RegionRendering = self.GetBooleanPluginInfoEntryWithDefault( "RegionRendering", False )
+        self.RegionStitch = self.GetBooleanPluginInfoEntryWithDefault( "RegionStitch", False )
+        if self.RegionRendering or self.RegionStitch:
+            self.SessionMode = False
+            self.SkipExistingFrames = False
+        
+        # Fails a task once Blender went without progress for StallMultiplier times the interval its
+        # progress came at so far, so that it is requeued long before the task timeout. Blender is
+        # then run as a monitored process, which RenderTasks can check while it waits for it.
+        self.StallDetection = self.GetBooleanPluginInfoEntryWithDefault( "StallDetection", self.GetBooleanConfigEntryWithDefault( "StallDetection", False ) )
+        self.stallMultiplier = float( self.GetConfigEntryWithDefault( "StallMultiplier", "10" ) )
+        self.stallMinimumSeconds = float( self.GetConfigEntryWithDefault( "StallMinimumSeconds", "300" ) )
+        if self.RegionRendering or self.RegionStitch:
+            self.StallDetection = False
+        
+        # Cameras and view layers rendered for every frame from one load of the scene, each to its own output
+        self.views = []
+        if not ( self.RegionRendering or self.RegionStitch ):
+            self.views = GetViews( ParseNames( self.GetPluginInfoEntryWithDefault( "Cameras", "" ) ), ParseNames( self.GetPluginInfoEntryWithDefault( "ViewLayers", "" ) ) )
+        
+        # Timestamps the phases of every task, a job can turn it on for itself
+        self.ProfilePhases = self.GetBooleanPluginInfoEntryWithDefault( "ProfileTaskPhases", self.GetBooleanConfigEntryWithDefault( "ProfileTaskPhases", False ) )
+        self.profiler = PhaseProfiler( self.ProfilePhases )
+        
+        # Concurrent tasks can each get their own share of the CPUs. Blender prints its process ID as
+        # it starts so that it is pinned to the share, the Worker itself keeps all of its CPUs.
+        self.PartitionConcurrentTasks = self.GetJob().JobConcurrentTasks > 1 and self.GetBooleanConfigEntryWithDefault( "PartitionConcurrentTasks", False )
+        
+        if self.SessionMode or self.SkipExistingFrames or self.StallDetection:
+            self.PluginType = PluginType.Advanced
+        else:
+            self.PluginType = PluginType.Simple
+            self.AddStdoutHandlers( self )
+    
+    def AddStdoutHandlers( self, target ):
+        ''' Register the progress handlers on the plugin or on the session's managed process '''
+        self.stdoutSource = target
+        
+        # The log format depends on the Blender release, so the parser is picked with the version
+        # the job was submitted from.
+        self.progressParser = GetProgressParser( self.GetPluginInfoEntryWithDefault( "Version", "" ) )
+        
         #Std out handlers
-        self.AddStdoutHandlerCallback(".*Tile ([0-9]+)/([0-9]+).*").HandleCallback += self.HandleTileProgress
-        self.AddStdoutHandlerCallback(".*Sample ([0-9]+)/([0-9]+).*").HandleCallback += self.HandleSampleProgress
-        self.AddStdoutHandlerCallback(".*Scene, Part ([0-9]+)-([0-9]+).*").HandleCallback += self.HandleSceneProgress
-        self.AddStdoutHandlerCallback(".*Saved:.*").HandleCallback += self.HandleStdoutSaved
-        #self.AddStdoutHandlerCallback(".*Error.*").HandleCallback += self.HandleStdoutError
-        self.AddStdoutHandlerCallback("Unable to open.*").HandleCallback += self.HandleStdoutFailed
-        self.AddStdoutHandlerCallback("Failed to read blend file.*").HandleCallback += self.HandleStdoutFailed
-        self.AddStdoutHandlerCallback(".*Unable to create directory.*").HandleCallback += self.HandleStdoutFailed
+        # A single anchored filter is registered, so each line is only matched once by Deadline.
+        # The lines that pass it are parsed in HandleStdout.
+        target.AddStdoutHandlerCallback( self.progressParser.Filter ).HandleCallback += self.HandleStdout
+    
+        # Only registered when profiling, since it matches every line Blender prints
+        if self.ProfilePhases:
+            target.AddStdoutHandlerCallback( ".*" ).HandleCallback += self.HandleProfileStdout
+        
+        if self.PartitionConcurrentTasks:
+            target.AddStdoutHandlerCallback( ProcessIdPattern ).HandleCallback += self.HandleProcessId
+        
+        if self.RegionStitch:
+            target.AddStdoutHandlerCallback( "Stitched rows ([0-9]+) of ([0-9]+)" ).HandleCallback += self.HandleStitchProgress
+            target.AddStdoutHandlerCallback( "Error: Unable to stitch.*" ).HandleCallback += self.HandleStitchError
+    
+    def HandleProcessId(self):
+        if len( self.taskCpus ) == 0:
+            return
+        
+        pid = int( self.stdoutSource.GetRegexMatch(1) )
+        try:
+            pinned = SetAffinity( self.taskCpus, pid )
+        except OSError as e:
+            self.LogWarning( "Unable to pin Blender (process %d) to CPUs %s: %s" % ( pid, FormatCpuList( self.taskCpus ), e ) )
+            return
+        
+        if pinned:
+            self.LogInfo( "Pinned Blender (process %d) to CPUs %s" % ( pid, FormatCpuList( self.taskCpus ) ) )
+    
+    def GetProcessIdArgument(self):
+        ''' Has Blender print its process ID before it loads the scene when it has to be pinned '''
+        if len( self.taskCpus ) == 0:
+            return ""
+        return " --python-expr \"" + ProcessIdExpression + "\""
+    
+    def HandleProfileStdout(self):
+        self.profiler.MarkOnce( "firstLine" )
+        if self.stdoutSource.GetRegexMatch(0).startswith( "Read blend:" ):
+            self.profiler.MarkOnce( "blendRead" )
+    
+    def HandleStdout(self):
+        line = self.stdoutSource.GetRegexMatch(0)
+        event = self.progressParser.Parse( line )
+        if event is None:
+            return
+        
+        if event.kind == "progress":
+            self.frameMetrics.Update( event )
+            self.estimator.Progress( event )
+            self.profiler.MarkOnce( "firstSample" )
+            if event.chunkType == "sample":
+                self.HandleSampleProgress( event )
+            elif event.chunkType == "tile":
+                self.HandleTileProgress( event )
+            else:
+                self.HandleSceneProgress( event )
+        elif event.kind == "saved":
+            frame = self.GetCurrentFrame()
+            if self.frameMetrics.peak is not None:
+                self.RecordJobMemory( self.frameMetrics.peak * 1048576 )
+            self.RecordFrameMetrics( self.frameMetrics.Saved, event, frame )
+            self.profiler.Mark( "saved", frame=frame )
+            self.estimator.Saved()
+            self.HandleStdoutSaved()
+        elif event.kind == "rendertime":
+            self.RecordFrameMetrics( self.frameMetrics.RenderTime, event )
+        elif event.kind == "failed":
+            self.HandleStdoutFailed( line )
     
     def RenderExecutable(self):
         build = self.GetPluginInfoEntryWithDefault( "Build", "None" ).lower()
@@ -60,10 +221,7 @@ class BlenderPlugin(DeadlinePlugin):
         blVersion = self.GetPluginInfoEntryWithDefault( "Version", "" ).lower()
         
         executable = ""
-        try:
-            executableList = self.GetConfigEntry( "Blender_%s_RenderExecutable" % ( blVersion ) )
-        except:
-            executableList = self.GetConfigEntry( "Blender_RenderExecutable" )
+        executableList, resolvedExecutable = self.ResolveExecutable( blVersion )
         
         ###
         
@@ -82,103 +240,917 @@ class BlenderPlugin(DeadlinePlugin):
             
         if( executable == "" ):
             self.LogInfo( "Not enforcing a build of Blender" )
-            executable = FileUtils.SearchFileList( executableList )
+            executable = resolvedExecutable
             if executable == "":
                 self.FailRender( "Blender render executable was not found in the semicolon separated list \"" + executableList + "\". The path to the render executable can be configured from the Plugin Configuration in the Deadline Monitor." )
         
+        self.frameMetrics.context.update( { "executable": executable, "version": self.resolvedVersion } )
+        self.profiler.Mark( "executable" )
         return executable
+    
+    def ResolveExecutable( self, version ):
+        ''' Return the executable list and the executable to use for a Blender version, from the worker's executable index '''
+        configEntries = self.GetExecutableConfigEntries()
+        fingerprint = GetConfigFingerprint( configEntries )
+        policy = self.GetConfigEntryWithDefault( "VersionMatchPolicy", DefaultMatchPolicy )
         
-    def RenderArgument(self):
-        sceneFile = self.GetPluginInfoEntryWithDefault( "SceneFile", self.GetDataFilename() )
-        sceneFile = RepositoryUtils.CheckPathMapping( sceneFile )
-        if SystemUtils.IsRunningOnWindows():
-            sceneFile = sceneFile.replace( "/", "\\" )
-            if sceneFile.startswith( "\\" ) and not sceneFile.startswith( "\\\\" ):
-                sceneFile = "\\" + sceneFile
+        # The later tasks of a job use the executable its first task resolved without touching the disk
+        key = ( fingerprint, version, policy )
+        if key not in self.resolvedExecutables:
+            self.resolvedExecutables[key] = self.FindExecutable( configEntries, fingerprint, version, policy )
+        entry, reason = self.resolvedExecutables[key]
+        
+        self.resolvedVersion = FormatVersion( entry["version"] ) if entry is not None else ""
+        if entry is None:
+            self.LogWarning( "No Blender executable found: %s" % reason )
+            return ( configEntries.get( FallbackConfigKey, "" ), "" )
+        
+        self.LogInfo( "Resolved Blender executable \"%s\": %s" % ( entry["path"], reason ) )
+        return ( configEntries.get( entry["source"], entry["path"] ), entry["path"] )
+    
+    def FindExecutable( self, configEntries, fingerprint, version, policy ):
+        ''' Return the (entry, reason) of the executable index for a Blender version. The index is kept
+        on disk between jobs, and it is only rebuilt, scanning the install roots again, when the
+        plugin configuration changed, when the executable it gives was removed or replaced, or when the
+        requested release isn't indexed and install roots are configured, since it may have been
+        installed in them while the Worker runs. '''
+        indexFile = os.path.join( self.GetSlaveDirectory(), "BlenderExecutableIndex.json" )
+        requestedVersion = ParseVersion( version )
+        if self.executableIndex is None or self.executableIndex.fingerprint != fingerprint:
+            self.executableIndex = ExecutableIndex.Load( indexFile )
+            if self.executableIndex is None or self.executableIndex.fingerprint != fingerprint:
+                self.LogInfo( "Blender executable configuration changed, rebuilding the executable index" )
+                self.executableIndex = self.BuildExecutableIndex( configEntries, fingerprint, indexFile )
+                return self.executableIndex.Find( requestedVersion, policy )
+        
+        entry, reason = self.executableIndex.Find( requestedVersion, policy )
+        if entry is not None and not self.executableIndex.IsCurrent( entry ):
+            self.LogInfo( "Blender executable \"%s\" changed since it was indexed, rebuilding the executable index" % entry["path"] )
+        elif configEntries.get( InstallRootsConfigKey, "" ) != "" and requestedVersion is not None and len( requestedVersion ) >= 2 and not self.executableIndex.HasRelease( requestedVersion ):
+            self.LogInfo( "Blender %s isn't indexed, rebuilding the executable index in case it was installed since" % FormatVersion( requestedVersion[:2] ) )
         else:
-            sceneFile = sceneFile.replace( "\\", "/" )
+            return ( entry, reason )
+        
+        self.executableIndex = self.BuildExecutableIndex( configEntries, fingerprint, indexFile )
+        return self.executableIndex.Find( requestedVersion, policy )
+    
+    def GetExecutableConfigEntries(self):
+        config = RepositoryUtils.GetPluginConfig( "Blender" )
+        
+        configEntries = {}
+        for key in config.GetConfigKeys():
+            if key in ( FallbackConfigKey, InstallRootsConfigKey ) or VersionedConfigKeyPattern.match( key ):
+                configEntries[key] = config.GetConfigEntry( key )
+        
+        return configEntries
+    
+    def DiscoverInstalls(self):
+        ''' Scan the install roots for Blender installs, "--version" only runs for new or replaced executables '''
+        manifestFile = os.path.join( ClientUtils.GetDeadlineTempPath(), "BlenderVersionManifest.json" )
+        manifest = VersionManifest.Load( manifestFile )
+        if manifest.Discover( SplitPatterns( self.GetConfigEntryWithDefault( InstallRootsConfigKey, "" ) ) ):
+            try:
+                manifest.Save( manifestFile )
+            except ( IOError, OSError ) as e:
+                self.LogWarning( "Unable to save the Blender version manifest to \"%s\": %s" % ( manifestFile, e ) )
+        return manifest
+    
+    def BuildExecutableIndex( self, configEntries, fingerprint, indexFile ):
+        index = ExecutableIndex( fingerprint )
+        for key, executableList in configEntries.items():
+            if key == InstallRootsConfigKey:
+                continue
+            
+            version = ()
+            match = VersionedConfigKeyPattern.match( key )
+            if match is not None:
+                version = ParseVersion( match.group( 1 ) )
+                if version is None:
+                    continue
+            
+            executable = FileUtils.SearchFileList( executableList )
+            if executable != "":
+                index.Add( version, executable, key )
+        
+        # Blender installs found in the install roots cover the releases without their own config entry
+        index.AddDiscovered( self.DiscoverInstalls() )
+        
+        self.LogInfo( "Blender versions on this Worker: %s" % ", ".join( FormatVersion( version ) for version in index.GetVersions() ) )
+        self.LogInfo( "Indexed %d Blender executables on this Worker" % len( index.entries ) )
+        try:
+            index.Save( indexFile )
+        except ( IOError, OSError ) as e:
+            self.LogWarning( "Unable to save the Blender executable index to \"%s\": %s" % ( indexFile, e ) )
         
-        renderArgument = " -b \"" + sceneFile + "\""
-        renderArgument += " -t " + self.GetPluginInfoEntryWithDefault( "Threads", "0" )
+        return index
         
-        outputFile = self.GetPluginInfoEntryWithDefault( "OutputFile", "" )
-        outputFile = RepositoryUtils.CheckPathMapping( outputFile )
+    def MapPath( self, path ):
+        path = RepositoryUtils.CheckPathMapping( path )
         if SystemUtils.IsRunningOnWindows():
-            outputFile = outputFile.replace( "/", "\\" )
-            if outputFile.startswith( "\\" ) and not outputFile.startswith( "\\\\" ):
-                outputFile = "\\" + outputFile
+            path = path.replace( "/", "\\" )
+            if path.startswith( "\\" ) and not path.startswith( "\\\\" ):
+                path = "\\" + path
         else:
-            outputFile = outputFile.replace( "\\", "/" )
+            path = path.replace( "\\", "/" )
         
-        renderArgument += StringUtils.BlankIfEitherIsBlank( " -x 1 -o \"", StringUtils.BlankIfEitherIsBlank( outputFile, "\"" ) )
-        renderArgument += " -s " + str(self.GetStartFrame()) + " -e " + str(self.GetEndFrame()) + " -a "
+        return path
+    
+    def GetSceneFile(self):
+        return self.MapPath( self.GetPluginInfoEntryWithDefault( "SceneFile", self.GetDataFilename() ) )
+    
+    def GetOutputFile(self):
+        return self.MapPath( self.GetPluginInfoEntryWithDefault( "OutputFile", "" ) )
+    
+    def GetTaskFrames(self):
+        ''' The frames of the current task, which aren't contiguous for stepped or sparse frame lists '''
+        frames = [ int( frame ) for frame in self.GetCurrentTask().TaskFrameList ]
+        if len( frames ) == 0:
+            frames = list( range( self.GetStartFrame(), self.GetEndFrame() + 1 ) )
+        
+        return frames
+    
+    def RenderArgument(self):
+        if self.RegionStitch:
+            return self.GetStitchArgument()
+        
+        renderArgument = " -b" + self.GetProcessIdArgument() + " \"" + self.renderSceneFile + "\""
+        renderArgument += " -t " + str( self.renderThreads )
+        if self.pathMapFile != "":
+            renderArgument += " --python \"" + os.path.join( self.GetPluginDirectory(), "BlenderPathRemap.py" ) + "\""
+        
+        outputFile = self.GetOutputFile()
         
+        # Each script reads its own file after "--": the path map is the first, the region the last
+        scriptArguments = [ self.pathMapFile ] if self.pathMapFile != "" else []
+        if self.RegionRendering:
+            renderArgument += " --python-exit-code 1 --python \"" + os.path.join( self.GetPluginDirectory(), "BlenderRegionDriver.py" ) + "\""
+            scriptArguments.append( self.WriteRegionSpec( outputFile ) )
+        elif len( self.views ) > 0:
+            renderArgument += " --python-exit-code 1 --python \"" + os.path.join( self.GetPluginDirectory(), "BlenderViewDriver.py" ) + "\""
+            scriptArguments.append( self.WriteViewSpec( outputFile ) )
+        else:
+            renderArgument += StringUtils.BlankIfEitherIsBlank( " -x 1 -o \"", StringUtils.BlankIfEitherIsBlank( outputFile, "\"" ) )
+            renderArgument += GetFrameArgument( self.renderFrames )
+        if len( scriptArguments ) > 0:
+            renderArgument += " --" + "".join( " \"" + argument + "\"" for argument in scriptArguments )
+        
+        self.profiler.Mark( "arguments" )
         return renderArgument
+    
+    def WriteRegionSpec( self, outputFile ):
+        ''' Write what BlenderRegionDriver.py renders for this task '''
+        frame = self.renderFrames[0]
+        spec = {
+            "frame": frame,
+            "columns": int( self.GetPluginInfoEntry( "RegionColumns" ) ),
+            "rows": int( self.GetPluginInfoEntry( "RegionRows" ) ),
+            "index": self.regionIndex,
+            "directory": GetRegionDirectory( outputFile, frame ) }
+        
+        specFile = os.path.join( self.GetJobsDataDirectory(), "BlenderRegion_%s.json" % self.GetCurrentTaskId() )
+        with open( specFile, "w" ) as f:
+            json.dump( spec, f, indent=1 )
+        
+        self.LogInfo( "Rendering region %d of %dx%d of frame %d to \"%s\"" % ( self.regionIndex + 1, spec["columns"], spec["rows"], frame, spec["directory"] ) )
+        return specFile
+    
+    def GetViewSpecs( self, outputFile ):
+        return [ { "camera": camera, "viewLayer": viewLayer, "output": GetViewOutput( outputFile, camera, viewLayer ) } for camera, viewLayer in self.views ]
+    
+    def WriteViewSpec( self, outputFile ):
+        ''' Write the frames and views BlenderViewDriver.py renders for this task '''
+        spec = { "frames": self.renderFrames, "views": self.GetViewSpecs( outputFile ) }
+        specFile = os.path.join( self.GetJobsDataDirectory(), "BlenderViews_%s.json" % self.GetCurrentTaskId() )
+        with open( specFile, "w" ) as f:
+            json.dump( spec, f, indent=1 )
+        return specFile
+    
+    def GetStitchArgument(self):
+        ''' Blender only runs BlenderRegions.py to stitch the regions, for the NumPy that comes with it '''
+        outputFile = self.GetOutputFile()
+        frame = self.renderFrames[0]
+        spec = {
+            "directory": GetRegionDirectory( outputFile, frame ),
+            "columns": int( self.GetPluginInfoEntry( "RegionColumns" ) ),
+            "rows": int( self.GetPluginInfoEntry( "RegionRows" ) ),
+            "output": GetFramePath( outputFile, frame ) }
+        
+        specFile = os.path.join( self.GetJobsDataDirectory(), "BlenderStitch_%s.json" % self.GetCurrentTaskId() )
+        with open( specFile, "w" ) as f:
+            json.dump( spec, f, indent=1 )
+        
+        self.LogInfo( "Stitching the %dx%d regions in \"%s\" into \"%s\"" % ( spec["columns"], spec["rows"], spec["directory"], spec["output"] ) )
+        self.profiler.Mark( "arguments" )
+        return " --factory-startup -b --python-exit-code 1 --python \"" + os.path.join( self.GetPluginDirectory(), "BlenderRegions.py" ) + "\" -- \"" + specFile + "\""
+    
+    def StartJob(self):
+        # The session itself is started by the first task, once the executable and scene are known.
+        self.session = None
+        self.sessionKey = None
+    
+    def RenderTasks(self):
+        if len( self.renderFrames ) == 0:
+            self.LogInfo( "All the frames of this task have already been rendered, Blender will not be started" )
+            return
+        
+        if self.SessionMode:
+            self.RenderSessionTask()
+        elif self.StallDetection:
+            self.RunMonitoredTask()
+        else:
+            process = BlenderRenderProcess( self )
+            try:
+                self.RunManagedProcess( process )
+                self.profiler.Mark( "exit" )
+            finally:
+                process.Cleanup()
+    
+    def RunMonitoredTask(self):
+        ''' Run Blender for the task as a monitored process, so that the task fails as soon as it stalls '''
+        process = BlenderRenderProcess( self )
+        try:
+            self.StartMonitoredManagedProcess( self.TaskProcessName, process )
+            while self.MonitoredManagedProcessIsRunning( self.TaskProcessName ):
+                if self.IsCanceled():
+                    self.FailRender( "Received cancel task command from Deadline." )
+                
+                self.FlushMonitoredManagedProcessStdout( self.TaskProcessName )
+                stall = self.GetStallMessage()
+                if stall != "":
+                    self.FailRender( stall )
+                SystemUtils.Sleep( 100 )
+            
+            self.FlushMonitoredManagedProcessStdout( self.TaskProcessName )
+            self.profiler.Mark( "exit" )
+        finally:
+            self.ShutdownMonitoredManagedProcess( self.TaskProcessName )
+            process.Cleanup()
+        
+        # The exit code of a monitored process isn't available, Blender saves every frame when it succeeded
+        if self.finishedFrames < self.totalFrames:
+            self.FailRender( "Blender exited after saving %d of the %d frames of this task" % ( self.finishedFrames, self.totalFrames ) )
+    
+    def GetStallMessage(self):
+        ''' Why the task is stalled, or an empty string while Blender makes progress '''
+        if not self.StallDetection:
+            return ""
+        
+        stall = self.estimator.GetStall( self.stallMultiplier, self.stallMinimumSeconds )
+        if stall is None:
+            return ""
+        return "Blender made no progress for %ds, more than %g times the %.1fs expected from the progress of this task so far, failing the task so that it is requeued" % ( stall[0], self.stallMultiplier, stall[1] )
+    
+    def RenderSessionTask(self):
+        executable = self.RenderExecutable()
+        sceneFile = self.GetSceneFile()
+        
+        # The session is only reused while it would load exactly the same scene with the same Blender.
+        sceneTime = 0
+        if os.path.isfile( sceneFile ):
+            sceneTime = os.path.getmtime( sceneFile )
+        sessionKey = ( executable, sceneFile, sceneTime )
+        
+        if self.session is not None and self.sessionKey != sessionKey:
+            self.LogInfo( "Scene file or Blender executable changed, restarting the Blender session" )
+            self.StopSession()
+        
+        if self.session is None:
+            self.StartSession( executable, self.renderSceneFile )
+            self.sessionKey = sessionKey
+        
+        request = {
+            "frames": self.renderFrames,
+            "output": self.GetOutputFile(),
+            "threads": self.renderThreads }
+        if len( self.views ) > 0:
+            request["views"] = self.GetViewSpecs( self.GetOutputFile() )
+        
+        self.session.ResetStatus()
+        self.WriteStdinToMonitoredManagedProcess( self.SessionName, json.dumps( request ) )
+        self.WaitForSession()
+        
+        if self.session.error != "":
+            self.FailRender( "Blender session failed to render the task: " + self.session.error )
+        
+        self.RecordJobMemory( self.session.peakMemory )
+        
+        memoryLimit = int( self.GetConfigEntryWithDefault( "SessionMemoryLimitMB", "0" ) )
+        if memoryLimit > 0 and self.session.peakMemory > memoryLimit * 1024 * 1024:
+            self.LogInfo( "Blender session peak memory of %d MB is above the %d MB limit, recycling the session" % ( self.session.peakMemory // ( 1024 * 1024 ), memoryLimit ) )
+            self.StopSession()
+    
+    def EndJob(self):
+        self.StopSession()
+    
+    def StartSession( self, executable, sceneFile ):
+        self.LogInfo( "Starting Blender session for \"%s\"" % sceneFile )
+        
+        driverScript = os.path.join( self.GetPluginDirectory(), "BlenderSessionDriver.py" )
+        self.session = BlenderSessionProcess( self, executable, sceneFile, driverScript, self.pathMapFile )
+        self.profiler.Mark( "arguments" )
+        self.StartMonitoredManagedProcess( self.SessionName, self.session )
+        self.WaitForSession()
+    
+    def StopSession(self):
+        if self.session is None:
+            return
+        
+        self.LogInfo( "Stopping Blender session" )
+        if self.MonitoredManagedProcessIsRunning( self.SessionName ):
+            self.WriteStdinToMonitoredManagedProcess( self.SessionName, "quit" )
+        self.ShutdownMonitoredManagedProcess( self.SessionName )
+        self.ReleaseSceneCache()
+        
+        self.session.Cleanup()
+        self.session = None
+        self.sessionKey = None
+    
+    def WaitForSession(self):
+        ''' Pump the session's stdout until it reports that it is idle again '''
+        while self.session.busy:
+            if self.IsCanceled():
+                self.FailRender( "Received cancel task command from Deadline." )
+            
+            self.VerifyMonitoredManagedProcess( self.SessionName )
+            self.FlushMonitoredManagedProcessStdout( self.SessionName )
+            stall = self.GetStallMessage()
+            if stall != "":
+                self.StopSession()
+                self.FailRender( stall )
+            SystemUtils.Sleep( 100 )
         
     def PreRenderTasks(self):
+        self.profiler.Start()
+        self.taskStarted = time.time()
         self.LogInfo( "Blender job starting..." ) 
 
-        # Plugin specific values for progress
-        self.totalFrames = self.GetEndFrame() - self.GetStartFrame() + 1
+        self.renderFrames = self.GetTaskFrames()
+        if self.RegionRendering:
+            # The tasks of a region job are numbered by region, they all render the same frame
+            self.regionIndex = self.renderFrames[0]
+            self.renderFrames = [ int( self.GetPluginInfoEntry( "RegionFrame" ) ) ]
+        if self.GetBooleanPluginInfoEntryWithDefault( "PreviewFirstOrder", False ):
+            self.renderFrames = GetPreviewOrder( self.renderFrames )
+        if self.SkipExistingFrames:
+            self.renderFrames = self.GetMissingFrames( self.renderFrames )
+        
+        # Plugin specific values for progress, which counts every view of every frame
+        self.totalFrames = len( self.renderFrames ) * max( 1, len( self.views ) )
         self.finishedFrames = 0
         self.totalChunks = 0
         self.currentChunk = 0
         self.chunkType = ""
+        self.frameProgress = 0.0
+        self.remainingTime = None
+        self.estimator = TaskEstimator( self.totalFrames )
         
-        self.UpdateProgress()
+        # Progress is only sent to Deadline when it moved enough or enough time has passed, since
+        # every update is a round trip to the Worker and the database.
+        self.suppressOutput = self.GetBooleanPluginInfoEntryWithDefault( "SupressOutput", True )
+        self.progressDelta = float( self.GetConfigEntryWithDefault( "ProgressUpdateDelta", "1" ) )
+        self.progressInterval = float( self.GetConfigEntryWithDefault( "ProgressUpdateInterval", "5" ) )
+        self.reportedProgress = None
+        self.reportedTime = 0
+        self.pendingProgress = None
+        self.progressUpdatesSent = 0
+        self.progressUpdatesSuppressed = 0
+        
+        self.frameMetrics = FrameMetrics( self.GetFrameMetricsFile(), {
+            "job": self.GetJob().JobId,
+            "task": self.GetCurrentTaskId(),
+            "worker": self.GetSlaveName(),
+            "scene": self.GetSceneFile(),
+            "requestedVersion": self.GetPluginInfoEntryWithDefault( "Version", "" ) } )
+        
+        self.PartitionCpus()
+        
+        self.renderSceneFile = self.GetSceneFile()
+        self.pathMapFile = ""
+        if len( self.views ) > 0:
+            if self.GetOutputFile() == "":
+                self.FailRender( "Rendering cameras or view layers requires an output file, each of them is written next to it" )
+            self.LogInfo( "Rendering %d views of each frame: %s" % ( len( self.views ), ", ".join( GetViewName( camera, viewLayer ) for camera, viewLayer in self.views ) ) )
+        if self.totalFrames > 0 and not self.RegionStitch:
+            self.AdmitTask()
+            self.PrepareSceneFiles()
+        
+        if self.totalFrames == 0:
+            self.SetProgress( 100 )
+            self.SetStatusMessage( "Task complete." )
+        else:
+            self.UpdateProgress()
+    
+        self.profiler.Mark( "preRender" )
+    
+    def GetFrameMetricsFile(self):
+        ''' The JSON-lines file the job's frame metrics are appended to on this Worker, empty when disabled '''
+        if not self.GetBooleanConfigEntryWithDefault( "WriteFrameMetrics", True ):
+            return ""
+        
+        return self.GetMetricsFile( ".jsonl" )
+    
+    def GetMetricsFile( self, extension ):
+        ''' A file of the job in the metrics directory of this Worker, empty if the directory can't be created '''
+        metricsDirectory = self.GetConfigEntryWithDefault( "FrameMetricsDirectory", "" ).strip()
+        if metricsDirectory == "":
+            metricsDirectory = os.path.join( self.GetSlaveDirectory(), "BlenderMetrics" )
+        
+        try:
+            if not os.path.isdir( metricsDirectory ):
+                os.makedirs( metricsDirectory )
+        except OSError as e:
+            self.LogWarning( "Unable to create the metrics directory \"%s\": %s" % ( metricsDirectory, e ) )
+            return ""
+        
+        return os.path.join( metricsDirectory, self.GetJob().JobId + extension )
+    
+    def RecordFrameMetrics( self, record, *args ):
+        try:
+            record( *args )
+        except ( IOError, OSError ) as e:
+            self.LogWarning( "Unable to write the frame metrics to \"%s\": %s" % ( self.frameMetrics.metricsFile, e ) )
+            self.frameMetrics.metricsFile = ""
+    
+    def PartitionCpus(self):
+        ''' Give this task its own share of the Worker's CPUs when the job renders concurrent tasks, instead
+        of every Blender process starting a thread per CPU '''
+        self.renderThreads = int( self.GetPluginInfoEntryWithDefault( "Threads", "0" ) )
+        self.taskCpus = []
+        if not self.PartitionConcurrentTasks:
+            return
+        
+        slotCount = self.GetJob().JobConcurrentTasks
+        topology = GetTopology()
+        slotIndex = self.GetThreadNumber()
+        cpus = PartitionCpus( topology, slotCount, slotIndex )
+        if len( cpus ) == 0:
+            return
+        
+        if self.renderThreads == 0:
+            self.renderThreads = len( cpus )
+        self.frameMetrics.context["threads"] = self.renderThreads
+        self.taskCpus = cpus
+        
+        self.LogInfo( "Concurrent task %d of %d renders with %d threads on CPUs %s of %d NUMA nodes" % ( slotIndex + 1, slotCount, self.renderThreads, FormatCpuList( cpus ), len( topology.nodes ) ) )
+    
+    def GetMemoryLedger(self):
+        ''' The ledger of the machine when memory admission control is enabled, None otherwise '''
+        if self.memoryLedger is None and self.GetBooleanConfigEntryWithDefault( "MemoryAdmissionControl", False ):
+            # The Deadline temp folder is shared by all the Workers of a machine
+            self.memoryLedger = MemoryLedger( os.path.join( ClientUtils.GetDeadlineTempPath(), "BlenderMemory.json" ) )
+        return self.memoryLedger
+    
+    def GetPeakFile( self, taskId ):
+        return os.path.join( RepositoryUtils.GetJobAuxiliaryPath( self.GetJob() ), PeakFilePattern % taskId )
+    
+    def AdmitTask(self):
+        ''' Wait until the machine has enough free memory for the peak memory the job reached so far on
+        any Worker, so that concurrent tasks don't push each other out of memory '''
+        ledger = self.GetMemoryLedger()
+        if ledger is None:
+            return
+        
+        jobId = self.GetJob().JobId
+        totalBytes, availableBytes = GetMemoryStatus()
+        try:
+            peakBytes, samples = GetJobEstimate( glob.glob( self.GetPeakFile( "*" ) ) )
+        except ( IOError, OSError ) as e:
+            self.LogWarning( "Memory admission: unable to read the job's peak memory, starting the task: %s" % e )
+            return
+        
+        if totalBytes is None:
+            self.LogInfo( "Memory admission: the free memory of this machine is unknown, starting the task" )
+            return
+        if samples == 0:
+            self.LogInfo( "Memory admission: no frame of this job rendered yet, starting the task without an estimate (%.1f GB available)" % ( availableBytes / 1073741824.0 ) )
+            return
+        
+        headroom = float( self.GetConfigEntryWithDefault( "MemoryHeadroomPercent", "15" ) )
+        requiredBytes = int( peakBytes * ( 1 + headroom / 100.0 ) )
+        estimate = "the job peaked at %.1f GB over %d frames, %.1f GB with %g%% headroom" % ( peakBytes / 1073741824.0, samples, requiredBytes / 1073741824.0, headroom )
+        if requiredBytes > totalBytes:
+            self.FailRender( "Memory admission: declined, %s, more than the %.1f GB of this machine" % ( estimate, totalBytes / 1073741824.0 ) )
+        
+        timeout = float( self.GetConfigEntryWithDefault( "MemoryAdmissionTimeout", "600" ) )
+        reservationSeconds = float( self.GetConfigEntryWithDefault( "MemoryReservationSeconds", "600" ) )
+        key = "%s_%s_%d" % ( jobId, self.GetCurrentTaskId(), self.GetThreadNumber() )
+        started = time.time()
+        nextLog = started
+        while True:
+            try:
+                admitted, reservedBytes = ledger.TryReserve( key, requiredBytes, availableBytes, reservationSeconds )
+            except ( IOError, OSError ) as e:
+                self.LogWarning( "Memory admission: unable to update the memory ledger, starting the task: %s" % e )
+                return
+            
+            waited = time.time() - started
+            status = "%s, %.1f GB available, %.1f GB reserved by tasks starting on this machine" % ( estimate, availableBytes / 1073741824.0, reservedBytes / 1073741824.0 )
+            if admitted:
+                self.memoryReservation = key
+                self.LogInfo( "Memory admission: admitted after %.0fs, %s" % ( waited, status ) )
+                return
+            if waited >= timeout:
+                self.FailRender( "Memory admission: declined after waiting %.0fs, %s" % ( waited, status ) )
+            if time.time() >= nextLog:
+                self.LogInfo( "Memory admission: delayed, %s" % status )
+                nextLog += 60
+            
+            self.SetStatusMessage( "Waiting for %.1f GB of free memory" % ( ( requiredBytes + reservedBytes ) / 1073741824.0 ) )
+            if self.IsCanceled():
+                self.FailRender( "Received cancel task command from Deadline." )
+            SystemUtils.Sleep( 5000 )
+            totalBytes, availableBytes = GetMemoryStatus()
+    
+    def RecordJobMemory( self, peakBytes ):
+        ''' Learn the job's peak memory, and give up the task's reservation once Blender reached its peak
+        on the first frame '''
+        ledger = self.GetMemoryLedger()
+        if ledger is None or peakBytes <= 0:
+            return
+        
+        peakFile = self.GetPeakFile( self.GetCurrentTaskId() )
+        try:
+            RecordPeak( peakFile, peakBytes )
+        except ( IOError, OSError ) as e:
+            self.LogWarning( "Memory admission: unable to record the peak memory in \"%s\": %s" % ( peakFile, e ) )
+        
+        try:
+            if self.memoryReservation != "":
+                ledger.Release( self.memoryReservation )
+                self.memoryReservation = ""
+        except ( IOError, OSError ) as e:
+            self.LogWarning( "Memory admission: unable to update the memory ledger: %s" % e )
+    
+    def PrepareSceneFiles(self):
+        ''' Point Blender at the Worker's cached copies of the scene and the files it references '''
+        # Scenes submitted with the job are already local, scenes put into the scene store are always fetched
+        storedScene = self.GetPluginInfoEntryWithDefault( "SceneHash", "" ) != ""
+        cacheScene = self.GetBooleanConfigEntryWithDefault( "SceneCacheEnabled", False ) and self.GetPluginInfoEntryWithDefault( "SceneFile", "" ) != ""
+        prefetch = self.GetBooleanConfigEntryWithDefault( "PrefetchSceneDependencies", False )
+        if not storedScene and not cacheScene and not prefetch:
+            self.ReleaseSceneCache()
+            return
+        
+        # The cached files of the previous task stay leased until this task leased its own, since a
+        # session's Blender may still read them
+        previousCache = self.sceneCache
+        sceneFile = self.GetSceneFile()
+        sceneCache = self.GetSceneCache()
+        self.sceneCache = sceneCache
+        renderSceneFile = sceneFile
+        if storedScene:
+            renderSceneFile = self.FetchStoredScene( sceneCache, sceneFile )
+        elif cacheScene:
+            renderSceneFile = self.CacheSceneFile( sceneCache, sceneFile )
+        
+        localPaths = {}
+        if prefetch:
+            localPaths = self.PrefetchSceneDependencies( sceneCache, sceneFile, renderSceneFile )
+        if previousCache is not None:
+            previousCache.ReleaseLeases()
+        
+        if renderSceneFile == sceneFile and len( localPaths ) == 0:
+            return
+        
+        # Paths relative to the scene have to be fixed up when it is cached, since the copy is in another folder
+        try:
+            self.WritePathMap( { "blendDirectory": os.path.dirname( sceneFile ), "paths": localPaths } )
+        except ( IOError, OSError ) as e:
+            self.LogWarning( "Unable to write the path map for the cached files, rendering them from their original location: %s" % e )
+            return
+        
+        self.renderSceneFile = renderSceneFile
+    
+    def CacheSceneFile( self, sceneCache, sceneFile ):
+        try:
+            result = sceneCache.Fetch( sceneFile )
+        except ( IOError, OSError ) as e:
+            self.LogWarning( "Unable to cache the scene file \"%s\", rendering it from its original location: %s" % ( sceneFile, e ) )
+            return sceneFile
+        
+        if result.hit:
+            self.LogInfo( "Scene cache hit for \"%s\" (%.1f MB)" % ( sceneFile, result.size / 1048576.0 ) )
+        else:
+            self.LogInfo( "Scene cache miss for \"%s\", copied %.1f MB in %.2fs" % ( sceneFile, result.bytesCopied / 1048576.0, result.seconds ) )
+        self.LogInfo( "Scene cache: %(hits)d hits, %(misses)d misses, %(bytesCopied)d bytes copied, %(bytesServed)d bytes served, %(bytesCached)d bytes cached" % sceneCache.stats )
+        
+        return result.localPath
+    
+    def FetchStoredScene( self, sceneCache, sceneFile ):
+        ''' Rebuild the scene the job put into the scene store in the scene cache '''
+        sceneHash = self.GetPluginInfoEntryWithDefault( "SceneHash", "" )
+        store = SceneStore( self.MapPath( self.GetPluginInfoEntryWithDefault( "SceneStore", "" ) ) )
+        try:
+            size = store.LoadManifest( sceneHash )["size"]
+            result = sceneCache.FetchEntry( sceneHash, store.GetManifestPath( sceneHash ), os.path.basename( sceneFile ), size, lambda localPath: store.Fetch( sceneHash, localPath ).bytesRead )
+        except ( IOError, OSError, ValueError ) as e:
+            if not os.path.isfile( sceneFile ):
+                self.FailRender( "Unable to fetch the scene %s from the scene store \"%s\", and \"%s\" does not exist: %s" % ( sceneHash, store.storeDirectory, sceneFile, e ) )
+            self.LogWarning( "Unable to fetch the scene %s from the scene store \"%s\", rendering \"%s\": %s" % ( sceneHash, store.storeDirectory, sceneFile, e ) )
+            return sceneFile
+        
+        if result.hit:
+            self.LogInfo( "Scene %s is in the scene cache (%.1f MB)" % ( sceneHash[:12], result.size / 1048576.0 ) )
+        else:
+            self.LogInfo( "Fetched scene %s from the scene store: %.1f MB read, %.1f MB decompressed in %.2fs" % ( sceneHash[:12], result.bytesCopied / 1048576.0, result.size / 1048576.0, result.seconds ) )
+        
+        return result.localPath
+        
+    def PrefetchSceneDependencies( self, sceneCache, sceneFile, readFile ):
+        ''' Copy the libraries, images and caches the scene references to the cache in parallel, before
+        Blender would read them from the file server one at a time while loading the scene '''
+        threads = int( self.GetConfigEntryWithDefault( "PrefetchThreads", "8" ) )
+        report = PrefetchBlendDependencies( sceneCache.Fetch, readFile, os.path.dirname( sceneFile ), self.MapPath, threads )
+        
+        for path, message in report.errors:
+            self.LogWarning( "Unable to prefetch \"%s\": %s" % ( path, message ) )
+        for path in report.missing:
+            self.LogWarning( "The scene references \"%s\", which does not exist" % path )
+        if len( report.skipped ) > 0:
+            self.LogInfo( "%d image sequences and UDIM images are read from their original location" % len( report.skipped ) )
+        
+        prefetchedBytes = report.GetBytes()
+        self.LogInfo( "Prefetched %d files referenced by the scene (%d already cached), %.1f MB in %.2fs with %d threads" % ( len( report.results ), report.GetHits(), prefetchedBytes / 1048576.0, report.seconds, threads ) )
+        readRate = sceneCache.GetReadRate()
+        if readRate > 0 and len( report.results ) > 0:
+            directSeconds = prefetchedBytes / readRate
+            self.LogInfo( "Reading them from the file server one at a time would take about %.2fs, %.2fs saved" % ( directSeconds, directSeconds - report.seconds ) )
+        
+        return report.paths
+    
+    def ReleaseSceneCache(self):
+        ''' Let other tasks evict the cached files this task's Blender read '''
+        if self.sceneCache is not None:
+            self.sceneCache.ReleaseLeases()
+            self.sceneCache = None
+    
+    def GetSceneCache(self):
+        cacheDirectory = self.GetConfigEntryWithDefault( "SceneCacheDirectory", "" ).strip()
+        if cacheDirectory == "":
+            # The Deadline temp folder is shared by all the Workers of a machine
+            cacheDirectory = os.path.join( ClientUtils.GetDeadlineTempPath(), "BlenderSceneCache" )
+        
+        maxBytes = int( float( self.GetConfigEntryWithDefault( "SceneCacheSizeGB", "50" ) ) * 1024 * 1024 * 1024 )
+        return FileCache( cacheDirectory, maxBytes )
+    
+    def WritePathMap( self, pathMap ):
+        ''' Write the paths BlenderPathRemap.py fixes up once Blender loaded the cached scene '''
+        pathMapFile = os.path.join( self.GetJobsDataDirectory(), "BlenderPathMap_%s.json" % self.GetCurrentTaskId() )
+        with open( pathMapFile, "w" ) as f:
+            json.dump( pathMap, f, indent=1 )
+        self.pathMapFile = pathMapFile
+    
+    def GetMissingFrames( self, frames ):
+        ''' Filter out the frames whose output file already exists and looks like a complete image '''
+        outputFile = self.GetOutputFile()
+        if outputFile == "":
+            self.LogWarning( "Existing frames can only be skipped when an output file is specified, rendering all the frames of this task" )
+            return frames
+        
+        # A frame is rendered again when any of its views is missing
+        outputFiles = [ GetViewOutput( outputFile, camera, viewLayer ) for camera, viewLayer in self.views ] or [ outputFile ]
+        missingFrames = set()
+        for viewOutput in outputFiles:
+            for frame, path, problem in CheckFrameOutputs( viewOutput, frames ):
+                if problem == "":
+                    self.LogInfo( "Skipping frame %d, \"%s\" has already been rendered" % ( frame, path ) )
+                else:
+                    if problem != "missing":
+                        self.LogWarning( "Rendering frame %d again, \"%s\" is %s" % ( frame, path, problem ) )
+                    missingFrames.add( frame )
+        
+        return [ frame for frame in frames if frame in missingFrames ]
         
     def PostRenderTasks(self):
+        if not self.SessionMode:
+            self.ReleaseSceneCache()
+        if self.memoryReservation != "":
+            try:
+                self.GetMemoryLedger().Release( self.memoryReservation )
+            except ( IOError, OSError ) as e:
+                self.LogWarning( "Memory admission: unable to release the memory reservation: %s" % e )
+            self.memoryReservation = ""
+        self.FlushProgress()
+        self.LogInfo( "Progress updates: %d sent, %d suppressed" % ( self.progressUpdatesSent, self.progressUpdatesSuppressed ) )
+        
+        self.RecordFrameMetrics( self.frameMetrics.Flush )
+        for line in self.frameMetrics.Summarize():
+            self.LogInfo( line )
+        
+        outputProblem = self.CheckTaskOutputs()
+        if self.ProfilePhases:
+            self.WritePhaseProfile()
+        if outputProblem != "":
+            self.FailRender( outputProblem )
+        if self.GetBooleanPluginInfoEntryWithDefault( "AdaptiveChunkProbe", False ):
+            self.WriteProbeTiming()
         self.LogInfo( "Blender job finished." )
+    
+    def CheckRegionFiles( self, outputFile ):
+        ''' Why the region of the task is missing, the stitch needs both its image and its record '''
+        directory = GetRegionDirectory( outputFile, self.renderFrames[0] )
+        for extension in ( ".tif", ".json" ):
+            path = os.path.join( directory, RegionFilePattern % self.regionIndex + extension )
+            if not os.path.isfile( path ):
+                return "Region %d was not rendered, \"%s\" is missing" % ( self.regionIndex + 1, path )
+        return ""
+    
+    def CheckTaskOutputs(self):
+        ''' Validate the output files of the frames the task rendered and write their previews, or
+        check the files of the region a region task rendered, returns why the task failed or an empty
+        string '''
+        validate = self.GetBooleanPluginInfoEntryWithDefault( "ValidateOutputs", self.GetBooleanConfigEntryWithDefault( "ValidateOutputs", False ) )
+        previews = self.GetBooleanPluginInfoEntryWithDefault( "WriteOutputPreviews", self.GetBooleanConfigEntryWithDefault( "WriteOutputPreviews", False ) )
+        outputFile = self.GetOutputFile()
+        if self.RegionRendering:
+            return self.CheckRegionFiles( outputFile )
+        if ( not validate and not previews ) or outputFile == "" or len( self.renderFrames ) == 0:
+            return ""
+        
+        threads = int( self.GetConfigEntryWithDefault( "OutputValidationThreads", "8" ) )
+        outputFiles = [ GetViewOutput( outputFile, camera, viewLayer ) for camera, viewLayer in self.views ] or [ outputFile ]
+        started = time.time()
+        results = []
+        for viewOutput in outputFiles:
+            if validate:
+                tolerance = float( self.GetConfigEntryWithDefault( "OutputSizeTolerance", "50" ) ) / 100.0
+                results.extend( ValidateFrameOutputs( viewOutput, self.renderFrames, threads, tolerance ) )
+                if any( problem != "" for frame, path, problem in results ):
+                    break
+            else:
+                results.extend( CheckFrameOutputs( viewOutput, self.renderFrames, threads ) )
+        
+        if validate:
+            self.profiler.Mark( "outputsChecked", files=len( results ) )
+            self.LogInfo( "Checked %d output files in %.2fs" % ( len( results ), time.time() - started ) )
+            invalid = [ "frame %d \"%s\" is %s" % ( frame, path, problem ) for frame, path, problem in results if problem != "" ]
+            if len( invalid ) > 0:
+                return "Invalid output files: %s" % "; ".join( invalid )
+        
+        if previews:
+            if not CanWritePreviews():
+                self.LogWarning( "Previews of the output files need NumPy, which Deadline's Python doesn't have" )
+                return ""
+            
+            started = time.time()
+            previewSize = int( self.GetConfigEntryWithDefault( "OutputPreviewSize", "256" ) )
+            written = 0
+            for frame, preview, problem in WritePreviews( results, threads, previewSize ):
+                if preview is None:
+                    self.LogWarning( "No preview of frame %d: %s" % ( frame, problem ) )
+                    continue
+                written += 1
+                if preview.IsBlack():
+                    self.LogWarning( "Frame %d \"%s\" is completely black" % ( frame, preview.path ) )
+            self.profiler.Mark( "previews", files=written )
+            self.LogInfo( "Wrote %d previews in %.2fs" % ( written, time.time() - started ) )
+        
+        return ""
+    
+    def WriteProbeTiming(self):
+        ''' Record how long this probe task took, the BlenderAdaptiveChunking event plugin chunks the
+        rest of the frames with it once the probe job finished '''
+        records = self.frameMetrics.records
+        frameSeconds = [ record["wallTime"] if record["wallTime"] is not None else record["renderTime"] for record in records ]
+        if len( frameSeconds ) == 0:
+            return
+        
+        # The wall time of the first frame also has starting Blender and loading the scene in it, which
+        # the chunking counts once per task as the startup. Blender's render time of the frame still has
+        # the frame's own sync in it.
+        if records[0]["renderTime"] is not None:
+            frameSeconds[0] = records[0]["renderTime"]
         
-    def UpdateProgress(self):
+        # Chunking needs the time of a whole frame, which is the time of all its views
+        viewCount = max( 1, len( self.views ) )
+        frameSeconds = [ sum( frameSeconds[index:index + viewCount] ) for index in range( 0, len( frameSeconds ), viewCount ) ]
+        
+        taskSeconds = time.time() - self.taskStarted
+        timingFile = os.path.join( RepositoryUtils.GetJobAuxiliaryPath( self.GetJob() ), TimingFilePattern % self.GetCurrentTaskId() )
+        try:
+            WriteTimingRecord( timingFile, { "task": self.GetCurrentTaskId(), "worker": self.GetSlaveName(), "seconds": taskSeconds, "frameSeconds": frameSeconds } )
+        except ( IOError, OSError ) as e:
+            self.LogWarning( "Unable to write the probe timing to \"%s\": %s" % ( timingFile, e ) )
+            return
+        
+        self.LogInfo( "Probe task rendered %d frames in %.1fs, %.1fs of it outside of rendering frames" % ( len( frameSeconds ), taskSeconds, taskSeconds - sum( seconds for seconds in frameSeconds if seconds is not None ) ) )
+    
+    def WritePhaseProfile(self):
+        self.profiler.MarkOnce( "exit" )
+        self.LogInfo( "Task phases:" )
+        for line in self.profiler.FormatBreakdown():
+            self.LogInfo( line )
+        
+        profileFile = self.GetMetricsFile( ".phases.jsonl" )
+        if profileFile == "":
+            return
+        
+        context = dict( self.frameMetrics.context, frames=len( self.renderFrames ), sessionMode=self.SessionMode )
+        try:
+            self.profiler.Write( profileFile, context )
+        except ( IOError, OSError ) as e:
+            self.LogWarning( "Unable to write the task phases to \"%s\": %s" % ( profileFile, e ) )
+        
+    def UpdateProgress( self, force=False ):
         progress = self.finishedFrames
         
-        # If we know the chunk type, we should have set its progress as well
+        # The progress within the frame comes from Blender's Time and Remaining fields when it prints
+        # them, otherwise from the chunk counts
+        progress += self.frameProgress
+        rendering = "frame %(ff)s/%(tf)s"
+        viewName = ""
+        if len( self.views ) > 0:
+            rendering = "view %(ff)s/%(tf)s (%(vn)s of frame %(fr)s)"
+            viewName = GetViewName( *self.views[self.finishedFrames % len( self.views )] )
         if self.chunkType != "":
-            progress += (self.currentChunk / float(self.totalChunks))
-            message = "Rendering %(ct)s %(cc)s/%(tt)s of frame %(ff)s/%(tf)s for this task"
+            message = "Rendering %(ct)s %(cc)s/%(tt)s of " + rendering + " for this task"
         else:
-            message = "Rendering frame %(ff)s/%(tf)s for this task"
+            message = "Rendering " + rendering + " for this task"
             
-        self.SetStatusMessage( message % {
+        message = message % {
+            "vn": viewName,
+            "fr": str( self.GetCurrentFrame() ),
             "ct": self.chunkType,
             "ff": str(self.finishedFrames + 1),
             "tf": str(self.totalFrames),
             "cc": str(self.currentChunk),
-            "tt": str(self.totalChunks) })
+            "tt": str(self.totalChunks) }
         
-        progress = progress / float( self.totalFrames )
-        self.SetProgress( progress * 100 )
+        # Blender's remaining time for the frame, or the rate of its progress, and the frames the task saved
+        frameRemaining = self.estimator.GetFrameRemaining( self.remainingTime )
+        taskRemaining = self.estimator.GetTaskRemaining( self.remainingTime )
+        if frameRemaining is not None and taskRemaining is not None:
+            message += " (%s remaining for this frame, %s for the task)" % ( FormatDuration( frameRemaining ), FormatDuration( taskRemaining ) )
+        elif taskRemaining is not None:
+            message += " (%s remaining for the task)" % FormatDuration( taskRemaining )
         
-        if self.GetBooleanPluginInfoEntryWithDefault( "SupressOutput", True ):
-            self.SuppressThisLine()
+        progress = progress / float( self.totalFrames ) * 100
+        
+        now = time.time()
+        if force or self.reportedProgress is None or abs( progress - self.reportedProgress ) >= self.progressDelta or now - self.reportedTime >= self.progressInterval:
+            self.SendProgress( message, progress, now )
+        else:
+            self.pendingProgress = ( message, progress )
+            self.progressUpdatesSuppressed += 1
+        
+        if self.suppressOutput:
+            self.stdoutSource.SuppressThisLine()
+    
+    def SendProgress( self, message, progress, now ):
+        self.SetStatusMessage( message )
+        self.SetProgress( progress )
+        
+        self.reportedProgress = progress
+        self.reportedTime = now
+        self.pendingProgress = None
+        self.progressUpdatesSent += 1
+    
+    def FlushProgress(self):
+        ''' Send the last progress update if it was held back '''
+        if self.pendingProgress is not None:
+            self.SendProgress( self.pendingProgress[0], self.pendingProgress[1], time.time() )
+    
+    def GetCurrentFrame(self):
+        ''' The frame being rendered, each frame is rendered once per view '''
+        index = self.finishedFrames // max( 1, len( self.views ) )
+        return self.renderFrames[index] if index < len( self.renderFrames ) else None
         
     def HandleStdoutSaved(self):
         self.finishedFrames += 1
         self.currentChunk = 0 # Avoid incorrect progress math after addtion
+        self.frameProgress = 0.0
+        self.remainingTime = None
         
-        self.UpdateProgress()
+        self.UpdateProgress( force=True )
         
         if self.finishedFrames + 1 > self.totalFrames:
             # This avoids us showing a status message of "rendering frame 2/1"
             self.SetStatusMessage( "Task complete." )
         
-    def HandleTileProgress(self):
+    def HandleTileProgress( self, event ):
         ''' Find tile progress for Cycle's tile render '''
-        self.currentChunk = int( self.GetRegexMatch(1) )
-        self.totalChunks  = int( self.GetRegexMatch(2) )
+        self.currentChunk = event.current
+        self.totalChunks  = event.total
         self.chunkType = "tile"
+        self.SetFrameProgress( event )
         self.UpdateProgress()
         
-    def HandleSampleProgress(self):
-        ''' Find sample progress for Cycle's progressive render '''
+    def HandleSampleProgress( self, event ):
+        ''' Find sample progress for Cycle's progressive render and EEVEE '''
         # Samples are reported in order, so let's be awesome
-        self.currentChunk = int( self.GetRegexMatch(1) )
-        self.totalChunks  = int( self.GetRegexMatch(2) )
+        self.currentChunk = event.current
+        self.totalChunks  = event.total
         self.chunkType = "sample"
+        self.SetFrameProgress( event )
         self.UpdateProgress()      
         
-    def HandleSceneProgress(self):
+    def SetFrameProgress( self, event ):
+        self.remainingTime = event.remaining
+        if event.fraction is not None:
+            # Blender's remaining time estimate moves around, don't let the progress go backwards
+            self.frameProgress = max( self.frameProgress, min( event.fraction, 1.0 ) )
+    
+    def HandleSceneProgress( self, event ):
         ''' Find sub-frame progress for the Blender Internal renderer '''
         # We hit problems with things like motion blur and sub-surf sampling
         # when reporting progress since lists progress multiple times without
@@ -186,12 +1158,115 @@ class BlenderPlugin(DeadlinePlugin):
         
         # Tiles aren't reported in order, so let's track it ourselves
         # self.currentChunk += 1
-        # self.totalChunks  = int( self.GetRegexMatch(2) )
+        # self.totalChunks  = event.total
         # self.chunkType = "chunk"
         self.UpdateProgress()  
             
-    def HandleStdoutError(self):
-        self.FailRender( self.GetRegexMatch(0) )
+    def HandleStdoutError( self, line ):
+        self.FailRender( line )
         
-    def HandleStdoutFailed(self):
+    def HandleStdoutFailed( self, line ):
+        self.FailRender( line )
+
+    def HandleStitchProgress(self):
+        self.frameProgress = float( self.GetRegexMatch(1) ) / max( 1, int( self.GetRegexMatch(2) ) )
+        self.UpdateProgress()
+    
+    def HandleStitchError(self):
         self.FailRender( self.GetRegexMatch(0) )
+
+class BlenderRenderProcess(ManagedProcess):
+    ''' Blender process for a single task, used when the plugin runs as an advanced plugin '''
+    
+    def __init__( self, deadlinePlugin ):
+        if sys.version_info.major == 3:
+            super().__init__()
+        self.deadlinePlugin = deadlinePlugin
+        
+        self.InitializeProcessCallback += self.InitializeProcess
+        self.RenderExecutableCallback += self.RenderExecutable
+        self.RenderArgumentCallback += self.RenderArgument
+    
+    def Cleanup(self):
+        for stdoutHandler in self.StdoutHandlers:
+            del stdoutHandler.HandleCallback
+        
+        del self.InitializeProcessCallback
+        del self.RenderExecutableCallback
+        del self.RenderArgumentCallback
+    
+    def InitializeProcess(self):
+        self.StdoutHandling = True
+        self.deadlinePlugin.AddStdoutHandlers( self )
+    
+    def RenderExecutable(self):
+        return self.deadlinePlugin.RenderExecutable()
+    
+    def RenderArgument(self):
+        return self.deadlinePlugin.RenderArgument()
+
+class BlenderSessionProcess(ManagedProcess):
+    ''' Long running Blender process that renders the requests written to its stdin by BlenderPlugin '''
+    
+    def __init__( self, deadlinePlugin, executable, sceneFile, driverScript, pathMapFile="" ):
+        if sys.version_info.major == 3:
+            super().__init__()
+        self.deadlinePlugin = deadlinePlugin
+        self.executable = executable
+        self.sceneFile = sceneFile
+        self.driverScript = driverScript
+        self.pathMapFile = pathMapFile
+        
+        # Busy until the driver script reports READY after loading the scene
+        self.busy = True
+        self.error = ""
+        self.peakMemory = 0
+        
+        self.InitializeProcessCallback += self.InitializeProcess
+        self.RenderExecutableCallback += self.RenderExecutable
+        self.RenderArgumentCallback += self.RenderArgument
+    
+    def Cleanup(self):
+        for stdoutHandler in self.StdoutHandlers:
+            del stdoutHandler.HandleCallback
+        
+        del self.InitializeProcessCallback
+        del self.RenderExecutableCallback
+        del self.RenderArgumentCallback
+    
+    def InitializeProcess(self):
+        self.StdoutHandling = True
+        self.deadlinePlugin.AddStdoutHandlers( self )
+        
+        self.AddStdoutHandlerCallback( "DEADLINE_SESSION: READY.*" ).HandleCallback += self.HandleReady
+        self.AddStdoutHandlerCallback( "DEADLINE_SESSION: DONE ([0-9]+).*" ).HandleCallback += self.HandleDone
+        self.AddStdoutHandlerCallback( "DEADLINE_SESSION: ERROR (.*)" ).HandleCallback += self.HandleError
+    
+    def RenderExecutable(self):
+        return self.executable
+    
+    def RenderArgument(self):
+        renderArgument = " -b" + self.deadlinePlugin.GetProcessIdArgument() + " \"" + self.sceneFile + "\""
+        renderArgument += " -t " + str( self.deadlinePlugin.renderThreads )
+        if self.pathMapFile != "":
+            renderArgument += " --python \"" + os.path.join( self.deadlinePlugin.GetPluginDirectory(), "BlenderPathRemap.py" ) + "\""
+        renderArgument += " --python \"" + self.driverScript + "\""
+        if self.pathMapFile != "":
+            renderArgument += " -- \"" + self.pathMapFile + "\""
+        
+        return renderArgument
+    
+    def ResetStatus(self):
+        self.busy = True
+        self.error = ""
+    
+    def HandleReady(self):
+        self.busy = False
+    
+    def HandleDone(self):
+        self.peakMemory = int( self.GetRegexMatch(1) )
+        self.busy = False
+    
+    def HandleError(self):
+        self.error = self.GetRegexMatch(1)
+        self.busy = False
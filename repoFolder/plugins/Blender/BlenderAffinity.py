@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+# Splits the CPUs of a Worker between the concurrent tasks it renders, so that each Blender process
+# gets its own cores instead of every process starting a thread per core. This module must not
+# import any Deadline modules so that it can be used outside of Deadline.
+
+from __future__ import absolute_import
+
+import errno
+import glob
+import os
+import re
+import sys
+
+# Blender runs this with --python-expr before it loads the scene, so that the plugin learns the ID
+# of the process it has to pin from the line it prints
+ProcessIdExpression = "import os;print('BlenderProcessId=%d'%os.getpid(),flush=True)"
+ProcessIdPattern = "^BlenderProcessId=([0-9]+)"
+
+class CpuTopology( object ):
+    ''' The logical CPUs this process may use, grouped by NUMA node and physical core '''
+
+    def __init__( self, nodes ):
+        # Each node is a list of cores, each core a list of the logical CPUs sharing it
+        self.nodes = [ node for node in nodes if len( node ) > 0 ]
+
+    def GetCores( self ):
+        ''' Cores ordered node by node, so contiguous runs of cores are NUMA local '''
+        return [ core for node in self.nodes for core in node ]
+
+    def GetCpuCount( self ):
+        return sum( len( core ) for core in self.GetCores() )
+
+def ParseCpuList( text ):
+    # type: (str) -> list
+    ''' Parse a Linux CPU list like "0-3,8-11" '''
+    cpus = []
+    for part in text.strip().split( "," ):
+        if part == "":
+            continue
+        if "-" in part:
+            first, last = part.split( "-", 1 )
+            cpus.extend( range( int( first ), int( last ) + 1 ) )
+        else:
+            cpus.append( int( part ) )
+    return cpus
+
+def ReadText( path ):
+    try:
+        with open( path, "r" ) as f:
+            return f.read()
+    except ( IOError, OSError ):
+        return None
+
+def GetAllowedCpus():
+    # type: () -> list
+    if hasattr( os, "sched_getaffinity" ):
+        return sorted( os.sched_getaffinity( 0 ) )
+    return list( range( os.cpu_count() or 1 ) )
+
+def GetTopology( allowedCpus=None, sysDirectory="/sys/devices/system" ):
+    # type: (list, str) -> CpuTopology
+    ''' The topology of the allowed CPUs (those of this process by default) from Linux sysfs, or a
+    single node of single thread cores elsewhere '''
+    allowed = set( allowedCpus if allowedCpus is not None else GetAllowedCpus() )
+
+    nodeCpus = []
+    for nodeDirectory in sorted( glob.glob( os.path.join( sysDirectory, "node", "node[0-9]*" ) ), key=lambda path: int( re.sub( r".*node", "", path ) ) ):
+        text = ReadText( os.path.join( nodeDirectory, "cpulist" ) )
+        if text is not None:
+            nodeCpus.append( [ cpu for cpu in ParseCpuList( text ) if cpu in allowed ] )
+    if len( nodeCpus ) == 0:
+        nodeCpus = [ sorted( allowed ) ]
+
+    nodes = []
+    for cpus in nodeCpus:
+        cores = []
+        seen = set()
+        for cpu in cpus:
+            if cpu in seen:
+                continue
+            # Hyper-threads of a core share its caches, so they stay in the same partition
+            siblings = ReadText( os.path.join( sysDirectory, "cpu", "cpu%d" % cpu, "topology", "thread_siblings_list" ) )
+            core = [ sibling for sibling in ParseCpuList( siblings ) if sibling in cpus ] if siblings is not None else [ cpu ]
+            if cpu not in core:
+                core = [ cpu ]
+            seen.update( core )
+            cores.append( core )
+        nodes.append( cores )
+
+    return CpuTopology( nodes )
+
+def PartitionCpus( topology, slotCount, slotIndex ):
+    # type: (CpuTopology, int, int) -> list
+    ''' The logical CPUs of one of slotCount equal partitions of the topology.
+
+    Cores are split into contiguous runs in node order, so a partition only spans NUMA nodes when
+    there are fewer slots than nodes, or when the cores don't divide evenly between the slots. With
+    more slots than cores, slots share cores round robin. '''
+    cores = topology.GetCores()
+    if len( cores ) == 0:
+        return []
+
+    slotCount = max( 1, slotCount )
+    slotIndex = slotIndex % slotCount
+    if slotCount > len( cores ):
+        return sorted( cores[slotIndex % len( cores )] )
+
+    start = len( cores ) * slotIndex // slotCount
+    end = len( cores ) * ( slotIndex + 1 ) // slotCount
+    return sorted( cpu for core in cores[start:end] for cpu in core )
+
+def GetThreadIds( pid ):
+    # type: (int) -> set
+    try:
+        return set( int( tid ) for tid in os.listdir( "/proc/%d/task" % pid ) )
+    except OSError:
+        return set( [ pid ] )
+
+def SetAffinity( cpus, pid=0 ):
+    # type: (list, int) -> bool
+    ''' Pin a process (this one by default) to CPUs, the threads and processes it starts afterwards
+    inherit it. Returns False where affinity isn't supported. '''
+    if hasattr( os, "sched_setaffinity" ):
+        # Linux affinity is per thread, so every thread of the process is pinned, again for the
+        # threads that were started while pinning the others
+        pid = pid or os.getpid()
+        pinned = set()
+        threads = GetThreadIds( pid )
+        while not threads <= pinned:
+            for tid in threads - pinned:
+                try:
+                    os.sched_setaffinity( tid, cpus )
+                except OSError as e:
+                    if e.errno != errno.ESRCH or tid == pid:
+                        raise
+                pinned.add( tid )
+            threads = GetThreadIds( pid )
+        return True
+
+    if sys.platform == "win32":
+        import ctypes
+        # Affinity masks only cover the 64 CPUs of one processor group
+        if len( cpus ) == 0 or max( cpus ) >= 64:
+            return False
+        mask = 0
+        for cpu in cpus:
+            mask |= 1 << cpu
+
+        kernel32 = ctypes.windll.kernel32
+        if pid == 0:
+            handle = kernel32.GetCurrentProcess()
+        else:
+            # PROCESS_SET_INFORMATION | PROCESS_QUERY_INFORMATION
+            handle = kernel32.OpenProcess( 0x0200 | 0x0400, False, pid )
+        if not handle:
+            return False
+        try:
+            return bool( kernel32.SetProcessAffinityMask( handle, ctypes.c_size_t( mask ) ) )
+        finally:
+            if pid != 0:
+                kernel32.CloseHandle( handle )
+
+    # macOS has no affinity API, the thread count still partitions the CPUs
+    return False
+
+def FormatCpuList( cpus ):
+    # type: (list) -> str
+    ''' The inverse of ParseCpuList '''
+    runs = []
+    for cpu in sorted( cpus ):
+        if len( runs ) > 0 and runs[-1][1] == cpu - 1:
+            runs[-1][1] = cpu
+        else:
+            runs.append( [ cpu, cpu ] )
+    return ",".join( "%d" % first if first == last else "%d-%d" % ( first, last ) for first, last in runs )
@@ -0,0 +1,319 @@
+#!/usr/bin/env python3
+# Reads the external file paths of a .blend file without Blender, and prefetches those files into
+# the Worker's cache. This module must not import any Deadline modules so that it can be used
+# outside of Deadline.
+#
+# A .blend file is a header followed by blocks, each with a code, a size, the address it had in
+# memory, the index of its struct in the file's SDNA and a count. The SDNA (the DNA1 block, at the
+# end of the file) describes the layout of every struct, so the path fields are found by name
+# instead of by offsets that change between Blender releases.
+
+from __future__ import absolute_import
+
+import gzip
+import os
+import struct
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+
+# Block codes of the datablocks that reference external files
+PathBlockCodes = {
+    b"LI\x00\x00": "library",
+    b"IM\x00\x00": "image",
+    b"SO\x00\x00": "sound",
+    b"MC\x00\x00": "movieclip",
+    b"VO\x00\x00": "volume",
+    b"CF\x00\x00": "cachefile",
+    b"VF\x00\x00": "font",
+}
+
+# Fonts use this name for the font built into Blender
+BuiltinPaths = ( "<builtin>", )
+
+# Image.source values of images made of several files, which can't be remapped to a single copy
+ImageSourceSequence = 2
+ImageSourceTiled = 6
+
+ZstdMagic = b"\x28\xb5\x2f\xfd"
+GzipMagic = b"\x1f\x8b"
+
+class BlendFileError( Exception ):
+    pass
+
+def OpenBlendFile( path ):
+    ''' Open a .blend file for reading, decompressing it if it was saved compressed '''
+    f = open( path, "rb" )
+    magic = f.read( 4 )
+    f.seek( 0 )
+    if magic[:2] == GzipMagic:
+        return gzip.GzipFile( fileobj=f, mode="rb" )
+    if magic == ZstdMagic:
+        try:
+            import zstandard
+        except ImportError:
+            f.close()
+            raise BlendFileError( "\"%s\" is compressed with Zstandard, which needs the zstandard module" % path )
+        return zstandard.ZstdDecompressor().stream_reader( f, closefd=True )
+    return f
+
+class BlendReader( object ):
+    ''' The header fields and block layout of an open .blend file '''
+
+    def __init__( self, f ):
+        self.f = f
+        header = self.Read( 12 )
+        if not header.startswith( b"BLENDER" ):
+            raise BlendFileError( "not a .blend file" )
+
+        if header[7:12] == b"17-01":
+            # Blender 5.0 and later: "BLENDER17-01v0500", 64 bit pointers and block sizes
+            self.Read( 5 )
+            self.pointerSize = 8
+            self.endian = "<"
+            self.blockHeader = struct.Struct( "<4siQqq" )
+            self.ReadBlockHeader = self.ReadLargeBlockHeader
+        else:
+            self.pointerSize = 8 if header[7:8] == b"-" else 4
+            self.endian = ">" if header[8:9] == b"V" else "<"
+            self.blockHeader = struct.Struct( self.endian + "4si" + ( "Q" if self.pointerSize == 8 else "I" ) + "ii" )
+            self.ReadBlockHeader = self.ReadSmallBlockHeader
+
+    def Read( self, size ):
+        data = self.f.read( size )
+        if len( data ) != size:
+            raise BlendFileError( "unexpected end of file" )
+        return data
+
+    def Skip( self, size ):
+        if self.f.seekable():
+            self.f.seek( size, 1 )
+            return
+
+        # Zstandard streams can't seek, read through them
+        while size > 0:
+            chunk = self.f.read( min( size, 1024 * 1024 ) )
+            if len( chunk ) == 0:
+                raise BlendFileError( "unexpected end of file" )
+            size -= len( chunk )
+
+    def ReadSmallBlockHeader( self ):
+        code, size, address, sdnaIndex, count = self.blockHeader.unpack( self.Read( self.blockHeader.size ) )
+        return code, size, sdnaIndex
+
+    def ReadLargeBlockHeader( self ):
+        code, sdnaIndex, address, size, count = self.blockHeader.unpack( self.Read( self.blockHeader.size ) )
+        return code, size, sdnaIndex
+
+class StructField( object ):
+    def __init__( self, name, offset, size ):
+        self.name = name
+        self.offset = offset
+        self.size = size
+
+def ParseSdna( data, endian, pointerSize ):
+    # type: (bytes, str, int) -> list
+    ''' Return the fields of every struct in the SDNA, by struct index '''
+    position = [ 0 ]
+
+    def Expect( tag ):
+        # Sections are 4 byte aligned
+        position[0] = ( position[0] + 3 ) & ~3
+        if data[position[0]:position[0] + 4] != tag:
+            raise BlendFileError( "malformed SDNA, expected %s" % tag.decode( "ascii" ) )
+        position[0] += 4
+
+    def ReadInt():
+        value = struct.unpack_from( endian + "i", data, position[0] )[0]
+        position[0] += 4
+        return value
+
+    def ReadStrings( count ):
+        strings = []
+        for _ in range( count ):
+            end = data.index( b"\x00", position[0] )
+            strings.append( data[position[0]:end].decode( "ascii", "replace" ) )
+            position[0] = end + 1
+        return strings
+
+    Expect( b"SDNA" )
+    Expect( b"NAME" )
+    names = ReadStrings( ReadInt() )
+    Expect( b"TYPE" )
+    typeCount = ReadInt()
+    ReadStrings( typeCount )
+    Expect( b"TLEN" )
+    lengths = struct.unpack_from( endian + "%dh" % typeCount, data, position[0] )
+    position[0] += 2 * typeCount
+    Expect( b"STRC" )
+
+    structs = []
+    for _ in range( ReadInt() ):
+        typeIndex, fieldCount = struct.unpack_from( endian + "hh", data, position[0] )
+        position[0] += 4
+        fields = {}
+        offset = 0
+        for _ in range( fieldCount ):
+            fieldType, fieldName = struct.unpack_from( endian + "hh", data, position[0] )
+            position[0] += 4
+            name = names[fieldName]
+            size = GetFieldSize( name, lengths[fieldType], pointerSize )
+            fields[name] = StructField( name, offset, size )
+            offset += size
+        structs.append( fields )
+
+    return structs
+
+def GetFieldSize( name, typeLength, pointerSize ):
+    # type: (str, int, int) -> int
+    ''' Size of a struct member from its SDNA name, like "*next", "(*func)()" or "filepath[1024]" '''
+    count = 1
+    for dimension in name.replace( "]", "" ).split( "[" )[1:]:
+        count *= int( dimension )
+    if name.startswith( "*" ) or name.startswith( "(*" ):
+        return pointerSize * count
+    return typeLength * count
+
+def GetPathField( fields ):
+    ''' The member holding the file path as it was saved. Before Blender 2.93 it was "name[1024]",
+    next to a "filepath[1024]" that held the absolute path of the machine that saved the file. '''
+    return fields.get( "name[1024]" ) or fields.get( "filepath[1024]" )
+
+def ReadBlendPaths( path ):
+    # type: (str) -> list
+    ''' Return (kind, path) for every external file referenced by a .blend file, as saved '''
+    f = OpenBlendFile( path )
+    try:
+        reader = BlendReader( f )
+        blocks = []
+        sdna = None
+        while True:
+            code, size, sdnaIndex = reader.ReadBlockHeader()
+            if code == b"ENDB":
+                break
+            if code == b"DNA1":
+                sdna = ParseSdna( reader.Read( size ), reader.endian, reader.pointerSize )
+            elif code in PathBlockCodes:
+                blocks.append( ( PathBlockCodes[code], sdnaIndex, reader.Read( size ) ) )
+            else:
+                reader.Skip( size )
+    except ( struct.error, ValueError ) as e:
+        raise BlendFileError( "malformed .blend file: %s" % e )
+    finally:
+        f.close()
+
+    if sdna is None:
+        raise BlendFileError( "the .blend file has no SDNA" )
+
+    paths = []
+    for kind, sdnaIndex, data in blocks:
+        if sdnaIndex < 0 or sdnaIndex >= len( sdna ):
+            continue
+        fields = sdna[sdnaIndex]
+        field = GetPathField( fields )
+        if field is None or field.offset + field.size > len( data ):
+            continue
+
+        # Packed files are read from the .blend file itself
+        if ReadInteger( data, fields.get( "*packedfile" ), reader.endian ):
+            continue
+        if kind == "image" and ReadInteger( data, fields.get( "source" ), reader.endian ) in ( ImageSourceSequence, ImageSourceTiled ):
+            kind = "sequence"
+
+        value = data[field.offset:field.offset + field.size].split( b"\x00", 1 )[0].decode( "utf-8", "replace" )
+        if value != "" and value not in BuiltinPaths:
+            paths.append( ( kind, value ) )
+
+    return paths
+
+def ReadInteger( data, field, endian ):
+    # type: (bytes, StructField, str) -> int
+    ''' Value of a short, int or pointer member, 0 if the struct doesn't have it '''
+    formats = { 2: "h", 4: "i", 8: "q" }
+    if field is None or field.size not in formats or field.offset + field.size > len( data ):
+        return 0
+    return struct.unpack_from( endian + formats[field.size], data, field.offset )[0]
+
+def ResolveBlendPath( path, baseDirectory ):
+    # type: (str, str) -> str
+    ''' Absolute path of a path saved in a .blend file, "//" is the folder of that .blend file '''
+    if path.startswith( "//" ):
+        path = os.path.join( baseDirectory, path[2:].replace( "\\", os.sep ).replace( "/", os.sep ) )
+    return os.path.normpath( path )
+
+class PrefetchReport( object ):
+    ''' What prefetching the dependencies of a scene did '''
+
+    def __init__( self ):
+        self.results = []       # CacheResult of every prefetched file
+        self.paths = {}         # path as Blender resolves it -> local copy
+        self.missing = []       # referenced files that don't exist
+        self.skipped = []       # UDIM tiles and image sequences, which are read from their original location
+        self.errors = []        # (path, message)
+        self.seconds = 0.0
+
+    def GetBytes( self ):
+        return sum( result.size for result in self.results )
+
+    def GetHits( self ):
+        return sum( 1 for result in self.results if result.hit )
+
+def PrefetchBlendDependencies( fetch, blendFile, blendDirectory, mapPath=None, threads=8, maxDepth=8 ):
+    # type: (callable, str, str, callable, int, int) -> PrefetchReport
+    ''' Fetch the files referenced by a .blend file, and by the libraries it links, in parallel.
+
+    fetch(path) returns the CacheResult of a file, mapPath(path) maps a path found in a .blend file
+    to the path to read on this machine. blendFile is read from wherever it is (it may already be
+    a local copy), relative paths are resolved against blendDirectory. Libraries are parsed after
+    they were fetched, so their own dependencies are fetched one level at a time. '''
+    report = PrefetchReport()
+    started = time.time()
+    mapPath = mapPath or ( lambda path: path )
+
+    seen = set()
+    level = [ ( blendFile, blendDirectory ) ]
+    with ThreadPoolExecutor( max_workers=max( 1, threads ) ) as executor:
+        for depth in range( maxDepth ):
+            if len( level ) == 0:
+                break
+
+            dependencies = []
+            for readFile, baseDirectory in level:
+                try:
+                    blendPaths = ReadBlendPaths( readFile )
+                except ( IOError, OSError, BlendFileError ) as e:
+                    report.errors.append( ( readFile, str( e ) ) )
+                    continue
+
+                for kind, blendPath in blendPaths:
+                    resolved = ResolveBlendPath( blendPath, baseDirectory )
+                    key = os.path.normcase( resolved )
+                    if key in seen:
+                        continue
+                    seen.add( key )
+
+                    if kind == "sequence" or "<UDIM>" in resolved or "<UVTILE>" in resolved:
+                        report.skipped.append( resolved )
+                        continue
+                    source = mapPath( resolved )
+                    if not os.path.isfile( source ):
+                        report.missing.append( resolved )
+                        continue
+                    dependencies.append( ( kind, resolved, source ) )
+
+            futures = [ ( kind, resolved, executor.submit( fetch, source ) ) for kind, resolved, source in dependencies ]
+            level = []
+            for kind, resolved, future in futures:
+                try:
+                    result = future.result()
+                except ( IOError, OSError ) as e:
+                    report.errors.append( ( resolved, str( e ) ) )
+                    continue
+
+                report.results.append( result )
+                report.paths[resolved] = result.localPath
+                if kind == "library":
+                    level.append( ( result.localPath, os.path.dirname( resolved ) ) )
+
+    report.seconds = time.time() - started
+    return report
@@ -0,0 +1,302 @@
+#!/usr/bin/env python3
+# Worker local cache of the files a Blender task reads from the file server, shared by the
+# concurrent tasks and Workers of a machine. This module must not import any Deadline modules so
+# that it can be used outside of Deadline.
+#
+# Files are stored in objects/<key>/<file name>, where the key is a hash of the source path, size
+# and modification time, so a changed file gets a new entry. Hashing the content instead would mean
+# reading the whole file from the file server on every task, which is what the cache avoids.
+# Scenes fetched from the scene store (BlenderSceneStore.py) are keyed by the content hash the job
+# gives instead.
+# index.json records the size and last use of every entry for the LRU eviction, and the hit/miss
+# statistics of the cache.
+# A task leases the entries it fetched until ReleaseLeases, once Blender is done with them: a lease
+# is a locked file in objects/<key>.users, and entries with a lease that is still locked aren't
+# evicted. The OS releases the lock of a task that died, and eviction removes its lease file.
+
+from __future__ import absolute_import
+
+import hashlib
+import json
+import os
+import shutil
+import sys
+import threading
+import time
+import uuid
+
+CacheFormat = 1
+
+CopyBufferSize = 16 * 1024 * 1024
+
+class FileLock( object ):
+    ''' Exclusive lock on a file, released by the OS if the process dies while holding it '''
+
+    def __init__( self, lockFile, timeout=None, poll=0.1 ):
+        # type: (str, float, float) -> None
+        self.lockFile = lockFile
+        self.timeout = timeout
+        self.poll = poll
+        self.handle = None
+
+    def Acquire( self, blocking=True ):
+        # type: (bool) -> bool
+        self.handle = open( self.lockFile, "a+" )
+        started = time.time()
+        while True:
+            try:
+                if sys.platform == "win32":
+                    import msvcrt
+                    self.handle.seek( 0 )
+                    msvcrt.locking( self.handle.fileno(), msvcrt.LK_NBLCK, 1 )
+                else:
+                    import fcntl
+                    fcntl.flock( self.handle.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB )
+                return True
+            except ( IOError, OSError ):
+                if not blocking or ( self.timeout is not None and time.time() - started > self.timeout ):
+                    self.handle.close()
+                    self.handle = None
+                    if not blocking:
+                        return False
+                    raise IOError( "Timed out waiting for the lock \"%s\"" % self.lockFile )
+                time.sleep( self.poll )
+
+    def Release( self ):
+        if self.handle is None:
+            return
+
+        try:
+            if sys.platform == "win32":
+                import msvcrt
+                self.handle.seek( 0 )
+                msvcrt.locking( self.handle.fileno(), msvcrt.LK_UNLCK, 1 )
+            else:
+                import fcntl
+                fcntl.flock( self.handle.fileno(), fcntl.LOCK_UN )
+        finally:
+            self.handle.close()
+            self.handle = None
+
+    def __enter__( self ):
+        self.Acquire()
+        return self
+
+    def __exit__( self, excType, excValue, traceback ):
+        self.Release()
+
+class CacheResult( object ):
+    ''' What fetching a file from the cache did '''
+
+    def __init__( self, source, localPath, hit, size, bytesCopied=0, seconds=0.0 ):
+        self.source = source
+        self.localPath = localPath
+        self.hit = hit
+        self.size = size
+        self.bytesCopied = bytesCopied
+        self.seconds = seconds      # time spent waiting for the lock and copying the file
+
+class FileCache( object ):
+    ''' Content keyed cache of source files with a size cap and least recently used eviction '''
+
+    def __init__( self, cacheDirectory, maxBytes, lockTimeout=3600 ):
+        # type: (str, int, float) -> None
+        self.cacheDirectory = cacheDirectory
+        self.maxBytes = maxBytes
+        self.lockTimeout = lockTimeout
+        self.objectsDirectory = os.path.join( cacheDirectory, "objects" )
+        self.indexFile = os.path.join( cacheDirectory, "index.json" )
+        self.stats = {}
+        # key -> FileLock of this cache's lease on the entry, entries are fetched by several threads
+        self.leases = {}
+        self.leasesLock = threading.Lock()
+
+    @staticmethod
+    def GetKey( path, size, mtime ):
+        # type: (str, int, float) -> str
+        identity = "%s\n%d\n%.6f" % ( os.path.normcase( os.path.abspath( path ) ), size, mtime )
+        return hashlib.sha1( identity.encode( "utf-8" ) ).hexdigest()
+
+    def Fetch( self, path, keep=() ):
+        # type: (str, tuple) -> CacheResult
+        ''' Return the cached copy of a file, copying it first on a miss. Raises IOError/OSError when
+        the source can't be read or the cache can't be written. Entries in keep aren't evicted. '''
+        status = os.stat( path )
+        key = self.GetKey( path, status.st_size, status.st_mtime )
+        return self.FetchEntry( key, path, os.path.basename( path ), status.st_size, lambda localPath: self.Copy( path, localPath ), keep )
+
+    def FetchEntry( self, key, source, fileName, size, copy, keep=() ):
+        # type: (str, str, str, int, callable, tuple) -> CacheResult
+        ''' Return the cached file of an entry, creating it first on a miss with copy(local path), which
+        returns the bytes it read from the source. Entries of the scene store are keyed by their hash. '''
+        started = time.time()
+        entryDirectory = os.path.join( self.objectsDirectory, key )
+        localPath = os.path.join( entryDirectory, fileName )
+
+        if not os.path.isdir( self.objectsDirectory ):
+            try:
+                os.makedirs( self.objectsDirectory )
+            except OSError:
+                if not os.path.isdir( self.objectsDirectory ):
+                    raise
+
+        # Tasks fetching the same file wait for the first one to copy it instead of copying it again.
+        # The entry stays locked until the index is updated so that it can't be evicted in between.
+        bytesCopied = 0
+        with FileLock( entryDirectory + ".lock", self.lockTimeout ):
+            hit = os.path.isfile( localPath ) and os.path.getsize( localPath ) == size
+            if not hit:
+                if not os.path.isdir( entryDirectory ):
+                    os.mkdir( entryDirectory )
+                bytesCopied = copy( localPath )
+            self.Lease( key )
+
+            result = CacheResult( source, localPath, hit, size, bytesCopied, time.time() - started )
+            self.UpdateIndex( key, result, set( keep ) | set( [ key ] ) )
+
+        return result
+
+    def GetUsersDirectory( self, key ):
+        return os.path.join( self.objectsDirectory, key + ".users" )
+
+    def Lease( self, key ):
+        ''' Keep other tasks from evicting an entry until ReleaseLeases, called with the entry locked '''
+        with self.leasesLock:
+            if key in self.leases:
+                return
+
+            usersDirectory = self.GetUsersDirectory( key )
+            if not os.path.isdir( usersDirectory ):
+                try:
+                    os.mkdir( usersDirectory )
+                except OSError:
+                    if not os.path.isdir( usersDirectory ):
+                        raise
+            lease = FileLock( os.path.join( usersDirectory, "%d-%s.lock" % ( os.getpid(), uuid.uuid4().hex ) ) )
+            lease.Acquire()
+            self.leases[key] = lease
+
+    def ReleaseLeases( self ):
+        ''' Let the entries this cache fetched be evicted again, once Blender no longer reads them '''
+        with self.leasesLock:
+            for lease in self.leases.values():
+                lease.Release()
+                RemoveFile( lease.lockFile )
+            self.leases = {}
+
+    def IsLeased( self, key ):
+        # type: (str) -> bool
+        ''' True while a task holds a lease on the entry, the leases of tasks that died are removed '''
+        usersDirectory = self.GetUsersDirectory( key )
+        try:
+            names = os.listdir( usersDirectory )
+        except OSError:
+            return False
+
+        for name in names:
+            lease = FileLock( os.path.join( usersDirectory, name ) )
+            if not lease.Acquire( blocking=False ):
+                return True
+            lease.Release()
+            RemoveFile( lease.lockFile )
+        return False
+
+    def Copy( self, path, localPath ):
+        tempFile = "%s.%d.tmp" % ( localPath, os.getpid() )
+        try:
+            with open( path, "rb" ) as source:
+                with open( tempFile, "wb" ) as target:
+                    shutil.copyfileobj( source, target, CopyBufferSize )
+            os.replace( tempFile, localPath )
+        except:
+            if os.path.isfile( tempFile ):
+                os.remove( tempFile )
+            raise
+
+        return os.path.getsize( localPath )
+
+    def LoadIndex( self ):
+        try:
+            with open( self.indexFile, "r" ) as f:
+                index = json.load( f )
+            if index.get( "format" ) == CacheFormat:
+                return index
+        except ( IOError, OSError, ValueError ):
+            pass
+
+        return { "format": CacheFormat, "entries": {}, "stats": {} }
+
+    def SaveIndex( self, index ):
+        tempFile = "%s.%d.tmp" % ( self.indexFile, os.getpid() )
+        with open( tempFile, "w" ) as f:
+            json.dump( index, f, indent=1 )
+        os.replace( tempFile, self.indexFile )
+
+    def UpdateIndex( self, key, result, keep ):
+        with FileLock( os.path.join( self.cacheDirectory, "index.lock" ), self.lockTimeout ):
+            index = self.LoadIndex()
+            index["entries"][key] = { "source": result.source, "path": result.localPath, "bytes": result.size, "lastUsed": time.time() }
+
+            stats = index["stats"]
+            stats["hits"] = stats.get( "hits", 0 ) + ( 1 if result.hit else 0 )
+            stats["misses"] = stats.get( "misses", 0 ) + ( 0 if result.hit else 1 )
+            stats["bytesCopied"] = stats.get( "bytesCopied", 0 ) + result.bytesCopied
+            stats["secondsCopying"] = stats.get( "secondsCopying", 0.0 ) + ( 0.0 if result.hit else result.seconds )
+            stats["bytesServed"] = stats.get( "bytesServed", 0 ) + result.size
+
+            evictedBytes = self.Evict( index, keep )
+            stats["bytesEvicted"] = stats.get( "bytesEvicted", 0 ) + evictedBytes
+            stats["bytesCached"] = sum( entry["bytes"] for entry in index["entries"].values() )
+
+            self.SaveIndex( index )
+            self.stats = dict( stats )
+
+    def GetReadRate( self ):
+        # type: () -> float
+        ''' Bytes per second the file server delivered to the cache so far, 0 if unknown '''
+        if self.stats.get( "secondsCopying", 0.0 ) <= 0:
+            return 0.0
+        return self.stats.get( "bytesCopied", 0 ) / self.stats["secondsCopying"]
+
+    def Evict( self, index, keep ):
+        ''' Remove the least recently used entries until the cache fits its size cap '''
+        entries = index["entries"]
+        total = sum( entry["bytes"] for entry in entries.values() )
+        evictedBytes = 0
+        for key in sorted( entries, key=lambda key: entries[key]["lastUsed"] ):
+            if total <= self.maxBytes:
+                break
+            if key in keep:
+                continue
+
+            # An entry that is being copied is locked, leave it to its task. Tasks lease an entry while
+            # it is locked, so an entry without leases can't get one before it is removed.
+            entryDirectory = os.path.join( self.objectsDirectory, key )
+            lock = FileLock( entryDirectory + ".lock" )
+            if not lock.Acquire( blocking=False ):
+                continue
+            try:
+                if self.IsLeased( key ):
+                    continue
+                shutil.rmtree( entryDirectory )
+                try:
+                    os.rmdir( self.GetUsersDirectory( key ) )
+                except OSError:
+                    pass
+            except OSError:
+                # Files in use can't be removed on Windows, try again on a later eviction
+                continue
+            finally:
+                lock.Release()
+
+            total -= entries[key]["bytes"]
+            evictedBytes += entries[key]["bytes"]
+            del entries[key]
+
+        return evictedBytes
+
+def RemoveFile( path ):
+    try:
+        os.remove( path )
+    except OSError:
+        pass
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+# Adaptive chunk sizing: a job first renders a few probe frames as tasks of one frame, then the
+# remaining frames are chunked so that their tasks take about a target duration. Short tasks spend
+# most of their time starting Blender and loading the scene, long tasks lose more work when they are
+# requeued and leave Workers idle at the end of the job. This module must not import any Deadline
+# modules so that it can be used outside of Deadline.
+#
+# Every probe task writes a timing record to the job's auxiliary folder:
+#
+#   {"task": ..., "seconds": <task wall time>, "frameSeconds": [<wall time of each frame>]}
+#
+# A frame's time runs from the previous save to its own, so it has the frame's sync in it. The first
+# frame of a task uses Blender's render time instead, so starting Blender and loading the scene are
+# only in the startup.
+
+from __future__ import absolute_import
+
+import heapq
+import json
+import math
+
+TimingFilePattern = "BlenderTiming_%s.json"
+
+def ChooseProbeFrames( frames, count ):
+    # type: (list, int) -> list
+    ''' count frames spread evenly over the frame list, the first and last included, since the cost of
+    a frame usually changes along a shot '''
+    frames = sorted( set( frames ) )
+    if count >= len( frames ):
+        return frames
+    if count <= 0:
+        return []
+    if count == 1:
+        return [ frames[len( frames ) // 2] ]
+
+    indexes = sorted( set( int( round( i * ( len( frames ) - 1 ) / float( count - 1 ) ) ) for i in range( count ) ) )
+    return [ frames[index] for index in indexes ]
+
+def WriteTimingRecord( timingFile, record ):
+    # type: (str, dict) -> None
+    with open( timingFile, "w" ) as f:
+        json.dump( record, f )
+
+def ReadTimingRecords( timingFiles ):
+    # type: (list) -> list
+    ''' The timing records in the files, files that can't be read are skipped '''
+    records = []
+    for timingFile in timingFiles:
+        try:
+            with open( timingFile, "r" ) as f:
+                records.append( json.load( f ) )
+        except ( IOError, OSError, ValueError ):
+            continue
+    return records
+
+def Median( values ):
+    values = sorted( values )
+    if len( values ) == 0:
+        return 0.0
+    middle = len( values ) // 2
+    if len( values ) % 2 == 1:
+        return float( values[middle] )
+    return ( values[middle - 1] + values[middle] ) / 2.0
+
+def EstimateTiming( records ):
+    # type: (list) -> tuple
+    ''' (startup seconds, seconds per frame) measured by probe tasks. The startup is everything a task
+    spent outside of rendering its frames: starting Blender, loading the scene and exiting. '''
+    startups = []
+    frameSeconds = []
+    for record in records:
+        frames = [ seconds for seconds in record.get( "frameSeconds", [] ) if seconds is not None ]
+        if len( frames ) == 0:
+            continue
+        startups.append( max( 0.0, record["seconds"] - sum( frames ) ) )
+        frameSeconds.extend( frames )
+
+    if len( frameSeconds ) == 0:
+        return ( 0.0, 0.0 )
+
+    # The median startup ignores a probe that waited for a cold file server, the mean frame time
+    # keeps the total work of the job right
+    return ( Median( startups ), sum( frameSeconds ) / len( frameSeconds ) )
+
+def GetAdaptiveChunkSize( startupSeconds, frameSeconds, frameCount, targetSeconds, minTasks=1 ):
+    # type: (float, float, int, float, int) -> int
+    ''' The frames per task that keep tasks at or under targetSeconds, with at least one frame per task
+    and at least minTasks tasks when there are enough frames '''
+    if frameCount <= 0:
+        return 1
+
+    if frameSeconds <= 0:
+        chunkSize = frameCount
+    else:
+        chunkSize = int( ( targetSeconds - startupSeconds ) / frameSeconds )
+
+    if minTasks > 1:
+        chunkSize = min( chunkSize, int( math.ceil( frameCount / float( minTasks ) ) ) )
+    return max( 1, min( chunkSize, frameCount ) )
+
+def GetTaskDurations( frameSeconds, startupSeconds, chunkSize ):
+    # type: (list, float, int) -> list
+    ''' Durations of the tasks of frames rendered in order with chunkSize frames per task '''
+    return [ startupSeconds + sum( frameSeconds[start:start + chunkSize] ) for start in range( 0, len( frameSeconds ), max( 1, chunkSize ) ) ]
+
+def SimulateMakespan( taskDurations, workers ):
+    # type: (list, int) -> float
+    ''' Time until the last task finishes when every Worker that becomes idle takes the next task in
+    order, like Deadline dequeues the tasks of a job '''
+    idle = [ 0.0 ] * max( 1, workers )
+    for duration in taskDurations:
+        heapq.heappush( idle, heapq.heappop( idle ) + duration )
+    return max( idle )
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+# Remaining time of a Blender task and stall detection, from the rate of the sample and tile progress
+# Blender prints and from the frames the task already saved. This module must not import any Deadline
+# modules so that it can be used outside of Deadline.
+#
+# A frame goes through three phases, each with its own expected time between two signs of progress:
+#   starting   from the start of the task or the previous save to the frame's first progress line,
+#              expected to take as long as it took for the frames before it
+#   rendering  between progress lines, expected to take as long as the longest interval seen so far,
+#              so that a slow tile isn't taken for a stall
+#   finishing  from the last sample or tile to the save, which includes denoising and compositing,
+#              expected to take as long as it took for the frames before it, or as long as the
+#              frame took to render
+# Nothing is expected before the first frame of a task rendered its first sample, the scene load is
+# left to the task timeout.
+
+from __future__ import absolute_import
+
+import time
+
+class TaskEstimator( object ):
+    ''' Follows the progress events and saves of a task's frames '''
+
+    def __init__( self, totalFrames, clock=time.time ):
+        # type: (int, callable) -> None
+        self.totalFrames = totalFrames
+        self.clock = clock
+        self.finishedFrames = 0
+        # Wall time of the finished frames, the first one includes loading the scene
+        self.frameSeconds = []
+        self.startupSeconds = []
+        self.finishSeconds = []
+        self.longestInterval = None
+        self.frameStart = clock()
+        self.lastProgress = self.frameStart
+        self.ResetFrame()
+
+    def ResetFrame( self ):
+        self.firstProgress = None
+        self.firstFraction = None
+        self.fraction = None
+
+    def Progress( self, event ):
+        ''' Track a "progress" event of the frame being rendered '''
+        now = self.clock()
+        if self.firstProgress is None:
+            self.firstProgress = now
+            self.startupSeconds.append( now - self.frameStart )
+        elif not self.IsFinishing():
+            self.longestInterval = max( self.longestInterval or 0.0, now - self.lastProgress )
+        self.lastProgress = now
+
+        if event.fraction is not None:
+            fraction = min( event.fraction, 1.0 )
+            if self.firstFraction is None:
+                self.firstFraction = fraction
+            # Blender's remaining time estimate moves around, don't let the frame go backwards
+            self.fraction = max( self.fraction or 0.0, fraction )
+
+    def Saved( self ):
+        ''' A frame, or one view of it, was saved '''
+        now = self.clock()
+        if self.firstProgress is not None:
+            self.finishSeconds.append( now - self.lastProgress )
+        self.frameSeconds.append( now - self.frameStart )
+        self.finishedFrames += 1
+        self.frameStart = now
+        self.lastProgress = now
+        self.ResetFrame()
+
+    def IsFinishing( self ):
+        return self.fraction is not None and self.fraction >= 1.0
+
+    def GetFrameSeconds( self ):
+        ''' The average wall time of the finished frames, leaving out the scene load of the first one
+        once there are others '''
+        frameSeconds = self.frameSeconds[1:] or self.frameSeconds
+        if len( frameSeconds ) == 0:
+            return None
+        return sum( frameSeconds ) / len( frameSeconds )
+
+    def GetFrameRemaining( self, blenderRemaining=None ):
+        # type: (float) -> float
+        ''' Seconds until the frame being rendered is done: Blender's own estimate when it printed one,
+        otherwise the rate its progress went up at since the frame's first progress line '''
+        if blenderRemaining is not None:
+            return blenderRemaining
+        if self.fraction is None or self.fraction <= self.firstFraction:
+            return None
+
+        rate = ( self.fraction - self.firstFraction ) / max( self.lastProgress - self.firstProgress, 1e-6 )
+        return max( 0.0, ( 1.0 - self.fraction ) / rate - ( self.clock() - self.lastProgress ) )
+
+    def GetTaskRemaining( self, blenderRemaining=None ):
+        # type: (float) -> float
+        ''' Seconds until every frame of the task is done, None until there is anything to go by '''
+        framesLeft = self.totalFrames - self.finishedFrames
+        if framesLeft <= 0:
+            return 0.0
+
+        frameElapsed = self.clock() - self.frameStart
+        frameRemaining = self.GetFrameRemaining( blenderRemaining )
+        frameSeconds = self.GetFrameSeconds()
+        if frameSeconds is None:
+            if frameRemaining is None:
+                return None
+            frameSeconds = frameElapsed + frameRemaining
+        if frameRemaining is None:
+            frameRemaining = max( 0.0, frameSeconds - frameElapsed )
+
+        return frameRemaining + ( framesLeft - 1 ) * frameSeconds
+
+    def GetExpectedInterval( self ):
+        ''' The longest time Blender is expected to go without progress in the phase the frame is in,
+        None when nothing can be expected yet '''
+        if self.firstProgress is None:
+            if self.finishedFrames == 0:
+                return None
+            return max( self.startupSeconds or self.frameSeconds )
+        if self.IsFinishing():
+            if len( self.finishSeconds ) > 0:
+                return max( self.finishSeconds )
+            return self.lastProgress - self.frameStart
+        return self.longestInterval
+
+    def GetStall( self, multiplier, minimumSeconds ):
+        # type: (float, float) -> tuple
+        ''' (seconds without progress, expected seconds) when Blender went without progress for more
+        than multiplier times the expected interval and at least minimumSeconds, otherwise None '''
+        expected = self.GetExpectedInterval()
+        if expected is None:
+            return None
+
+        silent = self.clock() - self.lastProgress
+        if silent > max( multiplier * expected, minimumSeconds ):
+            return ( silent, expected )
+        return None
+
+def FormatDuration( seconds ):
+    # type: (float) -> str
+    ''' "m:ss", or "h:mm:ss" from an hour on '''
+    minutes, seconds = divmod( int( seconds ), 60 )
+    if minutes < 60:
+        return "%d:%02d" % ( minutes, seconds )
+    return "%d:%02d:%02d" % ( minutes // 60, minutes % 60, seconds )
@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+# Index of the Blender executables installed on a worker, and the version matching policy used to
+# pick one for a job. This module must not import any Deadline modules so that it can be used
+# outside of Deadline.
+
+from __future__ import absolute_import
+
+import glob
+import hashlib
+import json
+import os
+import re
+import subprocess
+
+VersionedConfigKeyPattern = re.compile( r"^Blender_([0-9]+(?:\.[0-9]+)*)_RenderExecutable$", re.IGNORECASE )
+FallbackConfigKey = "Blender_RenderExecutable"
+InstallRootsConfigKey = "BlenderInstallRoots"
+
+# How far a job's Blender version may be from the installed version that renders it:
+#   Exact        - same major.minor release, the nearest patch release is used
+#   NewerMinor   - as Exact, otherwise the closest newer minor release of the same major version
+#   NearestMinor - as NewerMinor, otherwise the closest older minor release of the same major version
+MatchPolicies = ( "Exact", "NewerMinor", "NearestMinor" )
+DefaultMatchPolicy = "NewerMinor"
+
+IndexFormat = 1
+
+VersionTimeout = 60
+
+def ParseVersion( text ):
+    # type: (str) -> tuple
+    ''' Parse "4.0", "4.0.2" or "Blender 4.0.2 (hash ...)" into a tuple of ints, or None '''
+    match = re.search( r"([0-9]+)\.([0-9]+)(?:\.([0-9]+))?", text or "" )
+    if match is None:
+        return None
+
+    return tuple( int( part ) for part in match.groups() if part is not None )
+
+def FormatVersion( version ):
+    # type: (tuple) -> str
+    return ".".join( str( part ) for part in version )
+
+def GetVersionLimitName( version ):
+    # type: (str) -> str
+    ''' Name of the Deadline limit listing the Workers that have a Blender release, for example "blender-3-6" '''
+    parsed = ParseVersion( version )
+    if parsed is None:
+        return ""
+
+    return "blender-%d-%d" % parsed[:2]
+
+def SplitPatterns( value ):
+    # type: (str) -> list
+    return [ pattern.strip() for pattern in re.split( r"[;\r\n]+", value or "" ) if pattern.strip() != "" ]
+
+def ReadExecutableVersion( executable ):
+    # type: (str) -> tuple
+    ''' Run "blender --version" and parse the version it prints, or return None '''
+    try:
+        output = subprocess.check_output( [ executable, "--version" ], stderr=subprocess.STDOUT, timeout=VersionTimeout )
+    except ( OSError, subprocess.SubprocessError ):
+        return None
+
+    match = re.search( r"Blender ([0-9]+\.[0-9]+(?:\.[0-9]+)?)", output.decode( "utf-8", "replace" ) )
+    if match is None:
+        return None
+
+    return ParseVersion( match.group( 1 ) )
+
+class VersionManifest( object ):
+    ''' Versions of the Blender executables found in the install roots, so "--version" only runs once per binary '''
+
+    def __init__( self, executables=None ):
+        # path -> {"mtime": float, "version": list of ints, "root": the pattern that found it}
+        self.executables = executables if executables is not None else {}
+
+    @classmethod
+    def Load( cls, manifestFile ):
+        try:
+            with open( manifestFile, "r" ) as f:
+                return cls( json.load( f ).get( "executables", {} ) )
+        except ( IOError, OSError, ValueError ):
+            return cls()
+
+    def Save( self, manifestFile ):
+        tempFile = "%s.%d.tmp" % ( manifestFile, os.getpid() )
+        with open( tempFile, "w" ) as f:
+            json.dump( { "format": IndexFormat, "executables": self.executables }, f, indent=1 )
+        os.replace( tempFile, manifestFile )
+
+    def Discover( self, patterns, readVersion=ReadExecutableVersion ):
+        # type: (list, callable) -> bool
+        ''' Scan the install root patterns, return True if the manifest changed '''
+        found = {}
+        for pattern in patterns:
+            for path in sorted( glob.glob( os.path.expanduser( pattern ) ) ):
+                if os.path.isfile( path ) and path not in found:
+                    found[path] = pattern
+
+        changed = set( found ) != set( self.executables )
+        executables = {}
+        for path, pattern in found.items():
+            mtime = GetFileTime( path )
+            known = self.executables.get( path )
+            if known is not None and known["mtime"] == mtime:
+                executables[path] = known
+                continue
+
+            version = readVersion( path )
+            if version is not None:
+                executables[path] = { "mtime": mtime, "version": list( version ), "root": pattern }
+            changed = True
+
+        self.executables = executables
+        return changed
+
+    def GetVersions( self ):
+        return sorted( set( tuple( entry["version"] ) for entry in self.executables.values() ) )
+
+def GetConfigFingerprint( configEntries ):
+    # type: (dict) -> str
+    ''' Hash of the executable related config entries, any change to them invalidates the index '''
+    digest = hashlib.sha1()
+    for key in sorted( configEntries ):
+        digest.update( ( "%s=%s\n" % ( key, configEntries[key] ) ).encode( "utf-8" ) )
+
+    return digest.hexdigest()
+
+def GetFileTime( path ):
+    # type: (str) -> float
+    try:
+        return os.path.getmtime( path )
+    except OSError:
+        return -1.0
+
+class ExecutableIndex( object ):
+    ''' Blender versions available on a worker, each with the executable that was found for it '''
+
+    def __init__( self, fingerprint, entries=None ):
+        self.fingerprint = fingerprint
+        # Each entry is a dict with "version" (list of ints, empty for the fallback executable),
+        # "path", "mtime" and "source" (the config entry or install root it came from)
+        self.entries = entries if entries is not None else []
+
+    @classmethod
+    def Load( cls, indexFile ):
+        try:
+            with open( indexFile, "r" ) as f:
+                data = json.load( f )
+        except ( IOError, OSError, ValueError ):
+            return None
+
+        if data.get( "format" ) != IndexFormat:
+            return None
+
+        return cls( data.get( "fingerprint", "" ), data.get( "entries", [] ) )
+
+    def Save( self, indexFile ):
+        # Several worker slots may share the file, so replace it atomically
+        tempFile = "%s.%d.tmp" % ( indexFile, os.getpid() )
+        with open( tempFile, "w" ) as f:
+            json.dump( { "format": IndexFormat, "fingerprint": self.fingerprint, "entries": self.entries }, f, indent=1 )
+        os.replace( tempFile, indexFile )
+
+    def Add( self, version, path, source ):
+        self.entries.append( { "version": list( version ), "path": path, "mtime": GetFileTime( path ), "source": source } )
+
+    def AddDiscovered( self, manifest ):
+        ''' Add the executables found in the install roots, for the releases that aren't configured explicitly '''
+        configured = set( tuple( entry["version"][:2] ) for entry in self.entries if len( entry["version"] ) >= 2 )
+        for path in sorted( manifest.executables ):
+            executable = manifest.executables[path]
+            if tuple( executable["version"][:2] ) not in configured:
+                self.entries.append( { "version": executable["version"], "path": path, "mtime": executable["mtime"], "source": executable["root"] } )
+
+    def IsCurrent( self, entry ):
+        ''' An entry is stale once its executable was removed or replaced '''
+        return GetFileTime( entry["path"] ) == entry["mtime"]
+
+    def GetVersions( self ):
+        return sorted( set( tuple( entry["version"] ) for entry in self.entries if len( entry["version"] ) > 0 ) )
+
+    def HasRelease( self, version ):
+        # type: (tuple) -> bool
+        ''' Whether an executable of the major.minor release of version is indexed '''
+        return any( tuple( entry["version"][:2] ) == tuple( version[:2] ) for entry in self.entries if len( entry["version"] ) >= 2 )
+
+    def GetFallback( self ):
+        for entry in self.entries:
+            if len( entry["version"] ) == 0:
+                return entry
+        return None
+
+    def Find( self, requestedVersion, policy=DefaultMatchPolicy ):
+        # type: (tuple, str) -> tuple
+        ''' Return the (entry, reason) used to render the requested version, entry is None if nothing matches '''
+        if policy not in MatchPolicies:
+            policy = DefaultMatchPolicy
+
+        candidates = [ entry for entry in self.entries if len( entry["version"] ) >= 2 ]
+        if requestedVersion is None or len( requestedVersion ) < 2:
+            return self.FindFallback( "the job doesn't specify a Blender version" )
+
+        major, minor = requestedVersion[0], requestedVersion[1]
+        sameRelease = [ entry for entry in candidates if tuple( entry["version"][:2] ) == ( major, minor ) ]
+        if len( sameRelease ) > 0:
+            entry = min( sameRelease, key=lambda entry: self.PatchDistance( entry, requestedVersion ) )
+            if len( requestedVersion ) < 3 or len( entry["version"] ) < 3 or entry["version"][2] == requestedVersion[2]:
+                return ( entry, "exact match for Blender %s" % FormatVersion( requestedVersion ) )
+            return ( entry, "nearest patch release of Blender %s" % FormatVersion( requestedVersion ) )
+
+        sameMajor = [ entry for entry in candidates if entry["version"][0] == major ]
+        newer = [ entry for entry in sameMajor if entry["version"][1] > minor ]
+        older = [ entry for entry in sameMajor if entry["version"][1] < minor ]
+        if policy in ( "NewerMinor", "NearestMinor" ) and len( newer ) > 0:
+            entry = min( newer, key=lambda entry: ( entry["version"][1], -self.Patch( entry ) ) )
+            return ( entry, "closest newer release to Blender %s allowed by the %s policy" % ( FormatVersion( requestedVersion ), policy ) )
+        if policy == "NearestMinor" and len( older ) > 0:
+            entry = max( older, key=lambda entry: ( entry["version"][1], self.Patch( entry ) ) )
+            return ( entry, "closest older release to Blender %s allowed by the %s policy" % ( FormatVersion( requestedVersion ), policy ) )
+
+        return self.FindFallback( "no installed Blender matches %s with the %s policy" % ( FormatVersion( requestedVersion ), policy ) )
+
+    def FindFallback( self, reason ):
+        entry = self.GetFallback()
+        if entry is None:
+            return ( None, reason )
+        return ( entry, reason + ", using the fallback executable" )
+
+    @staticmethod
+    def Patch( entry ):
+        return entry["version"][2] if len( entry["version"] ) > 2 else 0
+
+    @staticmethod
+    def PatchDistance( entry, requestedVersion ):
+        ''' Sort key preferring the same patch, then newer patches, then older ones '''
+        if len( requestedVersion ) < 3:
+            return ( 0, -ExecutableIndex.Patch( entry ) )
+
+        patch = ExecutableIndex.Patch( entry )
+        if patch >= requestedVersion[2]:
+            return ( 0, patch - requestedVersion[2] )
+        return ( 1, requestedVersion[2] - patch )
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+# Frame list helpers shared by the Blender plugin and the submission scripts.
+# This module must not import any Deadline modules so that it can be used outside of Deadline.
+
+from __future__ import absolute_import
+
+import re
+
+FrameRangePattern = re.compile( r"^(-?[0-9]+)(?:-(-?[0-9]+)(?:[x:]([0-9]+))?)?$" )
+
+def ParseFrameList( text ):
+    # type: (str) -> list
+    ''' Parse a frame list with Deadline's syntax, for example "1-10x2,15,20-18", keeping its order.
+    Raises ValueError if it isn't a valid frame list. '''
+    frames = []
+    for part in re.split( r"[,\s]+", text.strip() ):
+        if part == "":
+            continue
+        match = FrameRangePattern.match( part )
+        if match is None:
+            raise ValueError( "\"%s\" is not a frame or a frame range" % part )
+
+        start = int( match.group( 1 ) )
+        end = int( match.group( 2 ) ) if match.group( 2 ) is not None else start
+        step = int( match.group( 3 ) ) if match.group( 3 ) is not None else 1
+        if step < 1:
+            raise ValueError( "\"%s\" has a step below 1" % part )
+        frames.extend( range( start, end + 1, step ) if start <= end else range( start, end - 1, -step ) )
+
+    if len( frames ) == 0:
+        raise ValueError( "The frame list is empty" )
+    return frames
+
+def GetFrameRuns( frames ):
+    # type: (list) -> list
+    ''' Split a frame list into consecutive (start, end) runs, keeping the order of the list '''
+    runs = []
+    for frame in frames:
+        if len( runs ) > 0 and frame == runs[-1][1] + 1:
+            runs[-1] = ( runs[-1][0], frame )
+        else:
+            runs.append( ( frame, frame ) )
+
+    return runs
+
+def IsContiguous( frames ):
+    # type: (list) -> bool
+    return len( GetFrameRuns( frames ) ) == 1
+
+def CollapseFrames( frames ):
+    # type: (list) -> str
+    ''' Format a frame list with Blender's -f syntax, for example [1, 2, 3, 7] becomes "1..3,7" '''
+    parts = []
+    for start, end in GetFrameRuns( frames ):
+        if start == end:
+            parts.append( str( start ) )
+        elif end == start + 1:
+            parts.append( "%d,%d" % ( start, end ) )
+        else:
+            parts.append( "%d..%d" % ( start, end ) )
+
+    return ",".join( parts )
+
+def GetFrameArgument( frames ):
+    # type: (list) -> str
+    ''' Blender command line arguments that render exactly the given frames '''
+    if IsContiguous( frames ):
+        return " -s " + str( frames[0] ) + " -e " + str( frames[-1] ) + " -a "
+
+    return " -f " + CollapseFrames( frames ) + " "
+
+def FormatFrameList( frames ):
+    # type: (list) -> str
+    ''' Format a frame list with Deadline's syntax, for example [1, 2, 3, 7] becomes "1-3,7" '''
+    return ",".join( str( start ) if start == end else "%d-%d" % ( start, end ) for start, end in GetFrameRuns( frames ) )
+
+def GetPreviewOrder( frames ):
+    # type: (list) -> list
+    ''' Order frames coarse to fine: the first, the last and the middle frame, then the frames halfway
+    between those, and so on, so that a preview of the whole shot is rendered first. Every frame
+    appears exactly once. '''
+    frames = sorted( set( frames ) )
+    if len( frames ) <= 2:
+        return frames
+
+    order = [ frames[0], frames[-1] ]
+    intervals = [ ( 0, len( frames ) - 1 ) ]
+    while len( intervals ) > 0:
+        # Each pass bisects every interval of the previous one, so the gaps halve pass by pass
+        nextIntervals = []
+        for low, high in intervals:
+            if high - low < 2:
+                continue
+            middle = ( low + high ) // 2
+            order.append( frames[middle] )
+            nextIntervals.extend( [ ( low, middle ), ( middle, high ) ] )
+        intervals = nextIntervals
+
+    return order
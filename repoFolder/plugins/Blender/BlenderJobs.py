@@ -0,0 +1,638 @@
+#!/usr/bin/env python3
+# Submission core of the Blender plugin: builds the job and plugin info of a Blender job from a
+# BlenderJob, validates it, and submits it as the one or more Deadline jobs its options need. The
+# submission dialog and the command line below are front-ends to it.
+# This module must not import any Deadline modules so that it can be used outside of Deadline.
+#
+#   python BlenderJobs.py --scene shot.blend --frames 1-100 --output /renders/shot_####.png --version 4.1
+#   python BlenderJobs.py --job shot.json --set pool=blender --set sessionMode=true --write-only /tmp/jobs
+#
+#   python BlenderJobs.py --job defaults.json --batch shots.json --batch-name "Lookdev 2024-06-01"
+#
+# --job reads the fields of a BlenderJob from a JSON object, --set overrides single fields. Without
+# --write-only, the job is submitted with deadlinecommand, found like the Blender submitter finds it.
+# --batch submits a JSON list of jobs, each holding the fields that differ from the job the other
+# options describe, with one deadlinecommand call for all of them (and a second one for the jobs
+# that refer to another job, like the probe of adaptive frames per task). Each job's IDs or
+# failure are reported.
+
+from __future__ import absolute_import
+
+import argparse
+import io
+import json
+import os
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from BlenderChunking import ChooseProbeFrames
+from BlenderExecutables import GetVersionLimitName, ParseVersion
+from BlenderFrames import FormatFrameList, GetPreviewOrder, ParseFrameList
+from BlenderRegions import RegionOutputExtensions
+from BlenderSceneStore import SceneStore
+from BlenderViews import GetViewOutput, GetViews, ParseNames
+
+# Frames rendered by the probe job of adaptive frames per task submissions
+AdaptiveProbeFrames = 3
+
+# The submission dialog prints a line starting with this for every job it submitted, the Blender
+# submitter reads the job IDs from them in the output of deadlinecommand -ExecuteScript
+SubmittedJobPrefix = "DEADLINE_SUBMISSION: JOB "
+
+class SubmissionError( Exception ):
+    pass
+
+class BlenderJob( object ):
+    ''' The options of a Blender submission, with the defaults of the submission dialog. Fields are
+    set as keyword arguments, unknown fields raise a SubmissionError. '''
+    Defaults = (
+        # Job description and scheduling
+        ( "name", "Untitled" ),
+        ( "comment", "" ),
+        ( "department", "" ),
+        ( "pool", "none" ),
+        ( "secondaryPool", "" ),
+        ( "group", "none" ),
+        ( "priority", 50 ),
+        ( "taskTimeoutMinutes", 0 ),
+        ( "enableAutoTimeout", False ),
+        ( "concurrentTasks", 1 ),
+        ( "limitConcurrentTasks", True ),
+        ( "machineLimit", 0 ),
+        ( "machineList", "" ),
+        ( "isBlacklist", False ),
+        ( "limitGroups", "" ),
+        ( "dependencies", "" ),
+        ( "onJobComplete", "Nothing" ),
+        ( "submitSuspended", False ),
+        ( "batchName", "" ),
+        # Blender options
+        ( "sceneFile", "" ),
+        ( "submitScene", False ),
+        # Shared folder scenes submitted with the job are put into instead, and the hash of the stored scene
+        ( "sceneStore", "" ),
+        ( "sceneHash", "" ),
+        ( "frames", "" ),
+        ( "chunkSize", 1 ),
+        ( "outputFile", "" ),
+        ( "threads", 0 ),
+        ( "build", "None" ),
+        ( "version", "" ),
+        ( "requireVersion", False ),
+        ( "sessionMode", False ),
+        ( "skipExistingFrames", False ),
+        ( "previewFirst", False ),
+        ( "adaptiveChunking", False ),
+        ( "targetTaskMinutes", 15 ),
+        ( "regionRendering", False ),
+        ( "regionColumns", 2 ),
+        ( "regionRows", 2 ),
+        ( "cameras", "" ),
+        ( "viewLayers", "" ),
+        # Extra "Key=Value" lines, and whether the front-end adds its integration settings
+        ( "jobInfo", () ),
+        ( "pluginInfo", () ),
+        ( "integration", True ),
+    )
+
+    def __init__( self, **values ):
+        for field, default in self.Defaults:
+            setattr( self, field, default )
+        self.Update( values )
+
+    def Update( self, values ):
+        fields = set( field for field, default in self.Defaults )
+        for field, value in values.items():
+            if field not in fields:
+                raise SubmissionError( "A Blender job has no field \"%s\"" % field )
+            setattr( self, field, value )
+
+    def Copy( self, **changes ):
+        ''' A copy of the job with some fields changed, for the jobs one submission is split into '''
+        job = BlenderJob( **self.ToDict() )
+        job.Update( changes )
+        return job
+
+    def ToDict( self ):
+        return dict( ( field, getattr( self, field ) ) for field, default in self.Defaults )
+
+    @classmethod
+    def FromDict( cls, values ):
+        return cls( **values )
+
+def PadOutputFile( outputFile ):
+    # type: (str) -> str
+    ''' Add "####" before the extension of an output file that has no frame padding '''
+    if outputFile == "" or "#" in outputFile:
+        return outputFile
+    prefix, extension = os.path.splitext( outputFile )
+    return prefix + "####" + extension
+
+def GetOutputPattern( framePath ):
+    # type: (str) -> str
+    ''' Turn the path Blender writes a frame to into an output pattern, for example
+    "/renders/shot_0001.png" into "/renders/shot_####.png" '''
+    directory, fileName = os.path.split( framePath )
+    prefix, extension = os.path.splitext( fileName )
+    prefix = re.sub( r"[0-9]+$", lambda match: "#" * len( match.group( 0 ) ), prefix )
+    return PadOutputFile( os.path.join( directory, prefix + extension ) )
+
+def NormalizeVersion( version ):
+    # type: (str) -> str
+    ''' The "major.minor" release of a Blender version like "4.1.2", other values are kept as they are '''
+    parsed = ParseVersion( version )
+    if parsed is None:
+        return ( version or "" ).strip()
+    return "%d.%d" % parsed[:2]
+
+def GetSubmittedViews( job ):
+    # type: (BlenderJob) -> list
+    return GetViews( ParseNames( job.cameras ), ParseNames( job.viewLayers ) )
+
+def ValidateJob( job, checkFiles=True ):
+    # type: (BlenderJob, bool) -> list
+    ''' The reasons the job can't be submitted, empty if it can. checkFiles also checks that the
+    scene file and the output folder exist on this machine. '''
+    problems = []
+    if job.sceneFile == "":
+        problems.append( "No Blender file was specified" )
+    elif checkFiles and not os.path.isfile( job.sceneFile ):
+        problems.append( "The Blender file %s does not exist" % job.sceneFile )
+
+    if job.outputFile != "" and checkFiles and not os.path.isdir( os.path.dirname( job.outputFile ) ):
+        problems.append( "The directory of the output file %s does not exist." % os.path.dirname( job.outputFile ) )
+
+    try:
+        frameList = ParseFrameList( str( job.frames ) )
+    except ValueError as e:
+        problems.append( "Frame range %s is not valid: %s" % ( job.frames, e ) )
+        frameList = []
+
+    if not IsPositiveInteger( job.chunkSize ):
+        problems.append( "Frames Per Task must be a whole number of at least 1, not %s" % job.chunkSize )
+    if job.adaptiveChunking and not IsPositiveInteger( job.targetTaskMinutes ):
+        problems.append( "Target Task Minutes must be a whole number of at least 1, not %s" % job.targetTaskMinutes )
+
+    if len( GetSubmittedViews( job ) ) > 0:
+        if job.outputFile == "":
+            problems.append( "Rendering cameras or view layers requires an output file, each of them is written next to it" )
+        if job.regionRendering:
+            problems.append( "Region rendering renders the scene's camera, clear the cameras and view layers to use it" )
+
+    if job.regionRendering:
+        for label, value in ( ( "Region Columns", job.regionColumns ), ( "Region Rows", job.regionRows ) ):
+            if not IsPositiveInteger( value ):
+                problems.append( "%s must be a whole number of at least 1, not %s" % ( label, value ) )
+        if len( frameList ) > 1:
+            problems.append( "Region rendering renders a single frame, but the frame list %s has %d frames" % ( job.frames, len( frameList ) ) )
+        if os.path.splitext( job.outputFile )[1].lower() not in RegionOutputExtensions:
+            problems.append( "Region rendering requires an output file ending in %s" % " or ".join( RegionOutputExtensions ) )
+
+    return problems
+
+def IsPositiveInteger( value ):
+    # type: (object) -> bool
+    try:
+        return int( value ) >= 1
+    except ( TypeError, ValueError ):
+        return False
+
+def FormatBool( value ):
+    return "True" if value else "False"
+
+def GetJobInfo( job ):
+    # type: (BlenderJob) -> list
+    ''' The lines of the job info file '''
+    lines = [
+        "Plugin=Blender",
+        "Name=%s" % job.name,
+        "Comment=%s" % job.comment,
+        "Department=%s" % job.department,
+        "Pool=%s" % job.pool,
+        "SecondaryPool=%s" % job.secondaryPool,
+        "Group=%s" % job.group,
+        "Priority=%s" % job.priority,
+        "TaskTimeoutMinutes=%s" % job.taskTimeoutMinutes,
+        "EnableAutoTimeout=%s" % FormatBool( job.enableAutoTimeout ),
+        "ConcurrentTasks=%s" % job.concurrentTasks,
+        "LimitConcurrentTasksToNumberOfCpus=%s" % FormatBool( job.limitConcurrentTasks ),
+        "MachineLimit=%s" % job.machineLimit,
+        ( "Blacklist=%s" if job.isBlacklist else "Whitelist=%s" ) % job.machineList ]
+
+    limitGroups = ParseNames( job.limitGroups )
+    versionLimit = GetVersionLimitName( NormalizeVersion( job.version ) )
+    if job.requireVersion and versionLimit != "" and versionLimit not in limitGroups:
+        limitGroups.append( versionLimit )
+    lines.append( "LimitGroups=%s" % ",".join( limitGroups ) )
+    lines.append( "JobDependencies=%s" % ",".join( ParseNames( job.dependencies ) ) )
+    lines.append( "OnJobComplete=%s" % job.onJobComplete )
+
+    if job.submitSuspended:
+        lines.append( "InitialStatus=Suspended" )
+
+    lines.append( "Frames=%s" % job.frames )
+    lines.append( "ChunkSize=%s" % job.chunkSize )
+
+    outputFile = PadOutputFile( job.outputFile )
+    if outputFile != "":
+        outputFiles = [ GetViewOutput( outputFile, camera, viewLayer ) for camera, viewLayer in GetSubmittedViews( job ) ] or [ outputFile ]
+        for index, viewOutput in enumerate( outputFiles ):
+            lines.append( "OutputFilename%d=%s" % ( index, viewOutput ) )
+
+    if job.batchName != "":
+        lines.append( "BatchName=%s" % job.batchName )
+
+    lines.extend( job.jobInfo )
+    return lines
+
+def GetPluginInfo( job ):
+    # type: (BlenderJob) -> list
+    ''' The lines of the plugin info file '''
+    lines = []
+    if job.sceneHash != "":
+        # Workers render the stored copy, the original path is kept for the scene's relative paths
+        lines.extend( [ "SceneFile=%s" % job.sceneFile, "SceneHash=%s" % job.sceneHash, "SceneStore=%s" % job.sceneStore ] )
+    elif not job.submitScene:
+        lines.append( "SceneFile=%s" % job.sceneFile )
+
+    outputFile = PadOutputFile( job.outputFile )
+    if outputFile != "":
+        lines.append( "OutputFile=%s" % outputFile )
+
+    lines.extend( [
+        "Threads=%s" % job.threads,
+        "Build=%s" % job.build,
+        "SessionMode=%s" % FormatBool( job.sessionMode ),
+        "SkipExistingFrames=%s" % FormatBool( job.skipExistingFrames ),
+        "PreviewFirstOrder=%s" % FormatBool( job.previewFirst ),
+        "Cameras=%s" % ",".join( ParseNames( job.cameras ) ),
+        "ViewLayers=%s" % ",".join( ParseNames( job.viewLayers ) ),
+        "Version=%s" % NormalizeVersion( job.version ) ] )
+
+    lines.extend( job.pluginInfo )
+    return lines
+
+def GetAuxiliaryFiles( job ):
+    # type: (BlenderJob) -> list
+    ''' The files submitted with the job '''
+    return [ job.sceneFile ] if job.submitScene and job.sceneHash == "" else []
+
+def StoreJobScene( job, stored=None ):
+    # type: (BlenderJob, dict) -> tuple
+    ''' Put the scene of a job that is submitted with its scene into the job's scene store instead,
+    returns (the job referring to the stored scene, what was done). When the store can't be written
+    the scene is submitted with the job. stored keeps the StoreResults of the scenes already stored,
+    so that the jobs of a batch hash each scene once. '''
+    if not job.submitScene or job.sceneStore == "" or job.sceneHash != "":
+        return ( job, "" )
+
+    key = ( os.path.abspath( job.sceneFile ), job.sceneStore )
+    if stored is not None and key in stored:
+        return ( job.Copy( sceneHash=stored[key].sceneHash ), "" )
+
+    try:
+        result = SceneStore( job.sceneStore ).Put( job.sceneFile )
+    except ( IOError, OSError ) as e:
+        return ( job, "Unable to put the scene into the scene store %s, submitting it with the job: %s" % ( job.sceneStore, e ) )
+
+    if stored is not None:
+        stored[key] = result
+    return ( job.Copy( sceneHash=result.sceneHash ), result.Format() )
+
+def WriteJobFiles( job, directory, name="blender" ):
+    # type: (BlenderJob, str, str) -> tuple
+    ''' Write the job and plugin info files of the job to directory, returns their paths '''
+    jobInfoFile = os.path.join( directory, name + "_job_info.job" )
+    pluginInfoFile = os.path.join( directory, name + "_plugin_info.job" )
+    for path, lines in ( ( jobInfoFile, GetJobInfo( job ) ), ( pluginInfoFile, GetPluginInfo( job ) ) ):
+        with io.open( path, "w", encoding="utf-8" ) as f:
+            f.write( u"\n".join( lines ) + u"\n" )
+    return ( jobInfoFile, pluginInfoFile )
+
+def GetJobId( results ):
+    # type: (str) -> str
+    for line in results.splitlines():
+        if line.startswith( "JobID=" ):
+            return line[len( "JobID=" ):].strip()
+    return ""
+
+def PlanJob( job ):
+    # type: (BlenderJob) -> tuple
+    ''' Split a submission into the Deadline jobs its options need: (first job, follow), where
+    follow(job ID of the first job) gives the job submitted after it, or is None. Adaptive frames
+    per task and region rendering need a second job that refers to the first. '''
+    job = job.Copy( outputFile=PadOutputFile( job.outputFile ), version=NormalizeVersion( job.version ) )
+    frameList = ParseFrameList( str( job.frames ) )
+
+    if job.regionRendering:
+        return PlanRegionJobs( job, frameList[0] )
+
+    if job.previewFirst:
+        # Deadline creates the tasks in the order of the frame list
+        frameList = GetPreviewOrder( frameList )
+        job = job.Copy( frames=FormatFrameList( frameList ) )
+
+    if job.adaptiveChunking and len( frameList ) > AdaptiveProbeFrames:
+        return PlanAdaptiveJobs( job, frameList )
+    return ( job, None )
+
+class SubmitResult( object ):
+    def __init__( self ):
+        # The combined output of deadlinecommand, after what putting the scene into the scene store did
+        self.output = ""
+        self.jobIds = []
+        # Jobs that could not be submitted after the first one, also in the output
+        self.errors = []
+
+def Submit( job, submitJob, resumeJob=None ):
+    # type: (BlenderJob, callable, callable) -> SubmitResult
+    ''' Submit the job as the Deadline jobs its options need. submitJob(job) submits one of them and
+    returns the output of deadlinecommand. resumeJob(job ID) resumes a suspended job, see
+    RecoverFollowFailure. '''
+    job, stored = StoreJobScene( job )
+    first, follow = PlanJob( job )
+    result = SubmitResult()
+    outputs = [ stored ] if stored != "" else []
+
+    output = submitJob( first )
+    outputs.append( output )
+    jobId = GetJobId( output )
+    if jobId != "":
+        result.jobIds.append( jobId )
+        if follow is not None:
+            followJob = follow( jobId )
+            output = submitJob( followJob )
+            outputs.append( output )
+            if GetJobId( output ) != "":
+                result.jobIds.append( GetJobId( output ) )
+            else:
+                result.errors.append( RecoverFollowFailure( job, first, jobId, followJob, resumeJob ) )
+                outputs.append( "Error: %s" % result.errors[-1] )
+
+    result.output = "\n".join( outputs )
+    return result
+
+def RecoverFollowFailure( job, first, jobId, followJob, resumeJob ):
+    # type: (BlenderJob, BlenderJob, str, BlenderJob, callable) -> str
+    ''' The error of a submission whose second job, the probe of adaptive frames per task or the
+    stitch of region rendering, could not be submitted. A first job that is only suspended to wait
+    for its probe is resumed with resumeJob, so that it renders with the frames per task it was
+    submitted with instead of staying suspended. '''
+    if not first.submitSuspended or job.submitSuspended:
+        return "%s could not be submitted, job %s was submitted without it" % ( followJob.name, jobId )
+
+    if resumeJob is not None:
+        output = resumeJob( jobId )
+        if not any( line.strip().startswith( "Error" ) for line in output.splitlines() ):
+            return "%s could not be submitted, job %s was resumed with %s frames per task" % ( followJob.name, jobId, first.chunkSize )
+    return "%s could not be submitted and job %s is still suspended, resume it in the Monitor" % ( followJob.name, jobId )
+
+def PlanAdaptiveJobs( job, frameList ):
+    # type: (BlenderJob, list) -> tuple
+    ''' The remaining frames as a suspended job, followed by a probe job that renders a few frames
+    spread over the frame list one per task. The BlenderAdaptiveChunking event plugin chunks the
+    remaining frames from the probe's render times and resumes their job once the probe finished. '''
+    probeFrames = ChooseProbeFrames( frameList, AdaptiveProbeFrames )
+    remainingFrames = [ frame for frame in frameList if frame not in probeFrames ]
+    batchName = job.batchName or job.name
+
+    def ProbeJob( mainJobId ):
+        probePluginInfo = [
+            "AdaptiveChunkProbe=True",
+            "AdaptiveChunkJobId=%s" % mainJobId,
+            "AdaptiveChunkTargetSeconds=%d" % ( int( job.targetTaskMinutes ) * 60 ) ]
+        return job.Copy( name="%s (probe)" % job.name, frames=FormatFrameList( probeFrames ), chunkSize=1, batchName=batchName,
+            jobInfo=list( job.jobInfo ) + [ "EventOptIns=BlenderAdaptiveChunking" ], pluginInfo=list( job.pluginInfo ) + probePluginInfo, integration=False )
+
+    return ( job.Copy( frames=FormatFrameList( remainingFrames ), batchName=batchName, submitSuspended=True ), ProbeJob )
+
+def PlanRegionJobs( job, frame ):
+    # type: (BlenderJob, int) -> tuple
+    ''' A job whose tasks each render one region of the frame, followed by a job that depends on it
+    and stitches the regions into the output file. '''
+    columns = int( job.regionColumns )
+    rows = int( job.regionRows )
+    regionInfo = [ "RegionColumns=%d" % columns, "RegionRows=%d" % rows ]
+    batchName = job.batchName or job.name
+
+    def StitchJob( regionJobId ):
+        return job.Copy( name="%s (stitch)" % job.name, frames=str( frame ), chunkSize=1, batchName=batchName,
+            dependencies=",".join( ParseNames( job.dependencies ) + [ regionJobId ] ), pluginInfo=list( job.pluginInfo ) + [ "RegionStitch=True" ] + regionInfo )
+
+    # The tasks of the region job are numbered by region
+    regionJob = job.Copy( name="%s (regions)" % job.name, frames="0-%d" % ( columns * rows - 1 ), chunkSize=1, batchName=batchName,
+        pluginInfo=list( job.pluginInfo ) + [ "RegionRendering=True", "RegionFrame=%d" % frame ] + regionInfo, integration=False )
+    return ( regionJob, StitchJob )
+
+class BatchResult( object ):
+    def __init__( self, name ):
+        self.name = name
+        self.jobIds = []
+        self.problems = []
+        self.notes = []
+
+def SubmitBatch( jobs, submitJobs, batchName="", checkFiles=True, resumeJob=None ):
+    # type: (list, callable, str, bool, callable) -> list
+    ''' Submit many jobs with as few deadlinecommand calls as possible: the first Deadline job of
+    every submission in one call, then the jobs that follow them in a second one. submitJobs(jobs)
+    submits a list of jobs in one call and returns the output of each, resumeJob is the one of
+    Submit. Jobs that are not valid are not submitted. Returns a BatchResult for each job. '''
+    results = []
+    plans = []
+    storedScenes = {}
+    for job in jobs:
+        if batchName != "":
+            job = job.Copy( batchName=batchName )
+        result = BatchResult( job.name )
+        result.problems = ValidateJob( job, checkFiles )
+        if len( result.problems ) == 0:
+            job, stored = StoreJobScene( job, storedScenes )
+            if stored != "":
+                result.notes.append( stored )
+            plans.append( ( result, job ) + PlanJob( job ) )
+        results.append( result )
+
+    followers = []
+    if len( plans ) > 0:
+        for ( result, job, first, follow ), output in zip( plans, submitJobs( [ first for result, job, first, follow in plans ] ) ):
+            jobId = RecordSubmission( result, output )
+            if follow is not None and jobId != "":
+                followers.append( ( result, job, first, jobId, follow( jobId ) ) )
+
+    if len( followers ) > 0:
+        for ( result, job, first, jobId, followJob ), output in zip( followers, submitJobs( [ followJob for result, job, first, jobId, followJob in followers ] ) ):
+            if RecordSubmission( result, output ) == "":
+                result.problems.append( RecoverFollowFailure( job, first, jobId, followJob, resumeJob ) )
+
+    return results
+
+def RecordSubmission( result, output ):
+    # type: (BatchResult, str) -> str
+    jobId = GetJobId( output )
+    if jobId != "":
+        result.jobIds.append( jobId )
+    else:
+        message = " ".join( line.strip() for line in output.splitlines() if line.strip() != "" and not line.startswith( "Result=" ) )
+        result.problems.append( message or "deadlinecommand printed no job ID" )
+    return jobId
+
+def GetMultipleJobArguments( jobFiles ):
+    # type: (list) -> list
+    ''' deadlinecommand arguments that submit the (job info, plugin info, auxiliary files) of many jobs at once '''
+    arguments = [ "-SubmitMultipleJobs" ]
+    for jobInfoFile, pluginInfoFile, auxiliaryFiles in jobFiles:
+        arguments.extend( [ "-job", jobInfoFile, pluginInfoFile ] + list( auxiliaryFiles ) )
+    return arguments
+
+def SplitMultipleJobOutput( output, count ):
+    # type: (str, int) -> list
+    ''' Split what "deadlinecommand -SubmitMultipleJobs" printed into the output of each job, in the
+    order they were submitted. The output of a job starts with its "Result=" line, jobs without one
+    get what was printed before the first job, which is why the whole call failed. '''
+    header = []
+    blocks = []
+    for line in output.splitlines():
+        if line.startswith( "Result=" ):
+            blocks.append( [] )
+        ( blocks[-1] if len( blocks ) > 0 else header ).append( line )
+
+    outputs = [ "\n".join( block ) for block in blocks[:count] ]
+    while len( outputs ) < count:
+        outputs.append( "\n".join( header ) )
+    return outputs
+
+def FormatBatchReport( results ):
+    # type: (list) -> str
+    lines = []
+    for result in results:
+        if len( result.problems ) == 0:
+            lines.append( "%s: %s" % ( result.name, ", ".join( result.jobIds ) ) )
+        else:
+            lines.append( "%s: FAILED %s%s" % ( result.name, "; ".join( result.problems ), " (submitted %s)" % ", ".join( result.jobIds ) if len( result.jobIds ) > 0 else "" ) )
+        lines.extend( "    %s" % note for note in result.notes )
+    failed = len( [ result for result in results if len( result.problems ) > 0 ] )
+    lines.append( "%d of %d submissions succeeded, %d failed" % ( len( results ) - failed, len( results ), failed ) )
+    return "\n".join( lines )
+
+def GetDeadlineCommand():
+    # type: () -> str
+    ''' deadlinecommand, found like the Blender submitter finds it '''
+    deadlineBin = os.environ.get( "DEADLINE_PATH", "" )
+    if deadlineBin == "" and os.path.exists( "/Users/Shared/Thinkbox/DEADLINE_PATH" ):
+        with open( "/Users/Shared/Thinkbox/DEADLINE_PATH" ) as f:
+            deadlineBin = f.read().strip()
+    return os.path.join( deadlineBin, "deadlinecommand" )
+
+def RunDeadlineCommand( arguments, deadlineCommand=None ):
+    # type: (list, str) -> str
+    ''' Run deadlinecommand and return what it printed '''
+    process = subprocess.Popen( [ deadlineCommand or GetDeadlineCommand() ] + list( arguments ), stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.STDOUT )
+    output = process.communicate()[0]
+    return output.decode( "utf-8", "replace" ).replace( "\r", "" )
+
+def ParseFieldValue( field, text ):
+    ''' Convert a --set value to the type of the field's default '''
+    default = dict( BlenderJob.Defaults ).get( field )
+    if isinstance( default, bool ):
+        if text.lower() not in ( "true", "false", "1", "0", "yes", "no" ):
+            raise SubmissionError( "%s is True or False, not \"%s\"" % ( field, text ) )
+        return text.lower() in ( "true", "1", "yes" )
+    if isinstance( default, int ):
+        return int( text )
+    if isinstance( default, tuple ):
+        return [ line for line in text.split( ";" ) if line != "" ]
+    return text
+
+def main():
+    parser = argparse.ArgumentParser( description="Submit a Blender job to Deadline without the submission dialog." )
+    parser.add_argument( "--job", help="JSON file with the fields of the job" )
+    parser.add_argument( "--scene", help="the Blender file" )
+    parser.add_argument( "--frames", help="frame list with Deadline's syntax" )
+    parser.add_argument( "--output", help="output file, \"####\" is added when it has no padding" )
+    parser.add_argument( "--version", help="Blender version the scene was saved with, like 4.1" )
+    parser.add_argument( "--name", help="job name" )
+    parser.add_argument( "--set", action="append", default=[], metavar="FIELD=VALUE", help="set any field of the job, can be repeated" )
+    parser.add_argument( "--batch", metavar="JSON", help="submit the jobs of a JSON list, each holding the fields that differ from the job above" )
+    parser.add_argument( "--batch-name", default="", help="batch name of all the jobs of --batch" )
+    parser.add_argument( "--write-only", metavar="DIRECTORY", help="only write the job files of a plain submission to DIRECTORY" )
+    parser.add_argument( "--deadline-command", help="path of deadlinecommand" )
+    args = parser.parse_args()
+
+    try:
+        job = BlenderJob()
+        if args.job:
+            with open( args.job, "r" ) as f:
+                job.Update( json.load( f ) )
+        for field, value in ( ( "sceneFile", args.scene ), ( "frames", args.frames ), ( "outputFile", args.output ), ( "version", args.version ), ( "name", args.name ) ):
+            if value is not None:
+                job.Update( { field: value } )
+        for assignment in args.set:
+            field, separator, value = assignment.partition( "=" )
+            job.Update( { field: ParseFieldValue( field, value ) } )
+    except ( IOError, OSError, ValueError, SubmissionError ) as e:
+        sys.stderr.write( "Error: %s\n" % e )
+        sys.exit( 2 )
+
+    if args.batch:
+        sys.exit( SubmitBatchFile( job, args.batch, args.batch_name, args.deadline_command ) )
+
+    problems = ValidateJob( job )
+    if len( problems ) > 0:
+        for problem in problems:
+            sys.stderr.write( "Error: %s\n" % problem )
+        sys.exit( 1 )
+
+    if args.write_only:
+        for path in WriteJobFiles( job.Copy( outputFile=PadOutputFile( job.outputFile ), version=NormalizeVersion( job.version ) ), args.write_only ):
+            print( path )
+        return
+
+    def SubmitJob( submitted ):
+        jobInfoFile, pluginInfoFile = WriteJobFiles( submitted, tempfile.gettempdir() )
+        return RunDeadlineCommand( [ jobInfoFile, pluginInfoFile ] + GetAuxiliaryFiles( submitted ), args.deadline_command )
+
+    def ResumeJob( jobId ):
+        return RunDeadlineCommand( [ "-ResumeJob", jobId ], args.deadline_command )
+
+    started = time.time()
+    result = Submit( job, SubmitJob, ResumeJob )
+    print( result.output )
+    print( "Submitted in %.2fs" % ( time.time() - started ) )
+    sys.exit( 0 if len( result.jobIds ) > 0 and len( result.errors ) == 0 else 1 )
+
+def SubmitBatchFile( job, batchFile, batchName, deadlineCommand ):
+    ''' Submit the jobs of a batch file, returns the exit code '''
+    try:
+        with open( batchFile, "r" ) as f:
+            jobs = [ job.Copy( **shot ) for shot in json.load( f ) ]
+    except ( IOError, OSError, ValueError, TypeError, SubmissionError ) as e:
+        sys.stderr.write( "Error: Unable to read the batch file %s: %s\n" % ( batchFile, e ) )
+        return 2
+
+    calls = []
+    def SubmitJobs( submitted ):
+        directory = tempfile.mkdtemp( prefix="blender_batch_" )
+        try:
+            jobFiles = [ WriteJobFiles( batchJob, directory, "job%04d" % index ) + ( GetAuxiliaryFiles( batchJob ), ) for index, batchJob in enumerate( submitted ) ]
+            started = time.time()
+            output = RunDeadlineCommand( GetMultipleJobArguments( jobFiles ), deadlineCommand )
+            calls.append( ( len( submitted ), time.time() - started ) )
+        finally:
+            shutil.rmtree( directory, ignore_errors=True )
+        return SplitMultipleJobOutput( output, len( submitted ) )
+
+    def ResumeJob( jobId ):
+        return RunDeadlineCommand( [ "-ResumeJob", jobId ], deadlineCommand )
+
+    results = SubmitBatch( jobs, SubmitJobs, batchName, resumeJob=ResumeJob )
+    print( FormatBatchReport( results ) )
+    for count, seconds in calls:
+        print( "deadlinecommand submitted %d jobs in %.1fs" % ( count, seconds ) )
+    return 1 if any( len( result.problems ) > 0 for result in results ) else 0
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+# Memory admission control for Blender tasks: the peak memory learned for each job, the memory
+# reserved by the tasks that are starting on a machine, and the free memory of the machine. This
+# module must not import any Deadline modules so that it can be used outside of Deadline.
+#
+# The peaks are stored with the job, a file per task in its auxiliary folder, so that every Worker
+# rendering the job learns from the frames the others rendered without a lock over the network:
+#
+#   {"peakBytes": ..., "samples": ...}
+#
+# The reservations are machine wide, in a ledger that is a JSON file shared by the Workers of a machine:
+#
+#   {"reservations": {"<key>": {"bytes": ..., "expires": ..., "pid": ...}}}
+#
+# A task reserves its job's estimate when it is admitted. Blender takes a while to reach its peak,
+# so the reservation counts against the free memory until the task saved its first frame, ends or
+# the reservation expires, after which the memory Blender really uses shows up in the free memory.
+
+from __future__ import absolute_import
+
+import ctypes
+import json
+import os
+import sys
+import time
+
+from BlenderCache import FileLock
+
+LedgerFormat = 2
+
+PeakFilePattern = "BlenderMemoryPeak_%s.json"
+
+def GetMemoryStatus():
+    # type: () -> tuple
+    ''' (total, available) physical memory in bytes, (None, None) where it can't be read '''
+    if sys.platform.startswith( "linux" ):
+        values = {}
+        try:
+            with open( "/proc/meminfo", "r" ) as f:
+                for line in f:
+                    name, value = line.split( ":", 1 )
+                    values[name] = int( value.split()[0] ) * 1024
+        except ( IOError, OSError, ValueError ):
+            return ( None, None )
+        available = values.get( "MemAvailable", values.get( "MemFree", 0 ) + values.get( "Cached", 0 ) )
+        return ( values.get( "MemTotal" ), available )
+
+    if sys.platform == "win32":
+        class MEMORYSTATUSEX( ctypes.Structure ):
+            _fields_ = [ ( "dwLength", ctypes.c_ulong ),
+                         ( "dwMemoryLoad", ctypes.c_ulong ),
+                         ( "ullTotalPhys", ctypes.c_ulonglong ),
+                         ( "ullAvailPhys", ctypes.c_ulonglong ),
+                         ( "ullTotalPageFile", ctypes.c_ulonglong ),
+                         ( "ullAvailPageFile", ctypes.c_ulonglong ),
+                         ( "ullTotalVirtual", ctypes.c_ulonglong ),
+                         ( "ullAvailVirtual", ctypes.c_ulonglong ),
+                         ( "ullAvailExtendedVirtual", ctypes.c_ulonglong ) ]
+
+        status = MEMORYSTATUSEX()
+        status.dwLength = ctypes.sizeof( status )
+        if ctypes.windll.kernel32.GlobalMemoryStatusEx( ctypes.byref( status ) ):
+            return ( status.ullTotalPhys, status.ullAvailPhys )
+
+    return ( None, None )
+
+def IsProcessAlive( pid ):
+    # type: (int) -> bool
+    if sys.platform == "win32":
+        # PROCESS_QUERY_LIMITED_INFORMATION
+        handle = ctypes.windll.kernel32.OpenProcess( 0x1000, False, pid )
+        if not handle:
+            return False
+        ctypes.windll.kernel32.CloseHandle( handle )
+        return True
+
+    try:
+        os.kill( pid, 0 )
+    except OSError as e:
+        # EPERM means the process exists but belongs to someone else
+        return e.errno == 1
+    return True
+
+def ReadPeakRecord( peakFile ):
+    # type: (str) -> dict
+    ''' The peak record of a task, None when it can't be read '''
+    try:
+        with open( peakFile, "r" ) as f:
+            record = json.load( f )
+        return { "peakBytes": int( record["peakBytes"] ), "samples": int( record["samples"] ) }
+    except ( IOError, OSError, ValueError, KeyError, TypeError ):
+        return None
+
+def RecordPeak( peakFile, peakBytes ):
+    # type: (str, int) -> None
+    ''' Add a frame's peak to the task's record, which only the task writes '''
+    record = ReadPeakRecord( peakFile ) or { "peakBytes": 0, "samples": 0 }
+    record["peakBytes"] = max( record["peakBytes"], int( peakBytes ) )
+    record["samples"] += 1
+
+    tempFile = "%s.%d.tmp" % ( peakFile, os.getpid() )
+    with open( tempFile, "w" ) as f:
+        json.dump( record, f )
+    os.replace( tempFile, peakFile )
+
+def GetJobEstimate( peakFiles ):
+    # type: (list) -> tuple
+    ''' (peak bytes, samples it was learned from) of a job from the records of its tasks, (0, 0) if
+    none of its frames rendered yet '''
+    records = [ record for record in ( ReadPeakRecord( peakFile ) for peakFile in peakFiles ) if record is not None ]
+    if len( records ) == 0:
+        return ( 0, 0 )
+    return ( max( record["peakBytes"] for record in records ), sum( record["samples"] for record in records ) )
+
+class MemoryLedger( object ):
+    ''' The machine wide record of the memory reserved by the tasks that are starting '''
+
+    def __init__( self, ledgerFile, lockTimeout=60 ):
+        # type: (str, float) -> None
+        self.ledgerFile = ledgerFile
+        self.lockTimeout = lockTimeout
+
+    def Load( self ):
+        try:
+            with open( self.ledgerFile, "r" ) as f:
+                ledger = json.load( f )
+            if ledger.get( "format" ) == LedgerFormat:
+                return ledger
+        except ( IOError, OSError, ValueError ):
+            pass
+
+        return { "format": LedgerFormat, "reservations": {} }
+
+    def Save( self, ledger ):
+        tempFile = "%s.%d.tmp" % ( self.ledgerFile, os.getpid() )
+        with open( tempFile, "w" ) as f:
+            json.dump( ledger, f, indent=1 )
+        os.replace( tempFile, self.ledgerFile )
+
+    def Update( self, change ):
+        ''' Apply change(ledger) under the ledger's lock and return what it returned '''
+        with FileLock( self.ledgerFile + ".lock", self.lockTimeout ):
+            ledger = self.Load()
+            now = time.time()
+            for key in [ key for key, reservation in ledger["reservations"].items() if reservation["expires"] < now or not IsProcessAlive( reservation["pid"] ) ]:
+                del ledger["reservations"][key]
+
+            result = change( ledger )
+            self.Save( ledger )
+            return result
+
+    def TryReserve( self, key, requiredBytes, availableBytes, reservationSeconds ):
+        # type: (str, int, int, float) -> tuple
+        ''' Reserve the memory if it fits in the available memory next to the reservations of the other
+        tasks. Returns (admitted, bytes reserved by the other tasks). Checking and reserving happen
+        under one lock, so tasks starting at the same time can't both take the last free memory. '''
+        def Change( ledger ):
+            reserved = sum( reservation["bytes"] for other, reservation in ledger["reservations"].items() if other != key )
+            if requiredBytes + reserved > availableBytes:
+                return ( False, reserved )
+            ledger["reservations"][key] = { "bytes": int( requiredBytes ), "expires": time.time() + reservationSeconds, "pid": os.getpid() }
+            return ( True, reserved )
+        return self.Update( Change )
+
+    def Release( self, key ):
+        # type: (str) -> None
+        def Change( ledger ):
+            ledger["reservations"].pop( key, None )
+        self.Update( Change )
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+# Per-frame render metrics of the Blender plugin, written as one JSON object per line so that the
+# files of many tasks can be concatenated and loaded by any tool. This module must not import any
+# Deadline modules so that it can be used outside of Deadline.
+#
+# A frame's wall time runs from the previous save, or from the start of the task for its first frame,
+# to its own save, like the ETA measures it. It includes what Blender does before the frame's first
+# progress line, which is also recorded as its setup time: syncing the scene, building the BVH and
+# compiling shaders, and for the first frame of a task starting Blender and loading the scene.
+
+from __future__ import absolute_import
+
+import json
+import os
+import time
+
+MetricsFormat = 2
+
+class FrameMetrics( object ):
+    ''' Collects the progress events of a task's frames and writes a record for every saved frame '''
+
+    def __init__( self, metricsFile, context=None, clock=time.time ):
+        # type: (str, dict, callable) -> None
+        self.metricsFile = metricsFile
+        # Values shared by every record of the task, like the job, task, executable and version
+        self.context = dict( context or {} )
+        self.clock = clock
+        self.records = []
+        self.pending = None
+        # The metrics of a task are created as it starts
+        self.lastSaved = clock()
+        self.ResetFrame()
+
+    def ResetFrame( self ):
+        self.progressStart = None
+        self.frame = None
+        self.memory = None
+        self.peak = None
+        self.samples = None
+        self.elapsed = None
+
+    def Update( self, event ):
+        ''' Track a "progress" event of the frame being rendered '''
+        if self.progressStart is None or ( event.frame is not None and self.frame is not None and event.frame != self.frame ):
+            self.ResetFrame()
+            self.progressStart = self.clock()
+
+        if event.frame is not None:
+            self.frame = event.frame
+        if event.memory is not None:
+            self.memory = max( self.memory or 0.0, event.memory )
+        if event.peak is not None:
+            self.peak = max( self.peak or 0.0, event.peak )
+        if event.chunkType == "sample" and event.total is not None:
+            self.samples = event.total
+        if event.elapsed is not None:
+            self.elapsed = event.elapsed
+
+    def Saved( self, event, frame=None ):
+        ''' Start the record of a saved frame, it is written once Blender reported the render time '''
+        self.Flush()
+
+        now = self.clock()
+        # The first progress line is only the start of the frame when the previous save is unknown
+        frameStart = self.lastSaved if self.lastSaved is not None else self.progressStart
+        record = dict( self.context )
+        record.update( {
+            "format": MetricsFormat,
+            "frame": self.frame if self.frame is not None else frame,
+            "time": now,
+            "wallTime": now - frameStart if frameStart is not None else None,
+            "setupTime": self.progressStart - frameStart if frameStart is not None and self.progressStart is not None else None,
+            "renderTime": self.elapsed,
+            "memoryMB": self.memory,
+            "peakMemoryMB": self.peak,
+            "samples": self.samples,
+            "output": event.path,
+            "outputBytes": GetFileSize( event.path ) } )
+        self.pending = record
+        self.lastSaved = now
+        self.ResetFrame()
+
+    def RenderTime( self, event ):
+        ''' Blender's own render time of the frame that was just saved '''
+        if self.pending is not None:
+            self.pending["renderTime"] = event.elapsed
+            self.Flush()
+
+    def Flush( self ):
+        ''' Write the pending record, raises IOError/OSError if the metrics file can't be written '''
+        if self.pending is None:
+            return
+
+        record = self.pending
+        self.pending = None
+        self.records.append( record )
+        if self.metricsFile:
+            # A single write per record so that concurrent tasks appending to the file don't mix lines
+            with open( self.metricsFile, "a" ) as f:
+                f.write( json.dumps( record, sort_keys=True ) + "\n" )
+
+    def Summarize( self ):
+        # type: () -> list
+        ''' Lines summarizing the frames of the task for the task log '''
+        if len( self.records ) == 0:
+            return []
+
+        lines = [ "Frame metrics for %d frames written to \"%s\"" % ( len( self.records ), self.metricsFile ) ]
+
+        wallTimes = [ record["wallTime"] for record in self.records if record["wallTime"] is not None ]
+        if len( wallTimes ) > 0:
+            slowest = max( ( record for record in self.records if record["wallTime"] is not None ), key=lambda record: record["wallTime"] )
+            lines.append( "Wall time per frame: %.2fs average, %.2fs for the slowest frame %s" % ( sum( wallTimes ) / len( wallTimes ), slowest["wallTime"], slowest["frame"] ) )
+
+        renderTimes = [ record["renderTime"] for record in self.records if record["renderTime"] is not None ]
+        if len( renderTimes ) > 0:
+            lines.append( "Blender render time per frame: %.2fs average, %.2fs maximum" % ( sum( renderTimes ) / len( renderTimes ), max( renderTimes ) ) )
+
+        peaks = [ record["peakMemoryMB"] for record in self.records if record["peakMemoryMB"] is not None ]
+        if len( peaks ) > 0:
+            lines.append( "Peak memory: %.1f MB" % max( peaks ) )
+
+        outputBytes = [ record["outputBytes"] for record in self.records if record["outputBytes"] is not None ]
+        if len( outputBytes ) > 0:
+            lines.append( "Output: %d files, %.1f MB" % ( len( outputBytes ), sum( outputBytes ) / 1048576.0 ) )
+
+        return lines
+
+def GetFileSize( path ):
+    # type: (str) -> int
+    try:
+        return os.path.getsize( path )
+    except ( OSError, TypeError ):
+        return None
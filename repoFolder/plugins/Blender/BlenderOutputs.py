@@ -0,0 +1,592 @@
+#!/usr/bin/env python3
+# Output file helpers for the Blender plugin: padding expansion, image file validation and the
+# previews of the frames a task wrote. This module must not import any Deadline modules so that it
+# can be used outside of Deadline.
+#
+# PNG and scanline OpenEXR files (uncompressed, RLE, ZIPS and ZIP, which is Blender's default) are
+# decoded in Python a block of rows at a time, and box filtered down to the preview size as the rows
+# arrive, so a preview never holds more than one block of the full frame in memory. Previews need
+# NumPy. PNG rows filtered with the Average or Paeth filters are unfiltered byte by byte, which is
+# slow in Python.
+
+from __future__ import absolute_import, division
+
+import os
+import re
+import struct
+import threading
+import time
+import zlib
+
+from concurrent.futures import ThreadPoolExecutor
+
+from BlenderRegions import PngWriter
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# Extensions Blender may append to an output path that doesn't have one when "-x 1" is used
+ImageExtensions = ( ".png", ".exr", ".jpg", ".tif", ".tga", ".bmp", ".hdr", ".dpx", ".cin", ".jp2", ".webp" )
+
+# Leading bytes of the image formats Blender writes. Formats without a signature (like Targa) are only
+# checked for their size.
+ImageSignatures = {
+    ".png": ( b"\x89PNG\r\n\x1a\n", ),
+    ".exr": ( b"\x76\x2f\x31\x01", ),
+    ".jpg": ( b"\xff\xd8\xff", ),
+    ".jpeg": ( b"\xff\xd8\xff", ),
+    ".tif": ( b"II*\x00", b"MM\x00*" ),
+    ".tiff": ( b"II*\x00", b"MM\x00*" ),
+    ".bmp": ( b"BM", ),
+    ".hdr": ( b"#?RADIANCE", b"#?RGBE" ),
+    ".dpx": ( b"SDPX", b"XPDS" ),
+    ".cin": ( b"\x80\x2a\x5f\xd7", b"\xd7\x5f\x2a\x80" ),
+    ".jp2": ( b"\x00\x00\x00\x0cjP  ", b"\xff\x4f\xff\x51" ),
+    ".webp": ( b"RIFF", ),
+}
+
+# Trailing bytes of the formats that have one, used to catch files that were cut off while writing
+ImageTrailers = {
+    ".png": b"IEND\xaeB`\x82",
+    ".jpg": b"\xff\xd9",
+    ".jpeg": b"\xff\xd9",
+}
+
+MinimumImageSize = 32
+
+ExrMagic = 20000630
+ExrTiled = 0x200
+ExrDeep = 0x800
+ExrMultipart = 0x1000
+ExrCompressions = ( "none", "RLE", "ZIPS", "ZIP", "PIZ", "PXR24", "B44", "B44A", "DWAA", "DWAB" )
+ExrLinesPerBlock = ( 1, 1, 1, 16, 32, 16, 32, 32, 32, 256 )
+# Bytes and NumPy types of the uint, half and float pixel types
+ExrPixelTypes = ( ( 4, "<u4" ), ( 2, "<f2" ), ( 4, "<f4" ) )
+
+# PNG color types and their samples per pixel
+PngColorTypes = { 0: 1, 2: 3, 3: 1, 4: 2, 6: 4 }
+
+# Preview pixels darker than this everywhere make a black frame
+BlackLevel = 0.5 / 255
+
+def GetFramePath( outputPattern, frame ):
+    # type: (str, int) -> str
+    ''' Replace the last run of "#" with the zero padded frame number, or append it like Blender does '''
+    match = None
+    for match in re.finditer( "#+", outputPattern ):
+        pass
+
+    if match is None:
+        return outputPattern + str( frame ).zfill( 4 )
+
+    return outputPattern[:match.start()] + str( frame ).zfill( len( match.group( 0 ) ) ) + outputPattern[match.end():]
+
+def GetCandidatePaths( path ):
+    # type: (str) -> list
+    ''' The files Blender may have written for an output path, depending on whether it added an extension '''
+    return [ path ] + [ path + extension for extension in ImageExtensions ]
+
+def ValidateImageFile( path ):
+    # type: (str) -> str
+    ''' Return an empty string if the file looks like a complete image, otherwise the reason it doesn't '''
+    try:
+        size = os.path.getsize( path )
+    except OSError:
+        return "missing"
+
+    if size < MinimumImageSize:
+        return "only %d bytes" % size
+
+    extension = os.path.splitext( path )[1].lower()
+    signatures = ImageSignatures.get( extension, () )
+    trailer = ImageTrailers.get( extension, b"" )
+    if len( signatures ) == 0 and trailer == b"":
+        return ""
+
+    try:
+        with open( path, "rb" ) as f:
+            header = f.read( 16 )
+            if trailer != b"":
+                f.seek( -len( trailer ), os.SEEK_END )
+                tail = f.read( len( trailer ) )
+            else:
+                tail = b""
+    except IOError as e:
+        return "unreadable (%s)" % e
+
+    if len( signatures ) > 0 and not any( header.startswith( signature ) for signature in signatures ):
+        return "invalid %s header" % extension
+    if tail != trailer:
+        return "truncated"
+
+    try:
+        header = ReadImageHeader( path )
+    except ValueError as e:
+        return "invalid header (%s)" % e
+    except IOError as e:
+        return "unreadable (%s)" % e
+    if header is not None and header.dataEnd > size:
+        return "truncated"
+
+    return ""
+
+def CheckFrameOutput( outputPattern, frame ):
+    # type: (str, int) -> tuple
+    ''' Return (frame, path, problem) for the first candidate file that exists, or a "missing" problem '''
+    framePath = GetFramePath( outputPattern, frame )
+    for path in GetCandidatePaths( framePath ):
+        if os.path.exists( path ):
+            return ( frame, path, ValidateImageFile( path ) )
+
+    return ( frame, framePath, "missing" )
+
+def CheckFrameOutputs( outputPattern, frames, threads=8 ):
+    # type: (str, list, int) -> list
+    ''' Check the outputs of all the frames in parallel, since each stat can be a network round trip '''
+    with ThreadPoolExecutor( max_workers=max( 1, threads ) ) as executor:
+        return list( executor.map( lambda frame: CheckFrameOutput( outputPattern, frame ), frames ) )
+
+class ImageHeader( object ):
+    ''' What the header of a PNG or OpenEXR file says '''
+
+    def __init__( self, format, width, height, channels ):
+        self.format = format
+        self.width = width
+        self.height = height
+        self.channels = channels        # names, or samples per pixel for PNG
+        self.compression = ""
+        self.dataEnd = 0                # where the last block of an OpenEXR ends, 0 if unknown
+
+def ReadExactly( f, size ):
+    data = f.read( size )
+    if len( data ) != size:
+        raise ValueError( "the file ends in its header" )
+    return data
+
+def ReadImageHeader( path ):
+    # type: (str) -> ImageHeader
+    ''' The header of a PNG or OpenEXR file, None for other formats. Raises ValueError when the
+    header can't be parsed and IOError when the file can't be read. '''
+    extension = os.path.splitext( path )[1].lower()
+    with open( path, "rb" ) as f:
+        if extension == ".png":
+            return ReadPngHeader( f )[0]
+        if extension == ".exr":
+            return ReadExrHeader( f, os.fstat( f.fileno() ).st_size )[0]
+    return None
+
+def ReadPngHeader( f ):
+    ''' (ImageHeader, bit depth, color type) of the PNG that starts at the file position '''
+    if ReadExactly( f, 8 ) != ImageSignatures[".png"][0]:
+        raise ValueError( "not a PNG file" )
+    length, chunkType = struct.unpack( ">I4s", ReadExactly( f, 8 ) )
+    data = ReadExactly( f, 13 ) if length == 13 else b""
+    if chunkType != b"IHDR" or length != 13:
+        raise ValueError( "the first chunk is not IHDR" )
+    if struct.unpack( ">I", ReadExactly( f, 4 ) )[0] != zlib.crc32( chunkType + data ) & 0xFFFFFFFF:
+        raise ValueError( "bad IHDR checksum" )
+
+    width, height, bitDepth, colorType, compression, filterMethod, interlace = struct.unpack( ">IIBBBBB", data )
+    if width == 0 or height == 0 or colorType not in PngColorTypes or bitDepth not in ( 1, 2, 4, 8, 16 ) or interlace > 1:
+        raise ValueError( "invalid IHDR values" )
+
+    header = ImageHeader( "PNG", width, height, PngColorTypes[colorType] )
+    header.compression = "Adam7" if interlace == 1 else ""
+    return ( header, bitDepth, colorType )
+
+def ReadNullTerminated( f ):
+    data = b""
+    while True:
+        byte = ReadExactly( f, 1 )
+        if byte == b"\x00":
+            return data
+        data += byte
+        if len( data ) > 255:
+            raise ValueError( "attribute name too long" )
+
+def ReadExrHeader( f, fileSize ):
+    ''' (ImageHeader, channels, line offsets) of the OpenEXR file, whose first part is read. Channels
+    are (name, pixel type, x sampling, y sampling) in the order of the file. The line offsets are
+    only read for single part scanline files. '''
+    magic, version = struct.unpack( "<II", ReadExactly( f, 8 ) )
+    if magic != ExrMagic:
+        raise ValueError( "not an OpenEXR file" )
+
+    attributes = {}
+    while True:
+        name = ReadNullTerminated( f )
+        if name == b"":
+            break
+        typeName = ReadNullTerminated( f )
+        size = struct.unpack( "<i", ReadExactly( f, 4 ) )[0]
+        if size < 0 or size > fileSize:
+            raise ValueError( "invalid size of the attribute %s" % name.decode( "latin-1" ) )
+        attributes[name.decode( "latin-1" )] = ( typeName, ReadExactly( f, size ) )
+
+    for required in ( "channels", "compression", "dataWindow" ):
+        if required not in attributes:
+            raise ValueError( "no %s attribute" % required )
+
+    channels = []
+    data = attributes["channels"][1]
+    position = 0
+    while position < len( data ) and data[position:position + 1] != b"\x00":
+        end = data.index( b"\x00", position )
+        pixelType, linear, xSampling, ySampling = struct.unpack( "<iB3xii", data[end + 1:end + 17] )
+        if pixelType not in ( 0, 1, 2 ):
+            raise ValueError( "invalid pixel type of the channel %s" % data[position:end].decode( "latin-1" ) )
+        channels.append( ( data[position:end].decode( "latin-1" ), pixelType, xSampling, ySampling ) )
+        position = end + 17
+
+    compression = struct.unpack( "<B", attributes["compression"][1][:1] )[0]
+    xMin, yMin, xMax, yMax = struct.unpack( "<iiii", attributes["dataWindow"][1][:16] )
+    if compression >= len( ExrCompressions ) or xMax < xMin or yMax < yMin or len( channels ) == 0:
+        raise ValueError( "invalid compression, data window or channels" )
+
+    header = ImageHeader( "OpenEXR", xMax - xMin + 1, yMax - yMin + 1, [ channel[0] for channel in channels ] )
+    header.compression = ExrCompressions[compression]
+    if version & ( ExrTiled | ExrDeep | ExrMultipart ):
+        return ( header, channels, [] )
+
+    # A file cut off while writing has a line offset table with holes or pointing past its end
+    blockCount = -( -header.height // ExrLinesPerBlock[compression] )
+    offsets = struct.unpack( "<%dQ" % blockCount, ReadExactly( f, 8 * blockCount ) )
+    if min( offsets ) == 0 or max( offsets ) + 8 > fileSize:
+        raise ValueError( "incomplete line offset table" )
+    f.seek( max( offsets ) + 4 )
+    header.dataEnd = max( offsets ) + 8 + struct.unpack( "<i", ReadExactly( f, 4 ) )[0]
+    return ( header, channels, offsets )
+
+def CheckOutputSize( outputPattern, frame, path, tolerance, neighbours=2 ):
+    # type: (str, int, str, float, int) -> str
+    ''' An empty string if the file is at least (1 - tolerance) times the median size of the outputs
+    of up to neighbours frames on either side, otherwise the reason it isn't. Frames are only
+    compared with smaller neighbours, since content changes make files bigger as often as smaller. '''
+    suffix = path[len( GetFramePath( outputPattern, frame ) ):]
+    sizes = []
+    for neighbour in range( frame - neighbours, frame + neighbours + 1 ):
+        try:
+            if neighbour != frame:
+                sizes.append( os.path.getsize( GetFramePath( outputPattern, neighbour ) + suffix ) )
+        except OSError:
+            pass
+    if len( sizes ) < 2:
+        return ""
+
+    sizes.sort()
+    median = sizes[len( sizes ) // 2] if len( sizes ) % 2 == 1 else ( sizes[len( sizes ) // 2 - 1] + sizes[len( sizes ) // 2] ) // 2
+    size = os.path.getsize( path )
+    if size < median * ( 1.0 - tolerance ):
+        return "only %d bytes, %.0f%% of the %d bytes of the frames around it" % ( size, size * 100.0 / max( 1, median ), median )
+    return ""
+
+def ValidateFrameOutputs( outputPattern, frames, threads=8, sizeTolerance=0.5, neighbours=2 ):
+    # type: (str, list, int, float, int) -> list
+    ''' Check that the output of each frame exists, has a valid header and isn't much smaller than its
+    neighbours, in parallel. Stops at the first invalid frame: the checks that haven't started are
+    skipped. Returns (frame, path, problem) for the frames that were checked. '''
+    failed = threading.Event()
+    def Check( frame ):
+        if failed.is_set():
+            return None
+        frame, path, problem = CheckFrameOutput( outputPattern, frame )
+        if problem == "" and sizeTolerance > 0:
+            problem = CheckOutputSize( outputPattern, frame, path, sizeTolerance, neighbours )
+        if problem != "":
+            failed.set()
+        return ( frame, path, problem )
+
+    with ThreadPoolExecutor( max_workers=max( 1, threads ) ) as executor:
+        return sorted( result for result in executor.map( Check, frames ) if result is not None )
+
+class PreviewResult( object ):
+    def __init__( self, path, previewPath, width, height, maximum, seconds ):
+        self.path = path
+        self.previewPath = previewPath
+        self.width = width
+        self.height = height
+        self.maximum = maximum          # brightest preview sample, from 0 to 1
+        self.seconds = seconds
+
+    def IsBlack( self ):
+        return self.maximum < BlackLevel
+
+def CanWritePreviews():
+    # type: () -> bool
+    return numpy is not None
+
+def GetPreviewPath( framePath ):
+    # type: (str) -> str
+    return os.path.join( os.path.dirname( framePath ), "preview", os.path.splitext( os.path.basename( framePath ) )[0] + ".png" )
+
+def UnfilterPngRow( filterType, row, previous, bytesPerPixel ):
+    ''' Undo the filter of a PNG row, previous is the unfiltered row above it '''
+    if filterType == 0:
+        return row
+    if filterType == 1:
+        # Adding the byte to the left is a running sum of the bytes of each sample, modulo 256
+        return numpy.cumsum( row.reshape( -1, bytesPerPixel ), axis=0, dtype=numpy.uint8 ).reshape( -1 )
+    if filterType == 2:
+        return row + previous
+    if filterType not in ( 3, 4 ):
+        raise ValueError( "invalid PNG filter type %d" % filterType )
+
+    current = bytearray( row.tobytes() )
+    above = previous.tobytes()
+    # The first pixel has nothing to its left, which makes Paeth the same as Up
+    for index in range( bytesPerPixel ):
+        current[index] = ( current[index] + ( above[index] >> 1 if filterType == 3 else above[index] ) ) & 0xFF
+
+    if filterType == 3:
+        for index in range( bytesPerPixel, len( current ) ):
+            current[index] = ( current[index] + ( ( current[index - bytesPerPixel] + above[index] ) >> 1 ) ) & 0xFF
+    else:
+        for index in range( bytesPerPixel, len( current ) ):
+            left = current[index - bytesPerPixel]
+            up = above[index]
+            upLeft = above[index - bytesPerPixel]
+            leftDistance = up - upLeft if up > upLeft else upLeft - up
+            upDistance = left - upLeft if left > upLeft else upLeft - left
+            upLeftDistance = left + up - upLeft - upLeft
+            if upLeftDistance < 0:
+                upLeftDistance = -upLeftDistance
+            if leftDistance <= upDistance and leftDistance <= upLeftDistance:
+                current[index] = ( current[index] + left ) & 0xFF
+            elif upDistance <= upLeftDistance:
+                current[index] = ( current[index] + up ) & 0xFF
+            else:
+                current[index] = ( current[index] + upLeft ) & 0xFF
+    return numpy.frombuffer( bytes( current ), numpy.uint8 )
+
+def ReadPngRows( path ):
+    ''' (header, generator of float32 (rows, width, color samples) strips from 0 to 1) of an 8 or 16
+    bit, non interlaced PNG. Alpha is left out. '''
+    f = open( path, "rb" )
+    try:
+        header, bitDepth, colorType = ReadPngHeader( f )
+    except:
+        f.close()
+        raise
+    if bitDepth < 8 or header.compression == "Adam7":
+        f.close()
+        raise ValueError( "no previews of PNG files with %d bit samples or interlacing" % bitDepth )
+
+    bytesPerPixel = header.channels * bitDepth // 8
+    stride = header.width * bytesPerPixel
+    colorSamples = 3 if colorType in ( 2, 6 ) else 1
+
+    def Rows():
+        with f:
+            decompressor = zlib.decompressobj()
+            pending = b""
+            previous = numpy.zeros( stride, numpy.uint8 )
+            palette = None
+            rowsRead = 0
+            while rowsRead < header.height:
+                length, chunkType = struct.unpack( ">I4s", ReadExactly( f, 8 ) )
+                data = ReadExactly( f, length )
+                f.seek( 4, os.SEEK_CUR )
+                if chunkType == b"PLTE":
+                    palette = numpy.frombuffer( data, numpy.uint8 ).reshape( -1, 3 ).astype( numpy.float32 ) / 255
+                elif chunkType == b"IEND":
+                    raise ValueError( "the image data ends after %d of %d rows" % ( rowsRead, header.height ) )
+                elif chunkType != b"IDAT":
+                    continue
+
+                pending += decompressor.decompress( data )
+                rowCount = min( len( pending ) // ( stride + 1 ), header.height - rowsRead )
+                if rowCount == 0:
+                    continue
+
+                rows = []
+                for index in range( rowCount ):
+                    start = index * ( stride + 1 )
+                    previous = UnfilterPngRow( pending[start], numpy.frombuffer( pending, numpy.uint8, stride, start + 1 ), previous, bytesPerPixel )
+                    rows.append( previous )
+                pending = pending[rowCount * ( stride + 1 ):]
+                rowsRead += rowCount
+
+                strip = numpy.stack( rows )
+                if bitDepth == 16:
+                    samples = strip.view( ">u2" ).astype( numpy.float32 ) / 65535
+                else:
+                    samples = strip.astype( numpy.float32 ) / 255
+                samples = samples.reshape( rowCount, header.width, header.channels )
+                if colorType == 3:
+                    if palette is None:
+                        raise ValueError( "no palette" )
+                    yield palette[strip.reshape( rowCount, header.width )]
+                else:
+                    yield samples[:, :, :colorSamples]
+
+    return ( header, Rows() )
+
+def GetPreviewChannels( names ):
+    # type: (list) -> list
+    ''' The channels of an OpenEXR file a preview shows: R, G and B, of the Combined pass of a
+    multilayer file if there is one, or else the first channel '''
+    if all( name in names for name in ( "R", "G", "B" ) ):
+        return [ "R", "G", "B" ]
+
+    layers = sorted( name[:-2] for name in names if name.endswith( ".R" ) and name[:-2] + ".G" in names and name[:-2] + ".B" in names )
+    layers.sort( key=lambda layer: not layer.endswith( "Combined" ) )
+    if len( layers ) > 0:
+        return [ layers[0] + ".R", layers[0] + ".G", layers[0] + ".B" ]
+    return [ "Y" if "Y" in names else names[0] ]
+
+def DecompressExrBlock( compression, data, size ):
+    ''' The pixel data of an RLE, ZIPS or ZIP compressed block '''
+    if compression == 1:
+        expanded = bytearray()
+        position = 0
+        while position < len( data ):
+            count = struct.unpack( "b", data[position:position + 1] )[0]
+            if count < 0:
+                expanded += data[position + 1:position + 1 - count]
+                position += 1 - count
+            else:
+                expanded += data[position + 1:position + 2] * ( count + 1 )
+                position += 2
+        data = bytes( expanded )
+    else:
+        data = zlib.decompress( data )
+    if len( data ) != size:
+        raise ValueError( "a block holds %d bytes instead of %d" % ( len( data ), size ) )
+
+    # Undo the predictor, then interleave the two halves the bytes were split into
+    deltas = numpy.frombuffer( data, numpy.uint8 ).copy()
+    deltas[1:] -= 128
+    predicted = numpy.cumsum( deltas, dtype=numpy.uint8 )
+    interleaved = numpy.empty( size, numpy.uint8 )
+    interleaved[0::2] = predicted[:( size + 1 ) // 2]
+    interleaved[1::2] = predicted[( size + 1 ) // 2:]
+    return interleaved.tobytes()
+
+def ReadExrRows( path ):
+    ''' (header, generator of float32 (rows, width, channels) strips of linear values) of the preview
+    channels of a single part scanline OpenEXR file, one block at a time '''
+    f = open( path, "rb" )
+    try:
+        header, channels, offsets = ReadExrHeader( f, os.fstat( f.fileno() ).st_size )
+        compression = ExrCompressions.index( header.compression )
+        if len( offsets ) == 0 or compression > 3:
+            raise ValueError( "no previews of tiled, deep, multi-part or %s compressed OpenEXR files" % header.compression )
+        if any( xSampling != 1 or ySampling != 1 for name, pixelType, xSampling, ySampling in channels ):
+            raise ValueError( "no previews of subsampled OpenEXR files" )
+    except:
+        f.close()
+        raise
+
+    # Where each channel's samples start in a line of a block
+    starts = {}
+    lineBytes = 0
+    for name, pixelType, xSampling, ySampling in channels:
+        starts[name] = ( lineBytes, pixelType )
+        lineBytes += header.width * ExrPixelTypes[pixelType][0]
+    previewChannels = GetPreviewChannels( header.channels )
+    linesPerBlock = ExrLinesPerBlock[compression]
+
+    def Rows():
+        with f:
+            for block, offset in enumerate( offsets ):
+                f.seek( offset )
+                y, size = struct.unpack( "<ii", ReadExactly( f, 8 ) )
+                lines = min( linesPerBlock, header.height - block * linesPerBlock )
+                data = ReadExactly( f, size )
+                if size < lines * lineBytes:
+                    data = DecompressExrBlock( compression, data, lines * lineBytes )
+                pixels = numpy.frombuffer( data, numpy.uint8, lines * lineBytes ).reshape( lines, lineBytes )
+
+                strip = numpy.empty( ( lines, header.width, len( previewChannels ) ), numpy.float32 )
+                for index, name in enumerate( previewChannels ):
+                    start, pixelType = starts[name]
+                    sampleBytes, typeCode = ExrPixelTypes[pixelType]
+                    strip[:, :, index] = pixels[:, start:start + header.width * sampleBytes].copy().view( typeCode )
+                yield strip
+
+    return ( header, Rows() )
+
+def DownscaleRows( strips, width, height, maxSize ):
+    ''' Box filter strips of rows down to at most maxSize pixels on the longest side, yielding one
+    output row at a time, so only the rows of one output row are held '''
+    factor = max( 1, -( -max( width, height ) // maxSize ) )
+    columns = numpy.arange( 0, width, factor )
+    columnCounts = numpy.diff( numpy.append( columns, width ) ).reshape( 1, -1, 1 ).astype( numpy.float32 )
+    total = None
+    rowCount = 0
+    for strip in strips:
+        reduced = numpy.add.reduceat( strip, columns, axis=1 )
+        for row in range( reduced.shape[0] ):
+            total = reduced[row:row + 1].copy() if total is None else total + reduced[row:row + 1]
+            rowCount += 1
+            if rowCount == factor:
+                yield total / ( columnCounts * rowCount )
+                total = None
+                rowCount = 0
+    if total is not None:
+        yield total / ( columnCounts * rowCount )
+
+def EncodeSrgb( linear ):
+    return numpy.where( linear <= 0.0031308, linear * 12.92, 1.055 * numpy.power( numpy.maximum( linear, 0.0031308 ), 1 / 2.4 ) - 0.055 )
+
+def WritePreview( path, previewPath, maxSize=256 ):
+    # type: (str, str, int) -> PreviewResult
+    ''' Write an 8 bit PNG preview of a PNG or OpenEXR frame. Raises ValueError when the frame can't
+    be previewed and IOError/OSError when it can't be read or the preview can't be written. '''
+    if numpy is None:
+        raise ValueError( "previews need NumPy" )
+
+    started = time.time()
+    extension = os.path.splitext( path )[1].lower()
+    if extension == ".png":
+        header, strips = ReadPngRows( path )
+    elif extension == ".exr":
+        header, strips = ReadExrRows( path )
+    else:
+        raise ValueError( "no previews of %s files" % extension )
+
+    factor = max( 1, -( -max( header.width, header.height ) // maxSize ) )
+    width = -( -header.width // factor )
+    height = -( -header.height // factor )
+    previewDirectory = os.path.dirname( previewPath )
+    if not os.path.isdir( previewDirectory ):
+        try:
+            os.makedirs( previewDirectory )
+        except OSError:
+            if not os.path.isdir( previewDirectory ):
+                raise
+
+    writer = None
+    maximum = 0.0
+    try:
+        for row in DownscaleRows( strips, header.width, header.height, maxSize ):
+            if writer is None:
+                writer = PngWriter( previewPath, width, height, row.shape[2], 8 )
+            maximum = max( maximum, float( row.max() ) )
+            if extension == ".exr":
+                row = EncodeSrgb( row )
+            writer.WriteRows( numpy.clip( row[0] * 255 + 0.5, 0, 255 ).astype( numpy.uint8 ).reshape( 1, width, -1 ) )
+        writer.Close()
+    except:
+        if writer is not None:
+            writer.Abort()
+        strips.close()
+        raise
+
+    return PreviewResult( path, previewPath, width, height, maximum, time.time() - started )
+
+def WritePreviews( results, threads=8, maxSize=256 ):
+    # type: (list, int, int) -> list
+    ''' Write the previews of the (frame, path, problem) of valid frames in parallel. Returns
+    (frame, PreviewResult or None, problem) for each of them. '''
+    def Preview( result ):
+        frame, path, problem = result
+        try:
+            return ( frame, WritePreview( path, GetPreviewPath( path ), maxSize ), "" )
+        except ( IOError, OSError, ValueError ) as e:
+            return ( frame, None, str( e ) )
+
+    with ThreadPoolExecutor( max_workers=max( 1, threads ) ) as executor:
+        return list( executor.map( Preview, [ result for result in results if result[2] == "" ] ) )
@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+# Path remapping script of the Deadline Blender plugin, for scenes rendered from a Worker's local
+# cache instead of the file server.
+#
+# It runs inside Blender after the scene is loaded and before it renders, with
+#
+#   blender -b cached.blend --python BlenderPathRemap.py ... -a -- BlenderPathMap.json
+#
+# where the JSON file written by Blender.py looks like
+#
+#   {"blendDirectory": "/projects/shot010", "paths": {"/projects/tex/wood.png": "/cache/objects/.../wood.png"}}
+#
+# Paths relative to the scene ("//textures/wood.png") are made absolute against blendDirectory, the
+# folder the scene was copied from, and the absolute paths found in "paths" are pointed at their
+# local copies. The output paths of the scene's render settings and File Output nodes are made
+# absolute too, since "//" is the cache folder, where the frames would be evicted with the scene.
+#
+# Libraries are remapped and reloaded first, because reloading a library reads the data linked from
+# it again. The linked data is remapped afterwards. Linked data usually can't be edited, and its
+# relative paths are relative to its library, so a library that was pointed at its local copy is
+# pointed back at its original location when some of its linked data can't be remapped. Every path
+# that still doesn't exist is reported with a warning.
+
+import json
+import os
+import sys
+
+import bpy
+
+# bpy.data collections whose items have a filepath, besides the libraries
+PathCollections = ( "images", "sounds", "movieclips", "volumes", "cache_files", "fonts" )
+
+# Image sequences and UDIM tiles are found by Blender from a pattern, not from the path itself
+PatternMarkers = ( "<UDIM>", "<UVTILE>", "#" )
+
+def GetMapFile():
+    if "--" not in sys.argv:
+        return ""
+    arguments = sys.argv[sys.argv.index( "--" ) + 1:]
+    return arguments[0] if len( arguments ) > 0 else ""
+
+def NormalizePath( path ):
+    return os.path.normcase( os.path.normpath( path ) )
+
+def Resolve( path, baseDirectory ):
+    ''' Absolute path of a Blender path, relative paths start with // '''
+    if path.startswith( "//" ):
+        path = os.path.join( baseDirectory, path[2:].replace( "\\", os.sep ).replace( "/", os.sep ) )
+    return os.path.normpath( path )
+
+def ResolveOutput( path, baseDirectory ):
+    ''' Like Resolve, keeping the trailing separator of an output path that names a folder '''
+    resolved = Resolve( path, baseDirectory )
+    if path.endswith( ( "/", "\\" ) ) and not resolved.endswith( os.sep ):
+        resolved += os.sep
+    return resolved
+
+def Write( line ):
+    sys.stdout.write( line + "\n" )
+    sys.stdout.flush()
+
+def IsExternal( item ):
+    return getattr( item, "packed_file", None ) is None and item.filepath != ""
+
+def SetPath( item, path ):
+    # type: (bpy.types.ID, str) -> bool
+    ''' Point an item at a path, False when it can't be edited, like most linked data '''
+    if not getattr( item, "is_editable", True ):
+        return False
+    try:
+        item.filepath = path
+    except ( AttributeError, TypeError, RuntimeError ):
+        return False
+    return True
+
+def GetLibraryDirectories( blendDirectory ):
+    ''' The original folder of every library, since the paths of linked data and of indirectly linked
+    libraries are relative to their library '''
+    libraryDirectories = {}
+    for library in bpy.data.libraries:
+        parent = getattr( library, "parent", None )
+        baseDirectory = libraryDirectories.get( parent.name, blendDirectory ) if parent is not None else blendDirectory
+        libraryDirectories[library.name] = os.path.dirname( Resolve( library.filepath, baseDirectory ) )
+    return libraryDirectories
+
+def ReloadLibraries( names ):
+    failed = 0
+    for name in names:
+        try:
+            bpy.data.libraries[name].reload()
+        except ( AttributeError, KeyError, RuntimeError ) as e:
+            Write( "Warning: Deadline could not reload the library \"%s\": %s" % ( name, e ) )
+            failed += 1
+    return failed
+
+def RemapLibraries( blendDirectory, localPaths, libraryDirectories ):
+    ''' Point the libraries at their local copies, or at their original location when their path is
+    relative. Returns (remapped, failed, {library name: original path} of the ones that are local). '''
+    remapped = 0
+    failed = 0
+    localLibraries = {}
+    reload = []
+    for library in bpy.data.libraries:
+        if library.filepath == "":
+            continue
+        parent = getattr( library, "parent", None )
+        baseDirectory = libraryDirectories.get( parent.name, blendDirectory ) if parent is not None else blendDirectory
+        source = Resolve( library.filepath, baseDirectory )
+        target = localPaths.get( NormalizePath( source ), source )
+        if target == library.filepath:
+            continue
+
+        if not SetPath( library, target ):
+            failed += 1
+            continue
+        remapped += 1
+        reload.append( library.name )
+        if target != source:
+            localLibraries[library.name] = source
+
+    failed += ReloadLibraries( reload )
+    return ( remapped, failed, localLibraries )
+
+def RemapData( blendDirectory, localPaths, libraryDirectories, localLibraries ):
+    ''' Point the images, sounds, caches... at their local copies or make their relative paths
+    absolute. Returns (remapped, failed, names of the local libraries whose linked data is lost). '''
+    remapped = 0
+    failed = 0
+    lostLibraries = set()
+    for collectionName in PathCollections:
+        for item in getattr( bpy.data, collectionName, [] ):
+            if not IsExternal( item ):
+                continue
+
+            library = getattr( item, "library", None )
+            baseDirectory = libraryDirectories.get( library.name, blendDirectory ) if library is not None else blendDirectory
+            source = Resolve( item.filepath, baseDirectory )
+            target = localPaths.get( NormalizePath( source ), source )
+            if target == item.filepath:
+                continue
+            # Relative paths of a library read from its original location already resolve
+            if library is not None and library.name not in localLibraries and target == source:
+                continue
+
+            if SetPath( item, target ):
+                remapped += 1
+                continue
+
+            failed += 1
+            # A relative path of data that can't be edited is found next to its library, which is
+            # only where it was when the library is read from its original location
+            if library is not None and item.filepath.startswith( "//" ) and library.name in localLibraries:
+                lostLibraries.add( library.name )
+
+    return ( remapped, failed, lostLibraries )
+
+def RestoreLibraries( localLibraries, names ):
+    ''' Point local libraries back at their original location '''
+    restored = []
+    for name in sorted( names ):
+        library = bpy.data.libraries.get( name )
+        if library is not None and SetPath( library, localLibraries[name] ):
+            Write( "Warning: Deadline reads the library \"%s\" from \"%s\", the data linked from it has relative paths that can't be remapped" % ( name, localLibraries[name] ) )
+            restored.append( name )
+    ReloadLibraries( restored )
+
+def MakeOutputsAbsolute( blendDirectory ):
+    ''' Make the relative output paths of the scenes and their File Output nodes absolute '''
+    count = 0
+    for scene in bpy.data.scenes:
+        if getattr( scene, "library", None ) is not None:
+            continue
+        if scene.render.filepath.startswith( "//" ):
+            scene.render.filepath = ResolveOutput( scene.render.filepath, blendDirectory )
+            count += 1
+
+    nodeTrees = [ scene.node_tree for scene in bpy.data.scenes if getattr( scene, "node_tree", None ) is not None and getattr( scene, "library", None ) is None ]
+    nodeTrees += [ group for group in getattr( bpy.data, "node_groups", [] ) if getattr( group, "library", None ) is None ]
+    for nodeTree in nodeTrees:
+        for node in nodeTree.nodes:
+            if node.type != "OUTPUT_FILE":
+                continue
+            # Blender 5 renamed base_path to directory
+            for name in ( "base_path", "directory" ):
+                path = getattr( node, name, None )
+                if path is not None and path.startswith( "//" ):
+                    setattr( node, name, ResolveOutput( path, blendDirectory ) )
+                    count += 1
+    return count
+
+def ReportUnresolved():
+    ''' Warn about every path that doesn't exist the way Blender resolves it '''
+    unresolved = 0
+    for collectionName in ( "libraries", ) + PathCollections:
+        for item in getattr( bpy.data, collectionName, [] ):
+            if not IsExternal( item ) or any( marker in item.filepath for marker in PatternMarkers ):
+                continue
+
+            library = getattr( item, "parent" if collectionName == "libraries" else "library", None )
+            path = bpy.path.abspath( item.filepath, library=library )
+            if not os.path.exists( path ):
+                Write( "Warning: Deadline could not resolve the path of %s \"%s\": \"%s\"" % ( collectionName[:-1], item.name, path ) )
+                unresolved += 1
+    return unresolved
+
+def Main():
+    mapFile = GetMapFile()
+    if mapFile == "":
+        return
+
+    with open( mapFile, "r" ) as f:
+        pathMap = json.load( f )
+
+    blendDirectory = pathMap.get( "blendDirectory", "" )
+    localPaths = dict( ( NormalizePath( source ), local ) for source, local in pathMap.get( "paths", {} ).items() )
+
+    libraryDirectories = GetLibraryDirectories( blendDirectory )
+    remappedLibraries, failedLibraries, localLibraries = RemapLibraries( blendDirectory, localPaths, libraryDirectories )
+    remapped, failed, lostLibraries = RemapData( blendDirectory, localPaths, libraryDirectories, localLibraries )
+    RestoreLibraries( localLibraries, lostLibraries )
+    outputs = MakeOutputsAbsolute( blendDirectory )
+    unresolved = ReportUnresolved()
+
+    Write( "Deadline remapped %d paths, %d could not be remapped, %d output paths made absolute, %d paths unresolved" % (
+        remappedLibraries + remapped, failedLibraries + failed, outputs, unresolved ) )
+
+Main()
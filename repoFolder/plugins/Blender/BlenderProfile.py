@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+# Timestamps of the phases of a Blender task, from the plugin's PreRenderTasks to the exit of
+# Blender, to see where the time of short frame tasks goes. This module must not import any Deadline
+# modules so that it can be used outside of Deadline.
+#
+# The phases, in the order they normally happen:
+#   start        PreRenderTasks was called
+#   preRender    PreRenderTasks is done, including skipping existing frames
+#   executable   RenderExecutable resolved the Blender executable
+#   arguments    RenderArgument mapped the paths, Blender is spawned right after it returns
+#   firstLine    Blender printed its first line
+#   blendRead    Blender printed "Read blend:"
+#   firstSample  the first progress line of a frame
+#   firstSaved   the first frame was saved
+#   saved        each following frame was saved
+#   exit         Blender exited, or the task was done in session mode
+#   outputsChecked  the output files of the task were validated
+#   previews        the previews of the output files were written
+
+from __future__ import absolute_import
+
+import json
+import time
+
+ProfileFormat = 1
+
+# Phases that aren't spent rendering, the overhead reported for a task
+OverheadPhases = ( "preRender", "executable", "arguments", "firstLine", "blendRead", "firstSample", "exit", "outputsChecked", "previews" )
+
+class PhaseProfiler( object ):
+    ''' Records when each phase of a task ended '''
+
+    def __init__( self, enabled=True, clock=time.time ):
+        # type: (bool, callable) -> None
+        self.enabled = enabled
+        self.clock = clock
+        self.started = None
+        self.marks = []
+        self.marked = set()
+
+    def Start( self ):
+        self.started = self.clock()
+        self.marks = [ ( "start", self.started, {} ) ]
+        self.marked = set( [ "start" ] )
+
+    def Mark( self, name, **values ):
+        if not self.enabled or self.started is None:
+            return
+        if name == "saved" and "firstSaved" not in self.marked:
+            name = "firstSaved"
+
+        self.marks.append( ( name, self.clock(), values ) )
+        self.marked.add( name )
+
+    def MarkOnce( self, name, **values ):
+        if name not in self.marked:
+            self.Mark( name, **values )
+
+    def GetBreakdown( self ):
+        # type: () -> list
+        ''' (phase, seconds since the start, seconds since the previous phase, values) for every mark '''
+        breakdown = []
+        previous = self.started
+        for name, markTime, values in self.marks:
+            breakdown.append( ( name, markTime - self.started, markTime - previous, values ) )
+            previous = markTime
+        return breakdown
+
+    def GetOverhead( self ):
+        # type: () -> tuple
+        ''' (overhead seconds, total seconds) of the task '''
+        breakdown = self.GetBreakdown()
+        if len( breakdown ) == 0:
+            return ( 0.0, 0.0 )
+
+        overhead = sum( delta for name, at, delta, values in breakdown if name in OverheadPhases )
+        return ( overhead, breakdown[-1][1] )
+
+    def ToRecord( self, context=None ):
+        # type: (dict) -> dict
+        record = dict( context or {} )
+        overhead, total = self.GetOverhead()
+        record.update( {
+            "format": ProfileFormat,
+            "time": self.started,
+            "total": total,
+            "overhead": overhead,
+            "phases": [ dict( values, phase=name, at=round( at, 4 ), seconds=round( delta, 4 ) ) for name, at, delta, values in self.GetBreakdown() ] } )
+        return record
+
+    def Write( self, profileFile, context=None ):
+        ''' Append the task's record to a JSON-lines file, raises IOError/OSError if it can't be written '''
+        with open( profileFile, "a" ) as f:
+            f.write( json.dumps( self.ToRecord( context ), sort_keys=True ) + "\n" )
+
+    def FormatBreakdown( self ):
+        # type: () -> list
+        ''' Lines with the breakdown of the task for the task log '''
+        lines = []
+        for name, at, delta, values in self.GetBreakdown():
+            detail = "".join( " %s=%s" % ( key, values[key] ) for key in sorted( values ) )
+            lines.append( "  %-12s %9.3fs %+9.3fs%s" % ( name, at, delta, detail ) )
+
+        overhead, total = self.GetOverhead()
+        if total > 0:
+            lines.append( "  overhead %.3fs of %.3fs (%.0f%%)" % ( overhead, total, overhead * 100.0 / total ) )
+        return lines
@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+# Parsing of Blender's stdout for the Blender plugin's progress handling.
+#
+# Blender's log format changed between releases, so there is one parser per family of releases,
+# registered with the first Blender version it handles. The plugin picks the parser with the Version
+# entry of the plugin info. Every registered parser has golden logs in tools/logs that are checked by
+# tools/CheckProgressParsers.py.
+#
+# This module must not import any Deadline modules so that it can be used outside of Deadline.
+
+from __future__ import absolute_import
+
+import re
+
+# Failures are the same for every Blender release
+FailedPattern = r"(?:Unable to open|Failed to read blend file|(?:Error: )?Unable to create directory)"
+
+# The lines every parser's filter lets through, besides the frame status lines
+CommonFilter = r"Saved:|\s*Time: [0-9]|" + FailedPattern
+
+def ParseTime( text ):
+    # type: (str) -> float
+    ''' Convert Blender's "MM:SS.ss" or "HH:MM:SS.ss" times to seconds '''
+    seconds = 0.0
+    for part in text.split( ":" ):
+        seconds = seconds * 60 + float( part )
+    return seconds
+
+class StdoutEvent( object ):
+    ''' A line of Blender output that matters to the plugin '''
+
+    __slots__ = ( "kind", "frame", "chunkType", "current", "total", "fraction", "elapsed", "remaining", "memory", "peak", "path", "line" )
+
+    def __init__( self, kind, line, **values ):
+        self.kind = kind                # "progress", "saved", "rendertime" or "failed"
+        self.line = line
+        self.frame = None
+        self.chunkType = None           # "sample", "tile" or None when only the frame is known
+        self.current = None
+        self.total = None
+        self.fraction = None            # progress of the current frame between 0 and 1, if known
+        self.elapsed = None             # seconds, from the Time field or the render time after "Saved:"
+        self.remaining = None           # seconds, from the Remaining field
+        self.memory = None              # MB, from the Mem field
+        self.peak = None                # MB, from the Peak field
+        self.path = None                # output file of "saved" events
+        for name, value in values.items():
+            setattr( self, name, value )
+
+    def ToDict( self ):
+        return dict( ( name, getattr( self, name ) ) for name in self.__slots__ if name != "line" and getattr( self, name ) is not None )
+
+class ProgressParser( object ):
+    ''' Base class of the parsers, handles the lines whose format never changed '''
+
+    Name = ""
+
+    # The only pattern registered with Deadline. It is anchored so that uninteresting lines are
+    # rejected after a few characters, and it is written in the subset of regex syntax that .NET and
+    # Python share. The trailing ".*" makes the whole line available as regex match 0.
+    Filter = r"^(?:" + CommonFilter + r").*"
+
+    SavedPattern = re.compile( r"^Saved:\s*(?P<path>.*)$" )
+    RenderTimePattern = re.compile( r"^\s*Time: (?P<elapsed>[0-9:.]+)" )
+    FailedLinePattern = re.compile( r"^" + FailedPattern )
+
+    def Parse( self, line ):
+        # type: (str) -> StdoutEvent
+        ''' Return the event for a line of Blender output, or None for lines that don't matter '''
+        if line.startswith( "Fra:" ):
+            return self.ParseFrameLine( line )
+
+        match = self.SavedPattern.match( line )
+        if match is not None:
+            return StdoutEvent( "saved", line, path=match.group( "path" ).strip().strip( "'\"" ) )
+
+        # " Time: 00:45.56 (Saving: 00:00.16)" follows every "Saved:" line
+        match = self.RenderTimePattern.match( line )
+        if match is not None:
+            return StdoutEvent( "rendertime", line, elapsed=ParseTime( match.group( "elapsed" ) ) )
+
+        if self.FailedLinePattern.match( line ) is not None:
+            return StdoutEvent( "failed", line )
+
+        return None
+
+    def ParseFrameLine( self, line ):
+        return None
+
+class LegacyProgressParser( ProgressParser ):
+    ''' Blender 2.7x and older: "Path Tracing Tile N/M", "Path Tracing Sample N/M" and "Scene, Part N-M" '''
+
+    Name = "legacy"
+    Filter = r"^(?:Fra:.*(?:Tile|Sample|Part) [0-9]|" + CommonFilter + r").*"
+
+    # The greedy ".*" makes the last progress token of the line win, so "Tile 3/16, Sample 5/10" is sample progress
+    FramePattern = re.compile(
+        r"^Fra:(?P<frame>-?[0-9]+).*(?:"
+        r"Sample (?P<sample>[0-9]+)/(?P<samples>[0-9]+)"
+        r"|Tile (?P<tile>[0-9]+)/(?P<tiles>[0-9]+)"
+        r"|Part (?P<part>[0-9]+)-(?P<parts>[0-9]+)"
+        r")" )
+
+    def ParseFrameLine( self, line ):
+        match = self.FramePattern.match( line )
+        if match is None:
+            return None
+
+        frame = int( match.group( "frame" ) )
+        for chunkType in ( "sample", "tile" ):
+            if match.group( chunkType ) is not None:
+                current = int( match.group( chunkType ) )
+                total = int( match.group( chunkType + "s" ) )
+                return StdoutEvent( "progress", line, frame=frame, chunkType=chunkType, current=current, total=total, fraction=float( current ) / total if total > 0 else None )
+
+        # Parts of the Blender Internal renderer aren't reported in order and are repeated for motion
+        # blur and sub-surf sampling, so they don't tell how far the frame is.
+        return StdoutEvent( "progress", line, frame=frame )
+
+class Blender28ProgressParser( ProgressParser ):
+    ''' Blender 2.80 to 3.x: "Fra:N Mem:... (Peak ...) | Time:... | Remaining:... | ... | <status>" status lines
+    where the status is "Sample N/M" and "Rendered N/M Tiles" for Cycles, or "Rendering N / M samples" for EEVEE '''
+
+    Name = "2.80"
+    Filter = r"^(?:Fra:.*\| (?:.*Sample [0-9]|Rendered [0-9]|Rendering [0-9])|" + CommonFilter + r").*"
+
+    FramePattern = re.compile(
+        r"^Fra:(?P<frame>-?[0-9]+) Mem:(?P<memory>[0-9.]+)M \(Peak (?P<peak>[0-9.]+)M\)"
+        r" \| Time:(?P<elapsed>[0-9:.]+)(?: \| Remaining:(?P<remaining>[0-9:.]+))?.*\| (?P<status>[^|]*)$" )
+    SamplePattern = re.compile( r"Sample (?P<current>[0-9]+)/(?P<total>[0-9]+)" )
+    TilesPattern = re.compile( r"Rendered (?P<current>[0-9]+)/(?P<total>[0-9]+) Tiles" )
+    EeveePattern = re.compile( r"^Rendering (?P<current>[0-9]+) / (?P<total>[0-9]+) samples" )
+
+    def ParseFrameLine( self, line ):
+        match = self.FramePattern.match( line )
+        if match is None:
+            return None
+
+        event = StdoutEvent( "progress", line,
+            frame=int( match.group( "frame" ) ),
+            elapsed=ParseTime( match.group( "elapsed" ) ),
+            memory=float( match.group( "memory" ) ),
+            peak=float( match.group( "peak" ) ) )
+        if match.group( "remaining" ) is not None:
+            event.remaining = ParseTime( match.group( "remaining" ) )
+
+        status = match.group( "status" )
+        samples = self.SamplePattern.search( status ) or self.EeveePattern.match( status )
+        tiles = self.TilesPattern.search( status )
+        if samples is None and tiles is None:
+            return None
+
+        if samples is not None:
+            event.chunkType = "sample"
+            event.current = int( samples.group( "current" ) )
+            event.total = int( samples.group( "total" ) )
+        else:
+            event.chunkType = "tile"
+            event.current = int( tiles.group( "current" ) )
+            event.total = int( tiles.group( "total" ) )
+
+        event.fraction = self.GetFraction( event, tiles )
+        return event
+
+    def GetFraction( self, event, tiles ):
+        ''' Blender's own estimate is used when it printed one, otherwise the sample and tile counts '''
+        if event.remaining is not None and event.elapsed + event.remaining > 0:
+            return event.elapsed / ( event.elapsed + event.remaining )
+
+        if event.total <= 0:
+            return None
+
+        fraction = float( event.current ) / event.total
+        if tiles is not None and event.chunkType == "sample":
+            # Samples restart for every tile, "Rendered N/M Tiles" counts the tiles that are done
+            tileCount = int( tiles.group( "total" ) )
+            if tileCount > 0:
+                fraction = ( int( tiles.group( "current" ) ) + fraction ) / tileCount
+
+        return min( fraction, 1.0 )
+
+class Blender4ProgressParser( Blender28ProgressParser ):
+    ''' Blender 4.x prints the same status lines as 3.x, EEVEE Next included '''
+
+    Name = "4.0"
+
+# (first Blender version, parser class), sorted by version
+ProgressParsers = []
+
+def RegisterProgressParser( firstVersion, parserClass ):
+    # type: (tuple, type) -> None
+    ProgressParsers.append( ( tuple( firstVersion ), parserClass ) )
+    ProgressParsers.sort( key=lambda entry: entry[0] )
+
+def GetProgressParser( version ):
+    # type: (str) -> ProgressParser
+    ''' Return the parser for a Blender version like "3.6", the newest parser when the version is unknown '''
+    match = re.search( r"([0-9]+)\.([0-9]+)", version or "" )
+    if match is None:
+        return ProgressParsers[-1][1]()
+
+    parsed = ( int( match.group( 1 ) ), int( match.group( 2 ) ) )
+    parserClass = ProgressParsers[0][1]
+    for firstVersion, registeredClass in ProgressParsers:
+        if firstVersion <= parsed:
+            parserClass = registeredClass
+
+    return parserClass()
+
+RegisterProgressParser( ( 0, 0 ), LegacyProgressParser )
+RegisterProgressParser( ( 2, 80 ), Blender28ProgressParser )
+RegisterProgressParser( ( 4, 0 ), Blender4ProgressParser )
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+# Driver script for the region rendering mode of the Deadline Blender plugin, it renders one region
+# of a frame. It is started inside Blender with
+#
+#   blender -b scene.blend --python-exit-code 1 --python BlenderRegionDriver.py -- [path map] region.json
+#
+# where region.json, written by Blender.py for the task, is the last argument:
+#
+#   {"frame": 1, "columns": 4, "rows": 4, "index": 5, "directory": "/renders/poster_regions/1"}
+#
+# The region is rendered with a cropped render border as an uncompressed 16 bit RGBA TIFF, next to
+# a JSON sidecar recording where it goes in the frame. BlenderRegions.py stitches them. The script
+# raises when the region wasn't written, so that Blender exits with an error.
+
+import json
+import os
+import sys
+
+import bpy
+
+sys.path.insert( 0, os.path.dirname( os.path.abspath( __file__ ) ) )
+from BlenderRegions import GetRegions, GetBlenderBorder, RegionFilePattern, WriteRegionRecord
+
+def main():
+    with open( sys.argv[-1], "r" ) as f:
+        spec = json.load( f )
+
+    scene = bpy.context.scene
+    render = scene.render
+
+    # The size Blender renders at, including the resolution percentage
+    width = render.resolution_x * render.resolution_percentage // 100
+    height = render.resolution_y * render.resolution_percentage // 100
+    region = GetRegions( width, height, spec["columns"], spec["rows"] )[spec["index"]]
+
+    render.use_border = True
+    render.use_crop_to_border = True
+    render.border_min_x, render.border_max_x, render.border_min_y, render.border_max_y = GetBlenderBorder( region, width, height )
+
+    settings = render.image_settings
+    settings.file_format = "TIFF"
+    settings.tiff_codec = "NONE"
+    settings.color_mode = "RGBA"
+    settings.color_depth = "16"
+
+    directory = spec["directory"]
+    if not os.path.isdir( directory ):
+        os.makedirs( directory, exist_ok=True )
+    path = os.path.join( directory, RegionFilePattern % region.index + ".tif" )
+
+    sys.stdout.write( "Rendering region %d of %d: %dx%d pixels at %d,%d of a %dx%d frame\n" % ( region.index + 1, spec["columns"] * spec["rows"], region.width, region.height, region.x, region.y, width, height ) )
+    sys.stdout.flush()
+    scene.frame_set( spec["frame"] )
+    bpy.ops.render.render()
+    # write_still would add the frame number to a file name without "#"
+    bpy.data.images["Render Result"].save_render( path, scene=scene )
+    if not os.path.isfile( path ):
+        raise RuntimeError( "Blender did not write region %d to \"%s\"" % ( region.index + 1, path ) )
+    sys.stdout.write( "Saved: '%s'\n" % path )
+    sys.stdout.flush()
+
+    WriteRegionRecord( directory, region, width, height )
+
+main()
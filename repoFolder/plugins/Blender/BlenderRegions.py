@@ -0,0 +1,454 @@
+#!/usr/bin/env python3
+# Region rendering of large stills: a frame is split into a grid of regions that are rendered by
+# separate tasks, then stitched back into the full frame. This module must not import any Deadline
+# modules so that it can be used outside of Deadline.
+#
+# BlenderRegionDriver.py renders each region as an uncompressed TIFF with a JSON sidecar holding
+# where the region goes. Uncompressed TIFFs can be read a few rows at a time, so stitching only
+# ever holds one strip of the full frame in memory. The stitched frame is written as PNG or TIFF.
+#
+# This file is also the stitch script. Blender's Python always has NumPy, so the stitch task runs
+#
+#   blender -b --factory-startup --python-exit-code 1 --python BlenderRegions.py -- stitch.json
+#
+# where stitch.json is {"directory": ..., "columns": 4, "rows": 4, "output": ..., "stripRows": 256}.
+
+from __future__ import absolute_import, division
+
+import json
+import os
+import struct
+import sys
+import time
+import zlib
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+RegionFilePattern = "region_%04d"
+RegionOutputExtensions = ( ".png", ".tif", ".tiff" )
+
+class RegionError( Exception ):
+    pass
+
+class Region( object ):
+    ''' A rectangle of the frame in pixels, from the top left corner like the rows of an image '''
+
+    def __init__( self, index, x, y, width, height ):
+        self.index = index
+        self.x = x
+        self.y = y
+        self.width = width
+        self.height = height
+
+    def ToDict( self ):
+        return { "index": self.index, "x": self.x, "y": self.y, "width": self.width, "height": self.height }
+
+    @staticmethod
+    def FromDict( record ):
+        return Region( record["index"], record["x"], record["y"], record["width"], record["height"] )
+
+    def __eq__( self, other ):
+        return isinstance( other, Region ) and self.ToDict() == other.ToDict()
+
+    def __ne__( self, other ):
+        return not self == other
+
+def GetRegions( width, height, columns, rows ):
+    # type: (int, int, int, int) -> list
+    ''' Split a frame into columns x rows regions, row by row from the top '''
+    regions = []
+    for row in range( rows ):
+        top = height * row // rows
+        bottom = height * ( row + 1 ) // rows
+        for column in range( columns ):
+            left = width * column // columns
+            right = width * ( column + 1 ) // columns
+            regions.append( Region( len( regions ), left, top, right - left, bottom - top ) )
+    return regions
+
+def GetBlenderBorder( region, width, height ):
+    # type: (Region, int, int) -> tuple
+    ''' (min x, max x, min y, max y) of Blender's render border for a region. Blender truncates the
+    border times the resolution to pixels and counts y from the bottom, so inner edges are moved
+    half a pixel in to land on the intended pixel whatever the float rounding. '''
+    def Edge( pixel, size ):
+        if pixel <= 0:
+            return 0.0
+        if pixel >= size:
+            return 1.0
+        return ( pixel + 0.5 ) / size
+
+    return ( Edge( region.x, width ), Edge( region.x + region.width, width ),
+             Edge( height - region.y - region.height, height ), Edge( height - region.y, height ) )
+
+def GetRegionDirectory( outputPattern, frame ):
+    # type: (str, int) -> str
+    ''' The folder the regions of a frame are rendered to, next to the stitched output '''
+    directory, name = os.path.split( outputPattern )
+    prefix = os.path.splitext( name )[0].replace( "#", "" ).rstrip( "._-" ) or "frame"
+    return os.path.join( directory, prefix + "_regions", str( frame ) )
+
+# TIFF field types this module reads and writes: BYTE, SHORT, LONG and LONG8 (BigTIFF)
+TiffTypes = { 1: "B", 3: "H", 4: "I", 16: "Q" }
+
+class TiffImage( object ):
+    ''' An uncompressed TIFF or BigTIFF, read a few rows at a time '''
+
+    def __init__( self, path ):
+        # type: (str) -> None
+        self.path = path
+        self.f = open( path, "rb" )
+        try:
+            self.ReadHeader()
+        except ( struct.error, KeyError, IndexError ) as e:
+            self.Close()
+            raise RegionError( "\"%s\" is not a valid TIFF: %s" % ( path, e ) )
+        except:
+            self.Close()
+            raise
+
+    def ReadHeader( self ):
+        header = self.f.read( 16 )
+        if header[:2] == b"II":
+            self.endian = "<"
+        elif header[:2] == b"MM":
+            self.endian = ">"
+        else:
+            raise RegionError( "\"%s\" is not a TIFF" % self.path )
+
+        version = struct.unpack_from( self.endian + "H", header, 2 )[0]
+        self.bigTiff = version == 43
+        if self.bigTiff:
+            ifdOffset = struct.unpack_from( self.endian + "Q", header, 8 )[0]
+        else:
+            ifdOffset = struct.unpack_from( self.endian + "I", header, 4 )[0]
+        tags = self.ReadIfd( ifdOffset )
+
+        self.width = tags[256][0]
+        self.height = tags[257][0]
+        self.samples = tags.get( 277, [ 1 ] )[0]
+        self.bitsPerSample = tags.get( 258, [ 1 ] )[0]
+        sampleFormat = tags.get( 339, [ 1 ] )[0]
+        if tags.get( 259, [ 1 ] )[0] != 1:
+            raise RegionError( "\"%s\" is compressed, regions must be uncompressed TIFFs" % self.path )
+        if tags.get( 284, [ 1 ] )[0] != 1:
+            raise RegionError( "\"%s\" stores its channels in separate planes" % self.path )
+        if ( self.bitsPerSample, sampleFormat ) not in ( ( 8, 1 ), ( 16, 1 ), ( 32, 3 ) ):
+            raise RegionError( "\"%s\" has %d bit samples of format %d, which aren't supported" % ( self.path, self.bitsPerSample, sampleFormat ) )
+
+        # Bottom up images (orientation 4) are flipped while reading
+        self.orientation = tags.get( 274, [ 1 ] )[0]
+        if self.orientation not in ( 1, 4 ):
+            raise RegionError( "\"%s\" has orientation %d, which isn't supported" % ( self.path, self.orientation ) )
+
+        self.rowsPerStrip = min( tags.get( 278, [ self.height ] )[0], self.height )
+        self.stripOffsets = tags[273]
+        self.rowBytes = self.width * self.samples * self.bitsPerSample // 8
+        self.typeCode = { 8: "u1", 16: "u2", 32: "f4" }[self.bitsPerSample]
+
+    def ReadIfd( self, offset ):
+        ''' The values of the first directory's tags, by tag '''
+        self.f.seek( offset )
+        if self.bigTiff:
+            count = struct.unpack( self.endian + "Q", self.f.read( 8 ) )[0]
+            entry = struct.Struct( self.endian + "HHQ8s" )
+        else:
+            count = struct.unpack( self.endian + "H", self.f.read( 2 ) )[0]
+            entry = struct.Struct( self.endian + "HHI4s" )
+        entries = [ entry.unpack( self.f.read( entry.size ) ) for _ in range( count ) ]
+
+        tags = {}
+        for tag, fieldType, valueCount, inline in entries:
+            if fieldType not in TiffTypes:
+                continue
+            size = struct.calcsize( TiffTypes[fieldType] ) * valueCount
+            if size <= len( inline ):
+                data = inline[:size]
+            else:
+                self.f.seek( struct.unpack( self.endian + ( "Q" if self.bigTiff else "I" ), inline )[0] )
+                data = self.f.read( size )
+            tags[tag] = list( struct.unpack( self.endian + "%d%s" % ( valueCount, TiffTypes[fieldType] ), data ) )
+        return tags
+
+    def ReadRows( self, start, stop ):
+        ''' Rows [start, stop) counted from the top, as an array of shape (rows, width, samples) '''
+        if self.orientation == 4:
+            return self.ReadFileRows( self.height - stop, self.height - start )[::-1]
+        return self.ReadFileRows( start, stop )
+
+    def ReadFileRows( self, start, stop ):
+        chunks = []
+        row = start
+        while row < stop:
+            strip = row // self.rowsPerStrip
+            stripStop = min( stop, ( strip + 1 ) * self.rowsPerStrip )
+            self.f.seek( self.stripOffsets[strip] + ( row - strip * self.rowsPerStrip ) * self.rowBytes )
+            chunks.append( self.f.read( ( stripStop - row ) * self.rowBytes ) )
+            row = stripStop
+
+        data = b"".join( chunks )
+        if len( data ) != ( stop - start ) * self.rowBytes:
+            raise RegionError( "\"%s\" is truncated" % self.path )
+        rows = numpy.frombuffer( data, numpy.dtype( self.endian + self.typeCode ) )
+        return rows.astype( numpy.dtype( "=" + self.typeCode ) ).reshape( stop - start, self.width, self.samples )
+
+    def Close( self ):
+        self.f.close()
+
+class ImageWriter( object ):
+    ''' Writes an image row strip by row strip to a temporary file, renamed when it is complete '''
+
+    def __init__( self, path, width, height, samples, bitsPerSample ):
+        self.path = path
+        self.tempPath = "%s.%d.tmp" % ( path, os.getpid() )
+        self.width = width
+        self.height = height
+        self.samples = samples
+        self.bitsPerSample = bitsPerSample
+        self.rowsWritten = 0
+        self.bytesWritten = 0
+        self.f = open( self.tempPath, "wb" )
+
+    def Write( self, data ):
+        self.f.write( data )
+        self.bytesWritten += len( data )
+
+    def WriteRows( self, rows ):
+        self.rowsWritten += rows.shape[0]
+        if self.rowsWritten > self.height:
+            raise RegionError( "More rows written than the image has" )
+        self.WriteStrip( rows )
+
+    def Close( self ):
+        if self.rowsWritten != self.height:
+            raise RegionError( "Only %d of the %d rows were written" % ( self.rowsWritten, self.height ) )
+        self.Finish()
+        self.f.close()
+        os.replace( self.tempPath, self.path )
+
+    def Abort( self ):
+        self.f.close()
+        if os.path.isfile( self.tempPath ):
+            os.remove( self.tempPath )
+
+class TiffWriter( ImageWriter ):
+    ''' Uncompressed TIFF. The layout is known up front, so the tags are written first and the rows
+    follow in order. Images over 4 GB are written as BigTIFF. '''
+
+    def __init__( self, path, width, height, samples, bitsPerSample, rowsPerStrip=64 ):
+        ImageWriter.__init__( self, path, width, height, samples, bitsPerSample )
+        rowBytes = width * samples * bitsPerSample // 8
+        stripCount = ( height + rowsPerStrip - 1 ) // rowsPerStrip
+        bigTiff = rowBytes * height > 0xFFFFFFFF - 65536
+        offsetType = 16 if bigTiff else 4
+
+        def Entries( dataOffset ):
+            entries = [
+                ( 256, 4, [ width ] ),
+                ( 257, 4, [ height ] ),
+                ( 258, 3, [ bitsPerSample ] * samples ),
+                ( 259, 3, [ 1 ] ),
+                ( 262, 3, [ 2 if samples >= 3 else 1 ] ),
+                ( 273, offsetType, [ dataOffset + strip * rowsPerStrip * rowBytes for strip in range( stripCount ) ] ),
+                ( 277, 3, [ samples ] ),
+                ( 278, 4, [ rowsPerStrip ] ),
+                ( 279, offsetType, [ ( min( height, ( strip + 1 ) * rowsPerStrip ) - strip * rowsPerStrip ) * rowBytes for strip in range( stripCount ) ] ),
+                ( 284, 3, [ 1 ] ),
+                ( 339, 3, [ 3 if bitsPerSample == 32 else 1 ] * samples ) ]
+            if samples in ( 2, 4 ):
+                # Unassociated alpha, like Blender writes
+                entries.append( ( 338, 3, [ 2 ] ) )
+            return sorted( entries )
+
+        headerSize = 16 if bigTiff else 8
+        directory = self.EncodeIfd( Entries( 0 ), headerSize, bigTiff )
+        dataOffset = ( headerSize + len( directory ) + 15 ) & ~15
+        directory = self.EncodeIfd( Entries( dataOffset ), headerSize, bigTiff )
+
+        if bigTiff:
+            header = struct.pack( "<2sHHHQ", b"II", 43, 8, 0, headerSize )
+        else:
+            header = struct.pack( "<2sHI", b"II", 42, headerSize )
+        self.Write( header + directory + b"\x00" * ( dataOffset - headerSize - len( directory ) ) )
+        self.typeCode = "<" + { 8: "u1", 16: "u2", 32: "f4" }[bitsPerSample]
+
+    @staticmethod
+    def EncodeIfd( entries, offset, bigTiff ):
+        ''' The directory at offset followed by the values that don't fit in their entries '''
+        inlineSize = 8 if bigTiff else 4
+        entrySize = 20 if bigTiff else 12
+        directorySize = ( 8 if bigTiff else 2 ) + len( entries ) * entrySize + ( 8 if bigTiff else 4 )
+
+        directory = struct.pack( "<Q" if bigTiff else "<H", len( entries ) )
+        values = b""
+        for tag, fieldType, fieldValues in entries:
+            data = struct.pack( "<%d%s" % ( len( fieldValues ), TiffTypes[fieldType] ), *fieldValues )
+            if len( data ) <= inlineSize:
+                inline = data.ljust( inlineSize, b"\x00" )
+            else:
+                inline = struct.pack( "<Q" if bigTiff else "<I", offset + directorySize + len( values ) )
+                values += data + b"\x00" * ( len( data ) % 2 )
+            directory += struct.pack( "<HHQ" if bigTiff else "<HHI", tag, fieldType, len( fieldValues ) ) + inline
+        directory += b"\x00" * ( 8 if bigTiff else 4 )
+        return directory + values
+
+    def WriteStrip( self, rows ):
+        self.Write( rows.astype( numpy.dtype( self.typeCode ), copy=False ).tobytes() )
+
+    def Finish( self ):
+        pass
+
+class PngWriter( ImageWriter ):
+    ''' PNG without row filters, compressed as the rows arrive '''
+
+    ColorTypes = { 1: 0, 2: 4, 3: 2, 4: 6 }
+
+    def __init__( self, path, width, height, samples, bitsPerSample, level=6 ):
+        if bitsPerSample not in ( 8, 16 ):
+            raise RegionError( "PNG can't hold %d bit samples, write the stitched image as a TIFF" % bitsPerSample )
+        ImageWriter.__init__( self, path, width, height, samples, bitsPerSample )
+        self.compressor = zlib.compressobj( level )
+        self.typeCode = ">u1" if bitsPerSample == 8 else ">u2"
+        self.Write( b"\x89PNG\r\n\x1a\n" )
+        self.WriteChunk( b"IHDR", struct.pack( ">IIBBBBB", width, height, bitsPerSample, self.ColorTypes[samples], 0, 0, 0 ) )
+
+    def WriteChunk( self, chunkType, data ):
+        self.Write( struct.pack( ">I", len( data ) ) + chunkType + data + struct.pack( ">I", zlib.crc32( chunkType + data ) & 0xFFFFFFFF ) )
+
+    def WriteStrip( self, rows ):
+        data = rows.astype( numpy.dtype( self.typeCode ), copy=False ).reshape( rows.shape[0], -1 ).view( numpy.uint8 )
+        # Every row starts with its filter type, 0 for none
+        filtered = numpy.concatenate( ( numpy.zeros( ( rows.shape[0], 1 ), numpy.uint8 ), data ), axis=1 )
+        compressed = self.compressor.compress( filtered.tobytes() )
+        if len( compressed ) > 0:
+            self.WriteChunk( b"IDAT", compressed )
+
+    def Finish( self ):
+        self.WriteChunk( b"IDAT", self.compressor.flush() )
+        self.WriteChunk( b"IEND", b"" )
+
+def OpenImageWriter( path, width, height, samples, bitsPerSample ):
+    extension = os.path.splitext( path )[1].lower()
+    if extension == ".png":
+        return PngWriter( path, width, height, samples, bitsPerSample )
+    if extension in RegionOutputExtensions[1:]:
+        return TiffWriter( path, width, height, samples, bitsPerSample )
+    raise RegionError( "Stitched images can be written as PNG or TIFF, not \"%s\"" % extension )
+
+def WriteRegionRecord( regionDirectory, region, fullWidth, fullHeight ):
+    # type: (str, Region, int, int) -> None
+    ''' Write the sidecar that tells the stitch where a rendered region goes '''
+    record = region.ToDict()
+    record.update( { "fullWidth": fullWidth, "fullHeight": fullHeight, "image": RegionFilePattern % region.index + ".tif" } )
+    with open( os.path.join( regionDirectory, RegionFilePattern % region.index + ".json" ), "w" ) as f:
+        json.dump( record, f )
+
+def LoadRegionRecords( regionDirectory, columns, rows ):
+    # type: (str, int, int) -> tuple
+    ''' (full width, full height, [(region, image path)]) of a rendered grid, checking that every
+    region was rendered and that together they tile the frame exactly '''
+    records = []
+    for index in range( columns * rows ):
+        recordFile = os.path.join( regionDirectory, RegionFilePattern % index + ".json" )
+        try:
+            with open( recordFile, "r" ) as f:
+                records.append( json.load( f ) )
+        except ( IOError, OSError, ValueError ) as e:
+            raise RegionError( "Region %d has not been rendered, \"%s\" can't be read: %s" % ( index, recordFile, e ) )
+
+    fullWidth = records[0]["fullWidth"]
+    fullHeight = records[0]["fullHeight"]
+    expected = GetRegions( fullWidth, fullHeight, columns, rows )
+    regions = []
+    for record, region in zip( records, expected ):
+        if ( record["fullWidth"], record["fullHeight"] ) != ( fullWidth, fullHeight ) or Region.FromDict( record ) != region:
+            raise RegionError( "Region %d was rendered as %s of a %dx%d frame, expected %s of a %dx%d frame" % ( region.index, Region.FromDict( record ).ToDict(), record["fullWidth"], record["fullHeight"], region.ToDict(), fullWidth, fullHeight ) )
+        regions.append( ( region, os.path.join( regionDirectory, record["image"] ) ) )
+    return ( fullWidth, fullHeight, regions )
+
+class StitchReport( object ):
+    def __init__( self ):
+        self.width = 0
+        self.height = 0
+        self.regions = 0
+        self.bytesRead = 0
+        self.bytesWritten = 0
+        self.stripBytes = 0         # size of the largest strip held in memory
+        self.seconds = 0.0
+
+def StitchRegions( regionDirectory, columns, rows, outputFile, stripRows=256, progress=None ):
+    # type: (str, int, int, str, int, callable) -> StitchReport
+    ''' Stitch the rendered regions into outputFile one strip of rows at a time, so memory use depends
+    on the frame width and stripRows, not on the frame size. progress(rows done, rows) is called
+    after every strip. '''
+    if numpy is None:
+        raise RegionError( "Stitching regions needs NumPy" )
+
+    started = time.time()
+    report = StitchReport()
+    report.width, report.height, regions = LoadRegionRecords( regionDirectory, columns, rows )
+    report.regions = len( regions )
+
+    images = []
+    try:
+        for region, imagePath in regions:
+            image = TiffImage( imagePath )
+            images.append( ( region, image ) )
+            if ( image.width, image.height ) != ( region.width, region.height ):
+                raise RegionError( "\"%s\" is %dx%d, region %d is %dx%d" % ( imagePath, image.width, image.height, region.index, region.width, region.height ) )
+            if ( image.samples, image.bitsPerSample ) != ( images[0][1].samples, images[0][1].bitsPerSample ):
+                raise RegionError( "\"%s\" has %d %d bit channels, other regions have %d %d bit channels" % ( imagePath, image.samples, image.bitsPerSample, images[0][1].samples, images[0][1].bitsPerSample ) )
+
+        first = images[0][1]
+        writer = OpenImageWriter( outputFile, report.width, report.height, first.samples, first.bitsPerSample )
+        try:
+            for top in range( 0, report.height, stripRows ):
+                bottom = min( report.height, top + stripRows )
+                strip = numpy.zeros( ( bottom - top, report.width, first.samples ), numpy.dtype( "=" + first.typeCode ) )
+                for region, image in images:
+                    start = max( top, region.y )
+                    stop = min( bottom, region.y + region.height )
+                    if start < stop:
+                        strip[start - top:stop - top, region.x:region.x + region.width] = image.ReadRows( start - region.y, stop - region.y )
+                        report.bytesRead += ( stop - start ) * image.rowBytes
+                writer.WriteRows( strip )
+                report.stripBytes = max( report.stripBytes, strip.nbytes )
+                if progress is not None:
+                    progress( bottom, report.height )
+            writer.Close()
+        except:
+            writer.Abort()
+            raise
+        report.bytesWritten = writer.bytesWritten
+    finally:
+        for region, image in images:
+            image.Close()
+
+    report.seconds = time.time() - started
+    return report
+
+def main():
+    arguments = sys.argv[sys.argv.index( "--" ) + 1:] if "--" in sys.argv else sys.argv[1:]
+    with open( arguments[-1], "r" ) as f:
+        spec = json.load( f )
+
+    def Progress( done, total ):
+        sys.stdout.write( "Stitched rows %d of %d\n" % ( done, total ) )
+        sys.stdout.flush()
+
+    try:
+        report = StitchRegions( spec["directory"], spec["columns"], spec["rows"], spec["output"], spec.get( "stripRows", 256 ), Progress )
+    except ( IOError, OSError, RegionError ) as e:
+        sys.stdout.write( "Error: Unable to stitch the regions: %s\n" % e )
+        sys.stdout.flush()
+        sys.exit( 1 )
+
+    sys.stdout.write( "Stitched %d regions into a %dx%d image in %.2fs, %.1f MB read, %.1f MB written, %.1f MB strips\n" % ( report.regions, report.width, report.height, report.seconds, report.bytesRead / 1048576.0, report.bytesWritten / 1048576.0, report.stripBytes / 1048576.0 ) )
+    sys.stdout.write( "Saved: '%s'\n" % spec["output"] )
+    sys.stdout.flush()
+
+if __name__ == "__main__":
+    main()
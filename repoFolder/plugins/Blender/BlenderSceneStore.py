@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+# Content addressed store of the scene files submitted with Blender jobs, in a shared folder the
+# submitters and the Workers can both reach. This module must not import any Deadline modules so
+# that it can be used outside of Deadline.
+#
+# A scene is split into chunks that are stored zlib compressed in chunks/<hash[:2]>/<hash>, named by
+# the SHA-256 of their content, and scenes/<hash[:2]>/<hash>.json lists the chunks of the scene with
+# that SHA-256. A scene that is already in the store isn't uploaded again, and chunks that another
+# scene already stored aren't either. The manifest is written last, so a scene is only in the store
+# once all of its chunks are.
+
+from __future__ import absolute_import
+
+import hashlib
+import json
+import os
+import time
+import uuid
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+StoreFormat = 1
+
+ChunkSize = 16 * 1024 * 1024
+
+# The first byte of a chunk file tells how it is encoded. Chunks that don't get smaller, like those
+# of .blend files Blender already compressed, are stored as they are.
+CompressedChunk = b"Z"
+RawChunk = b"R"
+
+# Compressing the start of a chunk tells cheaply whether the whole chunk is worth compressing
+SampleSize = 256 * 1024
+
+class StoreResult( object ):
+    ''' What putting a scene into the store did '''
+
+    def __init__( self, sceneHash, size ):
+        self.sceneHash = sceneHash
+        self.size = size
+        self.stored = False         # the scene was already in the store
+        self.chunks = 0
+        self.chunksWritten = 0
+        self.bytesRead = 0
+        self.bytesWritten = 0
+        self.hashSeconds = 0.0
+        self.uploadSeconds = 0.0
+
+    def Format( self ):
+        if self.stored:
+            return "Scene %s... (%.1f MB) is already in the scene store, nothing uploaded, hashed in %.2fs" % ( self.sceneHash[:12], self.size / 1048576.0, self.hashSeconds )
+        return "Scene %s... (%.1f MB) uploaded to the scene store: %d of %d chunks, %.1f MB compressed, hashed in %.2fs and uploaded in %.2fs" % (
+            self.sceneHash[:12], self.size / 1048576.0, self.chunksWritten, self.chunks, self.bytesWritten / 1048576.0, self.hashSeconds, self.uploadSeconds )
+
+class FetchResult( object ):
+    ''' What fetching a scene from the store did '''
+
+    def __init__( self, sceneHash, size, bytesRead, seconds ):
+        self.sceneHash = sceneHash
+        self.size = size
+        self.bytesRead = bytesRead  # compressed bytes read from the store
+        self.seconds = seconds
+
+class SceneStore( object ):
+    def __init__( self, storeDirectory, chunkSize=ChunkSize, compressionLevel=1, threads=4 ):
+        # type: (str, int, int, int) -> None
+        self.storeDirectory = storeDirectory
+        self.chunkSize = chunkSize
+        self.compressionLevel = compressionLevel
+        self.threads = max( 1, threads )
+
+    def GetManifestPath( self, sceneHash ):
+        # type: (str) -> str
+        return os.path.join( self.storeDirectory, "scenes", sceneHash[:2], sceneHash + ".json" )
+
+    def GetChunkPath( self, chunkHash ):
+        # type: (str) -> str
+        return os.path.join( self.storeDirectory, "chunks", chunkHash[:2], chunkHash )
+
+    def Contains( self, sceneHash ):
+        # type: (str) -> bool
+        return os.path.isfile( self.GetManifestPath( sceneHash ) )
+
+    def LoadManifest( self, sceneHash ):
+        # type: (str) -> dict
+        with open( self.GetManifestPath( sceneHash ), "r" ) as f:
+            manifest = json.load( f )
+        if manifest.get( "format" ) != StoreFormat or manifest.get( "hash" ) != sceneHash:
+            raise IOError( "The scene store manifest of %s is not valid" % sceneHash )
+        return manifest
+
+    def HashFile( self, path ):
+        # type: (str) -> tuple
+        ''' The SHA-256 of the file, its size and the SHA-256 of each of its chunks '''
+        sceneHash = hashlib.sha256()
+        chunkHashes = []
+        size = 0
+        with open( path, "rb" ) as f:
+            while True:
+                data = f.read( self.chunkSize )
+                if len( data ) == 0:
+                    break
+                sceneHash.update( data )
+                chunkHashes.append( hashlib.sha256( data ).hexdigest() )
+                size += len( data )
+        return ( sceneHash.hexdigest(), size, chunkHashes )
+
+    def Put( self, path ):
+        # type: (str) -> StoreResult
+        ''' Put a file into the store unless it is already there. Raises IOError/OSError when the file
+        can't be read or the store can't be written. '''
+        started = time.time()
+        sceneHash, size, chunkHashes = self.HashFile( path )
+        result = StoreResult( sceneHash, size )
+        result.chunks = len( chunkHashes )
+        result.bytesRead = size
+        result.hashSeconds = time.time() - started
+        if self.Contains( sceneHash ):
+            result.stored = True
+            return result
+
+        started = time.time()
+        missing = [ index for index, chunkHash in enumerate( chunkHashes ) if not os.path.isfile( self.GetChunkPath( chunkHash ) ) ]
+        with open( path, "rb" ) as f:
+            def ReadChunk( index ):
+                f.seek( index * self.chunkSize )
+                return ( chunkHashes[index], f.read( self.chunkSize ) )
+
+            for written in self.MapBounded( self.WriteChunk, ( ReadChunk( index ) for index in missing ) ):
+                result.chunksWritten += 1
+                result.bytesWritten += written
+
+        result.bytesRead += sum( min( self.chunkSize, size - index * self.chunkSize ) for index in missing )
+        self.WriteAtomic( self.GetManifestPath( sceneHash ), json.dumps( {
+            "format": StoreFormat,
+            "hash": sceneHash,
+            "size": size,
+            "name": os.path.basename( path ),
+            "chunks": chunkHashes }, indent=1 ).encode( "utf-8" ) )
+        result.uploadSeconds = time.time() - started
+        return result
+
+    def WriteChunk( self, chunk ):
+        chunkHash, data = chunk
+        encoded = RawChunk + data
+        sample = data[:SampleSize]
+        if len( zlib.compress( sample, self.compressionLevel ) ) < len( sample ) * 0.9:
+            compressed = zlib.compress( data, self.compressionLevel )
+            if len( compressed ) < len( data ):
+                encoded = CompressedChunk + compressed
+        self.WriteAtomic( self.GetChunkPath( chunkHash ), encoded )
+        return len( encoded )
+
+    def Fetch( self, sceneHash, localPath ):
+        # type: (str, str) -> FetchResult
+        ''' Rebuild the scene with the given hash at localPath. Raises IOError/OSError when it isn't in
+        the store, can't be read, or doesn't match its hash. '''
+        started = time.time()
+        manifest = self.LoadManifest( sceneHash )
+        sceneDigest = hashlib.sha256()
+        bytesRead = 0
+        tempFile = "%s.%d.tmp" % ( localPath, os.getpid() )
+        try:
+            with open( tempFile, "wb" ) as f:
+                for encodedSize, data in self.MapBounded( self.ReadChunk, manifest["chunks"] ):
+                    sceneDigest.update( data )
+                    f.write( data )
+                    bytesRead += encodedSize
+            if sceneDigest.hexdigest() != sceneHash or os.path.getsize( tempFile ) != manifest["size"]:
+                raise IOError( "The scene %s rebuilt from the scene store does not match its hash" % sceneHash )
+            os.replace( tempFile, localPath )
+        except:
+            if os.path.isfile( tempFile ):
+                os.remove( tempFile )
+            raise
+
+        return FetchResult( sceneHash, manifest["size"], bytesRead, time.time() - started )
+
+    def ReadChunk( self, chunkHash ):
+        with open( self.GetChunkPath( chunkHash ), "rb" ) as f:
+            encoded = f.read()
+        if encoded[:1] == CompressedChunk:
+            try:
+                data = zlib.decompress( encoded[1:] )
+            except zlib.error as e:
+                raise IOError( "The chunk %s of the scene store can't be decompressed: %s" % ( chunkHash, e ) )
+        elif encoded[:1] == RawChunk:
+            data = encoded[1:]
+        else:
+            raise IOError( "The chunk %s of the scene store is not valid" % chunkHash )
+        if hashlib.sha256( data ).hexdigest() != chunkHash:
+            raise IOError( "The chunk %s of the scene store does not match its hash" % chunkHash )
+        return ( len( encoded ), data )
+
+    def MapBounded( self, function, items ):
+        ''' Yield function(item) in order, with up to self.threads calls running at once, so that at
+        most that many chunks are in memory. zlib and hashlib release the GIL on large buffers. '''
+        with ThreadPoolExecutor( max_workers=self.threads ) as executor:
+            pending = []
+            for item in items:
+                pending.append( executor.submit( function, item ) )
+                if len( pending ) >= self.threads:
+                    yield pending.pop( 0 ).result()
+            while len( pending ) > 0:
+                yield pending.pop( 0 ).result()
+
+    def WriteAtomic( self, path, data ):
+        directory = os.path.dirname( path )
+        if not os.path.isdir( directory ):
+            try:
+                os.makedirs( directory )
+            except OSError:
+                if not os.path.isdir( directory ):
+                    raise
+
+        # Submitters on other machines may be writing the same chunk
+        tempFile = "%s.%s.tmp" % ( path, uuid.uuid4().hex )
+        try:
+            with open( tempFile, "wb" ) as f:
+                f.write( data )
+            os.replace( tempFile, path )
+        except:
+            if os.path.isfile( tempFile ):
+                os.remove( tempFile )
+            raise
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+# Driver script for the persistent Blender session mode of the Deadline Blender plugin.
+#
+# It is started inside Blender with "blender -b scene.blend --python BlenderSessionDriver.py",
+# so the scene is only loaded once. Each line read from stdin is a JSON render request sent by
+# Blender.py, for example:
+#
+#   {"frames": [1, 2, 3], "output": "/renders/shot_####.png", "threads": 0}
+#
+# Requests with "views" render every camera and view layer of them per frame instead, like
+# BlenderViewDriver.py.
+#
+# Blender prints its usual "Fra:"/"Saved:" lines while rendering, which the plugin's stdout
+# handlers pick up. After each request one of the following lines is printed:
+#
+#   DEADLINE_SESSION: DONE <peak memory in bytes>
+#   DEADLINE_SESSION: ERROR <message>
+#
+# The line "quit" (or the end of stdin) closes the session.
+
+import json
+import os
+import sys
+
+import bpy
+
+sys.path.insert( 0, os.path.dirname( os.path.abspath( __file__ ) ) )
+from BlenderViewDriver import RenderViews
+
+SESSION_PREFIX = "DEADLINE_SESSION: "
+
+def Report( message ):
+    sys.stdout.write( SESSION_PREFIX + message + "\n" )
+    sys.stdout.flush()
+
+def GetPeakMemory():
+    ''' Peak resident memory of this Blender process in bytes, or 0 if it can't be determined '''
+    try:
+        import resource
+        peak = resource.getrusage( resource.RUSAGE_SELF ).ru_maxrss
+        # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+        if sys.platform == "darwin":
+            return peak
+        return peak * 1024
+    except ImportError:
+        pass
+
+    try:
+        import ctypes
+        from ctypes import wintypes
+
+        class PROCESS_MEMORY_COUNTERS( ctypes.Structure ):
+            _fields_ = [ ( "cb", wintypes.DWORD ),
+                         ( "PageFaultCount", wintypes.DWORD ),
+                         ( "PeakWorkingSetSize", ctypes.c_size_t ),
+                         ( "WorkingSetSize", ctypes.c_size_t ),
+                         ( "QuotaPeakPagedPoolUsage", ctypes.c_size_t ),
+                         ( "QuotaPagedPoolUsage", ctypes.c_size_t ),
+                         ( "QuotaPeakNonPagedPoolUsage", ctypes.c_size_t ),
+                         ( "QuotaNonPagedPoolUsage", ctypes.c_size_t ),
+                         ( "PagefileUsage", ctypes.c_size_t ),
+                         ( "PeakPagefileUsage", ctypes.c_size_t ) ]
+
+        counters = PROCESS_MEMORY_COUNTERS()
+        counters.cb = ctypes.sizeof( counters )
+        process = ctypes.windll.kernel32.GetCurrentProcess()
+        if ctypes.windll.psapi.GetProcessMemoryInfo( process, ctypes.byref( counters ), counters.cb ):
+            return counters.PeakWorkingSetSize
+    except Exception:
+        pass
+
+    return 0
+
+def GetFrameRuns( frames ):
+    ''' Split a frame list into (start, end, step) runs that can each be rendered as one animation '''
+    runs = []
+    index = 0
+    while index < len( frames ):
+        start = frames[index]
+        step = 1
+        end = start
+        if index + 1 < len( frames ) and frames[index + 1] > start:
+            step = frames[index + 1] - start
+            while index + 1 < len( frames ) and frames[index + 1] == end + step:
+                index += 1
+                end = frames[index]
+        runs.append( ( start, end, step ) )
+        index += 1
+
+    return runs
+
+def Render( request ):
+    scene = bpy.context.scene
+    render = scene.render
+
+    output = request.get( "output", "" )
+    if output != "":
+        render.filepath = output
+        render.use_file_extension = True
+
+    threads = int( request.get( "threads", 0 ) )
+    if threads > 0:
+        render.threads_mode = "FIXED"
+        render.threads = threads
+    else:
+        render.threads_mode = "AUTO"
+
+    if len( request.get( "views", [] ) ) > 0:
+        RenderViews( request["frames"], request["views"] )
+        return
+
+    for start, end, step in GetFrameRuns( request["frames"] ):
+        scene.frame_start = start
+        scene.frame_end = end
+        scene.frame_step = step
+        bpy.ops.render.render( animation=True )
+
+def main():
+    originalRange = ( bpy.context.scene.frame_start, bpy.context.scene.frame_end, bpy.context.scene.frame_step )
+
+    Report( "READY" )
+    while True:
+        line = sys.stdin.readline()
+        if line == "":
+            break
+
+        line = line.strip()
+        if line == "":
+            continue
+        if line == "quit":
+            break
+
+        try:
+            Render( json.loads( line ) )
+        except Exception as e:
+            Report( "ERROR %s" % str( e ).replace( "\n", " " ) )
+        else:
+            Report( "DONE %d" % GetPeakMemory() )
+        finally:
+            bpy.context.scene.frame_start, bpy.context.scene.frame_end, bpy.context.scene.frame_step = originalRange
+
+main()
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+# Driver script for jobs of the Deadline Blender plugin that render several cameras or view layers
+# of a scene per frame, so the scene is only loaded once for all of them. It is started inside
+# Blender with
+#
+#   blender -b scene.blend --python BlenderViewDriver.py -- [path map] views.json
+#
+# where views.json, written by Blender.py for the task, is the last argument:
+#
+#   {"frames": [1, 2], "views": [{"camera": "CamA", "viewLayer": "", "output": "/renders/CamA/shot_####.png"}]}
+#
+# Every view of a frame is rendered before the next frame, and Blender prints a "Saved:" line for
+# each of them. BlenderSessionDriver.py renders the views of its requests with RenderViews.
+
+import json
+import sys
+
+import bpy
+
+def GetViewLayers( scene ):
+    ''' The view layers of the scene, the render layers before Blender 2.80 '''
+    if hasattr( scene, "view_layers" ):
+        return scene.view_layers
+    return scene.render.layers
+
+def CheckViews( scene, views ):
+    ''' Fail before rendering anything if a camera or view layer doesn't exist '''
+    layerNames = set( layer.name for layer in GetViewLayers( scene ) )
+    for view in views:
+        camera = bpy.data.objects.get( view["camera"] ) if view["camera"] != "" else scene.camera
+        if camera is None or camera.type != "CAMERA":
+            raise ValueError( "The scene has no camera named \"%s\"" % view["camera"] )
+        if view["viewLayer"] != "" and view["viewLayer"] not in layerNames:
+            raise ValueError( "The scene has no view layer named \"%s\"" % view["viewLayer"] )
+
+def RenderViews( frames, views ):
+    scene = bpy.context.scene
+    render = scene.render
+    CheckViews( scene, views )
+
+    layers = GetViewLayers( scene )
+    originalCamera = scene.camera
+    originalUse = dict( ( layer.name, layer.use ) for layer in layers )
+    originalFilepath = render.filepath
+    try:
+        render.use_file_extension = True
+        for frame in frames:
+            scene.frame_set( frame )
+            for view in views:
+                scene.camera = bpy.data.objects[view["camera"]] if view["camera"] != "" else originalCamera
+                for layer in layers:
+                    layer.use = originalUse[layer.name] if view["viewLayer"] == "" else layer.name == view["viewLayer"]
+                render.filepath = view["output"]
+
+                sys.stdout.write( "Rendering frame %d of camera %s, view layer %s\n" % ( frame, scene.camera.name, view["viewLayer"] or "(all)" ) )
+                sys.stdout.flush()
+                bpy.ops.render.render( write_still=True )
+    finally:
+        scene.camera = originalCamera
+        for layer in layers:
+            layer.use = originalUse[layer.name]
+        render.filepath = originalFilepath
+
+def main():
+    with open( sys.argv[-1], "r" ) as f:
+        spec = json.load( f )
+    RenderViews( spec["frames"], spec["views"] )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+# Camera and view layer helpers for jobs that render several views of a scene per frame, shared by
+# the Blender plugin and the submission scripts.
+# This module must not import any Deadline modules so that it can be used outside of Deadline.
+
+from __future__ import absolute_import
+
+import os
+import re
+
+def ParseNames( text ):
+    # type: (str) -> list
+    ''' The names of a comma separated list, without blanks or duplicates '''
+    names = []
+    for name in text.split( "," ):
+        name = name.strip()
+        if name != "" and name not in names:
+            names.append( name )
+    return names
+
+def GetViews( cameras, viewLayers ):
+    # type: (list, list) -> list
+    ''' The (camera, view layer) pairs rendered for every frame, camera by camera. An empty camera is
+    the scene's camera, an empty view layer renders the view layers the scene renders. No views
+    means the scene is rendered as it is. '''
+    if len( cameras ) == 0 and len( viewLayers ) == 0:
+        return []
+    return [ ( camera, viewLayer ) for camera in ( cameras or [ "" ] ) for viewLayer in ( viewLayers or [ "" ] ) ]
+
+def GetViewName( camera, viewLayer ):
+    # type: (str, str) -> str
+    ''' A name for the view that is safe to use as a folder name '''
+    name = "_".join( part for part in ( camera, viewLayer ) if part != "" )
+    return re.sub( r"[^\w.-]", "_", name )
+
+def GetViewOutput( outputPattern, camera, viewLayer ):
+    # type: (str, str, str) -> str
+    ''' Each view is written to a folder named after it next to the output file '''
+    directory, fileName = os.path.split( outputPattern )
+    return os.path.join( directory, GetViewName( camera, viewLayer ), fileName )
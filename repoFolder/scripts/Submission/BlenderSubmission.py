@@ -3,14 +3,15 @@ from __future__ import absolute_import
 # For Integration UI
 import imp
 import os
+import time
 import typing
 
 from System import *
-from System.IO import Path, StreamWriter, File, Directory
+from System.IO import Path, StreamWriter
 from System.Collections.Specialized import StringCollection
 from System.Text import Encoding
 
-from Deadline.Scripting import RepositoryUtils, FrameUtils, ClientUtils, PathUtils
+from Deadline.Scripting import RepositoryUtils, ClientUtils, PathUtils
 
 from DeadlineUI.Controls.Scripting.DeadlineScriptDialog import DeadlineScriptDialog
 
@@ -18,6 +19,10 @@ if typing.TYPE_CHECKING:
     from ThinkboxUI.Controls.Scripting.ButtonControl import ButtonControl
 imp.load_source( 'IntegrationUI', RepositoryUtils.GetRepositoryFilePath( "submission/Integration/Main/IntegrationUI.py", True ) )
 import IntegrationUI
+# The submission core imports its sibling modules by name
+for moduleName in ( "BlenderChunking", "BlenderExecutables", "BlenderFrames", "BlenderRegions", "BlenderSceneStore", "BlenderViews", "BlenderJobs" ):
+    imp.load_source( moduleName, RepositoryUtils.GetRepositoryFilePath( "plugins/Blender/%s.py" % moduleName, True ) )
+from BlenderJobs import BlenderJob, GetAuxiliaryFiles, GetJobInfo, GetOutputPattern, GetPluginInfo, Submit, SubmittedJobPrefix, ValidateJob
 
 ########################################################################
 ## Globals
@@ -115,16 +120,40 @@ def __main__( *args ):
 
     scriptDialog.AddControlToGrid( "ChunkSizeLabel", "LabelControl", "Frames Per Task", 4, 0, "This is the number of frames that will be rendered at a time for each job task. ", False )
     scriptDialog.AddRangeControlToGrid( "ChunkSizeBox", "RangeControl", 1, 1, 1000000, 0, 1, 4, 1 , expand=False)
-    scriptDialog.AddSelectionControlToGrid("SubmitSceneBox","CheckBoxControl",False,"Submit Blender Scene File With The Job", 4, 2, "If this option is enabled, the scene file will be submitted with the job, and then copied locally to the Worker machine during rendering.")
+    scriptDialog.AddSelectionControlToGrid("SubmitSceneBox","CheckBoxControl",False,"Submit Blender Scene File With The Job", 4, 2, "If this option is enabled, the scene file will be submitted with the job, and then copied locally to the Worker machine during rendering. When the Blender plugin has a Scene Store Directory, the scene is put there instead, compressed, and only if it isn't already stored.")
 
     scriptDialog.AddControlToGrid( "ThreadsLabel", "LabelControl", "Threads", 5, 0, "The number of threads to use for rendering.", False )
     scriptDialog.AddRangeControlToGrid( "ThreadsBox", "RangeControl", 0, 0, 256, 0, 1, 5, 1, expand=False )
+    scriptDialog.AddSelectionControlToGrid( "SessionModeBox", "CheckBoxControl", False, "Keep Scene Loaded Between Tasks", 5, 2, "If this option is enabled, each Worker keeps one Blender session open for the whole job instead of starting Blender and loading the scene for every task." )
 
     scriptDialog.AddControlToGrid( "BuildLabel", "LabelControl", "Build To Force", 6, 0, "You can force 32 or 64 bit rendering with this option.", False )
     scriptDialog.AddComboControlToGrid( "BuildBox", "ComboControl", "None", ("None","32bit","64bit"), 6, 1, expand=False )
+    scriptDialog.AddSelectionControlToGrid( "SkipExistingFramesBox", "CheckBoxControl", False, "Skip Frames That Already Exist", 6, 2, "If this option is enabled, frames whose output file already exists and is a valid image are not rendered again. Requires an output file." )
     ##Version##
     scriptDialog.AddControlToGrid( "BlenderVersionLabel", "LabelControl", "Blender Version: ", 7, 0, "This is the blender version from where the job is submitted", False )
     scriptDialog.AddControlToGrid( "BlenderVersion", "LabelControl", "X.X", 7, 1, "", False )
+    scriptDialog.AddSelectionControlToGrid( "RequireVersionBox", "CheckBoxControl", False, "Only Workers With This Blender Version", 7, 2, "If this option is enabled, the job requires the blender-X-Y limit of its Blender version, which the BlenderVersions event plugin fills with the Workers that have that version installed." )
+
+    scriptDialog.AddControlToGrid( "TargetTaskMinutesLabel", "LabelControl", "Target Task Minutes", 8, 0, "The duration adaptive frames per task aims for, including the time it takes to start Blender and load the scene.", False )
+    scriptDialog.AddRangeControlToGrid( "TargetTaskMinutesBox", "RangeControl", 15, 1, 10000, 0, 1, 8, 1, expand=False )
+    scriptDialog.AddSelectionControlToGrid( "AdaptiveChunkBox", "CheckBoxControl", False, "Adapt Frames Per Task To Render Time", 8, 2, "If this option is enabled, a probe job first renders a few frames spread over the frame list, one per task. The rest of the frames are submitted as a suspended job, which the BlenderAdaptiveChunking event plugin chunks to the target task duration from the measured startup and frame times, and then resumes. Frames Per Task is used if the probe measured nothing." )
+
+    scriptDialog.AddSelectionControlToGrid( "PreviewFirstBox", "CheckBoxControl", False, "Render Preview Frames First", 9, 2, "If this option is enabled, frames are rendered coarse to fine: the first, last and middle frames, then the frames halfway between those, and so on. A preview of the whole shot is ready early, and every frame is still rendered exactly once." )
+
+    scriptDialog.AddControlToGrid( "RegionColumnsLabel", "LabelControl", "Region Columns", 10, 0, "The number of columns the frame is split into when rendering it in regions.", False )
+    scriptDialog.AddRangeControlToGrid( "RegionColumnsBox", "RangeControl", 2, 1, 64, 0, 1, 10, 1, expand=False )
+    scriptDialog.AddSelectionControlToGrid( "RegionRenderingBox", "CheckBoxControl", False, "Split The Frame Into Regions", 10, 2, "If this option is enabled, a single frame is split into columns by rows regions that are rendered as the tasks of one job, and a second job that depends on it stitches them into the output file. Requires a .png or .tif output file." )
+
+    scriptDialog.AddControlToGrid( "RegionRowsLabel", "LabelControl", "Region Rows", 11, 0, "The number of rows the frame is split into when rendering it in regions.", False )
+    scriptDialog.AddRangeControlToGrid( "RegionRowsBox", "RangeControl", 2, 1, 64, 0, 1, 11, 1, expand=False )
+
+    scriptDialog.AddControlToGrid( "CamerasLabel", "LabelControl", "Cameras", 12, 0, "A comma separated list of the cameras to render every frame with when Render Cameras And View Layers Separately is enabled. Each camera is written to a folder named after it next to the output file, and the scene is only loaded once for all of them. Leave it blank to render with the scene's camera.", False )
+    scriptDialog.AddControlToGrid( "CamerasBox", "TextControl", "", 12, 1, colSpan=2 )
+
+    scriptDialog.AddControlToGrid( "ViewLayersLabel", "LabelControl", "View Layers", 13, 0, "A comma separated list of the view layers to render separately for every frame and camera when Render Cameras And View Layers Separately is enabled, each to a folder named after it next to the output file. Leave it blank to render the view layers the scene renders together.", False )
+    scriptDialog.AddControlToGrid( "ViewLayersBox", "TextControl", "", 13, 1, colSpan=2 )
+
+    scriptDialog.AddSelectionControlToGrid( "RenderViewsBox", "CheckBoxControl", False, "Render Cameras And View Layers Separately", 14, 2, "If this option is enabled, every frame is rendered once per camera and view layer listed above, each to its own output. Otherwise the scene is rendered as it is, and the lists are ignored." )
     #####
     scriptDialog.EndGrid()
     scriptDialog.EndTabPage()
@@ -148,7 +177,7 @@ def __main__( *args ):
 
     scriptDialog.EndGrid()
     
-    settings = ("DepartmentBox","CategoryBox","PoolBox","SecondaryPoolBox","GroupBox","PriorityBox","MachineLimitBox","IsBlacklistBox","MachineListBox","LimitGroupBox","SceneBox","FramesBox","ChunkSizeBox","OutputBox","ThreadsBox","BuildBox", "SubmitSceneBox")
+    settings = ("DepartmentBox","CategoryBox","PoolBox","SecondaryPoolBox","GroupBox","PriorityBox","MachineLimitBox","IsBlacklistBox","MachineListBox","LimitGroupBox","SceneBox","FramesBox","ChunkSizeBox","OutputBox","ThreadsBox","BuildBox", "SubmitSceneBox", "SessionModeBox", "SkipExistingFramesBox", "RequireVersionBox", "TargetTaskMinutesBox", "AdaptiveChunkBox", "PreviewFirstBox", "RegionRenderingBox", "RegionColumnsBox", "RegionRowsBox")
     scriptDialog.LoadSettings( GetSettingsFilename(), settings )
     scriptDialog.EnabledStickySaving( settings, GetSettingsFilename() )
     
@@ -171,23 +200,15 @@ def __main__( *args ):
         scriptDialog.SetValue( "FramesBox", args[1] )        
         
         
-        outputFile = outfl
-        ####
-
-        paddingSize = FrameUtils.GetPaddingSizeFromFilename( outputFile )
-        padding = ""
-        while len(padding) < paddingSize:
-            padding += "#"
-        
-        outputFile = FrameUtils.GetFilenameWithoutPadding( outputFile )
-        directory = Path.GetDirectoryName( outputFile )
-        prefix = Path.GetFileNameWithoutExtension( outputFile )
-        extension = Path.GetExtension( outputFile )
-        outputFile = Path.Combine( directory, prefix + padding + extension )
-        scriptDialog.SetValue( "OutputBox", outputFile  )
+        scriptDialog.SetValue( "OutputBox", GetOutputPattern( outfl ) )
         
         scriptDialog.SetValue( "ThreadsBox", int(args[3]) )
         
+        # The cameras and view layers selected in Blender, older submitters don't send them
+        if len( args ) > 7:
+            scriptDialog.SetValue( "CamerasBox", args[6] )
+            scriptDialog.SetValue( "ViewLayersBox", args[7] )
+        
         platform = args[4]
         if platform.find( "64" ) >= 0:
             scriptDialog.SetValue( "BuildBox", "64bit" )
@@ -210,109 +231,112 @@ def SubmitButtonPressed(*args):
     global scriptDialog
     global integration_dialog
     
-    outputFile = scriptDialog.GetValue( "OutputBox" )
+    job = GetDialogJob()
     
     # Check if Integration options are valid
-    if integration_dialog is not None and not integration_dialog.CheckIntegrationSanity( outputFile ):
+    if integration_dialog is not None and not integration_dialog.CheckIntegrationSanity( job.outputFile ):
         return
-        
-    # Check if blender files exist.
-    sceneFile = scriptDialog.GetValue( "SceneBox" )
-    if( not File.Exists( sceneFile ) ):
-        scriptDialog.ShowMessageBox( "The Blender file %s does not exist" % sceneFile, "Error" )
+    
+    problems = ValidateJob( job )
+    if len( problems ) > 0:
+        scriptDialog.ShowMessageBox( "\n".join( problems ), "Error" )
         return
-    elif (not scriptDialog.GetValue("SubmitSceneBox") and PathUtils.IsPathLocal(sceneFile)):
-        result = scriptDialog.ShowMessageBox( "The Blender file %s is local. Are you sure you want to continue?" % sceneFile, "Warning", ("Yes","No") )
+    
+    if not job.submitScene and PathUtils.IsPathLocal( job.sceneFile ):
+        result = scriptDialog.ShowMessageBox( "The Blender file %s is local. Are you sure you want to continue?" % job.sceneFile, "Warning", ("Yes","No") )
         if(result=="No"):
             return
     
-    # Check output file
-    if outputFile != "":
-        if(not Directory.Exists(Path.GetDirectoryName(outputFile))):
-            scriptDialog.ShowMessageBox( "The directory of the output file %s does not exist." % Path.GetDirectoryName(outputFile), "Error" )
+    if job.outputFile != "" and PathUtils.IsPathLocal( job.outputFile ):
+        result = scriptDialog.ShowMessageBox( "The output file %s is local. Are you sure you want to continue?" % job.outputFile, "Warning", ("Yes","No") )
+        if(result=="No"):
             return
-        elif( PathUtils.IsPathLocal(outputFile) ):
-            result = scriptDialog.ShowMessageBox( "The output file %s is local. Are you sure you want to continue?" % outputFile, "Warning", ("Yes","No") )
-            if(result=="No"):
-                return
     
-    # Check if a valid frame range has been specified.
-    frames = scriptDialog.GetValue( "FramesBox" )
-    if( not FrameUtils.FrameRangeValid( frames ) ):
-        scriptDialog.ShowMessageBox( "Frame range %s is not valid" % frames, "Error" )
-        return
-        
-    jobName = scriptDialog.GetValue( "NameBox" )
+    started = time.time()
+    result = Submit( job, SubmitDialogJob, ResumeDialogJob )
+    # The Blender submitter reads the job IDs and the errors from the output of deadlinecommand
+    for jobId in result.jobIds:
+        print( SubmittedJobPrefix + jobId )
+    for error in result.errors:
+        print( "Error: %s" % error )
+    scriptDialog.ShowMessageBox( "%s\n\nSubmitted in %.2fs" % ( result.output, time.time() - started ), "Submission Results" if len( result.errors ) == 0 else "Error" )
+
+def GetDialogJob():
+    # type: () -> BlenderJob
+    ''' The job the dialog's controls describe '''
+    global scriptDialog
+    
+    # The cameras and view layers are only rendered separately when asked for
+    renderViews = bool( scriptDialog.GetValue( "RenderViewsBox" ) )
+    return BlenderJob(
+        name=scriptDialog.GetValue( "NameBox" ),
+        comment=scriptDialog.GetValue( "CommentBox" ),
+        department=scriptDialog.GetValue( "DepartmentBox" ),
+        pool=scriptDialog.GetValue( "PoolBox" ),
+        secondaryPool=scriptDialog.GetValue( "SecondaryPoolBox" ),
+        group=scriptDialog.GetValue( "GroupBox" ),
+        priority=scriptDialog.GetValue( "PriorityBox" ),
+        taskTimeoutMinutes=scriptDialog.GetValue( "TaskTimeoutBox" ),
+        enableAutoTimeout=bool( scriptDialog.GetValue( "AutoTimeoutBox" ) ),
+        concurrentTasks=scriptDialog.GetValue( "ConcurrentTasksBox" ),
+        limitConcurrentTasks=bool( scriptDialog.GetValue( "LimitConcurrentTasksBox" ) ),
+        machineLimit=scriptDialog.GetValue( "MachineLimitBox" ),
+        machineList=scriptDialog.GetValue( "MachineListBox" ),
+        isBlacklist=bool( scriptDialog.GetValue( "IsBlacklistBox" ) ),
+        limitGroups=scriptDialog.GetValue( "LimitGroupBox" ),
+        dependencies=scriptDialog.GetValue( "DependencyBox" ),
+        onJobComplete=scriptDialog.GetValue( "OnJobCompleteBox" ),
+        submitSuspended=bool( scriptDialog.GetValue( "SubmitSuspendedBox" ) ),
+        sceneFile=scriptDialog.GetValue( "SceneBox" ),
+        submitScene=bool( scriptDialog.GetValue( "SubmitSceneBox" ) ),
+        sceneStore=RepositoryUtils.GetPluginConfig( "Blender" ).GetConfigEntryWithDefault( "SceneStoreDirectory", "" ).strip(),
+        frames=scriptDialog.GetValue( "FramesBox" ),
+        chunkSize=scriptDialog.GetValue( "ChunkSizeBox" ),
+        outputFile=scriptDialog.GetValue( "OutputBox" ),
+        threads=scriptDialog.GetValue( "ThreadsBox" ),
+        build=scriptDialog.GetValue( "BuildBox" ),
+        version=scriptDialog.GetValue( "BlenderVersion" ),
+        requireVersion=bool( scriptDialog.GetValue( "RequireVersionBox" ) ),
+        sessionMode=bool( scriptDialog.GetValue( "SessionModeBox" ) ),
+        skipExistingFrames=bool( scriptDialog.GetValue( "SkipExistingFramesBox" ) ),
+        previewFirst=bool( scriptDialog.GetValue( "PreviewFirstBox" ) ),
+        adaptiveChunking=bool( scriptDialog.GetValue( "AdaptiveChunkBox" ) ),
+        targetTaskMinutes=scriptDialog.GetValue( "TargetTaskMinutesBox" ),
+        regionRendering=bool( scriptDialog.GetValue( "RegionRenderingBox" ) ),
+        regionColumns=scriptDialog.GetValue( "RegionColumnsBox" ),
+        regionRows=scriptDialog.GetValue( "RegionRowsBox" ),
+        cameras=scriptDialog.GetValue( "CamerasBox" ) if renderViews else "",
+        viewLayers=scriptDialog.GetValue( "ViewLayersBox" ) if renderViews else "" )
+
+def SubmitDialogJob( job ):
+    # type: (BlenderJob) -> str
+    ''' Write the job and plugin info files of one job with the dialog's integration settings and
+    submit them, returns the output of deadlinecommand '''
+    global integration_dialog
     
     # Create job info file.
     jobInfoFilename = Path.Combine( ClientUtils.GetDeadlineTempPath(), "blender_job_info.job" )
     writer = StreamWriter( jobInfoFilename, False, Encoding.Unicode )
-    writer.WriteLine( "Plugin=Blender" )
-    writer.WriteLine( "Name=%s" % jobName )
-    writer.WriteLine( "Comment=%s" % scriptDialog.GetValue( "CommentBox" ) )
-    writer.WriteLine( "Department=%s" % scriptDialog.GetValue( "DepartmentBox" ) )
-    writer.WriteLine( "Pool=%s" % scriptDialog.GetValue( "PoolBox" ) )
-    writer.WriteLine( "SecondaryPool=%s" % scriptDialog.GetValue( "SecondaryPoolBox" ) )
-    writer.WriteLine( "Group=%s" % scriptDialog.GetValue( "GroupBox" ) )
-    writer.WriteLine( "Priority=%s" % scriptDialog.GetValue( "PriorityBox" ) )
-    writer.WriteLine( "TaskTimeoutMinutes=%s" % scriptDialog.GetValue( "TaskTimeoutBox" ) )
-    writer.WriteLine( "EnableAutoTimeout=%s" % scriptDialog.GetValue( "AutoTimeoutBox" ) )
-    writer.WriteLine( "ConcurrentTasks=%s" % scriptDialog.GetValue( "ConcurrentTasksBox" ) )
-    writer.WriteLine( "LimitConcurrentTasksToNumberOfCpus=%s" % scriptDialog.GetValue( "LimitConcurrentTasksBox" ) )
-    
-    writer.WriteLine( "MachineLimit=%s" % scriptDialog.GetValue( "MachineLimitBox" ) )
-    if( bool(scriptDialog.GetValue( "IsBlacklistBox" )) ):
-        writer.WriteLine( "Blacklist=%s" % scriptDialog.GetValue( "MachineListBox" ) )
-    else:
-        writer.WriteLine( "Whitelist=%s" % scriptDialog.GetValue( "MachineListBox" ) )
-    
-    writer.WriteLine( "LimitGroups=%s" % scriptDialog.GetValue( "LimitGroupBox" ) )
-    writer.WriteLine( "JobDependencies=%s" % scriptDialog.GetValue( "DependencyBox" ) )
-    writer.WriteLine( "OnJobComplete=%s" % scriptDialog.GetValue( "OnJobCompleteBox" ) )
-    
-    if( bool(scriptDialog.GetValue( "SubmitSuspendedBox" )) ):
-        writer.WriteLine( "InitialStatus=Suspended" )
-    
-    writer.WriteLine( "Frames=%s" % frames )
-    writer.WriteLine( "ChunkSize=%s" % scriptDialog.GetValue( "ChunkSizeBox" ) )
-    
-    if outputFile != "":
-        if outputFile.find( "#" ) < 0:
-            directory = Path.GetDirectoryName( outputFile )
-            prefix = Path.GetFileNameWithoutExtension( outputFile )
-            extension = Path.GetExtension( outputFile )
-            outputFile = Path.Combine( directory, prefix + "####" + extension )
-        writer.WriteLine( "OutputFilename0=%s" % outputFile )
+    for line in GetJobInfo( job ):
+        writer.WriteLine( line )
     
     # Integration
     extraKVPIndex = 0
     groupBatch = False
 
-    if integration_dialog is not None and integration_dialog.IntegrationProcessingRequested():
+    if job.integration and integration_dialog is not None and integration_dialog.IntegrationProcessingRequested():
         extraKVPIndex = integration_dialog.WriteIntegrationInfo( writer, extraKVPIndex )
         groupBatch = groupBatch or integration_dialog.IntegrationGroupBatchRequested()
 
-    if groupBatch:
-        writer.WriteLine( "BatchName=%s\n" % ( jobName ) ) 
+    if job.batchName == "" and groupBatch:
+        writer.WriteLine( "BatchName=%s\n" % ( job.name ) ) 
     writer.Close()
 
     # Create plugin info file.
     pluginInfoFilename = Path.Combine( ClientUtils.GetDeadlineTempPath(), "blender_plugin_info.job" )
     writer = StreamWriter( pluginInfoFilename, False, Encoding.Unicode )
-    
-    if(not scriptDialog.GetValue("SubmitSceneBox")):
-        writer.WriteLine("SceneFile=" + sceneFile)
-    
-    if outputFile != "":
-        writer.WriteLine( "OutputFile=%s" % outputFile )
-    
-    writer.WriteLine( "Threads=%s" % scriptDialog.GetValue( "ThreadsBox" ) )
-    writer.WriteLine( "Build=%s" % scriptDialog.GetValue( "BuildBox" ) )
-    
-    ## Write Version ##
-    writer.WriteLine( "Version=%s" % scriptDialog.GetValue( "BlenderVersion" ) )
-    #print("Blender version is this: %s" % (scriptDialog.GetValue( "BlenderVersion" )) )
-
+    for line in GetPluginInfo( job ):
+        writer.WriteLine( line )
     writer.Close()
     
     # Setup the command line arguments.
@@ -320,9 +344,16 @@ def SubmitButtonPressed(*args):
     
     arguments.Add( jobInfoFilename )
     arguments.Add( pluginInfoFilename )
-    if scriptDialog.GetValue( "SubmitSceneBox" ):
-        arguments.Add( sceneFile )
+    for auxiliaryFile in GetAuxiliaryFiles( job ):
+        arguments.Add( auxiliaryFile )
     
     # Now submit the job.
-    results = ClientUtils.ExecuteCommandAndGetOutput( arguments )
-    scriptDialog.ShowMessageBox( results, "Submission Results" )
+    return ClientUtils.ExecuteCommandAndGetOutput( arguments )
+
+def ResumeDialogJob( jobId ):
+    # type: (str) -> str
+    ''' Resume a suspended job, returns the output of deadlinecommand '''
+    arguments = StringCollection()
+    arguments.Add( "-ResumeJob" )
+    arguments.Add( jobId )
+    return ClientUtils.ExecuteCommandAndGetOutput( arguments )
@@ -15,10 +15,64 @@
 #along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 import bpy
+import json
 import os
 import subprocess
+import tempfile
+import threading
+import time
+
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+
+# Looking up the repository takes a deadlinecommand round trip, so the lookups are kept in a file
+# for CACHE_SECONDS, which also makes them survive reloading this script and restarting Blender.
+CACHE_FILE = os.path.join(tempfile.gettempdir(), "DeadlineBlenderSubmitter.json")
+CACHE_SECONDS = 600
+
+# The submission dialog prints a line starting with this for every job it submitted
+SUBMITTED_JOB_PREFIX = "DEADLINE_SUBMISSION: JOB "
+
+# Results of the submissions running in the background, read by PollResults on Blender's main thread
+results = queue.Queue()
+submission_thread = None
+
+def LoadCache():
+    try:
+        with open(CACHE_FILE, "r") as f:
+            return json.load(f)
+    except (IOError, OSError, ValueError):
+        return {}
+
+def SaveCache(cache):
+    try:
+        temp_file = "%s.%d.tmp" % (CACHE_FILE, os.getpid())
+        with open(temp_file, "w") as f:
+            json.dump(cache, f)
+        os.replace(temp_file, CACHE_FILE)
+    except (IOError, OSError):
+        pass
+
+def Cached(key, lookup, valid=None):
+    # The value of a lookup from the cache while it is younger than CACHE_SECONDS and valid(value)
+    # holds, otherwise from lookup().
+    cache = LoadCache()
+    entry = cache.get(key)
+    if entry is not None and time.time() - entry["time"] < CACHE_SECONDS and (valid is None or valid(entry["value"])):
+        return entry["value"]
+    
+    value = lookup()
+    cache[key] = {"time": time.time(), "value": value}
+    SaveCache(cache)
+    return value
 
 def GetDeadlineCommand():
+    # Keyed by DEADLINE_PATH so that a changed environment looks it up again
+    return Cached("deadlinecommand:" + os.environ.get("DEADLINE_PATH", ""), FindDeadlineCommand)
+
+def FindDeadlineCommand():
     deadlineBin = ""
     try:
         deadlineBin = os.environ['DEADLINE_PATH']
@@ -35,8 +89,12 @@ def GetDeadlineCommand():
     
     return deadlineCommand
 
-def GetRepositoryFilePath(subdir):
-    deadlineCommand = GetDeadlineCommand()
+def GetRepositoryFilePath(subdir, deadlineCommand=None):
+    # Cached while the file still exists, so that a moved repository is looked up again
+    return Cached("repository:%s:%s" % (deadlineCommand or GetDeadlineCommand(), subdir), lambda: LookupRepositoryFilePath(subdir, deadlineCommand), lambda path: path != "" and os.path.isfile(path))
+
+def LookupRepositoryFilePath(subdir, deadlineCommand=None):
+    deadlineCommand = deadlineCommand or GetDeadlineCommand()
     
     startupinfo = None
     #if os.name == 'nt':
@@ -60,9 +118,87 @@ def GetRepositoryFilePath(subdir):
 
     return path
 
-def main( ):
-    script_file = GetRepositoryFilePath("scripts/Submission/BlenderSubmission.py")
+def GetViews(scene):
+    # The cameras and view layers the submission dialog offers to render each to their own output:
+    # the selected cameras when more than one is selected, and the view layers the scene renders
+    # when it renders more than one. They are only rendered separately when that is enabled in the
+    # dialog.
+    cameras = [obj.name for obj in bpy.context.selected_objects if obj.type == 'CAMERA']
+    if len(cameras) < 2:
+        cameras = []
+    
+    if hasattr(scene, "view_layers"):
+        layers = scene.view_layers
+    else:
+        layers = scene.render.layers
+    view_layers = [layer.name for layer in layers if layer.use]
+    if len(view_layers) < 2:
+        view_layers = []
+    
+    return ",".join(cameras), ",".join(view_layers)
+
+def FormatTimings(timings):
+    return ", ".join("%s %.2fs" % (step, seconds) for step, seconds in timings)
+
+def RunSubmission(args, timings):
+    # Runs in the background: find the submission script and run the submission dialog with
+    # deadlinecommand, then queue the job IDs it printed or the error.
+    try:
+        started = time.time()
+        script_file = GetRepositoryFilePath("scripts/Submission/BlenderSubmission.py", args[0])
+        timings.append(("repository lookup", time.time() - started))
+        if script_file == "":
+            raise RuntimeError("Unable to find the Deadline repository with %s" % args[0])
+        
+        started = time.time()
+        proc = subprocess.Popen([args[0], "-ExecuteScript", script_file] + args[1:], stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+        output = proc.communicate()[0].decode("utf_8", "replace").replace("\r", "")
+        timings.append(("submission dialog", time.time() - started))
+        
+        job_ids = [line[len(SUBMITTED_JOB_PREFIX):].strip() for line in output.splitlines() if line.startswith(SUBMITTED_JOB_PREFIX)]
+        errors = [line.strip() for line in output.splitlines() if line.strip().startswith("Error")]
+        if len(job_ids) > 0 and len(errors) > 0:
+            results.put(("ERROR", "Deadline submission failed: %s (submitted %s, %s)" % ("; ".join(errors), ", ".join(job_ids), FormatTimings(timings))))
+        elif len(job_ids) > 0:
+            results.put(("INFO", "Submitted to Deadline: %s (%s)" % (", ".join(job_ids), FormatTimings(timings))))
+        elif len(errors) > 0:
+            results.put(("ERROR", "Deadline submission failed: %s (%s)" % ("; ".join(errors), FormatTimings(timings))))
+        else:
+            results.put(("INFO", "Nothing was submitted to Deadline (%s)" % FormatTimings(timings)))
+    except Exception as e:
+        results.put(("ERROR", "Deadline submission failed: %s" % e))
+
+def PollResults():
+    # Timer on Blender's main thread, reports the results of the background submissions
+    running = submission_thread is not None and submission_thread.is_alive()
+    while True:
+        try:
+            level, message = results.get_nowait()
+        except queue.Empty:
+            break
+        Report(level, message)
+    
+    return 0.5 if running else None
 
+def Report(level, message):
+    print(message)
+    try:
+        def Draw(menu, context):
+            menu.layout.label(text=message)
+        bpy.context.window_manager.popup_menu(Draw, title="Deadline", icon=level)
+    except Exception:
+        pass
+
+def main( ):
+    global submission_thread
+    
+    if submission_thread is not None and submission_thread.is_alive():
+        Report("ERROR", "A Deadline submission is still running, close its submission dialog first")
+        return
+    
+    # Saving and reading the scene have to happen on Blender's main thread, the rest runs in the background
+    timings = []
+    started = time.time()
     curr_scene = bpy.context.scene
     curr_render = curr_scene.render    
 
@@ -70,6 +206,8 @@ def main( ):
     
     if scene_file != "":
         bpy.ops.wm.save_mainfile()
+    timings.append(("save", time.time() - started))
+    started = time.time()
     
     frame_range = str(curr_scene.frame_start)
     if curr_scene.frame_start != curr_scene.frame_end:
@@ -86,22 +224,29 @@ def main( ):
     ver = (bpy.app.version_string.split("."))
     version = "%s.%s" % (ver[0], ver[1])
     
+    cameras, view_layers = GetViews(curr_scene)
+    
     deadlineCommand = GetDeadlineCommand()
+    timings.append(("scene settings", time.time() - started))
     
     args = []
     args.append(deadlineCommand)
-    args.append("-ExecuteScript")
-    args.append(script_file)
     args.append(scene_file)
     args.append(frame_range)
     args.append(output_path+","+version)
     args.append(str(threads))
     args.append(platform)
     args.append(version)
+    args.append(cameras)
+    args.append(view_layers)
     
-    startupinfo = None
-    #~ if os.name == 'nt':
-        #~ startupinfo = subprocess.STARTUPINFO()
-        #~ startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
+    submission_thread = threading.Thread(target=RunSubmission, args=(args, timings))
+    submission_thread.daemon = True
+    submission_thread.start()
     
-    subprocess.Popen(args, startupinfo=startupinfo)
+    # Without an event loop (background mode or before Blender 2.80) nothing would poll the results
+    if bpy.app.background or not hasattr(bpy.app, "timers"):
+        submission_thread.join()
+        PollResults()
+    else:
+        bpy.app.timers.register(PollResults, first_interval=0.5)
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+# Measures what partitioning the CPUs between concurrent tasks gains, without Blender.
+#
+#   python tools/BenchmarkCpuPartitioning.py [--slots 2 4] [--units 64] [--buffer-mb 8]
+#
+# Every slot stands for a concurrent Blender task that renders the same amount of work, split over
+# worker processes like Blender splits a frame over its threads. Without partitioning each slot
+# starts a process per CPU, as Blender does with "-t 0", so N slots run N processes per CPU. With
+# partitioning each slot starts a process per CPU of its partition and pins them to it, like the
+# plugin does. A unit of work walks a buffer larger than the CPU caches, so the cost of processes
+# evicting each other's cache lines and migrating between NUMA nodes shows up as well as the cost
+# of oversubscription.
+
+from __future__ import absolute_import
+
+import argparse
+import multiprocessing
+import os
+import sys
+import time
+
+ToolsDirectory = os.path.dirname( os.path.abspath( __file__ ) )
+sys.path.insert( 0, os.path.join( ToolsDirectory, "..", "repoFolder", "plugins", "Blender" ) )
+
+from BlenderAffinity import GetTopology, PartitionCpus, SetAffinity, FormatCpuList
+
+def Work( units, bufferBytes, cpus ):
+    if cpus is not None:
+        SetAffinity( cpus )
+
+    buffer = bytearray( bufferBytes )
+    for unit in range( units ):
+        for index in range( 0, bufferBytes, 64 ):
+            buffer[index] = ( buffer[index] + unit ) & 255
+
+def RunSlots( topology, slotCount, units, bufferBytes, partitioned ):
+    ''' Run the slots concurrently and return the wall time until all their work is done '''
+    processes = []
+    for slotIndex in range( slotCount ):
+        if partitioned:
+            cpus = PartitionCpus( topology, slotCount, slotIndex )
+            threadCpus = [ cpus ] * len( cpus )
+        else:
+            threadCpus = [ None ] * topology.GetCpuCount()
+
+        # The slot's units are split between its processes, like a frame between render threads
+        for threadIndex, cpus in enumerate( threadCpus ):
+            threadUnits = units * ( threadIndex + 1 ) // len( threadCpus ) - units * threadIndex // len( threadCpus )
+            processes.append( multiprocessing.Process( target=Work, args=( threadUnits, bufferBytes, cpus ) ) )
+
+    started = time.perf_counter()
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+    return time.perf_counter() - started, len( processes )
+
+def main():
+    parser = argparse.ArgumentParser( description="Benchmark concurrent tasks with and without CPU partitioning." )
+    parser.add_argument( "--slots", type=int, nargs="+", default=[ 2, 4 ], help="concurrent task counts to measure" )
+    parser.add_argument( "--units", type=int, default=64, help="units of work per slot" )
+    parser.add_argument( "--buffer-mb", type=float, default=8, help="memory walked by each process per unit" )
+    args = parser.parse_args()
+
+    topology = GetTopology()
+    bufferBytes = int( args.buffer_mb * 1024 * 1024 )
+    print( "%d CPUs in %d cores on %d NUMA nodes" % ( topology.GetCpuCount(), len( topology.GetCores() ), len( topology.nodes ) ) )
+    print( "%6s %-12s %10s %10s %12s %8s" % ( "slots", "mode", "processes", "seconds", "units/s", "speedup" ) )
+    for slotCount in args.slots:
+        sharedSeconds, sharedProcesses = RunSlots( topology, slotCount, args.units, bufferBytes, False )
+        partitionedSeconds, partitionedProcesses = RunSlots( topology, slotCount, args.units, bufferBytes, True )
+        totalUnits = slotCount * args.units
+        print( "%6d %-12s %10d %10.2f %12.1f %8s" % ( slotCount, "shared", sharedProcesses, sharedSeconds, totalUnits / sharedSeconds, "" ) )
+        print( "%6d %-12s %10d %10.2f %12.1f %7.2fx" % ( slotCount, "partitioned", partitionedProcesses, partitionedSeconds, totalUnits / partitionedSeconds, sharedSeconds / partitionedSeconds ) )
+        for slotIndex in range( slotCount ):
+            print( "%6s   slot %d: CPUs %s" % ( "", slotIndex, FormatCpuList( PartitionCpus( topology, slotCount, slotIndex ) ) ) )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,394 @@
+#!/usr/bin/env python3
+# Benchmarks and regression checks of the Blender plugin, the submission dialog and the Blender
+# submitter, run off the farm against the fakes in tools/fakes with tools/FakeBlender.py as blender.
+#
+#   python tools/BenchmarkPlugin.py [--repeat 20] [--speed 10] [--tolerance 0.5] [--update | --check]
+#
+# The checks render jobs on a FakeWorker and submit them with the dialog and the submitter, and fail
+# when a task fails, a frame is missing, the progress doesn't reach 100% or a submission gets no job
+# ID. Region tasks must write their region and its record, and fail when they can't. The later tasks
+# of a job must resolve the Blender executable without touching the disk, and a release installed in
+# the install roots must be found by the next job. The measurements are:
+#
+#   handlers <log>        lines per second through the plugin's stdout handlers for each recorded
+#                         log in tools/logs, including the progress updates they send
+#   task overhead         ms per task of a job rendered by a fake Blender that takes no time, in
+#                         separate processes and in session mode, and the plugin time of it spent in
+#                         the plugin's callbacks and stdout handlers
+#   replay overhead       ms per task above the recorded render time when tools/logs/blender4_eevee.log
+#                         is replayed at --speed
+#   dialog submission     ms for the submission dialog to submit a job, in process
+#   submitter ...         ms of Blender's main thread for SubmitBlenderToDeadline.py, and until the job
+#                         ID is reported with and without its cached repository lookups
+#
+# They are compared with tools/BenchmarkBaseline.json, and a measurement more than --tolerance worse
+# than its baseline fails the run. --update rewrites the baseline after a deliberate change, and only
+# when the checks pass. Timings depend on the machine, so the baseline is only comparable on the
+# machine that recorded it. --check runs every measurement once, with the log replayed at 100 times
+# its speed, and only reports the checks.
+
+from __future__ import absolute_import
+
+import argparse
+import contextlib
+import glob
+import importlib.util
+import io
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+import warnings
+
+ToolsDirectory = os.path.dirname( os.path.abspath( __file__ ) )
+RepositoryDirectory = os.path.normpath( os.path.join( ToolsDirectory, "..", "repoFolder" ) )
+BaselineFile = os.path.join( ToolsDirectory, "BenchmarkBaseline.json" )
+
+from FakeWorker import FakeWorker, WriteFakeExecutable
+from FakeBlender import GetSeconds, RecordedLog
+from FakeDeadlineCommand import WriteFakeDeadlineCommand
+
+from BlenderRegions import GetRegionDirectory, RegionFilePattern
+
+import Blender
+import bpy
+from Deadline.Plugins import Job
+from Deadline.Scripting import ClientUtils, SubmittedJobs
+from DeadlineUI.Controls.Scripting.DeadlineScriptDialog import DeadlineScriptDialog
+
+ReplayLog = os.path.join( ToolsDirectory, "logs", "blender4_eevee.log" )
+# Submitted from Blender with two selected cameras and two view layers, each rendered to its own output
+# once that is enabled in the dialog
+RenderViews = { "RenderViewsBox": True }
+Cameras = "CamA,CamB"
+ViewLayers = "ViewLayer,Background"
+
+def Expect( problems, label, actual, expected ):
+    if actual != expected:
+        problems.append( "%s: expected %r, got %r" % ( label, expected, actual ) )
+
+def Median( values ):
+    values = sorted( values )
+    return values[len( values ) // 2] if len( values ) > 0 else 0.0
+
+def LoadScript( name, path ):
+    # The submission scripts load their modules with imp, like the scripts that come with Deadline
+    warnings.simplefilter( "ignore", DeprecationWarning )
+    spec = importlib.util.spec_from_file_location( name, path )
+    module = importlib.util.module_from_spec( spec )
+    spec.loader.exec_module( module )
+    return module
+
+def CheckTasks( problems, label, results, outputFile ):
+    for result in results:
+        if result.error != "":
+            problems.append( "%s task %s failed: %s" % ( label, result.taskId, result.error ) )
+            continue
+        Expect( problems, "%s task %s progress" % ( label, result.taskId ), result.progress[-1:], [ 100.0 ] )
+        Expect( problems, "%s task %s status" % ( label, result.taskId ), result.statusMessages[-1:], [ "Task complete." ] )
+        for frame in result.frames:
+            if not os.path.isfile( outputFile.replace( "####", "%04d" % frame ) ):
+                problems.append( "%s frame %d was not written" % ( label, frame ) )
+
+def MeasureHandlers( worker, problems, metrics, repeat ):
+    ''' Lines per second of each recorded log through the handlers of a task that renders its frames '''
+    for log in sorted( glob.glob( os.path.join( ToolsDirectory, "logs", "*.log" ) ) ):
+        recording = RecordedLog( log )
+        with open( log ) as f:
+            lines = f.read().splitlines()
+        frames = list( range( 1, len( recording.frames ) + 1 ) )
+        pluginInfo = { "SceneFile": "shot.blend", "Version": recording.GetVersion() }
+
+        seconds = []
+        for _ in range( repeat ):
+            result = worker.ReplayStdout( pluginInfo, frames, lines )
+            if result.error != "":
+                problems.append( "%s failed: %s" % ( os.path.basename( log ), result.error ) )
+                break
+            seconds.append( result.seconds )
+        if len( seconds ) < repeat:
+            continue
+
+        name = os.path.splitext( os.path.basename( log ) )[0]
+        Expect( problems, "%s progress" % name, result.progress[-1:], [ 100.0 ] )
+        Expect( problems, "%s status" % name, result.statusMessages[-1:], [ "Task complete." ] )
+        metrics["handlers %s" % name] = ( len( lines ) / max( Median( seconds ), 1e-9 ), "lines/s" )
+
+def MeasureTasks( worker, directory, problems, metrics ):
+    ''' ms per task of jobs whose frames take no time to render '''
+    sceneFile = os.path.join( directory, "shot.blend" )
+    open( sceneFile, "w" ).close()
+    tasks = [ [ frame, frame + 1 ] for frame in range( 1, 17, 2 ) ]
+
+    for label, options in ( ( "task overhead", {} ), ( "session task overhead", { "SessionMode": "True" } ) ):
+        outputFile = os.path.join( directory, label.replace( " ", "_" ), "shot_####.png" )
+        pluginInfo = dict( { "SceneFile": sceneFile, "OutputFile": outputFile, "Version": "4.0" }, **options )
+        results = worker.RunJob( pluginInfo, tasks )
+        CheckTasks( problems, label, results, outputFile )
+        # The first task of a session also starts Blender
+        metrics[label] = ( Median( [ result.seconds for result in results[1:] ] ) * 1000, "ms" )
+        metrics[label.replace( "overhead", "plugin time" )] = ( Median( [ result.callbackSeconds + result.handlerSeconds for result in results ] ) * 1000, "ms" )
+
+        if label == "task overhead":
+            skipped = worker.RunJob( dict( pluginInfo, SkipExistingFrames="True" ), tasks[:2] )
+            Expect( problems, "skipped frames", [ ( result.error, result.lines ) for result in skipped ], [ ( "", 0 ) ] * 2 )
+
+def CheckRegionTasks( worker, directory, problems ):
+    ''' Region tasks write their region and its record, and fail when the region can't be written '''
+    sceneFile = os.path.join( directory, "shot.blend" )
+    pluginInfo = { "SceneFile": sceneFile, "Version": "4.0", "RegionRendering": "True", "RegionFrame": "7", "RegionColumns": "2", "RegionRows": "1" }
+    outputFile = os.path.join( directory, "regions", "poster.png" )
+    results = worker.RunJob( dict( pluginInfo, OutputFile=outputFile ), [ [ 0 ], [ 1 ] ], "regionjob" )
+    Expect( problems, "region task errors", [ result.error for result in results ], [ "", "" ] )
+    regionDirectory = GetRegionDirectory( outputFile, 7 )
+    for index in range( 2 ):
+        for extension in ( ".tif", ".json" ):
+            if not os.path.isfile( os.path.join( regionDirectory, RegionFilePattern % index + extension ) ):
+                problems.append( "region %d: %s was not written" % ( index, RegionFilePattern % index + extension ) )
+
+    # The regions of an output file whose folder is a file can't be written
+    blocker = os.path.join( directory, "blocker" )
+    open( blocker, "w" ).close()
+    results = worker.RunJob( dict( pluginInfo, OutputFile=os.path.join( blocker, "poster.png" ) ), [ [ 0 ] ], "brokenregionjob" )
+    if results[0].error == "":
+        problems.append( "region task without its region: no error" )
+
+class FileSystemCalls( object ):
+    ''' Counts the calls to the os functions that stat or list files, while it is entered '''
+    Names = ( "stat", "lstat", "scandir", "listdir" )
+
+    def __init__( self ):
+        self.calls = []
+        self.originals = {}
+
+    def __enter__( self ):
+        for name in self.Names:
+            self.originals[name] = getattr( os, name )
+            setattr( os, name, self.Counter( name, self.originals[name] ) )
+        return self
+
+    def __exit__( self, *args ):
+        for name, original in self.originals.items():
+            setattr( os, name, original )
+
+    def Counter( self, name, original ):
+        def Call( *args, **kwargs ):
+            self.calls.append( name )
+            return original( *args, **kwargs )
+        return Call
+
+def WriteInstall( directory, version ):
+    installDirectory = os.path.join( directory, "blender-%s" % version )
+    os.makedirs( installDirectory )
+    return WriteFakeExecutable( installDirectory, { "FAKE_BLENDER_VERSION": version } )
+
+def ResolveForJob( worker, jobId, version, calls=None ):
+    ''' The executable the plugin of a new job resolves for a version, twice, the second time within
+    calls when given '''
+    plugin = worker.LoadPlugin( Job( jobId, { "Version": version }, 1 ) )
+    try:
+        executable = plugin.ResolveExecutable( version )[1]
+        if calls is None:
+            return executable, executable
+        with calls:
+            return executable, plugin.ResolveExecutable( version )[1]
+    finally:
+        Blender.CleanupDeadlinePlugin( plugin )
+
+def CheckExecutableCache( directory, problems ):
+    ''' The install roots are only scanned again when the index is stale or misses the release '''
+    installs = os.path.join( directory, "installs" )
+    installed = WriteInstall( installs, "4.0.2" )
+    worker = FakeWorker( os.path.join( directory, "executables" ), { "BlenderInstallRoots": os.path.join( installs, "*", "blender" ) } )
+
+    calls = FileSystemCalls()
+    first, cached = ResolveForJob( worker, "cachejob", "4.0", calls )
+    Expect( problems, "resolved executable", ( first, cached ), ( installed, installed ) )
+    Expect( problems, "file system calls of a cached resolve", calls.calls, [] )
+
+    calls = FileSystemCalls()
+    with calls:
+        Expect( problems, "next job executable", ResolveForJob( worker, "nextjob", "4.0" )[0], installed )
+    Expect( problems, "install roots scans of the next job", calls.calls.count( "scandir" ), 0 )
+
+    newInstall = WriteInstall( installs, "4.1.1" )
+    Expect( problems, "new install executable", ResolveForJob( worker, "newinstalljob", "4.1" )[0], newInstall )
+
+def MeasureReplay( directory, problems, metrics, speed ):
+    ''' ms per task above the recorded render time, when a recorded log is replayed at speed '''
+    recording = RecordedLog( ReplayLog )
+    recordedSeconds = sum( GetSeconds( frame[-1] ) or 0.0 for frame in recording.frames )
+    worker = FakeWorker( os.path.join( directory, "replay" ), environment={ "FAKE_BLENDER_REPLAY": ReplayLog, "FAKE_BLENDER_SPEED": speed } )
+    sceneFile = os.path.join( directory, "shot.blend" )
+    outputFile = os.path.join( directory, "replay", "shot_####.png" )
+    frames = list( range( 1, len( recording.frames ) + 1 ) )
+    results = worker.RunJob( { "SceneFile": sceneFile, "OutputFile": outputFile, "Version": recording.GetVersion() }, [ frames ] )
+    CheckTasks( problems, "replay", results, outputFile )
+    metrics["replay overhead"] = ( ( results[0].seconds - recordedSeconds / speed ) * 1000, "ms" )
+
+def MeasureDialog( directory, problems, metrics, repeat ):
+    ''' ms for the submission dialog to submit a job, with the fake deadlinecommand answering in process '''
+    sceneFile = os.path.join( directory, "shot.blend" )
+    outputDirectory = os.path.join( directory, "render" )
+    if not os.path.isdir( outputDirectory ):
+        os.makedirs( outputDirectory )
+    DeadlineScriptDialog.autoSubmit = True
+    ClientUtils.tempDirectory = directory
+    ClientUtils.executeCommand = SubmittedJobs()
+    with contextlib.redirect_stdout( io.StringIO() ):
+        dialog = LoadScript( "BlenderSubmission", os.path.join( RepositoryDirectory, "scripts", "Submission", "BlenderSubmission.py" ) )
+        # The cameras and view layers the submitter sends are only rendered separately when asked for
+        dialog.__main__( sceneFile, "1-100", os.path.join( outputDirectory, "shot_0001.png" ) + ",4.0", "0", "linux64", "4.0", Cameras, ViewLayers )
+        pluginInfo = ReadJobFile( ClientUtils.executeCommand.submissions[-1][1] )
+        Expect( problems, "dialog default views", ( pluginInfo.get( "Cameras" ), pluginInfo.get( "ViewLayers" ) ), ( "", "" ) )
+        ClientUtils.executeCommand = SubmittedJobs()
+
+        DeadlineScriptDialog.userValues = RenderViews
+        seconds = []
+        for _ in range( repeat ):
+            started = time.perf_counter()
+            dialog.__main__( sceneFile, "1-100", os.path.join( outputDirectory, "shot_0001.png" ) + ",4.0", "0", "linux64", "4.0", Cameras, ViewLayers )
+            seconds.append( time.perf_counter() - started )
+        DeadlineScriptDialog.userValues = {}
+
+    Expect( problems, "dialog messages", [ title for title, message in DeadlineScriptDialog.dialogs[-1].messages ], [ "Submission Results" ] )
+    if len( ClientUtils.executeCommand.submissions ) != repeat:
+        problems.append( "dialog submitted %d jobs instead of %d" % ( len( ClientUtils.executeCommand.submissions ), repeat ) )
+        return
+    pluginInfo = ReadJobFile( ClientUtils.executeCommand.submissions[-1][1] )
+    Expect( problems, "dialog plugin info", ( pluginInfo.get( "Version" ), pluginInfo.get( "OutputFile" ), pluginInfo.get( "Cameras" ), pluginInfo.get( "ViewLayers" ) ), ( "4.0", os.path.join( outputDirectory, "shot_####.png" ), Cameras, ViewLayers ) )
+    metrics["dialog submission"] = ( Median( seconds ) * 1000, "ms" )
+
+def ReadJobFile( path ):
+    ''' The key=value lines of a job or plugin info file the submission dialog wrote '''
+    with open( path, encoding="utf-16" ) as f:
+        return dict( line.rstrip( "\n" ).split( "=", 1 ) for line in f if "=" in line )
+
+def MeasureSubmitter( directory, problems, metrics ):
+    ''' ms of Blender's main thread and until the job ID is reported, for SubmitBlenderToDeadline.py '''
+    sceneFile = os.path.join( directory, "shot.blend" )
+    os.environ["DEADLINE_PATH"] = os.path.dirname( WriteFakeDeadlineCommand( directory ) )
+    os.environ["FAKE_DEADLINE_TEMP"] = directory
+    os.environ["FAKE_DEADLINE_DIALOG_VALUES"] = json.dumps( RenderViews )
+    submitter = LoadScript( "SubmitBlenderToDeadline", os.path.join( RepositoryDirectory, "submission", "Blender", "Main", "SubmitBlenderToDeadline.py" ) )
+    submitter.CACHE_FILE = os.path.join( directory, "DeadlineBlenderSubmitter.json" )
+
+    for label in ( "cold", "warm" ):
+        bpy.Reset( sceneFile, background=False )
+        bpy.context.scene.render.filepath = os.path.join( directory, "render", "shot_####" )
+        bpy.context.selected_objects = [ bpy.Object( name, "CAMERA" ) for name in Cameras.split( "," ) ]
+        bpy.context.scene.view_layers = bpy.Collection( [ bpy.ViewLayer( name ) for name in ViewLayers.split( "," ) ] )
+        with contextlib.redirect_stdout( io.StringIO() ):
+            started = time.perf_counter()
+            submitter.main()
+            blocking = time.perf_counter() - started
+            while len( bpy.context.window_manager.popups ) == 0 and time.perf_counter() - started < 60:
+                bpy.app.timers.RunTimers()
+                time.sleep( 0.005 )
+            total = time.perf_counter() - started
+
+        popups = bpy.context.window_manager.popups
+        if len( popups ) == 0 or popups[0][1] != "INFO" or "fake" not in popups[0][2][0]:
+            problems.append( "submitter %s: no job ID reported: %r" % ( label, popups ) )
+        pluginInfo = ReadJobFile( os.path.join( directory, "blender_plugin_info.job" ) )
+        Expect( problems, "submitter %s views" % label, ( pluginInfo.get( "Cameras" ), pluginInfo.get( "ViewLayers" ) ), ( Cameras, ViewLayers ) )
+        metrics["submitter main thread %s" % label] = ( blocking * 1000, "ms" )
+        metrics["submitter %s" % label] = ( total * 1000, "ms" )
+
+    # A single selected camera is the camera to render with, not a list of views
+    bpy.Reset( sceneFile )
+    bpy.context.selected_objects = [ bpy.Object( "CamA", "CAMERA" ) ]
+    Expect( problems, "submitter single camera views", submitter.GetViews( bpy.context.scene ), ( "", "" ) )
+
+def RunBenchmarks( directory, repeat, speed ):
+    problems = []
+    metrics = {}
+    worker = FakeWorker( os.path.join( directory, "worker" ) )
+    MeasureHandlers( worker, problems, metrics, repeat )
+    MeasureTasks( worker, directory, problems, metrics )
+    CheckRegionTasks( worker, directory, problems )
+    CheckExecutableCache( directory, problems )
+    MeasureReplay( directory, problems, metrics, speed )
+    MeasureDialog( directory, problems, metrics, repeat )
+    MeasureSubmitter( directory, problems, metrics )
+    return problems, metrics
+
+def IsWorse( value, baseline, unit, tolerance ):
+    if unit == "lines/s":
+        return value * ( 1 + tolerance ) < baseline
+    # A few ms of noise don't make a regression of a measurement that small
+    return value > baseline * ( 1 + tolerance ) + 5
+
+def Compare( metrics, baseline, tolerance ):
+    ''' Print the measurements next to their baseline, returns the names of those that got worse '''
+    regressions = []
+    print( "%-36s %14s %14s %8s" % ( "measurement", "baseline", "current", "change" ) )
+    for name in sorted( metrics ):
+        value, unit = metrics[name]
+        entry = baseline.get( name )
+        if entry is None:
+            print( "%-36s %14s %11.1f %-2s" % ( name, "-", value, unit if unit == "ms" else "" ) )
+            continue
+        change = ( value - entry["value"] ) / max( abs( entry["value"] ), 1e-9 ) * 100
+        worse = IsWorse( value, entry["value"], unit, tolerance )
+        if worse:
+            regressions.append( name )
+        print( "%-36s %11.1f %-2s %11.1f %-2s %+7.0f%%%s" % ( name, entry["value"], unit if unit == "ms" else "", value, unit if unit == "ms" else "", change, "  WORSE" if worse else "" ) )
+    return regressions
+
+def LoadBaseline( path ):
+    if not os.path.isfile( path ):
+        return {}
+    with open( path ) as f:
+        return json.load( f ).get( "metrics", {} )
+
+def SaveBaseline( path, metrics, speed ):
+    with open( path, "w" ) as f:
+        json.dump( {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "processors": os.cpu_count(),
+            "replaySpeed": speed,
+            "metrics": dict( ( name, { "value": round( value, 3 ), "unit": unit } ) for name, ( value, unit ) in metrics.items() ) }, f, indent=1, sort_keys=True )
+        f.write( "\n" )
+
+def main():
+    parser = argparse.ArgumentParser( description="Benchmark the Blender plugin and submitters against fake Deadline and Blender." )
+    parser.add_argument( "--repeat", type=int, default=20, help="runs of the in-process measurements, the median is reported" )
+    parser.add_argument( "--speed", type=float, default=10, help="speed the recorded log is replayed at" )
+    parser.add_argument( "--tolerance", type=float, default=0.5, help="fraction a measurement may be worse than its baseline" )
+    parser.add_argument( "--baseline", default=BaselineFile, help="baseline to compare with" )
+    parser.add_argument( "--update", action="store_true", help="write the measurements to the baseline" )
+    parser.add_argument( "--check", action="store_true", help="only run the checks, without comparing with the baseline" )
+    args = parser.parse_args()
+    if args.check and args.update:
+        parser.error( "--check and --update can't be combined" )
+    if args.check:
+        args.repeat, args.speed = 1, 100
+
+    directory = tempfile.mkdtemp( prefix="blender_bench_" )
+    try:
+        problems, metrics = RunBenchmarks( directory, max( 1, args.repeat ), max( 0.1, args.speed ) )
+    finally:
+        shutil.rmtree( directory, ignore_errors=True )
+
+    for problem in problems:
+        print( "FAIL %s" % problem )
+    if args.check:
+        print( "%d problems" % len( problems ) )
+        sys.exit( 1 if problems else 0 )
+
+    regressions = Compare( metrics, LoadBaseline( args.baseline ), args.tolerance )
+    print( "%d problems, %d measurements worse than the baseline" % ( len( problems ), len( regressions ) ) )
+
+    if args.update and len( problems ) == 0:
+        SaveBaseline( args.baseline, metrics, args.speed )
+        print( "Baseline written to %s" % args.baseline )
+        regressions = []
+    sys.exit( 1 if problems or regressions else 0 )
+
+if __name__ == "__main__":
+    main()
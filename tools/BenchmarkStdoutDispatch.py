@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+# Replays recorded Blender logs through the plugin's stdout handling and reports lines per second,
+# comparing the original one-handler-per-regex setup with the single filter and the version's parser.
+#
+#   python tools/BenchmarkStdoutDispatch.py [--repeat N] [log ...]
+#
+# Without log arguments every log in tools/logs is replayed. Besides the throughput of the Python
+# side, the regex evaluations per line are reported, since in Deadline every registered handler is
+# evaluated against every line before any Python code runs.
+
+from __future__ import absolute_import
+
+import argparse
+import glob
+import os
+import re
+import sys
+import time
+
+ToolsDirectory = os.path.dirname( os.path.abspath( __file__ ) )
+sys.path.insert( 0, os.path.join( ToolsDirectory, "..", "repoFolder", "plugins", "Blender" ) )
+
+from BlenderProgress import GetProgressParser
+
+# The handlers the plugin used to register, in registration order. Deadline tests every line against
+# every one of them.
+OriginalHandlers = [
+    ( ".*Tile ([0-9]+)/([0-9]+).*", "tile" ),
+    ( ".*Sample ([0-9]+)/([0-9]+).*", "sample" ),
+    ( ".*Scene, Part ([0-9]+)-([0-9]+).*", "scene" ),
+    ( ".*Saved:.*", "saved" ),
+    ( "Unable to open.*", "failed" ),
+    ( "Failed to read blend file.*", "failed" ),
+    ( ".*Unable to create directory.*", "failed" ),
+]
+
+def ReplayOriginal( lines ):
+    handlers = [ ( re.compile( pattern ), kind ) for pattern, kind in OriginalHandlers ]
+    events = []
+    for line in lines:
+        for pattern, kind in handlers:
+            match = pattern.match( line )
+            if match is not None:
+                events.append( ( kind, match.groups() ) )
+    return events
+
+def ReplaySinglePass( lines ):
+    # The logs start with Blender's version banner, the plugin uses the job's Version entry instead
+    progressParser = GetProgressParser( lines[0] if len( lines ) > 0 else "" )
+    stdoutFilter = re.compile( progressParser.Filter )
+    events = []
+    for line in lines:
+        match = stdoutFilter.match( line )
+        if match is not None:
+            event = progressParser.Parse( match.group( 0 ) )
+            if event is not None:
+                events.append( ( event.kind, event ) )
+    return events
+
+def Measure( replay, lines, repeat ):
+    best = None
+    for _ in range( repeat ):
+        start = time.perf_counter()
+        events = replay( lines )
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min( best, elapsed )
+    return len( lines ) / best, events
+
+def main():
+    parser = argparse.ArgumentParser( description="Benchmark the Blender plugin's stdout handling on recorded logs." )
+    parser.add_argument( "logs", nargs="*", default=sorted( glob.glob( os.path.join( ToolsDirectory, "logs", "*.log" ) ) ) )
+    parser.add_argument( "--repeat", type=int, default=20, help="replays per log, the fastest one is reported" )
+    args = parser.parse_args()
+
+    print( "%-28s %8s %14s %14s %8s %14s" % ( "log", "lines", "before lines/s", "after lines/s", "speedup", "regex per line" ) )
+    for log in args.logs:
+        with open( log ) as f:
+            lines = f.read().splitlines()
+
+        before, beforeEvents = Measure( ReplayOriginal, lines, args.repeat )
+        after, afterEvents = Measure( ReplaySinglePass, lines, args.repeat )
+        # Before: every handler's regex for every line. After: the filter for every line and the
+        # parser for the lines that pass it.
+        beforeRegex = len( OriginalHandlers )
+        afterRegex = 1.0 + len( afterEvents ) / float( len( lines ) )
+        print( "%-28s %8d %14.0f %14.0f %7.1fx %6d -> %.2f" % ( os.path.basename( log ), len( lines ), before, after, after / before, beforeRegex, afterRegex ) )
+
+        beforeSaved = sum( 1 for kind, values in beforeEvents if kind == "saved" )
+        afterSaved = sum( 1 for kind, values in afterEvents if kind == "saved" )
+        if beforeSaved != afterSaved:
+            print( "  warning: %d saved frames before, %d after" % ( beforeSaved, afterSaved ) )
+
+if __name__ == "__main__":
+    main()
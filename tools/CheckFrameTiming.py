@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+# Checks the wall time the Blender plugin records for every frame, without Deadline or Blender.
+#
+#   python tools/CheckFrameTiming.py [--sync 0.3] [--check]
+#
+# FrameMetrics is fed the events of a task with a fake clock, and a job is rendered on a FakeWorker by a
+# FakeBlender that takes --sync seconds to sync every frame before its first sample. The wall time of
+# every frame must include its sync, measured from the previous save or the start of the task, and its
+# setup time must be the time before its first progress line. Probe tasks of adaptive frames per task,
+# with a scene that takes twice as long to load, must time their frames with the sync and their
+# startup with the load, so that the chunk size they give keeps tasks under the target.
+
+from __future__ import absolute_import
+
+import argparse
+import glob
+import json
+import os
+import shutil
+import sys
+import tempfile
+
+ToolsDirectory = os.path.dirname( os.path.abspath( __file__ ) )
+
+from FakeWorker import FakeWorker
+
+from Deadline.Scripting import RepositoryUtils
+
+from BlenderChunking import EstimateTiming, GetAdaptiveChunkSize, ReadTimingRecords, TimingFilePattern
+from BlenderMetrics import FrameMetrics
+from BlenderProgress import StdoutEvent
+
+class FakeClock( object ):
+    def __init__( self ):
+        self.now = 0.0
+
+    def __call__( self ):
+        return self.now
+
+def Expect( problems, label, actual, expected ):
+    if actual != expected:
+        problems.append( "%s: expected %r, got %r" % ( label, expected, actual ) )
+
+def CheckMetrics():
+    ''' A task starts at 0, loads the scene and syncs its first frame until 5, saves it at 8, syncs the
+    second frame until 9 and saves it at 12 '''
+    problems = []
+    clock = FakeClock()
+    metrics = FrameMetrics( "", clock=clock )
+    for frame, firstProgress, saved in ( ( 1, 5.0, 8.0 ), ( 2, 9.0, 12.0 ) ):
+        clock.now = firstProgress
+        metrics.Update( StdoutEvent( "progress", "", frame=frame, chunkType="sample", current=1, total=16 ) )
+        clock.now = saved - 1.0
+        metrics.Update( StdoutEvent( "progress", "", frame=frame, chunkType="sample", current=16, total=16 ) )
+        clock.now = saved
+        metrics.Saved( StdoutEvent( "saved", "", path="" ) )
+    metrics.Flush()
+
+    Expect( problems, "wall times", [ record["wallTime"] for record in metrics.records ], [ 8.0, 4.0 ] )
+    Expect( problems, "setup times", [ record["setupTime"] for record in metrics.records ], [ 5.0, 1.0 ] )
+    return problems
+
+def ReadRecords( metricsFile ):
+    with open( metricsFile ) as f:
+        return [ json.loads( line ) for line in f if line.strip() != "" ]
+
+def CheckRender( directory, syncSeconds, verbose ):
+    ''' Frames rendered by FakeBlender must each include their sync '''
+    problems = []
+    metricsDirectory = os.path.join( directory, "metrics" )
+    sceneFile = os.path.join( directory, "shot.blend" )
+    with open( sceneFile, "w" ) as f:
+        f.write( "fake scene" )
+
+    worker = FakeWorker( os.path.join( directory, "worker" ), { "WriteFrameMetrics": "True", "FrameMetricsDirectory": metricsDirectory },
+        { "FAKE_BLENDER_SYNC_SECONDS": syncSeconds, "FAKE_BLENDER_FRAME_SECONDS": syncSeconds / 2 } )
+    results = worker.RunJob( { "SceneFile": sceneFile, "OutputFile": os.path.join( directory, "out", "shot_####.png" ) }, [ [ 1, 2, 3 ] ], "timingjob" )
+    Expect( problems, "render errors", [ result.error for result in results ], [ "" ] )
+
+    records = ReadRecords( os.path.join( metricsDirectory, "timingjob.jsonl" ) )
+    Expect( problems, "frames recorded", [ record["frame"] for record in records ], [ 1, 2, 3 ] )
+    for record in records:
+        if verbose:
+            print( "frame %d: %.2fs wall time, %.2fs before its first sample, %.2fs render time" % ( record["frame"], record["wallTime"], record["setupTime"], record["renderTime"] ) )
+        if record["setupTime"] < syncSeconds or record["wallTime"] < syncSeconds * 1.5:
+            problems.append( "frame %d: the %.2fs sync is missing from its %.2fs wall time and %.2fs setup time" % ( record["frame"], syncSeconds, record["wallTime"], record["setupTime"] ) )
+    return problems
+
+def CheckProbe( directory, syncSeconds, verbose ):
+    ''' Probe tasks must count the sync of their frame per frame and the scene load once '''
+    problems = []
+    sceneFile = os.path.join( directory, "probe.blend" )
+    with open( sceneFile, "w" ) as f:
+        f.write( "fake scene" )
+
+    frameSeconds = syncSeconds * 1.5
+    loadSeconds = syncSeconds * 2
+    worker = FakeWorker( os.path.join( directory, "probe" ), {},
+        { "FAKE_BLENDER_LOAD_SECONDS": loadSeconds, "FAKE_BLENDER_SYNC_SECONDS": syncSeconds, "FAKE_BLENDER_FRAME_SECONDS": syncSeconds / 2 } )
+    pluginInfo = { "SceneFile": sceneFile, "OutputFile": os.path.join( directory, "probe", "shot_####.png" ), "AdaptiveChunkProbe": "True", "AdaptiveChunkJobId": "mainjob" }
+    results = worker.RunJob( pluginInfo, [ [ 1 ], [ 50 ], [ 100 ] ], "probejob" )
+    Expect( problems, "probe errors", [ result.error for result in results ], [ "", "", "" ] )
+
+    timingFiles = glob.glob( os.path.join( RepositoryUtils.auxiliaryDirectory, "probejob", TimingFilePattern % "*" ) )
+    startupSeconds, estimatedSeconds = EstimateTiming( ReadTimingRecords( timingFiles ) )
+    if verbose:
+        print( "probe: %.2fs startup, %.2fs per frame for a %.2fs load and %.2fs frames" % ( startupSeconds, estimatedSeconds, loadSeconds, frameSeconds ) )
+    if estimatedSeconds < frameSeconds * 0.9:
+        problems.append( "probe: %.2fs per frame is missing the %.2fs sync of the %.2fs frames" % ( estimatedSeconds, syncSeconds, frameSeconds ) )
+    if startupSeconds < loadSeconds * 0.9:
+        problems.append( "probe: the %.2fs startup is missing the %.2fs scene load" % ( startupSeconds, loadSeconds ) )
+
+    # A task of the chunk size the probe gives must fit in the target, with some slack for the fakes
+    targetSeconds = startupSeconds + 6 * frameSeconds
+    chunkSize = GetAdaptiveChunkSize( startupSeconds, estimatedSeconds, 100, targetSeconds )
+    results = worker.RunJob( dict( pluginInfo, AdaptiveChunkProbe="False" ), [ list( range( 1, chunkSize + 1 ) ) ], "chunkjob" )
+    if verbose:
+        print( "chunk: %d frames in %.2fs for a %.2fs target" % ( chunkSize, results[0].seconds, targetSeconds ) )
+    if results[0].seconds > targetSeconds * 1.25:
+        problems.append( "chunk: %d frames took %.2fs, more than the %.2fs target" % ( chunkSize, results[0].seconds, targetSeconds ) )
+    return problems
+
+def main():
+    parser = argparse.ArgumentParser( description="Check the wall time the Blender plugin records for every frame." )
+    parser.add_argument( "--sync", type=float, default=0.3, help="seconds the fake Blender syncs every frame" )
+    parser.add_argument( "--check", action="store_true", help="only run the checks, on small inputs and without the timings" )
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp( prefix="blender_timing_" )
+    try:
+        problems = CheckMetrics()
+        problems.extend( CheckRender( directory, max( 0.05, args.sync ), not args.check ) )
+        problems.extend( CheckProbe( directory, max( 0.05, args.sync ), not args.check ) )
+    finally:
+        shutil.rmtree( directory, ignore_errors=True )
+
+    for problem in problems:
+        print( "FAIL %s" % problem )
+    print( "%d problems" % len( problems ) )
+    sys.exit( 1 if problems else 0 )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+# Checks the submission core in BlenderJobs.py without Deadline, and times writing job files.
+#
+#   python tools/CheckJobFiles.py [--jobs 1000] [--check]
+#
+# The job and plugin info of plain, multi-view, preview first, adaptive and region submissions are
+# compared with what the plugin and the event plugins expect, with a fake deadlinecommand that hands
+# out job IDs.
+# A batch of valid, invalid, adaptive and rejected jobs is submitted the way --batch does, checking
+# that it takes two calls and that every job gets its IDs or its failure. Probe and stitch jobs
+# that are rejected must be reported as errors, and the suspended job of a rejected probe resumed. Then --jobs job file pairs
+# are written to a temporary folder to show the cost per job, unless --check is given.
+
+from __future__ import absolute_import
+
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+ToolsDirectory = os.path.dirname( os.path.abspath( __file__ ) )
+sys.path.insert( 0, os.path.join( ToolsDirectory, "..", "repoFolder", "plugins", "Blender" ) )
+
+from BlenderJobs import BlenderJob, FormatBatchReport, GetJobInfo, GetMultipleJobArguments, GetOutputPattern, GetPluginInfo, PadOutputFile, SplitMultipleJobOutput, Submit, SubmissionError, SubmitBatch, ValidateJob, WriteJobFiles
+
+class FakeDeadline( object ):
+    ''' Records the submitted jobs and answers like deadlinecommand '''
+    def __init__( self, rejected=() ):
+        self.jobs = []
+        self.resumed = []
+        # Jobs whose name starts with "rejected" or contains one of these are rejected
+        self.rejected = rejected
+
+    def Rejects( self, job ):
+        return job.name.startswith( "rejected" ) or any( part in job.name for part in self.rejected )
+
+    def SubmitJob( self, job ):
+        if self.Rejects( job ):
+            return "Result=Failure\nError: the pool \"%s\" does not exist\n" % job.pool
+        self.jobs.append( ( ParseLines( GetJobInfo( job ) ), ParseLines( GetPluginInfo( job ) ) ) )
+        return "Result=Success\nJobID=job%d\n" % len( self.jobs )
+
+    def ResumeJob( self, jobId ):
+        self.resumed.append( jobId )
+        return "Success\n"
+
+    def SubmitJobs( self, jobs ):
+        ''' Answers like "deadlinecommand -SubmitMultipleJobs" '''
+        output = [ "Submitting to Repository: /repository", "Submission Contains %d Jobs:" % len( jobs ) ]
+        for job in jobs:
+            if self.Rejects( job ):
+                output.extend( [ "Result=Failure", "Error: the pool \"%s\" does not exist" % job.pool ] )
+            else:
+                output.extend( [ self.SubmitJob( job ).strip(), "The job was submitted successfully." ] )
+        self.calls = getattr( self, "calls", 0 ) + 1
+        return SplitMultipleJobOutput( "\n".join( output ), len( jobs ) )
+
+def ParseLines( lines ):
+    return dict( line.split( "=", 1 ) for line in lines )
+
+def Expect( problems, label, actual, expected ):
+    if actual != expected:
+        problems.append( "%s: expected %r, got %r" % ( label, expected, actual ) )
+
+def RunChecks( directory ):
+    problems = []
+    sceneFile = os.path.join( directory, "shot.blend" )
+    open( sceneFile, "w" ).close()
+    base = BlenderJob( name="shot", sceneFile=sceneFile, frames="1-10", outputFile=os.path.join( directory, "shot.png" ), version="4.1.2", requireVersion=True, limitGroups="gpu" )
+
+    Expect( problems, "padding", PadOutputFile( "/r/shot.png" ), "/r/shot####.png" )
+    Expect( problems, "padded", PadOutputFile( "/r/shot_##.png" ), "/r/shot_##.png" )
+    Expect( problems, "pattern", GetOutputPattern( "/r/v2/shot_0001.png" ), "/r/v2/shot_####.png" )
+    Expect( problems, "pattern without digits", GetOutputPattern( "/r/shot.exr" ), "/r/shot####.exr" )
+
+    Expect( problems, "valid job", ValidateJob( base ), [] )
+    Expect( problems, "missing scene", len( ValidateJob( base.Copy( sceneFile=sceneFile + ".missing" ) ) ), 1 )
+    Expect( problems, "bad frames", len( ValidateJob( base.Copy( frames="1-x" ) ) ), 1 )
+    Expect( problems, "bad frames per task", [ len( ValidateJob( base.Copy( chunkSize=value ) ) ) for value in ( "x", "", None, 0, "4" ) ], [ 1, 1, 1, 1, 0 ] )
+    Expect( problems, "bad region rows", len( ValidateJob( base.Copy( frames="7", regionRendering=True, regionRows="two" ) ) ), 1 )
+    Expect( problems, "views without output", len( ValidateJob( base.Copy( outputFile="", cameras="CamA" ) ) ), 1 )
+    Expect( problems, "region with frames", len( ValidateJob( base.Copy( regionRendering=True ) ) ), 1 )
+    try:
+        BlenderJob( frame="1" )
+        problems.append( "unknown field: no error" )
+    except SubmissionError:
+        pass
+
+    fake = FakeDeadline()
+    result = Submit( base, fake.SubmitJob )
+    Expect( problems, "plain result", ( result.output.splitlines()[-1], result.jobIds ), ( "JobID=job1", [ "job1" ] ) )
+    jobInfo, pluginInfo = fake.jobs[0]
+    Expect( problems, "limits", jobInfo["LimitGroups"], "gpu,blender-4-1" )
+    Expect( problems, "output", pluginInfo["OutputFile"], os.path.join( directory, "shot####.png" ) )
+    Expect( problems, "version", pluginInfo["Version"], "4.1" )
+
+    fake = FakeDeadline()
+    Submit( base.Copy( cameras="CamA, CamB", viewLayers="ViewLayer,Background" ), fake.SubmitJob )
+    Expect( problems, "views", ( fake.jobs[0][1]["Cameras"], fake.jobs[0][1]["ViewLayers"] ), ( "CamA,CamB", "ViewLayer,Background" ) )
+
+    fake = FakeDeadline()
+    Submit( base.Copy( previewFirst=True ), fake.SubmitJob )
+    Expect( problems, "preview order", fake.jobs[0][0]["Frames"], "1,10,5,3,7,2,4,6,8-9" )
+
+    fake = FakeDeadline()
+    result = Submit( base.Copy( adaptiveChunking=True, chunkSize=4 ), fake.SubmitJob )
+    ( mainInfo, mainPlugin ), ( probeInfo, probePlugin ) = fake.jobs
+    Expect( problems, "adaptive job IDs", result.jobIds, [ "job1", "job2" ] )
+    Expect( problems, "adaptive main frames", ( mainInfo["Frames"], mainInfo["InitialStatus"], mainInfo["ChunkSize"] ), ( "2-4,6-9", "Suspended", "4" ) )
+    Expect( problems, "adaptive probe", ( probeInfo["Frames"], probeInfo["ChunkSize"], probeInfo["EventOptIns"], probePlugin["AdaptiveChunkJobId"] ), ( "1,5,10", "1", "BlenderAdaptiveChunking", "job1" ) )
+    Expect( problems, "adaptive batch", ( mainInfo["BatchName"], probeInfo["BatchName"] ), ( "shot", "shot" ) )
+
+    # A rejected probe must not leave the main job suspended, nor report success
+    fake = FakeDeadline( rejected=( "(probe)", ) )
+    result = Submit( base.Copy( adaptiveChunking=True, chunkSize=4 ), fake.SubmitJob, fake.ResumeJob )
+    Expect( problems, "rejected probe", ( result.jobIds, fake.resumed, len( result.errors ) ), ( [ "job1" ], [ "job1" ], 1 ) )
+    Expect( problems, "rejected probe output", "Error: shot (probe) could not be submitted, job job1 was resumed with 4 frames per task" in result.output, True )
+    fake = FakeDeadline( rejected=( "(probe)", ) )
+    result = Submit( base.Copy( adaptiveChunking=True ), fake.SubmitJob )
+    Expect( problems, "rejected probe without resume", "job job1 is still suspended" in result.output, True )
+    fake = FakeDeadline( rejected=( "(probe)", ) )
+    result = Submit( base.Copy( adaptiveChunking=True, submitSuspended=True ), fake.SubmitJob, fake.ResumeJob )
+    Expect( problems, "rejected probe of a suspended submission", ( fake.resumed, len( result.errors ) ), ( [], 1 ) )
+    fake = FakeDeadline( rejected=( "(stitch)", ) )
+    result = Submit( base.Copy( frames="7", regionRendering=True ), fake.SubmitJob, fake.ResumeJob )
+    Expect( problems, "rejected stitch", ( result.jobIds, fake.resumed, result.errors ), ( [ "job1" ], [], [ "shot (stitch) could not be submitted, job job1 was submitted without it" ] ) )
+
+    fake = FakeDeadline()
+    Submit( base.Copy( frames="7", regionRendering=True, regionColumns=3, regionRows=2, dependencies="other" ), fake.SubmitJob )
+    ( regionInfo, regionPlugin ), ( stitchInfo, stitchPlugin ) = fake.jobs
+    Expect( problems, "region job", ( regionInfo["Frames"], regionPlugin["RegionFrame"], regionPlugin["RegionColumns"] ), ( "0-5", "7", "3" ) )
+    Expect( problems, "stitch job", ( stitchInfo["Frames"], stitchInfo["JobDependencies"], stitchPlugin["RegionStitch"] ), ( "7", "other,job1", "True" ) )
+
+    fake = FakeDeadline()
+    batch = [ base.Copy( name="shot%d" % index ) for index in range( 3 ) ]
+    batch += [ base.Copy( name="broken", frames="x" ), base.Copy( name="adaptive", adaptiveChunking=True ), base.Copy( name="rejected", pool="nope" ) ]
+    results = SubmitBatch( batch, fake.SubmitJobs, "lookdev" )
+    Expect( problems, "batch calls", fake.calls, 2 )
+    Expect( problems, "batch ids", [ result.jobIds for result in results ], [ [ "job1" ], [ "job2" ], [ "job3" ], [], [ "job4", "job5" ], [] ] )
+    Expect( problems, "batch failures", [ len( result.problems ) for result in results ], [ 0, 0, 0, 1, 0, 1 ] )
+    Expect( problems, "batch name", set( jobInfo["BatchName"] for jobInfo, pluginInfo in fake.jobs ), set( [ "lookdev" ] ) )
+    Expect( problems, "probe refers to main", fake.jobs[4][1]["AdaptiveChunkJobId"], "job4" )
+    Expect( problems, "rejection reported", "does not exist" in results[5].problems[0], True )
+    Expect( problems, "report", FormatBatchReport( results ).splitlines()[-1], "4 of 6 submissions succeeded, 2 failed" )
+
+    fake = FakeDeadline( rejected=( "(probe)", ) )
+    results = SubmitBatch( [ base.Copy( name="plain" ), base.Copy( name="adaptive", adaptiveChunking=True ) ], fake.SubmitJobs, resumeJob=fake.ResumeJob )
+    Expect( problems, "batch rejected probe", ( [ result.jobIds for result in results ], [ len( result.problems ) for result in results ], fake.resumed ), ( [ [ "job1" ], [ "job2" ] ], [ 0, 2 ], [ "job2" ] ) )
+
+    Expect( problems, "failed call", SplitMultipleJobOutput( "Error: could not connect to the repository", 2 ), [ "Error: could not connect to the repository" ] * 2 )
+    Expect( problems, "arguments", GetMultipleJobArguments( [ ( "a.job", "b.job", [] ), ( "c.job", "d.job", [ "s.blend" ] ) ] ), [ "-SubmitMultipleJobs", "-job", "a.job", "b.job", "-job", "c.job", "d.job", "s.blend" ] )
+
+    return problems
+
+def TimeWriting( directory, count ):
+    job = BlenderJob( name="shot", sceneFile="/projects/shot.blend", frames="1-250", outputFile="/renders/shot_####.exr", version="4.1" )
+    started = time.time()
+    for index in range( count ):
+        WriteJobFiles( job.Copy( name="shot_%04d" % index ), directory, "shot_%04d" % index )
+    seconds = time.time() - started
+    print( "%d job file pairs written in %.3fs, %.3f ms per job" % ( count, seconds, seconds * 1000.0 / max( 1, count ) ) )
+
+def main():
+    parser = argparse.ArgumentParser( description="Check the Blender submission core and time writing job files." )
+    parser.add_argument( "--jobs", type=int, default=1000, help="job file pairs to write" )
+    parser.add_argument( "--check", action="store_true", help="only run the checks, on small inputs and without the timings" )
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp( prefix="blender_jobs_" )
+    try:
+        problems = RunChecks( directory )
+        if not args.check:
+            TimeWriting( directory, args.jobs )
+    finally:
+        shutil.rmtree( directory, ignore_errors=True )
+
+    for problem in problems:
+        print( "FAIL %s" % problem )
+    print( "%d problems" % len( problems ) )
+    sys.exit( 1 if problems else 0 )
+
+if __name__ == "__main__":
+    main()
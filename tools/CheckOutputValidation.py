@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+# Checks the output validation and previews of BlenderOutputs.py without Blender, and times them.
+#
+#   python tools/CheckOutputValidation.py [--width 1920 --height 1080 --frames 8] [--check]
+#
+# Frames are written as PNG files with every row filter and as OpenEXR files with every compression
+# the previews read, each with a known gradient, and their previews are compared with a box filtered
+# copy of the gradient. Truncated, empty, damaged and suspiciously small frames must be reported,
+# and validation must stop at the first invalid frame. --check uses two small frames and doesn't
+# print the timings. Needs NumPy.
+
+from __future__ import absolute_import, division
+
+import argparse
+import os
+import shutil
+import struct
+import sys
+import tempfile
+import time
+import zlib
+
+import numpy
+
+ToolsDirectory = os.path.dirname( os.path.abspath( __file__ ) )
+sys.path.insert( 0, os.path.join( ToolsDirectory, "..", "repoFolder", "plugins", "Blender" ) )
+
+from BlenderOutputs import GetPreviewPath, ReadImageHeader, ValidateFrameOutputs, ValidateImageFile, WritePreview, WritePreviews
+
+def Gradient( width, height ):
+    ''' RGB values from 0 to 1 that differ in every row and column '''
+    x = numpy.linspace( 0, 1, width, dtype=numpy.float32 ).reshape( 1, -1 )
+    y = numpy.linspace( 0, 1, height, dtype=numpy.float32 ).reshape( -1, 1 )
+    return numpy.stack( [ x * y * 0 + x, y + x * 0, ( x + y ) / 2 ], axis=2 )
+
+def PngChunk( chunkType, data ):
+    return struct.pack( ">I", len( data ) ) + chunkType + data + struct.pack( ">I", zlib.crc32( chunkType + data ) & 0xFFFFFFFF )
+
+def FilterRow( filterType, row, previous, bytesPerPixel ):
+    row = row.astype( numpy.int32 )
+    previous = previous.astype( numpy.int32 )
+    left = numpy.concatenate( ( numpy.zeros( bytesPerPixel, numpy.int32 ), row[:-bytesPerPixel] ) )
+    upLeft = numpy.concatenate( ( numpy.zeros( bytesPerPixel, numpy.int32 ), previous[:-bytesPerPixel] ) )
+    if filterType == 0:
+        predicted = 0
+    elif filterType == 1:
+        predicted = left
+    elif filterType == 2:
+        predicted = previous
+    elif filterType == 3:
+        predicted = ( left + previous ) // 2
+    else:
+        estimate = left + previous - upLeft
+        distances = numpy.stack( [ abs( estimate - left ), abs( estimate - previous ), abs( estimate - upLeft ) ] )
+        choice = numpy.where( ( distances[0] <= distances[1] ) & ( distances[0] <= distances[2] ), 0, numpy.where( distances[1] <= distances[2], 1, 2 ) )
+        predicted = numpy.choose( choice, [ left, previous, upLeft ] )
+    return bytes( [ filterType ] ) + ( ( row - predicted ) & 0xFF ).astype( numpy.uint8 ).tobytes()
+
+def WritePng( path, image, bitDepth=8 ):
+    ''' RGBA PNG cycling through the five row filters '''
+    height, width = image.shape[:2]
+    rgba = numpy.concatenate( ( image, numpy.ones( ( height, width, 1 ), numpy.float32 ) ), axis=2 )
+    if bitDepth == 16:
+        rows = numpy.round( rgba * 65535 ).astype( ">u2" ).reshape( height, -1 ).view( numpy.uint8 )
+    else:
+        rows = numpy.round( rgba * 255 ).astype( numpy.uint8 ).reshape( height, -1 )
+    bytesPerPixel = 4 * bitDepth // 8
+    previous = numpy.zeros( rows.shape[1], numpy.uint8 )
+    data = b""
+    for index in range( height ):
+        data += FilterRow( index % 5, rows[index], previous, bytesPerPixel )
+        previous = rows[index]
+    with open( path, "wb" ) as f:
+        f.write( b"\x89PNG\r\n\x1a\n" + PngChunk( b"IHDR", struct.pack( ">IIBBBBB", width, height, bitDepth, 6, 0, 0, 0 ) ) )
+        compressed = zlib.compress( data )
+        for start in range( 0, len( compressed ), 65536 ):
+            f.write( PngChunk( b"IDAT", compressed[start:start + 65536] ) )
+        f.write( PngChunk( b"IEND", b"" ) )
+
+def ExrAttribute( name, typeName, data ):
+    return name + b"\x00" + typeName + b"\x00" + struct.pack( "<i", len( data ) ) + data
+
+def CompressExrBlock( compression, data ):
+    size = len( data )
+    raw = numpy.frombuffer( data, numpy.uint8 )
+    split = numpy.concatenate( ( raw[0::2], raw[1::2] ) )
+    deltas = split.astype( numpy.int32 )
+    deltas[1:] = ( split[1:].astype( numpy.int32 ) - split[:-1].astype( numpy.int32 ) + 128 ) & 0xFF
+    predicted = deltas.astype( numpy.uint8 ).tobytes()
+    if compression == 1:
+        encoded = b""
+        for start in range( 0, size, 127 ):
+            run = predicted[start:start + 127]
+            encoded += struct.pack( "b", -len( run ) ) + run
+    else:
+        encoded = zlib.compress( predicted )
+    return encoded if len( encoded ) < size else data
+
+def WriteExr( path, image, compression, layer="" ):
+    ''' Half float scanline OpenEXR with the channels of image as (layer.)B, G, R '''
+    height, width = image.shape[:2]
+    prefix = layer + "." if layer != "" else ""
+    names = [ prefix + "B", prefix + "G", prefix + "R" ]
+    channelData = b"".join( name.encode() + b"\x00" + struct.pack( "<iB3xii", 1, 0, 1, 1 ) for name in names ) + b"\x00"
+    header = struct.pack( "<II", 20000630, 2 )
+    header += ExrAttribute( b"channels", b"chlist", channelData )
+    header += ExrAttribute( b"compression", b"compression", struct.pack( "<B", compression ) )
+    header += ExrAttribute( b"dataWindow", b"box2i", struct.pack( "<iiii", 0, 0, width - 1, height - 1 ) )
+    header += ExrAttribute( b"displayWindow", b"box2i", struct.pack( "<iiii", 0, 0, width - 1, height - 1 ) )
+    header += ExrAttribute( b"lineOrder", b"lineOrder", b"\x00" ) + b"\x00"
+
+    linesPerBlock = { 0: 1, 1: 1, 2: 1, 3: 16 }[compression]
+    linear = image ** 2.2
+    blocks = []
+    for top in range( 0, height, linesPerBlock ):
+        lines = linear[top:top + linesPerBlock]
+        data = b"".join( b"".join( lines[line, :, 2 - index].astype( "<f2" ).tobytes() for index in range( 3 ) ) for line in range( lines.shape[0] ) )
+        if compression != 0:
+            data = CompressExrBlock( compression, data )
+        blocks.append( struct.pack( "<ii", top, len( data ) ) + data )
+
+    offset = len( header ) + 8 * len( blocks )
+    offsets = []
+    for block in blocks:
+        offsets.append( offset )
+        offset += len( block )
+    with open( path, "wb" ) as f:
+        f.write( header + struct.pack( "<%dQ" % len( offsets ), *offsets ) + b"".join( blocks ) )
+
+def BoxFilter( image, factor ):
+    height, width = image.shape[:2]
+    shape = ( -( -height // factor ), factor, -( -width // factor ), factor, image.shape[2] )
+    padded = numpy.zeros( ( shape[0] * factor, shape[2] * factor, image.shape[2] ), numpy.float32 )
+    counts = numpy.zeros( padded.shape, numpy.float32 )
+    padded[:height, :width] = image
+    counts[:height, :width] = 1
+    return padded.reshape( shape ).sum( axis=( 1, 3 ) ) / counts.reshape( shape ).sum( axis=( 1, 3 ) )
+
+def ReadPreview( path ):
+    ''' The samples of a preview PNG, which has no row filters '''
+    with open( path, "rb" ) as f:
+        data = f.read()
+    width, height, bitDepth, colorType = struct.unpack( ">IIBB", data[16:26] )
+    idat = b""
+    position = 8
+    while position < len( data ):
+        length, chunkType = struct.unpack( ">I4s", data[position:position + 8] )
+        if chunkType == b"IDAT":
+            idat += data[position + 8:position + 8 + length]
+        position += 12 + length
+    rows = numpy.frombuffer( zlib.decompress( idat ), numpy.uint8 ).reshape( height, -1 )[:, 1:]
+    return rows.reshape( height, width, -1 ).astype( numpy.float32 ) / 255
+
+def Expect( problems, label, actual, expected ):
+    if actual != expected:
+        problems.append( "%s: expected %r, got %r" % ( label, expected, actual ) )
+
+def RunChecks( directory, width, height, frames, threads, verbose=True ):
+    problems = []
+    image = Gradient( width, height )
+    factor = -( -max( width, height ) // 256 )
+    expected = BoxFilter( image, factor )
+
+    cases = [ ( "png8", lambda path: WritePng( path, image ), ".png", expected ),
+              ( "png16", lambda path: WritePng( path, image, 16 ), ".png", expected ) ]
+    for compression, name in ( ( 0, "none" ), ( 1, "rle" ), ( 2, "zips" ), ( 3, "zip" ) ):
+        cases.append( ( "exr_" + name, lambda path, compression=compression: WriteExr( path, image, compression, "ViewLayer.Combined" ), ".exr", None ) )
+
+    for name, write, extension, expectedPreview in cases:
+        pattern = os.path.join( directory, name, "shot_####" + extension )
+        os.makedirs( os.path.dirname( pattern ) )
+        for frame in range( 1, frames + 1 ):
+            write( pattern.replace( "####", "%04d" % frame ) )
+
+        started = time.time()
+        results = ValidateFrameOutputs( pattern, list( range( 1, frames + 1 ) ), threads )
+        validated = time.time() - started
+        Expect( problems, "%s valid" % name, [ problem for frame, path, problem in results ], [ "" ] * frames )
+
+        started = time.time()
+        previews = WritePreviews( results, threads )
+        previewed = time.time() - started
+        Expect( problems, "%s previews" % name, [ problem for frame, preview, problem in previews ], [ "" ] * frames )
+        if verbose:
+            print( "%-9s %d frames of %dx%d: validated in %.3fs, previews in %.2fs (%.3fs per frame)" % ( name, frames, width, height, validated, previewed, previewed / frames ) )
+
+        if previews[0][1] is not None:
+            preview = ReadPreview( previews[0][1].previewPath )
+            reference = expected if expectedPreview is not None else EncodeReference( BoxFilter( image ** 2.2, factor ) )
+            Expect( problems, "%s preview size" % name, preview.shape, reference.shape )
+            if preview.shape == reference.shape:
+                error = float( numpy.abs( preview - reference ).max() )
+                if error > 2.5 / 255:
+                    problems.append( "%s preview differs by %.4f" % ( name, error ) )
+
+    header = ReadImageHeader( os.path.join( directory, "exr_zip", "shot_0001.exr" ) )
+    Expect( problems, "exr header", ( header.width, header.height, header.compression, header.channels ), ( width, height, "ZIP", [ "ViewLayer.Combined.B", "ViewLayer.Combined.G", "ViewLayer.Combined.R" ] ) )
+
+    # Damaged outputs
+    pattern = os.path.join( directory, "damaged", "shot_####.exr" )
+    os.makedirs( os.path.dirname( pattern ) )
+    noise = numpy.random.RandomState( 1 ).rand( height, width, 3 ).astype( numpy.float32 )
+    for frame in range( 1, 11 ):
+        WriteExr( pattern.replace( "####", "%04d" % frame ), noise, 3 )
+    framePath = pattern.replace( "####", "%04d" )
+    with open( framePath % 3, "r+b" ) as f:
+        f.truncate( os.path.getsize( framePath % 3 ) - 100 )
+    with open( framePath % 5, "r+b" ) as f:
+        f.seek( 20 )
+        f.write( b"\xff" * 8 )
+    os.remove( framePath % 7 )
+    Expect( problems, "truncated exr", ValidateImageFile( framePath % 3 ), "truncated" )
+    Expect( problems, "damaged header", ValidateImageFile( framePath % 5 ).startswith( "invalid header" ), True )
+    WriteExr( framePath % 9, numpy.zeros( ( height, width, 3 ), numpy.float32 ), 3 )
+    results = dict( ( frame, problem ) for frame, path, problem in ValidateFrameOutputs( pattern, list( range( 1, 11 ) ), 1 ) )
+    Expect( problems, "fails fast", sorted( results ), [ 1, 2, 3 ] )
+    Expect( problems, "missing", ValidateFrameOutputs( pattern, [ 7 ], threads )[0][2], "missing" )
+    results = dict( ( frame, problem ) for frame, path, problem in ValidateFrameOutputs( pattern, [ 9, 10 ], threads ) )
+    Expect( problems, "small frame", results.get( 9, "" ).startswith( "only" ), True )
+    Expect( problems, "black preview", WritePreview( framePath % 9, GetPreviewPath( framePath % 9 ) ).IsBlack(), True )
+
+    pngPath = os.path.join( directory, "png8", "shot_0002.png" )
+    with open( pngPath, "r+b" ) as f:
+        f.truncate( os.path.getsize( pngPath ) // 2 )
+    Expect( problems, "truncated png", ValidateImageFile( pngPath ), "truncated" )
+    return problems
+
+def EncodeReference( linear ):
+    return numpy.where( linear <= 0.0031308, linear * 12.92, 1.055 * numpy.power( numpy.maximum( linear, 0.0031308 ), 1 / 2.4 ) - 0.055 )
+
+def main():
+    parser = argparse.ArgumentParser( description="Check the output validation and previews of the Blender plugin." )
+    parser.add_argument( "--width", type=int, default=1920 )
+    parser.add_argument( "--height", type=int, default=1080 )
+    parser.add_argument( "--frames", type=int, default=8 )
+    parser.add_argument( "--threads", type=int, default=8 )
+    parser.add_argument( "--check", action="store_true", help="only run the checks, on small inputs and without the timings" )
+    args = parser.parse_args()
+    if args.check:
+        args.width, args.height, args.frames = 320, 180, 2
+
+    directory = tempfile.mkdtemp( prefix="blender_outputs_" )
+    try:
+        problems = RunChecks( directory, args.width, args.height, args.frames, args.threads, not args.check )
+    finally:
+        shutil.rmtree( directory, ignore_errors=True )
+
+    for problem in problems:
+        print( "FAIL %s" % problem )
+    print( "%d problems" % len( problems ) )
+    sys.exit( 1 if problems else 0 )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+# Checks BlenderPathRemap.py against the fake bpy, without Deadline or Blender.
+#
+#   python tools/CheckPathRemap.py [--check]
+#
+# A scene rendered from the cache links data from two libraries: one with a relative path, whose
+# linked image can't be edited and has a path relative to the library, and one with a local copy,
+# whose linked image can be edited and has a local copy too. Reloading a library reads its linked
+# data again, discarding the paths set before. After the remap every path must resolve the way
+# Blender resolves it, the first library must be read from its original location, the second one
+# and its image from their local copies, the relative output paths must be absolute against the
+# scene's original folder, and the one missing texture must be reported with a warning.
+
+from __future__ import absolute_import
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import runpy
+import shutil
+import sys
+import tempfile
+import types
+
+ToolsDirectory = os.path.dirname( os.path.abspath( __file__ ) )
+sys.path.insert( 0, os.path.join( ToolsDirectory, "fakes" ) )
+
+import bpy
+
+RemapScript = os.path.join( ToolsDirectory, "..", "repoFolder", "plugins", "Blender", "BlenderPathRemap.py" )
+
+class Library( object ):
+    ''' A linked library, reload() reads the paths of the data linked from it from the library file '''
+
+    def __init__( self, name, filepath, parent=None ):
+        self.name = name
+        self.filepath = filepath
+        self.parent = parent
+        self.packed_file = None
+        self.linked = []
+        self.reloads = 0
+
+    def Link( self, item ):
+        item.library = self
+        self.linked.append( ( item, item.filepath ) )
+        return item
+
+    def reload( self ):
+        for item, filepath in self.linked:
+            item.filepath = filepath
+        self.reloads += 1
+
+class Image( object ):
+    def __init__( self, name, filepath, editable=True ):
+        self.name = name
+        self.filepath = filepath
+        self.library = None
+        self.packed_file = None
+        self.is_editable = editable
+
+def Touch( path ):
+    if not os.path.isdir( os.path.dirname( path ) ):
+        os.makedirs( os.path.dirname( path ) )
+    with open( path, "w" ) as f:
+        f.write( "fake" )
+    return path
+
+def Expect( problems, label, actual, expected ):
+    if actual != expected:
+        problems.append( "%s: expected %r, got %r" % ( label, expected, actual ) )
+
+def CheckRemap( directory, verbose ):
+    problems = []
+    project = os.path.join( directory, "project" )
+    cache = os.path.join( directory, "cache" )
+    blendDirectory = os.path.join( project, "shot010" )
+    Touch( os.path.join( blendDirectory, "shot.blend" ) )
+    Touch( os.path.join( blendDirectory, "tex", "floor.png" ) )
+    Touch( os.path.join( project, "lib", "props.blend" ) )
+    Touch( os.path.join( project, "lib", "tex", "wood.png" ) )
+    sets = Touch( os.path.join( project, "lib", "sets.blend" ) )
+    sky = Touch( os.path.join( project, "tex", "sky.png" ) )
+    localSets = Touch( os.path.join( cache, "objects", "sets.blend" ) )
+    localSky = Touch( os.path.join( cache, "objects", "sky.png" ) )
+    localProps = Touch( os.path.join( cache, "objects", "props.blend" ) )
+
+    bpy.Reset( Touch( os.path.join( cache, "objects", "shot.blend" ) ) )
+    scene = bpy.data.scenes[0]
+    scene.render.filepath = "//render/"
+    fileOutput = types.SimpleNamespace( type="OUTPUT_FILE", base_path="//passes/pass_" )
+    scene.node_tree = types.SimpleNamespace( nodes=[ types.SimpleNamespace( type="R_LAYERS" ), fileOutput ] )
+    bpy.data.node_groups = bpy.Collection()
+
+    props = Library( "props.blend", "//../lib/props.blend" )
+    setsLibrary = Library( "sets.blend", sets )
+    wood = props.Link( Image( "wood.png", "//tex/wood.png", editable=False ) )
+    skyImage = setsLibrary.Link( Image( "sky.png", sky ) )
+    floor = Image( "floor.png", "//tex/floor.png" )
+    missing = Image( "missing.png", "//tex/missing.png" )
+    bpy.data.libraries = bpy.Collection( [ props, setsLibrary ] )
+    bpy.data.images = bpy.Collection( [ wood, skyImage, floor, missing ] )
+
+    mapFile = os.path.join( directory, "BlenderPathMap.json" )
+    paths = { os.path.join( project, "lib", "props.blend" ): localProps, sets: localSets, sky: localSky }
+    with open( mapFile, "w" ) as f:
+        json.dump( { "blendDirectory": blendDirectory, "paths": paths }, f )
+
+    output = io.StringIO()
+    arguments = sys.argv
+    sys.argv = [ "blender", "-b", bpy.data.filepath, "--python", RemapScript, "--", mapFile ]
+    try:
+        with contextlib.redirect_stdout( output ):
+            runpy.run_path( RemapScript )
+    finally:
+        sys.argv = arguments
+    lines = output.getvalue().splitlines()
+    if verbose:
+        for line in lines:
+            print( "blender: %s" % line )
+
+    Expect( problems, "props library", props.filepath, os.path.join( project, "lib", "props.blend" ) )
+    Expect( problems, "sets library", setsLibrary.filepath, localSets )
+    Expect( problems, "linked sky image", skyImage.filepath, localSky )
+    Expect( problems, "local floor image", floor.filepath, os.path.join( blendDirectory, "tex", "floor.png" ) )
+    Expect( problems, "render output", scene.render.filepath, os.path.join( blendDirectory, "render" ) + os.sep )
+    Expect( problems, "File Output node", fileOutput.base_path, os.path.join( blendDirectory, "passes", "pass_" ) )
+    for item in list( bpy.data.libraries ) + [ wood, skyImage, floor ]:
+        library = getattr( item, "parent", None ) if isinstance( item, Library ) else item.library
+        path = bpy.path.abspath( item.filepath, library=library )
+        if not os.path.exists( path ):
+            problems.append( "%s: %s doesn't exist" % ( item.name, path ) )
+
+    warnings = [ line for line in lines if line.startswith( "Warning:" ) and "could not resolve" in line ]
+    Expect( problems, "unresolved warnings", [ "missing.png" in line for line in warnings ], [ True ] )
+    return problems
+
+def main():
+    parser = argparse.ArgumentParser( description="Check BlenderPathRemap.py against the fake bpy." )
+    parser.add_argument( "--check", action="store_true", help="only run the checks, without printing the script's output" )
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp( prefix="blender_remap_" )
+    try:
+        problems = CheckRemap( directory, not args.check )
+    finally:
+        shutil.rmtree( directory, ignore_errors=True )
+
+    for problem in problems:
+        print( "FAIL %s" % problem )
+    print( "%d problems" % len( problems ) )
+    sys.exit( 1 if problems else 0 )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+# Checks the Blender plugin's progress parsers against the recorded logs in tools/logs.
+#
+#   python tools/CheckProgressParsers.py [--update | --check] [log ...]
+#
+# Every log starts with Blender's version banner, which selects the parser like the job's Version
+# entry does in the plugin. The events parsed from each log.log are compared with log.golden, a JSON
+# line per event. --update rewrites the golden files, review their diff before committing it.
+# Without log arguments every log in tools/logs is checked. --check only prints the logs that don't
+# match. Exits with 1 when a log doesn't match.
+
+from __future__ import absolute_import
+
+import argparse
+import glob
+import json
+import os
+import sys
+
+ToolsDirectory = os.path.dirname( os.path.abspath( __file__ ) )
+sys.path.insert( 0, os.path.join( ToolsDirectory, "..", "repoFolder", "plugins", "Blender" ) )
+
+from BlenderProgress import GetProgressParser
+
+def ParseLog( log ):
+    with open( log ) as f:
+        lines = f.read().splitlines()
+
+    progressParser = GetProgressParser( lines[0] if len( lines ) > 0 else "" )
+    events = []
+    for number, line in enumerate( lines, 1 ):
+        event = progressParser.Parse( line )
+        if event is None:
+            continue
+
+        values = event.ToDict()
+        for name in ( "fraction", "elapsed", "remaining" ):
+            if name in values:
+                values[name] = round( values[name], 4 )
+        values["line"] = number
+        events.append( json.dumps( values, sort_keys=True ) )
+
+    return progressParser, events
+
+def main():
+    parser = argparse.ArgumentParser( description="Check the Blender progress parsers against the golden logs." )
+    parser.add_argument( "logs", nargs="*", default=sorted( glob.glob( os.path.join( ToolsDirectory, "logs", "*.log" ) ) ) )
+    parser.add_argument( "--update", action="store_true", help="rewrite the golden files from the current parsers" )
+    parser.add_argument( "--check", action="store_true", help="only print the logs that don't match" )
+    args = parser.parse_args()
+    if args.check and args.update:
+        parser.error( "--check and --update can't be combined" )
+
+    problems = []
+    for log in args.logs:
+        progressParser, events = ParseLog( log )
+        goldenFile = os.path.splitext( log )[0] + ".golden"
+        name = os.path.basename( log )
+
+        if args.update:
+            with open( goldenFile, "w" ) as f:
+                f.write( "".join( event + "\n" for event in events ) )
+            print( "%-28s %-8s %5d events written" % ( name, progressParser.Name, len( events ) ) )
+            continue
+
+        if not os.path.isfile( goldenFile ):
+            problems.append( "%s has no golden file, run with --update" % name )
+            continue
+
+        with open( goldenFile ) as f:
+            golden = f.read().splitlines()
+
+        if golden == events:
+            if not args.check:
+                print( "%-28s %-8s %5d events ok" % ( name, progressParser.Name, len( events ) ) )
+            continue
+
+        problems.append( "%s with the %s parser, %d events expected, %d parsed" % ( name, progressParser.Name, len( golden ), len( events ) ) )
+        for index in range( max( len( golden ), len( events ) ) ):
+            expected = golden[index] if index < len( golden ) else "<none>"
+            actual = events[index] if index < len( events ) else "<none>"
+            if expected != actual:
+                print( "  first difference at event %d\n    expected: %s\n    parsed:   %s" % ( index + 1, expected, actual ) )
+                break
+
+    for problem in problems:
+        print( "FAIL %s" % problem )
+    print( "%d problems" % len( problems ) )
+    sys.exit( 1 if problems else 0 )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+# Checks region rendering and stitching with synthetic images, without Deadline or Blender.
+#
+#   python tools/CheckRegionStitch.py [--width 1999] [--height 1001] [--grids 1x1 2x2 3x5 7x4] [--strip-rows 64] [--check]
+#
+# For every grid, a random 16 bit RGBA frame (and an 8 bit RGB and a float one) is cut into the
+# regions GetRegions gives, each written as an uncompressed TIFF with its JSON sidecar as
+# BlenderRegionDriver.py would. The regions are stitched into a PNG and a TIFF, which are read back
+# and compared with the original frame pixel for pixel. The render border of every region is
+# checked to cover exactly its pixels the way Blender rounds it. --check uses a 199x101 frame and
+# doesn't print the timings. Needs NumPy.
+
+from __future__ import absolute_import, division
+
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import zlib
+
+import numpy
+
+ToolsDirectory = os.path.dirname( os.path.abspath( __file__ ) )
+sys.path.insert( 0, os.path.join( ToolsDirectory, "..", "repoFolder", "plugins", "Blender" ) )
+
+from BlenderRegions import GetBlenderBorder, GetRegions, RegionFilePattern, StitchRegions, TiffImage, TiffWriter, WriteRegionRecord
+
+def ReadPng( path, width, samples, dtype ):
+    ''' The pixels of a PNG the stitch wrote, which only uses filter type 0 '''
+    with open( path, "rb" ) as f:
+        data = f.read()
+
+    position = 8
+    compressed = []
+    while position < len( data ):
+        length = int.from_bytes( data[position:position + 4], "big" )
+        if data[position + 4:position + 8] == b"IDAT":
+            compressed.append( data[position + 8:position + 8 + length] )
+        position += length + 12
+
+    raw = numpy.frombuffer( zlib.decompress( b"".join( compressed ) ), numpy.uint8 )
+    rowBytes = 1 + width * samples * dtype.itemsize
+    rows = raw.reshape( -1, rowBytes )
+    if ( rows[:, 0] != 0 ).any():
+        raise ValueError( "unexpected PNG filter type" )
+    return rows[:, 1:].copy().view( dtype.newbyteorder( ">" ) ).reshape( rows.shape[0], width, samples )
+
+def CheckBorders( width, height, columns, rows ):
+    ''' Blender renders the pixels whose index is in [int(min * size), int(max * size)) '''
+    problems = []
+    for region in GetRegions( width, height, columns, rows ):
+        minX, maxX, minY, maxY = GetBlenderBorder( region, width, height )
+        bottom = height - region.y - region.height
+        covered = ( int( minX * width ), int( maxX * width ), int( minY * height ), int( maxY * height ) )
+        if covered != ( region.x, region.x + region.width, bottom, bottom + region.height ):
+            problems.append( "region %d of %dx%d: border covers %s" % ( region.index, columns, rows, covered ) )
+    return problems
+
+def CheckStitch( frame, columns, rows, stripRows, directory, verbose=True ):
+    height, width, samples = frame.shape
+    regionDirectory = os.path.join( directory, "regions_%dx%d_%s" % ( columns, rows, frame.dtype.name ) )
+    os.makedirs( regionDirectory )
+    for region in GetRegions( width, height, columns, rows ):
+        writer = TiffWriter( os.path.join( regionDirectory, RegionFilePattern % region.index + ".tif" ), region.width, region.height, samples, frame.dtype.itemsize * 8 )
+        writer.WriteRows( frame[region.y:region.y + region.height, region.x:region.x + region.width] )
+        writer.Close()
+        WriteRegionRecord( regionDirectory, region, width, height )
+
+    problems = []
+    extensions = [ ".tif" ] if frame.dtype.kind == "f" else [ ".png", ".tif" ]
+    for extension in extensions:
+        outputFile = os.path.join( directory, "stitched_%dx%d_%s%s" % ( columns, rows, frame.dtype.name, extension ) )
+        report = StitchRegions( regionDirectory, columns, rows, outputFile, stripRows )
+        if extension == ".png":
+            stitched = ReadPng( outputFile, width, samples, frame.dtype )
+        else:
+            image = TiffImage( outputFile )
+            stitched = image.ReadRows( 0, image.height )
+            image.Close()
+
+        matches = stitched.shape == frame.shape and numpy.array_equal( stitched, frame )
+        if verbose:
+            print( "%-6s %5s %-8s %4d regions %8.3fs %8.1f MB written %6.2f MB largest strip %s" % ( "%dx%d" % ( columns, rows ), extension, frame.dtype.name, report.regions, report.seconds, report.bytesWritten / 1048576.0, report.stripBytes / 1048576.0, "ok" if matches else "MISMATCH" ) )
+        if not matches:
+            problems.append( "%dx%d %s %s differs from the original frame" % ( columns, rows, frame.dtype.name, extension ) )
+    return problems
+
+def main():
+    parser = argparse.ArgumentParser( description="Stitch synthetic regions and compare them with the original frame." )
+    parser.add_argument( "--width", type=int, default=1999 )
+    parser.add_argument( "--height", type=int, default=1001 )
+    parser.add_argument( "--grids", nargs="+", default=[ "1x1", "2x2", "3x5", "7x4" ], help="COLUMNSxROWS" )
+    parser.add_argument( "--strip-rows", type=int, default=64 )
+    parser.add_argument( "--check", action="store_true", help="only run the checks, on small inputs and without the timings" )
+    args = parser.parse_args()
+    if args.check:
+        args.width, args.height = 199, 101
+
+    generator = numpy.random.default_rng( 0 )
+    frames = [
+        generator.integers( 0, 65536, ( args.height, args.width, 4 ), dtype=numpy.uint16 ),
+        generator.integers( 0, 256, ( args.height, args.width, 3 ), dtype=numpy.uint8 ),
+        generator.random( ( args.height, args.width, 4 ), dtype=numpy.float32 ) ]
+
+    problems = []
+    directory = tempfile.mkdtemp( prefix="region_stitch_" )
+    try:
+        for grid in args.grids:
+            columns, rows = [ int( value ) for value in grid.lower().split( "x" ) ]
+            problems.extend( CheckBorders( args.width, args.height, columns, rows ) )
+            for frame in frames:
+                problems.extend( CheckStitch( frame, columns, rows, args.strip_rows, directory, not args.check ) )
+    finally:
+        shutil.rmtree( directory, ignore_errors=True )
+
+    for problem in problems:
+        print( "FAIL %s" % problem )
+    print( "%d problems" % len( problems ) )
+    sys.exit( 1 if problems else 0 )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+# Checks the scene store of BlenderSceneStore.py and how the submission core and the Worker cache
+# use it, and times putting and fetching a scene.
+#
+#   python tools/CheckSceneStore.py [--megabytes 256] [--check]
+#
+# A scene of --megabytes, half compressible and half random, is put into a store in a temporary
+# folder, put again (nothing is uploaded), changed in one chunk (only that chunk is uploaded) and
+# fetched back through a FileCache. A damaged chunk must fail the fetch. The job submitted with a
+# stored scene must refer to it by hash instead of submitting the file. Files a task of another
+# Worker leased must survive eviction until it releases them or dies. --check uses an 8 MB scene and
+# doesn't print the timings.
+
+from __future__ import absolute_import
+
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+ToolsDirectory = os.path.dirname( os.path.abspath( __file__ ) )
+sys.path.insert( 0, os.path.join( ToolsDirectory, "..", "repoFolder", "plugins", "Blender" ) )
+
+from BlenderCache import FileCache
+from BlenderJobs import BlenderJob, GetAuxiliaryFiles, GetPluginInfo, Submit, SubmitBatch
+from BlenderSceneStore import SceneStore
+
+ChunkSize = 4 * 1024 * 1024
+
+def Expect( problems, label, actual, expected ):
+    if actual != expected:
+        problems.append( "%s: expected %r, got %r" % ( label, expected, actual ) )
+
+def WriteScene( path, megabytes ):
+    block = b"BLENDER-v300REND" * 65536
+    with open( path, "wb" ) as f:
+        for index in range( megabytes ):
+            f.write( block if index % 2 == 0 else os.urandom( len( block ) ) )
+
+def ReadFile( path ):
+    with open( path, "rb" ) as f:
+        return f.read()
+
+def RunChecks( directory, megabytes, verbose=True ):
+    problems = []
+    sceneFile = os.path.join( directory, "shot.blend" )
+    WriteScene( sceneFile, megabytes )
+    store = SceneStore( os.path.join( directory, "store" ), ChunkSize )
+
+    first = store.Put( sceneFile )
+    if verbose:
+        print( first.Format() )
+    if verbose:
+        print( "  %.0f MB/s" % ( first.size / 1048576.0 / max( 1e-6, first.hashSeconds + first.uploadSeconds ) ) )
+    Expect( problems, "first put", ( first.stored, first.chunksWritten ), ( False, first.chunks ) )
+    Expect( problems, "compressed", first.bytesWritten < first.size, True )
+
+    again = store.Put( sceneFile )
+    if verbose:
+        print( again.Format() )
+    Expect( problems, "second put", ( again.stored, again.chunksWritten, again.bytesWritten ), ( True, 0, 0 ) )
+
+    changedFile = os.path.join( directory, "shot_v2.blend" )
+    shutil.copyfile( sceneFile, changedFile )
+    with open( changedFile, "r+b" ) as f:
+        f.seek( ChunkSize + 10 )
+        f.write( b"changed" )
+    changed = store.Put( changedFile )
+    if verbose:
+        print( changed.Format() )
+    Expect( problems, "changed chunk", ( changed.stored, changed.chunksWritten ), ( False, 1 ) )
+
+    cache = FileCache( os.path.join( directory, "cache" ), 1024 ** 4 )
+    def FetchScene( sceneHash ):
+        size = store.LoadManifest( sceneHash )["size"]
+        return cache.FetchEntry( sceneHash, store.GetManifestPath( sceneHash ), "shot.blend", size, lambda localPath: store.Fetch( sceneHash, localPath ).bytesRead )
+
+    fetched = FetchScene( first.sceneHash )
+    if verbose:
+        print( "Fetched %.1f MB, %.1f MB read in %.2fs, %.0f MB/s" % ( fetched.size / 1048576.0, fetched.bytesCopied / 1048576.0, fetched.seconds, fetched.size / 1048576.0 / max( 1e-6, fetched.seconds ) ) )
+    Expect( problems, "fetch miss", ( fetched.hit, fetched.bytesCopied ), ( False, first.bytesWritten ) )
+    Expect( problems, "fetched content", ReadFile( fetched.localPath ) == ReadFile( sceneFile ), True )
+    Expect( problems, "fetch hit", FetchScene( first.sceneHash ).hit, True )
+
+    chunkHash = store.LoadManifest( changed.sceneHash )["chunks"][1]
+    with open( store.GetChunkPath( chunkHash ), "r+b" ) as f:
+        f.seek( 100 )
+        f.write( b"damage" )
+    try:
+        store.Fetch( changed.sceneHash, os.path.join( directory, "damaged.blend" ) )
+        problems.append( "damaged chunk: no error" )
+    except IOError:
+        pass
+    Expect( problems, "damaged temp file removed", os.listdir( directory ).count( "damaged.blend" ), 0 )
+
+    job = BlenderJob( name="shot", sceneFile=sceneFile, frames="1-10", submitScene=True, sceneStore=store.storeDirectory )
+    submitted = []
+    results = Submit( job, lambda job: submitted.append( job ) or "Result=Success\nJobID=job1" ).output
+    pluginInfo = dict( line.split( "=", 1 ) for line in GetPluginInfo( submitted[0] ) )
+    Expect( problems, "stored job", ( pluginInfo.get( "SceneHash" ), pluginInfo.get( "SceneFile" ), GetAuxiliaryFiles( submitted[0] ) ), ( first.sceneHash, sceneFile, [] ) )
+    Expect( problems, "store reported", results.splitlines()[0].startswith( "Scene %s" % first.sceneHash[:12] ), True )
+
+    brokenStore = job.Copy( sceneStore=os.path.join( sceneFile, "not a folder" ) )
+    submitted = []
+    results = Submit( brokenStore, lambda job: submitted.append( job ) or "Result=Success\nJobID=job1" ).output
+    Expect( problems, "store fallback", ( GetAuxiliaryFiles( submitted[0] ), results.startswith( "Unable to put" ) ), ( [ sceneFile ], True ) )
+
+    batch = [ job.Copy( name="shot%d" % index ) for index in range( 3 ) ]
+    results = SubmitBatch( batch, lambda jobs: [ "Result=Success\nJobID=job%d" % index for index in range( len( jobs ) ) ] )
+    Expect( problems, "batch hashes once", [ len( result.notes ) for result in results ], [ 1, 0, 0 ] )
+
+    problems.extend( CheckLeases( directory ) )
+    return problems
+
+def CheckLeases( directory ):
+    ''' A cache that only fits one file, shared by two tasks '''
+    problems = []
+    cacheDirectory = os.path.join( directory, "leases" )
+    files = []
+    for index in range( 3 ):
+        files.append( os.path.join( directory, "lease%d.bin" % index ) )
+        with open( files[-1], "wb" ) as f:
+            f.write( os.urandom( 1024 ) )
+
+    rendering = FileCache( cacheDirectory, 1024 )
+    leased = rendering.Fetch( files[0] )
+    other = FileCache( cacheDirectory, 1024 )
+    other.Fetch( files[1] )
+    other.ReleaseLeases()
+    Expect( problems, "leased entry kept", os.path.isfile( leased.localPath ), True )
+    rendering.ReleaseLeases()
+    other.Fetch( files[2] )
+    other.ReleaseLeases()
+    Expect( problems, "released entry evicted", os.path.isfile( leased.localPath ), False )
+
+    # A task that dies keeps its lease file, but not the lock on it
+    script = "import sys; sys.path.insert( 0, %r ); from BlenderCache import FileCache; FileCache( %r, 1024 ).Fetch( %r ); import os; os._exit( 0 )" % ( sys.path[0], cacheDirectory, files[0] )
+    subprocess.check_call( [ sys.executable, "-c", script ] )
+    died = other.Fetch( files[0] )
+    other.ReleaseLeases()
+    other.Fetch( files[1] )
+    other.ReleaseLeases()
+    Expect( problems, "lease of a dead task ignored", os.path.isfile( died.localPath ), False )
+    return problems
+
+def main():
+    parser = argparse.ArgumentParser( description="Check the Blender scene store and time putting and fetching a scene." )
+    parser.add_argument( "--megabytes", type=int, default=256, help="size of the test scene" )
+    parser.add_argument( "--check", action="store_true", help="only run the checks, on small inputs and without the timings" )
+    args = parser.parse_args()
+    if args.check:
+        args.megabytes = 8
+
+    directory = tempfile.mkdtemp( prefix="blender_store_" )
+    try:
+        problems = RunChecks( directory, max( 8, args.megabytes ), not args.check )
+    finally:
+        shutil.rmtree( directory, ignore_errors=True )
+
+    for problem in problems:
+        print( "FAIL %s" % problem )
+    print( "%d problems" % len( problems ) )
+    sys.exit( 1 if problems else 0 )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,326 @@
+#!/usr/bin/env python3
+# Stand-in for the blender executable, used to exercise the Deadline Blender plugin without Blender.
+#
+# Point a Blender_X.Y_RenderExecutable entry of the plugin configuration at this script (or run it
+# by hand) and it understands the subset of the Blender command line that the plugin uses:
+#
+#   -b  <scene>  -t <threads>  -x <0|1>  -o <output>  -s <start>  -e <end>  -j <step>  -a
+#   -f <frame[,frame..]>  --python <script>  --python-expr <code>  --python-exit-code <code>  --version
+#   --  <script arguments>
+#
+# Rendering prints Blender 4.x style "Fra:" progress lines and "Saved:" lines, and writes a small
+# valid PNG for every frame, or for a still only with write_still, like Blender. Like Blender, an
+# error in a script is printed and the fake carries on, unless --python-exit-code was given before. Scripts passed with --python run against the fake bpy module in
+# tools/fakes, so the session driver can be tried with:
+#
+#   echo '{"frames": [1, 2, 3], "output": "/tmp/fake_####"}' | \
+#       python tools/FakeBlender.py -b scene.blend --python repoFolder/plugins/Blender/BlenderSessionDriver.py
+#
+# The speed of the fake render can be tuned with environment variables:
+#
+#   FAKE_BLENDER_VERSION        version reported by the fake (default 4.0.2)
+#   FAKE_BLENDER_LOAD_SECONDS   time taken to "load" the scene (default 0)
+#   FAKE_BLENDER_SYNC_SECONDS   time taken to sync a frame before its first sample (default 0)
+#   FAKE_BLENDER_FRAME_SECONDS  time taken to render a frame's samples (default 0)
+#   FAKE_BLENDER_SAMPLES        number of sample lines printed per frame (default 16)
+#   FAKE_BLENDER_STALL_FRAME    frame that hangs halfway through its samples, without printing anything
+#   FAKE_BLENDER_STALL_SECONDS  how long that frame hangs (default 3600)
+#
+# Instead of its own lines, the fake can replay a recorded log like those in tools/logs:
+#
+#   FAKE_BLENDER_REPLAY         log to replay, its version banner becomes the default version
+#   FAKE_BLENDER_SPEED          replay speed, 1 prints the lines with the delays of the recording,
+#                               10 ten times faster and 0 without any delay (default 1)
+#
+# Loading the scene prints the lines of the log before its first frame, and every rendered frame
+# prints the lines of the next recorded frame, starting over with the first one after the last.
+# The delays come from the Time fields of the lines, and the frame numbers and "Saved:" paths are
+# those of the frames actually rendered, whose PNG is written as usual.
+
+from __future__ import absolute_import
+
+import os
+import re
+import struct
+import sys
+import time
+import traceback
+import zlib
+
+ToolsDirectory = os.path.dirname( os.path.abspath( __file__ ) )
+sys.path.insert( 0, os.path.join( ToolsDirectory, "fakes" ) )
+
+import bpy
+
+REPLAY = os.environ.get( "FAKE_BLENDER_REPLAY", "" )
+SPEED = float( os.environ.get( "FAKE_BLENDER_SPEED", "1" ) )
+LOAD_SECONDS = float( os.environ.get( "FAKE_BLENDER_LOAD_SECONDS", "0" ) )
+SYNC_SECONDS = float( os.environ.get( "FAKE_BLENDER_SYNC_SECONDS", "0" ) )
+FRAME_SECONDS = float( os.environ.get( "FAKE_BLENDER_FRAME_SECONDS", "0" ) )
+SAMPLES = int( os.environ.get( "FAKE_BLENDER_SAMPLES", "16" ) )
+STALL_FRAME = os.environ.get( "FAKE_BLENDER_STALL_FRAME", "" )
+STALL_SECONDS = float( os.environ.get( "FAKE_BLENDER_STALL_SECONDS", "3600" ) )
+
+TimePattern = re.compile( r"Time: ?(?:([0-9]+):)?([0-9]+):([0-9]+(?:\.[0-9]+)?)" )
+FramePattern = re.compile( r"^Fra:-?[0-9]+" )
+FrameEndPattern = re.compile( r"^\s*Time: [0-9]" )
+VersionPattern = re.compile( r"^Blender ([0-9]+\.[0-9]+(?:\.[0-9]+)?)" )
+
+def Out( line ):
+    sys.stdout.write( line + "\n" )
+    sys.stdout.flush()
+
+def PngBytes( width=4, height=4 ):
+    def Chunk( tag, data ):
+        return struct.pack( ">I", len( data ) ) + tag + data + struct.pack( ">I", zlib.crc32( tag + data ) & 0xffffffff )
+
+    rows = b"".join( b"\x00" + b"\x80\x80\x80" * width for _ in range( height ) )
+    return ( b"\x89PNG\r\n\x1a\n"
+        + Chunk( b"IHDR", struct.pack( ">IIBBBBB", width, height, 8, 2, 0, 0, 0 ) )
+        + Chunk( b"IDAT", zlib.compress( rows ) )
+        + Chunk( b"IEND", b"" ) )
+
+class RecordedLog( object ):
+    ''' A Blender log split into the lines before the first frame and the lines of each frame '''
+
+    def __init__( self, path ):
+        with open( path ) as f:
+            lines = f.read().splitlines()
+
+        self.banner = lines.pop( 0 ) if len( lines ) > 0 and VersionPattern.match( lines[0] ) else ""
+        self.header = []
+        while len( lines ) > 0 and FramePattern.match( lines[0] ) is None:
+            self.header.append( lines.pop( 0 ) )
+
+        self.frames = []
+        frame = []
+        for line in lines:
+            if line == "Blender quit":
+                break
+            if len( frame ) == 0 and line.strip() == "":
+                continue
+            frame.append( line )
+            if FrameEndPattern.match( line ):
+                self.frames.append( frame )
+                frame = []
+        if len( frame ) > 0:
+            self.frames.append( frame )
+        self.nextFrame = 0
+
+    def GetVersion( self ):
+        match = VersionPattern.match( self.banner )
+        return match.group( 1 ) if match is not None else None
+
+    def NextFrame( self ):
+        lines = self.frames[self.nextFrame % len( self.frames )] if len( self.frames ) > 0 else []
+        self.nextFrame += 1
+        return lines
+
+def GetSeconds( line ):
+    ''' The time of a line's Time field, or None '''
+    match = TimePattern.search( line )
+    if match is None:
+        return None
+    hours, minutes, seconds = match.groups()
+    return int( hours or 0 ) * 3600 + int( minutes ) * 60 + float( seconds )
+
+RECORDING = RecordedLog( REPLAY ) if REPLAY != "" else None
+VERSION = os.environ.get( "FAKE_BLENDER_VERSION", ( RECORDING.GetVersion() if RECORDING is not None else None ) or "4.0.2" )
+
+class FakeBlender( object ):
+    def __init__( self ):
+        bpy.Reset( version=VERSION )
+        bpy.ops.render.render = self.Render
+        bpy.data.images["Render Result"].save_render = self.SaveRender
+        self.scene = bpy.context.scene
+        self.startTime = time.time()
+
+    def Load( self, sceneFile ):
+        bpy.data.filepath = sceneFile
+        if not os.path.isfile( sceneFile ):
+            Out( "Unable to open \"%s\"" % sceneFile )
+            return False
+
+        time.sleep( LOAD_SECONDS )
+        if RECORDING is None:
+            Out( "Read blend: \"%s\"" % sceneFile )
+            return True
+
+        for line in RECORDING.header:
+            if line.startswith( "Read blend: \"" ):
+                line = "Read blend: \"%s\"" % sceneFile
+            elif line.startswith( "Read blend: " ):
+                line = "Read blend: %s" % sceneFile
+            Out( line )
+        return True
+
+    def RenderFrame( self, frame, save=True ):
+        self.scene.frame_set( frame )
+        if RECORDING is not None:
+            self.ReplayFrame( frame )
+            return
+
+        start = time.time()
+        prefix = "Fra:%d Mem:120.00M (Peak 180.00M)" % frame
+        Out( "%s | Time:00:00.00 | Mem:0.00M, Peak:0.00M | Scene, ViewLayer | Synchronizing object | Cube" % prefix )
+        time.sleep( SYNC_SECONDS )
+        for sample in range( 1, SAMPLES + 1 ):
+            if str( frame ) == STALL_FRAME and sample == SAMPLES // 2 + 1:
+                time.sleep( STALL_SECONDS )
+            if FRAME_SECONDS > 0:
+                time.sleep( FRAME_SECONDS / float( SAMPLES ) )
+            elapsed = time.time() - start
+            remaining = max( SYNC_SECONDS + FRAME_SECONDS - elapsed, 0 )
+            Out( "%s | Time:%s | Remaining:%s | Mem:64.00M, Peak:64.00M | Scene, ViewLayer | Sample %d/%d" % ( prefix, FormatTime( elapsed ), FormatTime( remaining ), sample, SAMPLES ) )
+
+        if not save:
+            return
+        outputPath = self.WriteOutput( frame )
+        if outputPath is None:
+            return
+        Out( "Saved: '%s'" % outputPath )
+        Out( " Time: %s (Saving: 00:00.00)" % FormatTime( time.time() - start ) )
+        Out( "" )
+
+    def ReplayFrame( self, frame ):
+        ''' Print the lines of the next recorded frame as if they were this frame's '''
+        started = time.time()
+        for line in RECORDING.NextFrame():
+            seconds = GetSeconds( line )
+            if seconds is not None and SPEED > 0:
+                delay = started + seconds / SPEED - time.time()
+                if delay > 0:
+                    time.sleep( delay )
+
+            if line.startswith( "Saved: " ):
+                outputPath = self.WriteOutput( frame )
+                if outputPath is None:
+                    return
+                line = "Saved: '%s'" % outputPath
+            Out( FramePattern.sub( "Fra:%d" % frame, line ) )
+
+    def WriteOutput( self, frame ):
+        ''' Write the frame's image, returns its path or None when it can't be written '''
+        outputPath = self.scene.render.frame_path( frame=frame )
+        directory = os.path.dirname( outputPath )
+        if directory != "" and not os.path.isdir( directory ):
+            try:
+                os.makedirs( directory )
+            except OSError:
+                Out( "Unable to create directory \"%s\"" % directory )
+                return None
+
+        with open( outputPath, "wb" ) as f:
+            f.write( PngBytes() )
+        return outputPath
+
+    def RenderAnimation( self ):
+        for frame in range( self.scene.frame_start, self.scene.frame_end + 1, max( self.scene.frame_step, 1 ) ):
+            self.RenderFrame( frame )
+
+    def Render( self, animation=False, write_still=False, **kwargs ):
+        if animation:
+            self.RenderAnimation()
+        else:
+            self.RenderFrame( self.scene.frame_current, write_still )
+        return { "FINISHED" }
+
+    def SaveRender( self, filepath, scene=None ):
+        with open( filepath, "wb" ) as f:
+            f.write( PngBytes() )
+
+    def RunScript( self, script, scriptArgs ):
+        sys.argv = [ sys.argv[0] ] + scriptArgs
+        with open( script ) as f:
+            code = compile( f.read(), script, "exec" )
+        exec( code, { "__name__": "__main__", "__file__": script } )
+
+def FormatTime( seconds ):
+    minutes, seconds = divmod( seconds, 60 )
+    return "%02d:%05.2f" % ( minutes, seconds )
+
+def ParseFrames( value ):
+    frames = []
+    for part in value.split( "," ):
+        if ".." in part:
+            start, end = part.split( ".." )
+            frames.extend( range( int( start ), int( end ) + 1 ) )
+        else:
+            frames.append( int( part ) )
+    return frames
+
+def main( args ):
+    if "--version" in args:
+        Out( "Blender %s" % VERSION )
+        Out( "\tbuild date: 2024-01-01" )
+        return 0
+
+    blender = FakeBlender()
+    # Exit code of a script error, which Blender ignores by default
+    scriptExitCode = 0
+    if RECORDING is not None and RECORDING.banner != "":
+        Out( RECORDING.banner )
+    else:
+        Out( "Blender %s (hash 0000000 built 2024-01-01 00:00:00)" % VERSION )
+
+    index = 0
+    while index < len( args ):
+        arg = args[index]
+        value = args[index + 1] if index + 1 < len( args ) else ""
+
+        if arg == "--":
+            break
+        elif arg == "-b":
+            pass
+        elif not arg.startswith( "-" ):
+            # Like Blender, the scene is loaded where it is on the command line
+            if not blender.Load( arg ):
+                return 1
+        elif arg == "-t":
+            blender.scene.render.threads = int( value )
+            index += 1
+        elif arg == "-x":
+            blender.scene.render.use_file_extension = value == "1"
+            index += 1
+        elif arg == "-o":
+            blender.scene.render.filepath = value
+            index += 1
+        elif arg == "-s":
+            blender.scene.frame_start = int( value )
+            index += 1
+        elif arg == "-e":
+            blender.scene.frame_end = int( value )
+            index += 1
+        elif arg == "-j":
+            blender.scene.frame_step = int( value )
+            index += 1
+        elif arg == "-a":
+            blender.RenderAnimation()
+        elif arg == "-f":
+            for frame in ParseFrames( value ):
+                blender.RenderFrame( frame )
+            index += 1
+        elif arg == "--python":
+            scriptArgs = args[args.index( "--" ) + 1:] if "--" in args else []
+            try:
+                blender.RunScript( value, scriptArgs )
+            except Exception:
+                traceback.print_exc( file=sys.stdout )
+                sys.stdout.flush()
+                if scriptExitCode != 0:
+                    return scriptExitCode
+            index += 1
+        elif arg == "--python-exit-code":
+            scriptExitCode = int( value )
+            index += 1
+        elif arg == "--python-expr":
+            exec( value, { "__name__": "__main__" } )
+            index += 1
+        index += 1
+
+    Out( "" )
+    Out( "Blender quit" )
+    return 0
+
+if __name__ == "__main__":
+    sys.exit( main( sys.argv[1:] ) )
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+# Stand-in for deadlinecommand, with the commands the Blender submitter runs:
+#
+#   -GetRepositoryFilePath <path>          the file in repoFolder, or in tools/fakes/repository
+#   -ExecuteScript <script> [arguments]    runs the script's __main__ against the fake Deadline API
+#
+# Scripts run as they would in the Deadline client, except that the submission dialog isn't shown:
+# its Submit button is pressed right away, and the jobs it submits get fake job IDs. Point the
+# submitter at it with WriteFakeDeadlineCommand, which writes a deadlinecommand into a folder for
+# DEADLINE_PATH. The job files of the submissions are written to FAKE_DEADLINE_TEMP, or to the
+# system's temp folder when it isn't set. FAKE_DEADLINE_DIALOG_VALUES holds a JSON object of the
+# dialog controls to set before Submit is pressed.
+
+from __future__ import absolute_import
+
+import importlib.util
+import json
+import os
+import stat
+import sys
+import tempfile
+import warnings
+
+ToolsDirectory = os.path.dirname( os.path.abspath( __file__ ) )
+sys.path.insert( 0, os.path.join( ToolsDirectory, "fakes" ) )
+
+from Deadline.Scripting import ClientUtils, RepositoryUtils
+from DeadlineUI.Controls.Scripting.DeadlineScriptDialog import DeadlineScriptDialog
+
+def WriteFakeDeadlineCommand( directory ):
+    ''' Write a deadlinecommand that runs this script with this Python, returns its path '''
+    if os.name == "nt":
+        executable = os.path.join( directory, "deadlinecommand.bat" )
+        script = "@echo off\r\n\"%s\" \"%s\" %%*\r\n" % ( sys.executable, os.path.abspath( __file__ ) )
+    else:
+        executable = os.path.join( directory, "deadlinecommand" )
+        script = "#!/bin/sh\nexec \"%s\" \"%s\" \"$@\"\n" % ( sys.executable, os.path.abspath( __file__ ) )
+
+    with open( executable, "w" ) as f:
+        f.write( script )
+    os.chmod( executable, os.stat( executable ).st_mode | stat.S_IXUSR | stat.S_IXGRP | stat.S_IXOTH )
+    return executable
+
+def ExecuteScript( script, arguments ):
+    ClientUtils.tempDirectory = os.environ.get( "FAKE_DEADLINE_TEMP", "" ) or tempfile.gettempdir()
+    DeadlineScriptDialog.autoSubmit = True
+    DeadlineScriptDialog.userValues = json.loads( os.environ.get( "FAKE_DEADLINE_DIALOG_VALUES", "" ) or "{}" )
+    # The submission scripts load their modules with imp, like the scripts that come with Deadline
+    warnings.simplefilter( "ignore", DeprecationWarning )
+    spec = importlib.util.spec_from_file_location( "__deadline_script__", script )
+    module = importlib.util.module_from_spec( spec )
+    spec.loader.exec_module( module )
+    module.__main__( *arguments )
+
+def main( args ):
+    # The submitter passes "-GetRepositoryFilePath " with a trailing space
+    command = args[0].strip() if len( args ) > 0 else ""
+    if command == "-GetRepositoryFilePath":
+        print( RepositoryUtils.GetRepositoryFilePath( args[1] if len( args ) > 1 else "", True ) )
+    elif command == "-ExecuteScript" and len( args ) > 1:
+        ExecuteScript( args[1], args[2:] )
+    else:
+        print( "Error: the fake deadlinecommand does not support %s" % " ".join( args ) )
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit( main( sys.argv[1:] ) )
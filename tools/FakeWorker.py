@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+# Drives the Deadline Blender plugin through the callbacks of a Worker, against the fake Deadline API
+# in tools/fakes and with tools/FakeBlender.py standing in for blender.
+#
+#   from FakeWorker import FakeWorker
+#   worker = FakeWorker( directory )
+#   results = worker.RunJob( { "Version": "4.0", "OutputFile": ... }, [ [ 1, 2 ], [ 3, 4 ] ] )
+#
+# A job is rendered by one plugin like a Worker slot renders it: InitializeProcess when the plugin is
+# loaded, StartJob and EndJob around the tasks of advanced plugins, and PreRenderTasks, the render and
+# PostRenderTasks for each task. Each task's TaskResult holds its time, the time of the callbacks and
+# of the stdout handlers, what the plugin reported and why it failed. The plugin configuration
+# points every Blender version at FakeBlender, whose FAKE_BLENDER_* variables are passed with the
+# environment argument.
+#
+# Run as a script, it renders a job and prints what the plugin reported:
+#
+#   python tools/FakeWorker.py [--frames 1-10] [--chunk 5] [--session] [--replay tools/logs/blender4_cycles.log --speed 0]
+
+from __future__ import absolute_import
+
+import argparse
+import os
+import shutil
+import stat
+import sys
+import tempfile
+import time
+
+ToolsDirectory = os.path.dirname( os.path.abspath( __file__ ) )
+PluginDirectory = os.path.normpath( os.path.join( ToolsDirectory, "..", "repoFolder", "plugins", "Blender" ) )
+sys.path.insert( 0, PluginDirectory )
+sys.path.insert( 0, os.path.join( ToolsDirectory, "fakes" ) )
+
+from Deadline.Plugins import Job, PluginType, Task
+from Deadline.Scripting import ClientUtils, PluginConfig, RepositoryUtils
+from FranticX.Processes import HandlerStats, RenderFailure
+
+import Blender
+
+def WriteFakeExecutable( directory, environment=None ):
+    ''' Write a blender executable that runs FakeBlender.py with this Python and the given FAKE_BLENDER_*
+    variables, returns its path '''
+    lines = [ "%s=%s" % ( key, value ) for key, value in sorted( ( environment or {} ).items() ) ]
+    if os.name == "nt":
+        executable = os.path.join( directory, "blender.bat" )
+        script = "@echo off\r\n" + "".join( "set %s\r\n" % line for line in lines ) + "\"%s\" \"%s\" %%*\r\n" % ( sys.executable, os.path.join( ToolsDirectory, "FakeBlender.py" ) )
+    else:
+        executable = os.path.join( directory, "blender" )
+        script = "#!/bin/sh\n" + "".join( "export %s\n" % line for line in lines ) + "exec \"%s\" \"%s\" \"$@\"\n" % ( sys.executable, os.path.join( ToolsDirectory, "FakeBlender.py" ) )
+
+    with open( executable, "w" ) as f:
+        f.write( script )
+    os.chmod( executable, os.stat( executable ).st_mode | stat.S_IXUSR | stat.S_IXGRP | stat.S_IXOTH )
+    return executable
+
+class TaskResult( object ):
+    def __init__( self, taskId, frames ):
+        self.taskId = taskId
+        self.frames = frames
+        self.seconds = 0.0
+        self.callbackSeconds = 0.0  # PreRenderTasks and PostRenderTasks
+        self.handlerSeconds = 0.0
+        self.lines = 0
+        self.error = ""
+        self.statusMessages = []
+        self.progress = []
+
+class FakeWorker( object ):
+    def __init__( self, directory, config=None, environment=None, workerName="fakeworker" ):
+        # type: (str, dict, dict, str) -> None
+        self.directory = directory
+        self.workerName = workerName
+        self.workerDirectory = self.MakeDirectory( "worker" )
+        self.jobsDataDirectory = self.MakeDirectory( "jobsData" )
+        ClientUtils.tempDirectory = self.MakeDirectory( "temp" )
+        RepositoryUtils.auxiliaryDirectory = self.MakeDirectory( "auxiliary" )
+
+        executable = WriteFakeExecutable( self.MakeDirectory( "bin" ), environment )
+        entries = { "Blender_RenderExecutable": executable, "WriteFrameMetrics": "False" }
+        entries.update( config or {} )
+        self.config = PluginConfig( entries )
+        RepositoryUtils.pluginConfigs["Blender"] = self.config
+        self.plugin = None
+
+    def MakeDirectory( self, name ):
+        directory = os.path.join( self.directory, name )
+        if not os.path.isdir( directory ):
+            os.makedirs( directory )
+        return directory
+
+    def LoadPlugin( self, job, threadNumber=0 ):
+        plugin = Blender.GetDeadlinePlugin()
+        plugin.job = job
+        plugin.config = self.config
+        plugin.pluginDirectory = PluginDirectory
+        plugin.workerDirectory = self.workerDirectory
+        plugin.jobsDataDirectory = self.jobsDataDirectory
+        plugin.threadNumber = threadNumber
+        plugin.workerName = self.workerName
+        plugin.InitializeProcessCallback()
+        return plugin
+
+    def RunJob( self, pluginInfo, tasks, jobId="fakejob", concurrentTasks=1 ):
+        # type: (dict, list, str, int) -> list
+        ''' Render the tasks, each a list of frames, with one plugin, returns a TaskResult per task '''
+        job = Job( jobId, pluginInfo, concurrentTasks )
+        plugin = self.LoadPlugin( job )
+        results = []
+        try:
+            if plugin.PluginType == PluginType.Advanced:
+                plugin.StartJobCallback()
+            for taskId, frames in enumerate( tasks ):
+                results.append( self.RunTask( plugin, Task( taskId, frames ) ) )
+        finally:
+            try:
+                if plugin.PluginType == PluginType.Advanced:
+                    plugin.EndJobCallback()
+            finally:
+                Blender.CleanupDeadlinePlugin( plugin )
+        return results
+
+    def RunTask( self, plugin, task ):
+        result = TaskResult( task.TaskId, [ int( frame ) for frame in task.TaskFrameList ] )
+        plugin.task = task
+        plugin.statusMessages = []
+        plugin.progress = []
+        lines, handlerSeconds = HandlerStats.lines, HandlerStats.seconds
+        started = time.perf_counter()
+        try:
+            callbackStarted = time.perf_counter()
+            plugin.PreRenderTasksCallback()
+            result.callbackSeconds += time.perf_counter() - callbackStarted
+
+            if plugin.PluginType == PluginType.Advanced:
+                plugin.RenderTasksCallback()
+            else:
+                exitCode = plugin.Run()
+                if exitCode != 0:
+                    plugin.FailRender( "Renderer returned non-zero error code, %d" % exitCode )
+
+            callbackStarted = time.perf_counter()
+            plugin.PostRenderTasksCallback()
+            result.callbackSeconds += time.perf_counter() - callbackStarted
+        except RenderFailure as e:
+            result.error = str( e )
+
+        result.seconds = time.perf_counter() - started
+        result.lines = HandlerStats.lines - lines
+        result.handlerSeconds = HandlerStats.seconds - handlerSeconds
+        result.statusMessages = plugin.statusMessages
+        result.progress = plugin.progress
+        return result
+
+    def ReplayStdout( self, pluginInfo, frames, lines ):
+        # type: (dict, list, list) -> TaskResult
+        ''' Feed recorded lines through the handlers of a task instead of running Blender, the time is
+        the time of the handlers alone '''
+        plugin = self.LoadPlugin( Job( "replayjob", pluginInfo ) )
+        task = Task( 0, frames )
+        plugin.task = task
+        result = TaskResult( task.TaskId, frames )
+        try:
+            plugin.PreRenderTasksCallback()
+            lineCount, handlerSeconds = HandlerStats.lines, HandlerStats.seconds
+            for line in lines:
+                plugin.HandleStdoutLine( line )
+            result.lines = HandlerStats.lines - lineCount
+            result.handlerSeconds = HandlerStats.seconds - handlerSeconds
+            plugin.PostRenderTasksCallback()
+        except RenderFailure as e:
+            result.error = str( e )
+        finally:
+            Blender.CleanupDeadlinePlugin( plugin )
+
+        result.seconds = result.handlerSeconds
+        result.statusMessages = plugin.statusMessages
+        result.progress = plugin.progress
+        return result
+
+def ParseFrameRange( value ):
+    start, _, end = value.partition( "-" )
+    return list( range( int( start ), int( end or start ) + 1 ) )
+
+def main():
+    parser = argparse.ArgumentParser( description="Render a job with the Blender plugin on a fake Worker." )
+    parser.add_argument( "--frames", default="1-4", help="frame range of the job" )
+    parser.add_argument( "--chunk", type=int, default=2, help="frames per task" )
+    parser.add_argument( "--version", default="4.0", help="Blender version of the job" )
+    parser.add_argument( "--session", action="store_true", help="keep the scene loaded between tasks" )
+    parser.add_argument( "--replay", default="", help="recorded log FakeBlender replays" )
+    parser.add_argument( "--speed", default="0", help="replay speed, 0 replays without delays" )
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp( prefix="blender_worker_" )
+    try:
+        sceneFile = os.path.join( directory, "shot.blend" )
+        open( sceneFile, "w" ).close()
+        environment = { "FAKE_BLENDER_REPLAY": os.path.abspath( args.replay ), "FAKE_BLENDER_SPEED": args.speed } if args.replay != "" else {}
+        worker = FakeWorker( directory, environment=environment )
+        frames = ParseFrameRange( args.frames )
+        tasks = [ frames[index:index + args.chunk] for index in range( 0, len( frames ), args.chunk ) ]
+        pluginInfo = { "SceneFile": sceneFile, "OutputFile": os.path.join( directory, "render", "shot_####.png" ), "Version": args.version, "SessionMode": str( args.session ) }
+
+        failed = False
+        for result in worker.RunJob( pluginInfo, tasks ):
+            print( "Task %s, frames %s: %.3fs, %d lines, callbacks %.1f ms, handlers %.1f ms, %d progress updates" % ( result.taskId, ",".join( str( frame ) for frame in result.frames ), result.seconds, result.lines, result.callbackSeconds * 1000, result.handlerSeconds * 1000, len( result.progress ) ) )
+            if len( result.statusMessages ) > 0:
+                print( "  status: %s" % result.statusMessages[-1] )
+            if result.error != "":
+                print( "  FAILED: %s" % result.error )
+                failed = True
+    finally:
+        shutil.rmtree( directory, ignore_errors=True )
+    sys.exit( 1 if failed else 0 )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+# Prints the coarse to fine order "Render Preview Frames First" renders a frame list in, or checks
+# the ordering.
+#
+#   python tools/PreviewFrameOrder.py 1-250 [--chunk 5]
+#   python tools/PreviewFrameOrder.py --check
+#
+# Frame lists use Deadline's syntax: "1-100", "1-100x2", "1,5,10-20". With --chunk, the tasks
+# Deadline creates from the reordered list are printed. --check orders a range of contiguous,
+# stepped and random sparse frame lists and verifies that every frame appears exactly once and
+# that the largest gap between the rendered frames halves with every pass.
+
+from __future__ import absolute_import
+
+import argparse
+import os
+import random
+import sys
+
+ToolsDirectory = os.path.dirname( os.path.abspath( __file__ ) )
+sys.path.insert( 0, os.path.join( ToolsDirectory, "..", "repoFolder", "plugins", "Blender" ) )
+
+from BlenderFrames import FormatFrameList, GetPreviewOrder, ParseFrameList
+
+def CheckOrder( frames ):
+    ''' A description of what is wrong with the preview order of frames, empty if nothing is '''
+    order = GetPreviewOrder( frames )
+    expected = sorted( set( frames ) )
+    if sorted( order ) != expected:
+        missing = set( expected ) - set( order )
+        duplicated = set( frame for frame in order if order.count( frame ) > 1 )
+        return "missing %s, duplicated %s" % ( sorted( missing ), sorted( duplicated ) )
+
+    # After the first and last frame and k bisecting passes, no gap (in frames of the list) is
+    # wider than the span divided by 2^k, rounded up
+    span = len( expected ) - 1
+    rendered = 2
+    passes = 0
+    while rendered < len( order ):
+        passes += 1
+        rendered = min( len( order ), rendered + 2 ** ( passes - 1 ) )
+        indexes = sorted( expected.index( frame ) for frame in order[:rendered] )
+        widest = max( high - low for low, high in zip( indexes, indexes[1:] ) )
+        if widest > -( -span // 2 ** passes ):
+            return "a gap of %d frames is left after pass %d" % ( widest, passes )
+    return ""
+
+def RunChecks():
+    generator = random.Random( 0 )
+    frameLists = [ list( range( 1, count + 1 ) ) for count in range( 0, 300 ) ]
+    frameLists += [ list( range( 1001, 1001 + count * step, step ) ) for count in range( 1, 100 ) for step in ( 2, 3, 10 ) ]
+    frameLists += [ generator.sample( range( -500, 500 ), generator.randint( 1, 200 ) ) for _ in range( 500 ) ]
+    frameLists += [ [ 5, 5, 5 ], [ 3, 1, 2, 1 ] ]
+
+    problems = []
+    for frames in frameLists:
+        problem = CheckOrder( frames )
+        if problem != "":
+            problems.append( "%s: %s" % ( FormatFrameList( sorted( set( frames ) ) ), problem ) )
+    return problems
+
+def main():
+    parser = argparse.ArgumentParser( description="Print or check the preview first frame order." )
+    parser.add_argument( "frames", nargs="?", help="frame list in Deadline's syntax" )
+    parser.add_argument( "--chunk", type=int, default=0, help="also print the tasks of this many frames" )
+    parser.add_argument( "--check", action="store_true", help="only verify the ordering on many frame lists" )
+    args = parser.parse_args()
+
+    if args.check:
+        problems = RunChecks()
+        for problem in problems:
+            print( "FAIL %s" % problem )
+        print( "%d problems" % len( problems ) )
+        sys.exit( 1 if problems else 0 )
+    if args.frames is None:
+        parser.error( "a frame list or --check is required" )
+
+    order = GetPreviewOrder( ParseFrameList( args.frames ) )
+    print( FormatFrameList( order ) )
+    if args.chunk > 0:
+        for index in range( 0, len( order ), args.chunk ):
+            print( "task %d: %s" % ( index // args.chunk, FormatFrameList( order[index:index + args.chunk] ) ) )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+# Aggregates the task phase profiles written by the Blender plugin with ProfileTaskPhases enabled,
+# to compare the launch overhead of Blender versions and scenes.
+#
+#   python tools/ReportTaskPhases.py [--by version,scene] path [path ...]
+#
+# The paths are .phases.jsonl files or folders holding them, like the BlenderMetrics folders of the
+# Workers. Tasks are grouped by version and scene by default. For every group the average seconds
+# spent in each phase are reported, followed by the average overhead (everything that isn't
+# rendering frames) and its share of the task time. Phases are described in BlenderProfile.py.
+
+from __future__ import absolute_import
+
+import argparse
+import glob
+import json
+import os
+import sys
+
+ToolsDirectory = os.path.dirname( os.path.abspath( __file__ ) )
+sys.path.insert( 0, os.path.join( ToolsDirectory, "..", "repoFolder", "plugins", "Blender" ) )
+
+from BlenderProfile import OverheadPhases
+
+PhaseOrder = ( "preRender", "executable", "arguments", "firstLine", "blendRead", "firstSample", "firstSaved", "saved", "exit", "outputsChecked", "previews" )
+
+def FindProfiles( paths ):
+    for path in paths:
+        if os.path.isdir( path ):
+            for profileFile in sorted( glob.glob( os.path.join( path, "*.phases.jsonl" ) ) ):
+                yield profileFile
+        else:
+            yield path
+
+def LoadRecords( paths ):
+    records = []
+    for profileFile in FindProfiles( paths ):
+        with open( profileFile ) as f:
+            for line in f:
+                line = line.strip()
+                if line == "":
+                    continue
+                try:
+                    records.append( json.loads( line ) )
+                except ValueError:
+                    sys.stderr.write( "Skipping a malformed line of %s\n" % profileFile )
+    return records
+
+class PhaseGroup( object ):
+    def __init__( self ):
+        self.tasks = 0
+        self.seconds = {}
+        self.counts = {}
+        self.overhead = 0.0
+        self.total = 0.0
+
+    def Add( self, record ):
+        self.tasks += 1
+        self.overhead += record.get( "overhead", 0.0 )
+        self.total += record.get( "total", 0.0 )
+        for phase in record.get( "phases", [] ):
+            name = phase["phase"]
+            self.seconds[name] = self.seconds.get( name, 0.0 ) + phase["seconds"]
+            self.counts[name] = self.counts.get( name, 0 ) + 1
+
+    def Average( self, name ):
+        ''' Average seconds per task, or per frame for the frames after the first '''
+        if name not in self.counts:
+            return None
+        if name == "saved":
+            return self.seconds[name] / self.counts[name]
+        return self.seconds[name] / self.tasks
+
+def main():
+    parser = argparse.ArgumentParser( description="Compare the task phases profiled by the Blender plugin." )
+    parser.add_argument( "paths", nargs="+", help=".phases.jsonl files or folders holding them" )
+    parser.add_argument( "--by", default="version,scene", help="comma separated fields to group the tasks by: version, requestedVersion, scene, executable, worker or job" )
+    args = parser.parse_args()
+    args.by = [ name.strip() for name in args.by.split( "," ) if name.strip() != "" ]
+
+    records = LoadRecords( args.paths )
+    if len( records ) == 0:
+        print( "No task phases found" )
+        return
+
+    groups = {}
+    for record in records:
+        key = tuple( str( record.get( name, "" ) ) for name in args.by )
+        groups.setdefault( key, PhaseGroup() ).Add( record )
+
+    width = max( len( " / ".join( key ) ) for key in groups )
+    width = max( width, len( " / ".join( args.by ) ) )
+    header = "%-*s %6s" % ( width, " / ".join( args.by ), "tasks" )
+    header += "".join( " %11s" % name for name in PhaseOrder )
+    header += " %10s %9s" % ( "overhead", "share" )
+    print( header )
+
+    for key in sorted( groups, key=lambda key: -groups[key].overhead / groups[key].tasks ):
+        group = groups[key]
+        row = "%-*s %6d" % ( width, " / ".join( key ), group.tasks )
+        for name in PhaseOrder:
+            average = group.Average( name )
+            row += " %11s" % ( "-" if average is None else "%.3f" % average )
+        share = group.overhead * 100.0 / group.total if group.total > 0 else 0.0
+        row += " %10.3f %8.0f%%" % ( group.overhead / group.tasks, share )
+        print( row )
+
+    print( "" )
+    print( "Seconds per task, \"saved\" is per frame after the first. Overhead is %s." % ", ".join( OverheadPhases ) )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+# Replays recorded frame times to compare the makespan of static frames per task with adaptive
+# frames per task, without Deadline or Blender.
+#
+#   python tools/SimulateAdaptiveChunking.py [--workers 10] [--startup 30] [--target-minutes 15] [--min-tasks 20] path [path ...]
+#   python tools/SimulateAdaptiveChunking.py --synthetic 250:4:30 --synthetic 120:600:45
+#
+# The paths are the .jsonl frame metrics files the plugin writes, or folders holding them. Every job
+# in them is replayed with the wall time of its frames, and Blender's render time for the first
+# frame of every task, whose wall time has the task's startup in it. The startup of a task (starting Blender,
+# loading the scene, exiting) is the median overhead of the job's .phases.jsonl file when there is
+# one next to the metrics, --startup otherwise. --synthetic FRAMES:SECONDS:STARTUP makes up a job
+# whose frame cost drifts by half along the shot, like a camera move into a heavier set.
+#
+# Tasks are dequeued in order by the first idle Worker. The adaptive job first renders the probe
+# frames one per task, then the remaining frames chunked with the probe's measurements, as the
+# submitter and the BlenderAdaptiveChunking event plugin do. Like the event plugin's MinimumTasks,
+# --min-tasks keeps fast jobs from being chunked into fewer tasks than there are Workers; set it
+# to about twice the number of Workers of the farm.
+
+from __future__ import absolute_import
+
+import argparse
+import glob
+import json
+import os
+import random
+import sys
+
+ToolsDirectory = os.path.dirname( os.path.abspath( __file__ ) )
+sys.path.insert( 0, os.path.join( ToolsDirectory, "..", "repoFolder", "plugins", "Blender" ) )
+
+from BlenderChunking import ChooseProbeFrames, EstimateTiming, GetAdaptiveChunkSize, GetTaskDurations, Median, SimulateMakespan
+
+class RecordedJob( object ):
+    def __init__( self, name, frameSeconds, startupSeconds ):
+        self.name = name
+        self.frameSeconds = frameSeconds    # frame -> wall time
+        self.startupSeconds = startupSeconds
+
+def LoadJobs( paths, defaultStartup ):
+    metricsFiles = []
+    for path in paths:
+        if os.path.isdir( path ):
+            metricsFiles.extend( sorted( glob.glob( os.path.join( path, "*.jsonl" ) ) ) )
+        else:
+            metricsFiles.append( path )
+
+    jobs = []
+    for metricsFile in metricsFiles:
+        if metricsFile.endswith( ".phases.jsonl" ):
+            continue
+
+        frameSeconds = {}
+        tasks = set()
+        for record in ReadJsonLines( metricsFile ):
+            seconds = record.get( "wallTime" ) if record.get( "wallTime" ) is not None else record.get( "renderTime" )
+            # The first frame of a task also took the task's startup, which is simulated on its own
+            if record.get( "task" ) not in tasks and record.get( "renderTime" ) is not None:
+                seconds = record["renderTime"]
+            tasks.add( record.get( "task" ) )
+            if record.get( "frame" ) is not None and seconds is not None:
+                frameSeconds[record["frame"]] = seconds
+        if len( frameSeconds ) == 0:
+            continue
+
+        startupSeconds = defaultStartup
+        overheads = [ record["overhead"] for record in ReadJsonLines( metricsFile[:-len( ".jsonl" )] + ".phases.jsonl" ) if "overhead" in record ]
+        if len( overheads ) > 0:
+            startupSeconds = Median( overheads )
+        jobs.append( RecordedJob( os.path.basename( metricsFile ), frameSeconds, startupSeconds ) )
+
+    return jobs
+
+def ReadJsonLines( path ):
+    if not os.path.isfile( path ):
+        return []
+
+    records = []
+    with open( path ) as f:
+        for line in f:
+            try:
+                records.append( json.loads( line ) )
+            except ValueError:
+                continue
+    return records
+
+def MakeSyntheticJob( spec, seed ):
+    frameCount, seconds, startup = spec.split( ":" )
+    generator = random.Random( seed )
+    frameCount = int( frameCount )
+    frameSeconds = {}
+    for index in range( frameCount ):
+        drift = 0.75 + 0.5 * index / max( 1, frameCount - 1 )
+        frameSeconds[index + 1] = float( seconds ) * drift * generator.uniform( 0.9, 1.1 )
+    return RecordedJob( "synthetic %s" % spec, frameSeconds, float( startup ) )
+
+def Summarize( label, chunkSize, taskDurations, makespan ):
+    total = sum( taskDurations )
+    return "%-10s %6s %6d %12.1f %12.2f %10.1f" % ( label, chunkSize, len( taskDurations ), makespan / 60.0, total / 3600.0, max( taskDurations ) / 60.0 )
+
+def SimulateJob( job, workers, chunkSizes, targetSeconds, probeCount, minTasks ):
+    frames = sorted( job.frameSeconds )
+    print( "%s: %d frames, %.1fs per frame on average, %.1fs startup, %d Workers" % ( job.name, len( frames ), sum( job.frameSeconds.values() ) / len( frames ), job.startupSeconds, workers ) )
+    print( "%-10s %6s %6s %12s %12s %10s" % ( "mode", "chunk", "tasks", "makespan min", "worker hours", "max task" ) )
+
+    best = None
+    for chunkSize in chunkSizes:
+        durations = GetTaskDurations( [ job.frameSeconds[frame] for frame in frames ], job.startupSeconds, chunkSize )
+        makespan = SimulateMakespan( durations, workers )
+        best = makespan if best is None else min( best, makespan )
+        print( Summarize( "static", chunkSize, durations, makespan ) )
+
+    # The probe tasks measure what the replayed frames took, with the job's startup
+    probeFrames = ChooseProbeFrames( frames, probeCount )
+    remainingFrames = [ frame for frame in frames if frame not in probeFrames ]
+    probeDurations = [ job.startupSeconds + job.frameSeconds[frame] for frame in probeFrames ]
+    probeRecords = [ { "seconds": duration, "frameSeconds": [ job.frameSeconds[frame] ] } for frame, duration in zip( probeFrames, probeDurations ) ]
+    startupSeconds, frameSeconds = EstimateTiming( probeRecords )
+    chunkSize = GetAdaptiveChunkSize( startupSeconds, frameSeconds, len( remainingFrames ), targetSeconds, minTasks )
+
+    # The remaining frames only start once the probe job finished
+    durations = GetTaskDurations( [ job.frameSeconds[frame] for frame in remainingFrames ], job.startupSeconds, chunkSize )
+    makespan = SimulateMakespan( probeDurations, workers ) + SimulateMakespan( durations, workers )
+    print( Summarize( "adaptive", chunkSize, probeDurations + durations, makespan ) )
+    print( "adaptive is %.2fx the best static makespan, %.2fx the makespan of 1 frame per task" % ( makespan / best, makespan / SimulateMakespan( GetTaskDurations( [ job.frameSeconds[frame] for frame in frames ], job.startupSeconds, 1 ), workers ) ) )
+    print( "" )
+
+def main():
+    parser = argparse.ArgumentParser( description="Replay recorded frame times with static and adaptive frames per task." )
+    parser.add_argument( "paths", nargs="*", help="frame metrics .jsonl files or folders holding them" )
+    parser.add_argument( "--synthetic", action="append", default=[], help="FRAMES:SECONDS:STARTUP of a made up job, can be repeated" )
+    parser.add_argument( "--workers", type=int, default=10 )
+    parser.add_argument( "--startup", type=float, default=30.0, help="task startup seconds of jobs without a .phases.jsonl file" )
+    parser.add_argument( "--chunk-sizes", type=int, nargs="+", default=[ 1, 2, 5, 10, 25, 50 ] )
+    parser.add_argument( "--target-minutes", type=float, default=15.0 )
+    parser.add_argument( "--probes", type=int, default=3, help="probe frames of the adaptive job" )
+    parser.add_argument( "--min-tasks", type=int, default=20, help="minimum tasks of the adaptive job's remaining frames" )
+    args = parser.parse_args()
+
+    jobs = LoadJobs( args.paths, args.startup )
+    jobs.extend( MakeSyntheticJob( spec, index ) for index, spec in enumerate( args.synthetic ) )
+    if len( jobs ) == 0:
+        jobs = [ MakeSyntheticJob( "250:4:30", 0 ), MakeSyntheticJob( "120:600:45", 1 ) ]
+
+    for job in jobs:
+        SimulateJob( job, args.workers, args.chunk_sizes, args.target_minutes * 60, args.probes, args.min_tasks )
+
+if __name__ == "__main__":
+    main()
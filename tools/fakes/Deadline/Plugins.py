@@ -0,0 +1,153 @@
+# Stand-in for Deadline.Plugins, so that Blender.py runs outside of Deadline.
+#
+# The fakes in tools/fakes mirror the module layout of Deadline's Python API, put the folder first
+# on sys.path and "from Deadline.Plugins import DeadlinePlugin" imports them. They only implement
+# what this repository's plugin, submission dialog and submitter use, and behave like Deadline
+# where the plugin depends on it: FailRender raises, stdout handlers are matched against every line
+# in registration order, and SetProgress/SetStatusMessage are recorded instead of being sent to the
+# database. tools/FakeWorker.py drives a plugin through the callbacks of a Worker.
+
+from __future__ import absolute_import
+
+from FranticX.Processes import Callback, ManagedProcess, MonitoredProcess, RenderFailure
+from Deadline.Scripting import PluginConfig, ParseBoolean
+
+class PluginType( object ):
+    Simple = 1
+    Advanced = 2
+
+class Job( object ):
+    def __init__( self, jobId="fakejob", pluginInfo=None, concurrentTasks=1, name="fake job" ):
+        self.JobId = jobId
+        self.JobName = name
+        self.JobPlugin = "Blender"
+        self.JobConcurrentTasks = concurrentTasks
+        self.pluginInfo = dict( pluginInfo or {} )
+
+class Task( object ):
+    def __init__( self, taskId, frames ):
+        self.TaskId = str( taskId )
+        self.TaskFrameList = [ str( frame ) for frame in frames ]
+
+class DeadlinePlugin( ManagedProcess ):
+    def __init__( self ):
+        ManagedProcess.__init__( self )
+        self.StartJobCallback = Callback()
+        self.PreRenderTasksCallback = Callback()
+        self.PostRenderTasksCallback = Callback()
+        self.RenderTasksCallback = Callback()
+        self.EndJobCallback = Callback()
+        self.PluginType = PluginType.Simple
+        self.SingleFramesOnly = False
+
+        # Set up by FakeWorker for the job and task being rendered
+        self.job = Job()
+        self.task = Task( 0, [ 0 ] )
+        self.config = PluginConfig()
+        self.pluginDirectory = ""
+        self.workerDirectory = ""
+        self.jobsDataDirectory = ""
+        self.threadNumber = 0
+        self.workerName = "fakeworker"
+        self.canceled = False
+
+        # What the plugin reported, kept for the tools to check
+        self.statusMessages = []
+        self.progress = []
+        self.log = []
+        self.monitoredProcesses = {}
+
+    def LogInfo( self, message ):
+        self.log.append( ( "INFO", message ) )
+
+    def LogWarning( self, message ):
+        self.log.append( ( "WARNING", message ) )
+
+    def FailRender( self, message ):
+        raise RenderFailure( message )
+
+    def SetStatusMessage( self, message ):
+        self.statusMessages.append( message )
+
+    def SetProgress( self, progress ):
+        self.progress.append( progress )
+
+    def IsCanceled( self ):
+        return self.canceled
+
+    def GetConfigEntry( self, key ):
+        return self.config.GetConfigEntry( key )
+
+    def GetConfigEntryWithDefault( self, key, default ):
+        return self.config.GetConfigEntryWithDefault( key, default )
+
+    def GetBooleanConfigEntryWithDefault( self, key, default ):
+        return self.config.GetBooleanConfigEntryWithDefault( key, default )
+
+    def GetPluginInfoEntry( self, key ):
+        return self.job.pluginInfo[key]
+
+    def GetPluginInfoEntryWithDefault( self, key, default ):
+        return self.job.pluginInfo.get( key, default )
+
+    def GetBooleanPluginInfoEntryWithDefault( self, key, default ):
+        return ParseBoolean( self.job.pluginInfo.get( key, default ) )
+
+    def GetJob( self ):
+        return self.job
+
+    def GetCurrentTask( self ):
+        return self.task
+
+    def GetCurrentTaskId( self ):
+        return self.task.TaskId
+
+    def GetStartFrame( self ):
+        return int( self.task.TaskFrameList[0] )
+
+    def GetEndFrame( self ):
+        return int( self.task.TaskFrameList[-1] )
+
+    def GetThreadNumber( self ):
+        return self.threadNumber
+
+    def GetSlaveName( self ):
+        return self.workerName
+
+    def GetSlaveDirectory( self ):
+        return self.workerDirectory
+
+    def GetPluginDirectory( self ):
+        return self.pluginDirectory
+
+    def GetJobsDataDirectory( self ):
+        return self.jobsDataDirectory
+
+    def GetDataFilename( self ):
+        return ""
+
+    def RunManagedProcess( self, process ):
+        process.InitializeProcessCallback()
+        exitCode = process.Run()
+        if exitCode != 0:
+            self.FailRender( "Renderer returned non-zero error code, %d" % exitCode )
+
+    def StartMonitoredManagedProcess( self, name, process ):
+        self.monitoredProcesses[name] = MonitoredProcess( process )
+
+    def MonitoredManagedProcessIsRunning( self, name ):
+        return name in self.monitoredProcesses and self.monitoredProcesses[name].IsRunning()
+
+    def VerifyMonitoredManagedProcess( self, name ):
+        self.monitoredProcesses[name].Verify()
+
+    def FlushMonitoredManagedProcessStdout( self, name ):
+        self.monitoredProcesses[name].Flush()
+
+    def WriteStdinToMonitoredManagedProcess( self, name, text ):
+        self.monitoredProcesses[name].WriteStdin( text )
+
+    def ShutdownMonitoredManagedProcess( self, name ):
+        process = self.monitoredProcesses.pop( name, None )
+        if process is not None:
+            process.Shutdown()
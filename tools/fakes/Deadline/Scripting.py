@@ -0,0 +1,177 @@
+# Stand-in for Deadline.Scripting, see tools/fakes/Deadline/Plugins.py.
+#
+# The utilities answer from class attributes that tools/FakeWorker.py and the tools set up:
+# the plugin configurations, the repository folders, the temp folder and the function that stands
+# in for deadlinecommand.
+
+from __future__ import absolute_import
+
+import os
+import time
+
+FakesDirectory = os.path.dirname( os.path.dirname( os.path.abspath( __file__ ) ) )
+RepositoryDirectory = os.path.join( FakesDirectory, "..", "..", "repoFolder" )
+
+class PluginConfig( object ):
+    ''' The configuration of a plugin, as edited in Configure Plugins '''
+
+    def __init__( self, entries=None ):
+        self.entries = dict( entries or {} )
+
+    def GetConfigKeys( self ):
+        return list( self.entries.keys() )
+
+    def GetConfigEntry( self, key ):
+        return self.entries[key]
+
+    def GetConfigEntryWithDefault( self, key, default ):
+        return self.entries.get( key, default )
+
+    def GetBooleanConfigEntryWithDefault( self, key, default ):
+        return ParseBoolean( self.entries.get( key, default ) )
+
+def ParseBoolean( value ):
+    if isinstance( value, bool ):
+        return value
+    return str( value ).strip().lower() in ( "true", "1", "yes", "on" )
+
+class RepositoryUtils( object ):
+    pluginConfigs = {}
+    # Repository folders searched in order, the fakes stand in for the scripts this repository doesn't have
+    repositoryDirectories = [ os.path.normpath( RepositoryDirectory ), os.path.join( FakesDirectory, "repository" ) ]
+    auxiliaryDirectory = ""
+    pathMappings = []
+
+    @classmethod
+    def GetPluginConfig( cls, plugin ):
+        return cls.pluginConfigs.setdefault( plugin, PluginConfig() )
+
+    @classmethod
+    def GetRepositoryFilePath( cls, path, checkExists=False ):
+        for directory in cls.repositoryDirectories:
+            candidate = os.path.join( directory, path )
+            if os.path.isfile( candidate ):
+                return candidate
+        return "" if checkExists else os.path.join( cls.repositoryDirectories[0], path )
+
+    @classmethod
+    def GetJobAuxiliaryPath( cls, job ):
+        directory = os.path.join( cls.auxiliaryDirectory, job.JobId )
+        if not os.path.isdir( directory ):
+            os.makedirs( directory )
+        return directory
+
+    @classmethod
+    def CheckPathMapping( cls, path ):
+        for source, target in cls.pathMappings:
+            if path.startswith( source ):
+                return target + path[len( source ):]
+        return path
+
+    @staticmethod
+    def GetMaximumPriority():
+        return 100
+
+class SubmittedJobs( object ):
+    ''' Answers like deadlinecommand when a job is submitted, handing out job IDs '''
+
+    def __init__( self ):
+        self.submissions = []
+
+    def __call__( self, arguments ):
+        self.submissions.append( list( arguments ) )
+        return "Result=Success\nJobID=fake%06d\nThe job was submitted successfully.\n" % len( self.submissions )
+
+class ClientUtils( object ):
+    tempDirectory = ""
+    settingsDirectory = ""
+    # Called with the arguments of ExecuteCommandAndGetOutput, returns the output of deadlinecommand
+    executeCommand = SubmittedJobs()
+
+    @classmethod
+    def GetDeadlineTempPath( cls ):
+        return cls.tempDirectory
+
+    @classmethod
+    def GetUsersSettingsDirectory( cls ):
+        return cls.settingsDirectory or cls.tempDirectory
+
+    @classmethod
+    def ExecuteCommandAndGetOutput( cls, arguments ):
+        return cls.executeCommand( arguments )
+
+class FileUtils( object ):
+    @staticmethod
+    def SearchFileList( fileList ):
+        ''' The first file of a semicolon separated list that exists '''
+        for path in fileList.split( ";" ):
+            path = path.strip()
+            if path != "" and os.path.isfile( path ):
+                return path
+        return ""
+
+    @staticmethod
+    def SearchFileListFor32Bit( fileList ):
+        return FileUtils.SearchFileList( fileList )
+
+    @staticmethod
+    def SearchFileListFor64Bit( fileList ):
+        return FileUtils.SearchFileList( fileList )
+
+    @staticmethod
+    def FileExists( path ):
+        return os.path.isfile( path )
+
+class FrameUtils( object ):
+    @staticmethod
+    def Parse( frameList ):
+        ''' The frames of a Deadline frame list like "1-10x2,15" '''
+        frames = []
+        for part in frameList.replace( " ", "," ).split( "," ):
+            if part == "":
+                continue
+            step = 1
+            if "x" in part:
+                part, step = part.split( "x" )
+                step = int( step )
+            if "-" in part[1:]:
+                index = part.index( "-", 1 )
+                start, end = int( part[:index] ), int( part[index + 1:] )
+                frames.extend( range( start, end + 1, step ) if start <= end else range( start, end - 1, -step ) )
+            else:
+                frames.append( int( part ) )
+        return frames
+
+    @staticmethod
+    def FrameArrayIsValid( frameList ):
+        try:
+            return len( FrameUtils.Parse( frameList ) ) > 0
+        except ValueError:
+            return False
+
+class PathUtils( object ):
+    localPaths = False
+
+    @classmethod
+    def IsPathLocal( cls, path ):
+        return cls.localPaths
+
+class SystemUtils( object ):
+    @staticmethod
+    def IsRunningOnWindows():
+        return os.name == "nt"
+
+    @staticmethod
+    def IsRunningOnLinux():
+        return os.name != "nt"
+
+    @staticmethod
+    def Sleep( milliseconds ):
+        time.sleep( milliseconds / 1000.0 )
+
+class StringUtils( object ):
+    @staticmethod
+    def BlankIfEitherIsBlank( first, second ):
+        if first == "" or second == "":
+            return ""
+        return first + second
@@ -0,0 +1,105 @@
+# Stand-in for DeadlineUI.Controls.Scripting.DeadlineScriptDialog, see tools/fakes/Deadline/Plugins.py.
+#
+# The dialog keeps the value of each control by name and doesn't show anything. ShowDialog sets the
+# controls in userValues, as a user would, and presses the SubmitButton when autoSubmit is set.
+# Message boxes are recorded and answered with the first of their buttons, so a submission script
+# runs start to end without a user.
+
+from __future__ import absolute_import
+
+class Signal( object ):
+    def __init__( self ):
+        self.slots = []
+
+    def connect( self, slot ):
+        self.slots.append( slot )
+
+    def emit( self, *args ):
+        for slot in self.slots:
+            slot( *args )
+
+class Control( object ):
+    def __init__( self, name, controlType, value ):
+        self.name = name
+        self.controlType = controlType
+        self.value = value
+        self.enabled = True
+        self.ValueModified = Signal()
+
+class DeadlineScriptDialog( object ):
+    autoSubmit = False
+    # Values set before the SubmitButton is pressed, by control name
+    userValues = {}
+    # Every dialog that was shown, for the tools to look at
+    dialogs = []
+
+    def __init__( self ):
+        self.controls = {}
+        self.messages = []
+        self.title = ""
+        self.shown = False
+
+    def AddControl( self, name, controlType, value ):
+        control = Control( name, controlType, value )
+        self.controls[name] = control
+        return control
+
+    def AddControlToGrid( self, name, controlType, value, *args, **kwargs ):
+        return self.AddControl( name, controlType, value )
+
+    def AddRangeControlToGrid( self, name, controlType, value, *args, **kwargs ):
+        return self.AddControl( name, controlType, value )
+
+    def AddSelectionControlToGrid( self, name, controlType, value, *args, **kwargs ):
+        return self.AddControl( name, controlType, value )
+
+    def AddComboControlToGrid( self, name, controlType, value, *args, **kwargs ):
+        return self.AddControl( name, controlType, value )
+
+    def AddHorizontalSpacerToGrid( self, name, *args, **kwargs ):
+        return self.AddControl( name, "HorizontalSpacer", None )
+
+    def GetValue( self, name ):
+        return self.controls[name].value
+
+    def SetValue( self, name, value ):
+        self.controls[name].value = value
+
+    def SetEnabled( self, name, enabled ):
+        self.controls[name].enabled = enabled
+
+    def GetEnabled( self, name ):
+        return self.controls[name].enabled
+
+    def SetTitle( self, title ):
+        self.title = title
+
+    def GetIcon( self, name ):
+        return name
+
+    def ShowMessageBox( self, message, title, buttons=( "OK", ) ):
+        self.messages.append( ( title, message ) )
+        return buttons[0]
+
+    def ShowDialog( self, modal ):
+        self.shown = True
+        DeadlineScriptDialog.dialogs.append( self )
+        for name, value in self.userValues.items():
+            self.SetValue( name, value )
+        if self.autoSubmit and "SubmitButton" in self.controls:
+            self.controls["SubmitButton"].ValueModified.emit( self.controls["SubmitButton"] )
+
+    def closeEvent( self, *args ):
+        self.shown = False
+
+    # Layout and settings only matter to a real dialog
+    def SetIcon( self, icon ): pass
+    def AddTabControl( self, *args, **kwargs ): pass
+    def EndTabControl( self ): pass
+    def AddTabPage( self, *args, **kwargs ): pass
+    def EndTabPage( self ): pass
+    def AddGrid( self ): pass
+    def EndGrid( self ): pass
+    def LoadSettings( self, settingsFile, settings ): pass
+    def EnabledStickySaving( self, settings, settingsFile ): pass
+    def MakeTopMost( self ): pass
@@ -0,0 +1,182 @@
+# Stand-in for FranticX.Processes, see tools/fakes/Deadline/Plugins.py.
+#
+# ManagedProcess runs the executable and arguments its callbacks return, and feeds every line it
+# prints through the stdout handlers the way the Worker does: each handler's regex is matched
+# against the line, in registration order, and the matching ones are called with the match
+# available from GetRegexMatch.
+
+from __future__ import absolute_import
+
+import os
+import re
+import shlex
+import subprocess
+import sys
+import threading
+import time
+
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+
+class RenderFailure( Exception ):
+    ''' Raised by FailRender, the Worker fails the task with the message '''
+    pass
+
+class Callback( object ):
+    ''' A .NET style event, handlers are added with += and all of them run when it is called '''
+
+    def __init__( self ):
+        self.handlers = []
+
+    def __iadd__( self, handler ):
+        self.handlers.append( handler )
+        return self
+
+    def __call__( self, *args ):
+        result = None
+        for handler in self.handlers:
+            result = handler( *args )
+        return result
+
+class StdoutHandler( object ):
+    def __init__( self, pattern ):
+        self.pattern = pattern
+        self.regex = re.compile( pattern )
+        self.HandleCallback = Callback()
+
+class HandlerStats( object ):
+    ''' Lines fed through the stdout handlers of every process, and the time the handlers took '''
+    lines = 0
+    matches = 0
+    seconds = 0.0
+
+    @classmethod
+    def Reset( cls ):
+        cls.lines = 0
+        cls.matches = 0
+        cls.seconds = 0.0
+
+def GetCommandLine( executable, arguments ):
+    ''' The argument list of a Deadline style executable and argument string. Python scripts are run
+    with this Python, so that tools/FakeBlender.py can stand in for blender. '''
+    commandLine = [ executable ] + shlex.split( arguments, posix=( os.name != "nt" ) )
+    if executable.lower().endswith( ".py" ):
+        commandLine.insert( 0, sys.executable )
+    return commandLine
+
+class ManagedProcess( object ):
+    def __init__( self ):
+        self.InitializeProcessCallback = Callback()
+        self.RenderExecutableCallback = Callback()
+        self.RenderArgumentCallback = Callback()
+        self.StdoutHandlers = []
+        self.StdoutHandling = False
+        self.PopupHandling = False
+        self.output = []
+        self.exitCode = None
+        self.match = None
+        self.lineSuppressed = False
+
+    def AddStdoutHandlerCallback( self, pattern ):
+        handler = StdoutHandler( pattern )
+        self.StdoutHandlers.append( handler )
+        return handler
+
+    def GetRegexMatch( self, index ):
+        return self.match.group( index ) or ""
+
+    def SuppressThisLine( self ):
+        self.lineSuppressed = True
+
+    def HandleStdoutLine( self, line ):
+        ''' Feed a line through the handlers, returns False when a handler suppressed it '''
+        started = time.perf_counter()
+        self.lineSuppressed = False
+        for handler in self.StdoutHandlers:
+            match = handler.regex.match( line )
+            if match is None:
+                continue
+            self.match = match
+            HandlerStats.matches += 1
+            handler.HandleCallback()
+        HandlerStats.lines += 1
+        HandlerStats.seconds += time.perf_counter() - started
+        return not self.lineSuppressed
+
+    def HandleOutput( self, line ):
+        if self.HandleStdoutLine( line ):
+            self.output.append( line )
+
+    def StartProcess( self, stdin=False ):
+        executable = self.RenderExecutableCallback()
+        arguments = self.RenderArgumentCallback()
+        if not os.path.isfile( executable ):
+            raise RenderFailure( "Executable \"%s\" could not be found" % executable )
+        return subprocess.Popen( GetCommandLine( executable, arguments ), stdin=subprocess.PIPE if stdin else subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, universal_newlines=True, bufsize=1 )
+
+    def Run( self ):
+        ''' Run the process to the end, handling its stdout as it is printed, returns the exit code '''
+        process = self.StartProcess()
+        try:
+            for line in process.stdout:
+                self.HandleOutput( line.rstrip( "\r\n" ) )
+        finally:
+            process.stdout.close()
+            self.exitCode = process.wait()
+        return self.exitCode
+
+class MonitoredProcess( object ):
+    ''' A managed process started with StartMonitoredManagedProcess, whose stdout is read by a thread
+    and handled when the plugin flushes it '''
+
+    def __init__( self, managedProcess ):
+        self.managedProcess = managedProcess
+        self.lines = queue.Queue()
+        managedProcess.InitializeProcessCallback()
+        self.process = managedProcess.StartProcess( stdin=True )
+        self.reader = threading.Thread( target=self.Read )
+        self.reader.daemon = True
+        self.reader.start()
+
+    def Read( self ):
+        for line in self.process.stdout:
+            self.lines.put( line.rstrip( "\r\n" ) )
+        self.process.stdout.close()
+
+    def IsRunning( self ):
+        return self.process.poll() is None
+
+    def Flush( self ):
+        while True:
+            try:
+                line = self.lines.get_nowait()
+            except queue.Empty:
+                return
+            self.managedProcess.HandleOutput( line )
+
+    def Verify( self ):
+        ''' Fail like the Worker does once the process exited and its output was handled '''
+        if self.IsRunning():
+            return
+        self.reader.join()
+        self.Flush()
+        raise RenderFailure( "Monitored managed process exited with code %d" % self.process.returncode )
+
+    def WriteStdin( self, text ):
+        self.process.stdin.write( text + "\n" )
+        self.process.stdin.flush()
+
+    def Shutdown( self, timeout=10 ):
+        try:
+            self.process.stdin.close()
+        except ( IOError, OSError ):
+            pass
+        try:
+            self.process.wait( timeout )
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            self.process.wait()
+        self.reader.join()
+        self.Flush()
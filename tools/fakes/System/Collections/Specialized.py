@@ -0,0 +1,11 @@
+# Stand-in for System.Collections.Specialized, see tools/fakes/Deadline/Plugins.py.
+
+from __future__ import absolute_import
+
+class StringCollection( list ):
+    def Add( self, value ):
+        self.append( value )
+
+    @property
+    def Count( self ):
+        return len( self )
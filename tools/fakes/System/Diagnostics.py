@@ -0,0 +1,2 @@
+# Stand-in for System.Diagnostics, see tools/fakes/Deadline/Plugins.py. Blender.py imports it without
+# using it.
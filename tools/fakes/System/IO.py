@@ -0,0 +1,29 @@
+# Stand-in for System.IO, see tools/fakes/Deadline/Plugins.py.
+
+from __future__ import absolute_import
+
+import io
+import os
+
+class Path( object ):
+    @staticmethod
+    def Combine( *paths ):
+        return os.path.join( *paths )
+
+    @staticmethod
+    def GetFileNameWithoutExtension( path ):
+        return os.path.splitext( os.path.basename( path ) )[0]
+
+    @staticmethod
+    def GetDirectoryName( path ):
+        return os.path.dirname( path )
+
+class StreamWriter( object ):
+    def __init__( self, path, append, encoding ):
+        self.file = io.open( path, "a" if append else "w", encoding=encoding.name )
+
+    def WriteLine( self, line ):
+        self.file.write( line + "\n" )
+
+    def Close( self ):
+        self.file.close()
@@ -0,0 +1,13 @@
+# Stand-in for System.Text, see tools/fakes/Deadline/Plugins.py.
+
+from __future__ import absolute_import
+
+class TextEncoding( object ):
+    def __init__( self, name ):
+        self.name = name
+
+class Encoding( object ):
+    # Deadline writes job files as UTF-16 with a byte order mark
+    Unicode = TextEncoding( "utf-16" )
+    UTF8 = TextEncoding( "utf-8" )
+    ASCII = TextEncoding( "ascii" )
@@ -0,0 +1,171 @@
+# Stand-in for Blender's bpy module, with the part of it this repository's scripts use.
+#
+# tools/FakeBlender.py runs the plugin's driver scripts against it, and tools that import the
+# Blender submitter put tools/fakes first on sys.path. Reset() starts over with a new scene, and
+# ops.render.render and ops.wm.save_mainfile can be replaced to render or save something.
+
+from __future__ import absolute_import
+
+import os
+import re
+import sys
+import types
+
+class Collection( list ):
+    ''' A bpy.data collection, indexed by position or by name '''
+
+    def get( self, name, default=None ):
+        for item in self:
+            if item.name == name:
+                return item
+        return default
+
+    def __getitem__( self, key ):
+        if isinstance( key, str ):
+            item = self.get( key )
+            if item is None:
+                raise KeyError( key )
+            return item
+        return list.__getitem__( self, key )
+
+class Object( object ):
+    def __init__( self, name, type="MESH" ):
+        self.name = name
+        self.type = type
+
+class Image( object ):
+    def __init__( self, name, filepath="" ):
+        self.name = name
+        self.filepath = filepath
+        self.library = None
+        self.packed_file = None
+
+    def save_render( self, filepath, scene=None ):
+        ''' Write the image with the scene's output settings, an empty file unless it is replaced '''
+        open( filepath, "wb" ).close()
+
+class ViewLayer( object ):
+    def __init__( self, name, use=True ):
+        self.name = name
+        self.use = use
+
+class ImageSettings( object ):
+    def __init__( self ):
+        self.file_format = "PNG"
+        self.color_mode = "RGBA"
+        self.color_depth = "8"
+
+class Render( object ):
+    def __init__( self ):
+        self.filepath = "//"
+        self.use_file_extension = True
+        self.threads = 1
+        self.threads_mode = "AUTO"
+        self.resolution_x = 1920
+        self.resolution_y = 1080
+        self.resolution_percentage = 100
+        self.use_border = False
+        self.use_crop_to_border = False
+        self.border_min_x = 0.0
+        self.border_max_x = 1.0
+        self.border_min_y = 0.0
+        self.border_max_y = 1.0
+        self.image_settings = ImageSettings()
+
+    def frame_path( self, frame=1 ):
+        path = self.filepath
+        if path.startswith( "//" ):
+            path = os.path.join( os.getcwd(), path[2:] )
+
+        match = None
+        for match in re.finditer( "#+", path ):
+            pass
+        if match is not None:
+            path = path[:match.start()] + str( frame ).zfill( len( match.group( 0 ) ) ) + path[match.end():]
+        else:
+            path += str( frame ).zfill( 4 )
+
+        if self.use_file_extension and not path.lower().endswith( ".png" ):
+            path += ".png"
+        return path
+
+class Scene( object ):
+    def __init__( self ):
+        self.name = "Scene"
+        self.frame_start = 1
+        self.frame_end = 250
+        self.frame_step = 1
+        self.frame_current = 1
+        self.render = Render()
+        self.camera = Object( "Camera", "CAMERA" )
+        self.view_layers = Collection( [ ViewLayer( "ViewLayer" ) ] )
+
+    def frame_set( self, frame ):
+        self.frame_current = frame
+
+class Timers( object ):
+    ''' bpy.app.timers, the registered functions are only called by RunTimers '''
+
+    def __init__( self ):
+        self.functions = []
+
+    def register( self, function, first_interval=0 ):
+        self.functions.append( function )
+
+    def is_registered( self, function ):
+        return function in self.functions
+
+    def RunTimers( self ):
+        ''' Call the registered functions once, keeping the ones that want to be called again '''
+        self.functions = [ function for function in self.functions if function() is not None ]
+
+class Layout( object ):
+    def __init__( self ):
+        self.labels = []
+
+    def label( self, text="", **kwargs ):
+        self.labels.append( text )
+
+class WindowManager( object ):
+    def __init__( self ):
+        self.popups = []
+
+    def popup_menu( self, draw, title="", icon="NONE" ):
+        ''' Draw the menu right away and keep its title, icon and labels '''
+        menu = types.SimpleNamespace( layout=Layout() )
+        draw( menu, context )
+        self.popups.append( ( title, icon, menu.layout.labels ) )
+
+def Finished( **kwargs ):
+    return { "FINISHED" }
+
+def AbsPath( path, start=None, library=None ):
+    ''' bpy.path.abspath: paths starting with // are relative to the library or the scene file '''
+    if not path.startswith( "//" ):
+        return path
+    if library is not None:
+        start = os.path.dirname( AbsPath( library.filepath ) )
+    elif start is None:
+        start = os.path.dirname( data.filepath )
+    return os.path.join( start, path[2:] )
+
+def Reset( sceneFile="", version="4.0.2", background=True, timers=True ):
+    ''' Start over with one scene saved as sceneFile '''
+    module = sys.modules[__name__]
+    scene = Scene()
+    camera = scene.camera
+    module.app = types.SimpleNamespace(
+        version=tuple( int( part ) for part in version.split( "." ) ),
+        version_string=version,
+        build_platform=sys.platform,
+        background=background )
+    if timers:
+        module.app.timers = Timers()
+    module.context = types.SimpleNamespace( scene=scene, selected_objects=[], window_manager=WindowManager() )
+    module.data = types.SimpleNamespace( filepath=sceneFile, scenes=Collection( [ scene ] ), objects=Collection( [ camera ] ), libraries=Collection(), images=Collection( [ Image( "Render Result" ) ] ) )
+    module.path = types.SimpleNamespace( abspath=AbsPath )
+    module.ops = types.SimpleNamespace(
+        render=types.SimpleNamespace( render=Finished ),
+        wm=types.SimpleNamespace( save_mainfile=Finished ) )
+
+Reset()
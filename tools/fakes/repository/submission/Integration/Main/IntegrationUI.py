@@ -0,0 +1,23 @@
+# Stand-in for the IntegrationUI.py of a Deadline repository, see tools/fakes/Deadline/Plugins.py.
+# Project management and Draft integration are never requested.
+
+from __future__ import absolute_import
+
+class IntegrationDialog( object ):
+    def AddIntegrationTabs( self, scriptDialog, settingsName, draftRequested, projectManagementOptions, failOnNoTabs=True ):
+        pass
+
+    def CheckIntegrationSanity( self, outputFile="" ):
+        return True
+
+    def IntegrationProcessingRequested( self ):
+        return False
+
+    def IntegrationGroupBatchRequested( self ):
+        return False
+
+    def WriteIntegrationInfo( self, writer, index ):
+        return index
+
+    def CloseProjectManagementConnections( self, *args ):
+        pass